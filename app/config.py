@@ -16,6 +16,16 @@ DATABASE_URL = f"sqlite:///{DATA_DIR}/config.sqlite"
 # Výchozí porty
 DEFAULT_OPC_UA_PORT = 4840
 DEFAULT_MODBUS_PORT = 5020
+DEFAULT_MQTT_PORT = 1883  # port MQTT brokeru, na který stroje publikují
+
+# OPC UA historie hodnot (HistoryRead) - kruhový buffer v paměti na každý senzor
+OPC_UA_HISTORY_SIZE = 3600            # počet uchovávaných ticků (0 = historie vypnuta)
+OPC_UA_HISTORY_MAX_RESPONSE = 10000   # max. hodnot v jedné odpovědi (zbytek přes continuation point)
+
+# MQTT publikace (stroje s protokolem mqtt jsou klienti brokeru)
+MQTT_RECONNECT_MIN = 1.0        # první pauza před novým připojením po ztrátě spojení (s)
+MQTT_RECONNECT_MAX = 30.0       # nejdelší pauza mezi pokusy o připojení (s)
+MQTT_MAX_INFLIGHT = 1000        # max. nepotvrzených QoS 1 zpráv na spojení
 
 # Výchozí IP adresa
 DEFAULT_HOST = "127.0.0.1"
@@ -23,6 +33,64 @@ DEFAULT_HOST = "127.0.0.1"
 # Simulace - interval aktualizace hodnot (v sekundách)
 SIMULATION_UPDATE_INTERVAL = 1.0
 
+# Autostart - spuštění povolených strojů (is_enabled) při startu aplikace
+AUTOSTART_ENABLED = True
+AUTOSTART_BATCH_SIZE = 10       # počet strojů spouštěných současně v jedné dávce
+AUTOSTART_BATCH_INTERVAL = 0.5  # pauza mezi dávkami (v sekundách)
+
+# Snapshot běhového stavu - běžící stroje a stav generátorů přežijí restart služby
+SNAPSHOT_ENABLED = True
+SNAPSHOT_PATH = DATA_DIR / "runtime.snapshot"
+SNAPSHOT_INTERVAL = 60.0           # periodické ukládání (v sekundách), navíc vždy při ukončení
+SNAPSHOT_RESTORE_BATCH_SIZE = 50   # obnova po startu - strojů v dávce (bez pauzy mezi dávkami)
+
+# Měření zpoždění event loopu a watchdog blokujících callbacků
+LOOP_LAG_INTERVAL = 0.1         # interval měření (v sekundách)
+LOOP_LAG_THRESHOLD = 0.1        # zpoždění, od kterého se eviduje incident (v sekundách)
+LOOP_LAG_MAX_INCIDENTS = 100    # počet uchovávaných incidentů
+LOOP_LAG_ASYNCIO_DEBUG = False  # asyncio debug režim - hlášení pomalých callbacků (zpomaluje loop)
+
+# Profilování na vyžádání (/api/admin/profile)
+PROFILE_MAX_SECONDS = 60.0          # maximální délka jednoho měření
+PROFILE_DEFAULT_INTERVAL_MS = 5.0   # výchozí interval samplování
+
+# Hromadné vytváření/import flotily - počet strojů v jednom INSERT (import je jedna transakce)
+FLEET_BATCH_SIZE = 100
+
+# Limitní alarmy senzorů (/api/alarms)
+ALARM_HISTORY_SIZE = 1000       # počet uchovávaných přechodů alarmů
+ALARM_STREAM_QUEUE_SIZE = 1000  # fronta jednoho SSE odběratele (při zaplnění se události zahazují)
+ALARM_STREAM_KEEPALIVE = 15.0   # interval keepalive komentáře v SSE streamu (v sekundách)
+
+# Scénáře - časové osy skriptovaných událostí (/api/scenarios)
+SCENARIO_MAX_SPEED = 1000.0     # maximální zrychlení času scénáře
+SCENARIO_MAX_EVENTS = 100000    # maximální počet událostí jednoho scénáře
+SCENARIO_HISTORY_SIZE = 20      # počet uchovávaných dokončených běhů
+
+# Plánování kapacity a řízení přijetí simulátorů (/api/admin/capacity)
+CAPACITY_CPU_BUDGET = 0.7               # max. odhadované vytížení event loopu ticky (podíl jednoho jádra)
+CAPACITY_LATENCY_BUDGET = 0.05          # max. odhadované střední zpoždění ticku ve frontě event loopu (s)
+CAPACITY_ADMISSION = "refuse"           # start nad rozpočet: refuse = odmítnout, queue = do fronty, off = jen odhad
+CAPACITY_QUEUE_INTERVAL = 5.0           # perioda opakovaného posouzení strojů ve frontě na kapacitu (s)
+CAPACITY_CALIBRATE_ON_STARTUP = True    # kalibrace modelu nákladů krátkým benchmarkem po startu aplikace
+CAPACITY_CALIBRATION_TAGS = (10, 500)   # počty tagů kalibračního stroje (dva body lineárního modelu)
+CAPACITY_CALIBRATION_TICKS = 20         # měřených ticků v každém bodu
+
+# Adaptivní zpomalování strojů při přetížení (/api/admin/load-shedding)
+LOAD_SHEDDING_ENABLED = True
+LOAD_SHEDDING_INTERVAL = 2.0            # perioda regulátoru (s)
+LOAD_SHEDDING_HIGH_UTILIZATION = 0.85   # vytížení loopu ticky, nad kterým se zpomaluje
+LOAD_SHEDDING_LOW_UTILIZATION = 0.6     # vytížení, pod kterým se rychlost obnovuje
+LOAD_SHEDDING_HIGH_LAG = 0.05           # průměrné zpoždění loopu za periodu, nad kterým se zpomaluje (s)
+LOAD_SHEDDING_LOW_LAG = 0.01            # průměrné zpoždění, pod kterým se rychlost obnovuje (s)
+LOAD_SHEDDING_MAX_SLOWDOWN = 8          # max. násobek intervalu aktualizace zpomaleného stroje
+LOAD_SHEDDING_HISTORY_SIZE = 200        # počet uchovávaných změn rychlosti
+
+# Renderování šablon - bytecode cache zkompilovaných šablon a cache karet strojů
+TEMPLATE_BYTECODE_CACHE = True
+TEMPLATE_CACHE_DIR = DATA_DIR / "template_cache"
+MACHINE_CARD_CACHE_SIZE = 5000  # max. uchovávaných vyrenderovaných karet strojů
+
 
 # Zajistit existenci složky data
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -2,6 +2,10 @@
 Databázové připojení a session management
 """
 
+from enum import Enum
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
 from sqlmodel import SQLModel, create_engine, Session
 from app.config import DATABASE_URL
 
@@ -13,9 +17,56 @@ engine = create_engine(
 )
 
 
+# Datové migrace spouštěné po doplnění sloupců (idempotentní SQL příkazy)
+DATA_MIGRATIONS = [
+    # simulation_type byl Enum sloupec ukládající názvy členů (SINE),
+    # nyní je to název z registru typů simulace (sine)
+    "UPDATE sensors SET simulation_type = lower(simulation_type) "
+    "WHERE simulation_type IN ('RANDOM', 'SINE', 'STEP', 'RAMP', 'CONSTANT')",
+]
+
+
+def _sql_literal(value) -> str:
+    """Výchozí hodnota sloupce jako SQL literál"""
+    if isinstance(value, Enum):
+        value = value.name  # SQLAlchemy Enum ukládá názvy členů
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _add_missing_columns(connection: Connection) -> None:
+    """
+    Doplní do existujících tabulek sloupce přidané do modelů.
+    Lehká náhrada migrací - sloupce se jen přidávají, nikdy nemažou ani nemění.
+    """
+    inspector = inspect(connection)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            default = column.default
+            if default is not None and default.is_scalar:
+                ddl += f" DEFAULT {_sql_literal(default.arg)}"
+            elif not column.nullable:
+                # NOT NULL bez výchozí hodnoty nelze do neprázdné tabulky přidat
+                continue
+            connection.execute(text(ddl))
+
+
 def create_db_and_tables():
-    """Vytvoří databázi a tabulky"""
+    """Vytvoří databázi a tabulky, doplní nové sloupce a provede datové migrace"""
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        _add_missing_columns(connection)
+        for statement in DATA_MIGRATIONS:
+            connection.execute(text(statement))
 
 
 def get_session():
@@ -0,0 +1,239 @@
+"""
+Headless runner - spuštění simulátorů z popisu flotily bez webového rozhraní
+
+Nepoužívá FastAPI, uvicorn, Jinja ani SQLite databázi. Stroje se spouští
+přímo přes SimulationManager, vhodné pro CI a zátěžové testy v kontejnerech.
+
+    plc-sim-headless fleet.json
+    plc-sim-headless fleet.yaml --duration 60 --timing-json timing.json
+    plc-sim-headless fleet.json --snapshot state.bin   # teplý restart ze snapshotu
+    plc-sim-headless fleet.json --scenario scenario.json --speed 10 --duration 30
+    plc-sim-headless fleet.json --admission refuse   # jen stroje, které se vejdou do rozpočtu kapacity
+    plc-sim-headless fleet.json --load-shedding      # při přetížení zpomalovat stroje nižší priority
+"""
+
+import time
+
+# Čas importu modulu - základ pro měření studeného startu
+_T0 = time.perf_counter()
+
+import argparse
+import asyncio
+import json
+import logging
+import signal
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import AUTOSTART_BATCH_SIZE, CAPACITY_CALIBRATE_ON_STARTUP, SNAPSHOT_INTERVAL
+from app.services.capacity import ADMISSION_MODES, capacity_planner
+from app.services.fleet import FleetFileError, build_fleet, load_fleet_file
+from app.services.load_shedding import load_shedder
+from app.services.loop_lag import loop_lag_monitor
+from app.services.scenarios import compile_scenario, load_scenario_file, scenario_runner
+from app.services.snapshot import SnapshotWriter, read_snapshot
+from app.simulators.manager import simulation_manager
+
+logger = logging.getLogger("app.headless")
+
+
+def _elapsed_ms(since: float) -> float:
+    """Vrátí uplynulý čas v milisekundách"""
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+async def run_fleet(
+    fleet_path: str,
+    batch_size: int = AUTOSTART_BATCH_SIZE,
+    duration: Optional[float] = None,
+    timing_json: Optional[str] = None,
+    snapshot_path: Optional[str] = None,
+    scenario_path: Optional[str] = None,
+    speed: Optional[float] = None,
+    admission: str = "off",
+    load_shedding: bool = False,
+) -> int:
+    """
+    Spustí flotilu a běží do přerušení (nebo po dobu duration).
+
+    Returns:
+        Návratový kód procesu
+    """
+    timing: Dict[str, float] = {"imports_ms": _elapsed_ms(_T0)}
+
+    t = time.perf_counter()
+    try:
+        fleet = build_fleet(load_fleet_file(fleet_path))
+    except (OSError, FleetFileError, ValueError) as e:
+        logger.error(f"Nelze načíst flotilu {fleet_path}: {e}")
+        return 2
+    timing["fleet_load_ms"] = _elapsed_ms(t)
+
+    # Scénář se přeloží proti popisu flotily ještě před startem serverů
+    scenario = None
+    if scenario_path:
+        machines = {machine.id: (machine, sensors) for machine, sensors in fleet}
+        try:
+            scenario = compile_scenario(load_scenario_file(scenario_path), machines.get)
+        except (OSError, ValueError) as e:
+            logger.error(f"Nelze načíst scénář {scenario_path}: {e}")
+            return 2
+
+    # Snapshot z minulého běhu - stroje navážou uloženým stavem generátorů
+    snapshot = read_snapshot(Path(snapshot_path)) if snapshot_path else None
+
+    # Řízení přijetí - zátěžové testy záměrně přetěžují, proto je výchozí "off"
+    capacity_planner.admission = admission
+    if admission != "off" and CAPACITY_CALIBRATE_ON_STARTUP:
+        t = time.perf_counter()
+        await capacity_planner.calibrate()
+        timing["calibration_ms"] = _elapsed_ms(t)
+
+    # Bez pauzy mezi dávkami - v headless režimu jde o co nejrychlejší start
+    t = time.perf_counter()
+    progress = await simulation_manager.autostart(fleet, batch_size, batch_interval=0.0, snapshot=snapshot)
+    timing["servers_start_ms"] = _elapsed_ms(t)
+
+    # Čekat na první publikované hodnoty všech spuštěných simulátorů
+    t = time.perf_counter()
+    simulators = [
+        simulation_manager.get_simulator(machine.id)
+        for machine, _ in fleet
+        if simulation_manager.is_running(machine.id)
+    ]
+    await asyncio.gather(*(sim.wait_first_update(timeout=10.0) for sim in simulators))
+    timing["first_values_ms"] = _elapsed_ms(t)
+    timing["cold_start_ms"] = _elapsed_ms(_T0)
+
+    sensors_total = sum(len(sensors) for _, sensors in fleet)
+    logger.info(
+        f"Flotila spuštěna: {progress.started}/{progress.total} strojů, "
+        f"{sensors_total} senzorů, studený start {timing['cold_start_ms']} ms "
+        f"(importy {timing['imports_ms']} ms, servery {timing['servers_start_ms']} ms, "
+        f"první hodnoty {timing['first_values_ms']} ms)"
+    )
+    if progress.failed:
+        logger.error(f"Nepodařilo se spustit stroje: {progress.failed_ids}")
+    if progress.queued:
+        logger.warning(f"Ve frontě na kapacitu: {simulation_manager.get_queued()}")
+
+    if timing_json:
+        report = {
+            "machines": progress.total,
+            "started": progress.started,
+            "failed": progress.failed,
+            "queued": progress.queued,
+            "sensors": sensors_total,
+            **timing,
+        }
+        with open(timing_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    # Běh do signálu nebo po zadanou dobu
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    writer = None
+    if snapshot_path:
+        writer = SnapshotWriter(Path(snapshot_path), SNAPSHOT_INTERVAL, simulation_manager.capture_snapshot)
+        writer.start()
+
+    # Stroje ve frontě na kapacitu se spustí, až se kapacita uvolní
+    if admission == "queue":
+        simulation_manager.start_queue_drain()
+
+    # Regulátor zátěže - stejně jako u admission je výchozí vypnutý kvůli zátěžovým testům
+    if load_shedding:
+        loop_lag_monitor.start()
+        load_shedder.start(simulation_manager.get_running_simulators)
+
+    run = None
+    if scenario is not None:
+        run = scenario_runner.start(scenario, simulation_manager, machines.get, speed)
+
+    with suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(stop.wait(), duration)
+
+    await scenario_runner.stop_all()
+    if run is not None and run.errors:
+        logger.error(f"Scénář '{scenario.name}': {len(run.errors)} událostí se nepodařilo provést")
+
+    if writer:
+        await writer.stop()
+        await writer.save()
+    logger.info("Zastavuji flotilu...")
+    if load_shedding:
+        await load_shedder.stop()
+        if load_shedder.events:
+            logger.info(f"Regulátor zátěže provedl {len(load_shedder.events)} změn rychlosti")
+        await loop_lag_monitor.stop()
+    await simulation_manager.stop_queue_drain()
+    await simulation_manager.stop_all()
+
+    return 1 if progress.failed or (run is not None and run.errors) else 0
+
+
+def run():
+    """Vstupní bod příkazu plc-sim-headless"""
+    parser = argparse.ArgumentParser(
+        prog="plc-sim-headless",
+        description="Spustí simulované PLC stroje z popisu flotily (JSON/YAML) bez webového rozhraní",
+    )
+    parser.add_argument("fleet", help="Soubor s popisem flotily (.json, .yaml, .yml)")
+    parser.add_argument(
+        "--batch-size", type=int, default=AUTOSTART_BATCH_SIZE,
+        help="Počet strojů spouštěných současně",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=None,
+        help="Doba běhu v sekundách (výchozí: do přerušení)",
+    )
+    parser.add_argument(
+        "--timing-json", default=None,
+        help="Uložit naměřené časy studeného startu do JSON souboru",
+    )
+    parser.add_argument(
+        "--snapshot", default=None,
+        help="Soubor se snapshotem stavu - při startu se obnoví, průběžně a při ukončení uloží",
+    )
+    parser.add_argument(
+        "--scenario", default=None,
+        help="Scénář událostí (.json, .yaml) spuštěný po startu flotily",
+    )
+    parser.add_argument(
+        "--speed", type=float, default=None,
+        help="Zrychlení času scénáře (výchozí: hodnota speed ze scénáře)",
+    )
+    parser.add_argument(
+        "--admission", choices=ADMISSION_MODES, default="off",
+        help="Stroje nad rozpočet kapacity odmítnout (refuse), zařadit do fronty (queue) nebo spustit (off)",
+    )
+    parser.add_argument(
+        "--load-shedding", action="store_true",
+        help="Při přetížení zpomalovat aktualizaci strojů s nižší prioritou",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Úroveň logování")
+    args = parser.parse_args()
+    if args.speed is not None and args.speed <= 0:
+        parser.error("--speed musí být kladné číslo")
+
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    exit_code = asyncio.run(
+        run_fleet(
+            args.fleet, args.batch_size, args.duration, args.timing_json, args.snapshot,
+            args.scenario, args.speed, args.admission, args.load_shedding,
+        )
+    )
+    raise SystemExit(exit_code)
+
+
+if __name__ == "__main__":
+    run()
@@ -2,15 +2,78 @@
 Hlavní FastAPI aplikace - PLC Simulátor pro Industry 4.0
 """
 
-import uvicorn
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from typing import Iterable
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.config import (
+    STATIC_DIR,
+    AUTOSTART_ENABLED,
+    AUTOSTART_BATCH_SIZE,
+    AUTOSTART_BATCH_INTERVAL,
+    CAPACITY_CALIBRATE_ON_STARTUP,
+    LOAD_SHEDDING_ENABLED,
+    SNAPSHOT_ENABLED,
+    SNAPSHOT_PATH,
+    SNAPSHOT_INTERVAL,
+    SNAPSHOT_RESTORE_BATCH_SIZE,
+)
+from app.database import create_db_and_tables, engine
+from app.models import Machine
+from app.routers import (
+    dashboard_router,
+    machines_router,
+    api_router,
+    simulation_router,
+    sensors_router,
+    fleet_router,
+    metrics_router,
+    admin_router,
+    alarms_router,
+    scenarios_router,
+)
+from app.services.capacity import capacity_planner
+from app.services.load_shedding import load_shedder
+from app.services.loop_lag import loop_lag_monitor
+from app.services.scenarios import scenario_runner
+from app.services.snapshot import SnapshotWriter, read_snapshot
+from app.simulators.manager import StartupProgress, simulation_manager
+
+
+async def _startup(machines, batch_size: int, batch_interval: float, snapshot) -> None:
+    """Kalibrace modelu kapacity a autostart strojů (běží na pozadí)"""
+    if CAPACITY_CALIBRATE_ON_STARTUP:
+        try:
+            await capacity_planner.calibrate()
+        except Exception as e:
+            print(f"⚠️ Kalibrace kapacity selhala, platí výchozí model: {e}")
+    if machines:
+        await simulation_manager.autostart(machines, batch_size, batch_interval, snapshot)
 
-from app.config import STATIC_DIR
-from app.database import create_db_and_tables
-from app.routers import dashboard_router, machines_router, api_router, simulation_router, sensors_router
-from app.simulators.manager import simulation_manager
+
+def _load_startup_machines(restore_ids: Iterable[int]):
+    """Načte stroje ke spuštění po startu včetně senzorů - povolené (autostart) a běžící podle snapshotu"""
+    conditions = []
+    if AUTOSTART_ENABLED:
+        conditions.append(Machine.is_enabled == True)  # noqa: E712
+    restore_ids = list(restore_ids)
+    if restore_ids:
+        conditions.append(Machine.id.in_(restore_ids))
+    if not conditions:
+        return []
+    with Session(engine) as session:
+        machines = session.exec(
+            select(Machine)
+            .where(or_(*conditions))
+            .options(selectinload(Machine.sensors))
+            .order_by(Machine.id)
+        ).all()
+        return [(machine, list(machine.sensors)) for machine in machines]
 
 
 @asynccontextmanager
@@ -21,11 +84,57 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     print("✅ Databáze připravena")
     
+    loop_lag_monitor.start()
+    if LOAD_SHEDDING_ENABLED:
+        load_shedder.start(simulation_manager.get_running_simulators)
+    simulation_manager.start_queue_drain()
+    
+    # Snapshot z minulého běhu - běžící stroje navážou uloženým stavem generátorů
+    snapshot = read_snapshot(SNAPSHOT_PATH) if SNAPSHOT_ENABLED else None
+    snapshot_writer = None
+    if SNAPSHOT_ENABLED:
+        snapshot_writer = SnapshotWriter(SNAPSHOT_PATH, SNAPSHOT_INTERVAL, simulation_manager.capture_snapshot)
+    
+    # Kalibrace kapacity a autostart povolených a obnovovaných strojů na pozadí -
+    # neblokuje připravenost aplikace, autostart už posuzuje přijetí kalibrovaným modelem
+    autostart_task = None
+    machines = _load_startup_machines(snapshot.machines if snapshot else ())
+    batch_size, batch_interval = AUTOSTART_BATCH_SIZE, AUTOSTART_BATCH_INTERVAL
+    if snapshot and snapshot.machines:
+        batch_size, batch_interval = max(batch_size, SNAPSHOT_RESTORE_BATCH_SIZE), 0.0
+    if machines:
+        # Průběh je v /ready vidět už během kalibrace, autostart ho pak průběžně doplňuje
+        simulation_manager.startup_progress = StartupProgress(total=len(machines), in_progress=True)
+    if machines or CAPACITY_CALIBRATE_ON_STARTUP:
+        autostart_task = asyncio.create_task(_startup(machines, batch_size, batch_interval, snapshot))
+    if machines:
+        print(f"⏳ Autostart {len(machines)} strojů na pozadí")
+    if snapshot_writer:
+        snapshot_writer.start()
+    simulation_manager.ready = True
+    
     yield
     
     # Shutdown
     print("🛑 Zastavuji PLC Simulátor...")
+    if autostart_task and not autostart_task.done():
+        autostart_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await autostart_task
+    simulation_manager.ready = False
+    await scenario_runner.stop_all()
+    if snapshot_writer:
+        # Stav se zachytí ještě před zastavením simulací
+        await snapshot_writer.stop()
+        try:
+            snapshot = await snapshot_writer.save()
+            print(f"💾 Snapshot uložen ({len(snapshot.machines)} běžících strojů)")
+        except Exception as e:
+            print(f"⚠️ Snapshot se nepodařilo uložit: {e}")
+    await load_shedder.stop()
+    await simulation_manager.stop_queue_drain()
     await simulation_manager.stop_all()
+    await loop_lag_monitor.stop()
     print("✅ Simulátor zastaven")
 
 
@@ -47,10 +156,18 @@ app.include_router(machines_router)
 app.include_router(api_router)
 app.include_router(simulation_router)
 app.include_router(sensors_router)
+app.include_router(fleet_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
+app.include_router(alarms_router)
+app.include_router(scenarios_router)
 
 
 def run():
     """Spustí aplikaci pomocí uvicorn"""
+    # Import až zde - workery uvicornu i testy importují jen app.main:app
+    import uvicorn
+    
     uvicorn.run(
         "app.main:app",
         host="127.0.0.1",
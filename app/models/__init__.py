@@ -2,17 +2,26 @@
 Databázové modely
 """
 
-from app.models.machine import Machine, MachineCreate, MachineUpdate, ProtocolType
+from app.models.machine import Machine, MachineCreate, MachinePriority, MachineUpdate, ProtocolType
 from app.models.sensor import Sensor, SensorCreate, SensorUpdate, DataType, SimulationType
+from app.models.timestamps import utc_now
+from app.models.fleet import FleetConfig, FleetGenerate, FleetImportResult, MachineConfig, SensorConfig
 
 __all__ = [
     "Machine",
     "MachineCreate", 
     "MachineUpdate",
+    "MachinePriority",
     "ProtocolType",
     "Sensor",
     "SensorCreate",
     "SensorUpdate",
     "DataType",
     "SimulationType",
+    "FleetConfig",
+    "FleetGenerate",
+    "FleetImportResult",
+    "MachineConfig",
+    "SensorConfig",
+    "utc_now",
 ]
@@ -0,0 +1,64 @@
+"""
+Schémata pro hromadnou práci s konfigurací flotily (šablony, export, import)
+"""
+
+from typing import Any, Dict, Optional, List
+from pydantic import ValidationInfo, field_validator, model_validator
+from sqlmodel import SQLModel, Field
+
+from app.models.machine import MachineBase, _validate_impairment
+from app.models.sensor import SensorBase
+
+
+class SensorConfig(SensorBase):
+    """Konfigurace senzoru bez vazby na databázi"""
+    pass
+
+
+class MachineConfig(MachineBase):
+    """Konfigurace stroje včetně jeho senzorů"""
+    sensors: List[SensorConfig] = Field(default_factory=list)
+    
+    @field_validator("impairment")
+    @classmethod
+    def _check_impairment(cls, value: Optional[Dict[str, Any]], info: ValidationInfo) -> Optional[Dict[str, float]]:
+        """Profil zhoršení sítě jen u protokolů, kterým lze předřadit proxy"""
+        return _validate_impairment(value, info.data.get("protocol"))
+    
+    @model_validator(mode="after")
+    def _validate_formulas(self):
+        """Vzorce odvozených senzorů musí odkazovat na senzory stroje a nesmí tvořit cyklus"""
+        from app.services.formulas import check_formulas
+        
+        check_formulas(self.sensors)
+        return self
+
+
+class FleetConfig(SQLModel):
+    """Kompletní konfigurace flotily strojů"""
+    machines: List[MachineConfig] = Field(default_factory=list)
+
+
+class FleetGenerate(SQLModel):
+    """Požadavek na hromadné vygenerování strojů ze šablony"""
+    template: MachineConfig = Field(description="Šablona stroje včetně senzorů")
+    count: int = Field(gt=0, le=10000, description="Počet strojů k vytvoření")
+    port_start: int = Field(ge=1, le=65535, description="Začátek rozsahu portů")
+    port_end: int = Field(ge=1, le=65535, description="Konec rozsahu portů (včetně)")
+    name_pattern: str = Field(
+        default="{name}-{n:03d}",
+        description="Vzor názvu stroje; {name} = název šablony, {n} = pořadí od start_index",
+    )
+    start_index: int = Field(default=1, description="Pořadové číslo prvního stroje")
+    batch_size: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Počet strojů v jednom INSERT (výchozí dle konfigurace)",
+    )
+
+
+class FleetImportResult(SQLModel):
+    """Výsledek hromadného vložení strojů"""
+    created_machines: int
+    created_sensors: int
+    machine_ids: List[int]
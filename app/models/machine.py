@@ -4,8 +4,11 @@ Model pro stroj (Machine) - PLC simulátor
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional, List, TYPE_CHECKING
-from sqlmodel import SQLModel, Field, Relationship
+from typing import Any, Dict, Optional, List, TYPE_CHECKING
+from pydantic import ValidationInfo, field_serializer, field_validator
+from sqlmodel import SQLModel, Field, Relationship, JSON
+
+from app.models.timestamps import utc_now
 
 if TYPE_CHECKING:
     from app.models.sensor import Sensor
@@ -15,6 +18,14 @@ class ProtocolType(str, Enum):
     """Typ komunikačního protokolu"""
     OPC_UA = "opc_ua"
     MODBUS = "modbus"
+    MQTT = "mqtt"
+
+
+class MachinePriority(str, Enum):
+    """Priorita stroje při přetížení - nižší priorita se zpomaluje dřív (viz load_shedding)"""
+    CRITICAL = "critical"  # vždy jmenovitá rychlost aktualizace
+    NORMAL = "normal"
+    LOW = "low"
 
 
 class MachineBase(SQLModel):
@@ -22,9 +33,62 @@ class MachineBase(SQLModel):
     name: str = Field(index=True, description="Název stroje (např. 'Lis-01')")
     description: Optional[str] = Field(default=None, description="Popis stroje")
     protocol: ProtocolType = Field(default=ProtocolType.OPC_UA, description="Komunikační protokol")
-    host: str = Field(default="127.0.0.1", description="IP adresa serveru")
-    port: int = Field(default=4840, description="Port serveru")
+    host: str = Field(default="127.0.0.1", description="IP adresa serveru (u MQTT adresa brokeru)")
+    port: int = Field(default=4840, description="Port serveru (u MQTT port brokeru)")
     is_enabled: bool = Field(default=True, description="Zda je stroj aktivní pro simulaci")
+    priority: MachinePriority = Field(
+        default=MachinePriority.NORMAL,
+        description="Priorita při přetížení: critical = nikdy nezpomalovat, low = zpomalit jako první"
+    )
+    process_model: Optional[str] = Field(
+        default=None,
+        description="Procesní model stroje (např. 'machine'), None = senzory jsou nezávislé"
+    )
+    process_params: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_type=JSON,
+        description="Parametry procesního modelu (např. {\"mtbf\": 600})"
+    )
+    impairment: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_type=JSON,
+        description="Profil zhoršení sítě (např. {\"latency_ms\": 200, \"drop_rate\": 0.05}), None = bez proxy"
+    )
+    protocol_settings: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_type=JSON,
+        description="Nastavení protokolu (např. {\"encoding\": \"sparkplug\"} u MQTT), None = výchozí"
+    )
+    
+    @field_validator("process_model")
+    @classmethod
+    def _validate_process_model(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            _validate_process(value, None)
+        return value
+    
+    @field_validator("process_params")
+    @classmethod
+    def _check_process_params(cls, value: Optional[Dict[str, Any]], info: ValidationInfo) -> Optional[Dict[str, float]]:
+        """Procesní model musí být registrován a parametry musí odpovídat jeho deklaraci"""
+        process_model = info.data.get("process_model")
+        if process_model is None:
+            return None
+        return _validate_process(process_model, value)
+    
+    @field_validator("impairment")
+    @classmethod
+    def _check_impairment(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+        return _validate_impairment(value)
+    
+    @field_validator("protocol_settings")
+    @classmethod
+    def _check_protocol_settings(cls, value: Optional[Dict[str, Any]], info: ValidationInfo) -> Optional[Dict[str, Any]]:
+        """Nastavení musí odpovídat deklaraci protokolu stroje"""
+        protocol = info.data.get("protocol")
+        if protocol is None:
+            return value
+        return _validate_protocol_settings(protocol, value)
 
 
 class Machine(MachineBase, table=True):
@@ -32,8 +96,8 @@ class Machine(MachineBase, table=True):
     __tablename__ = "machines"
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="Čas vytvoření")
-    updated_at: datetime = Field(default_factory=datetime.utcnow, description="Čas poslední úpravy")
+    created_at: datetime = Field(default_factory=utc_now, description="Čas vytvoření")
+    updated_at: datetime = Field(default_factory=utc_now, description="Čas poslední úpravy")
     
     # Relace na senzory
     sensors: List["Sensor"] = Relationship(
@@ -43,12 +107,44 @@ class Machine(MachineBase, table=True):
     
     def update_timestamp(self):
         """Aktualizuje čas poslední úpravy"""
-        self.updated_at = datetime.utcnow()
+        self.updated_at = utc_now()
+
+
+def _validate_process(process_model: str, params: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Zvaliduje procesní model a jeho parametry proti registru"""
+    # Import až zde - registr modelů importuje services, které importují modely
+    from app.services.process_models import validate_process_params
+    
+    return validate_process_params(process_model, params)
+
+
+def _validate_impairment(
+    impairment: Optional[Dict[str, Any]],
+    protocol: Optional[ProtocolType] = None,
+) -> Optional[Dict[str, float]]:
+    """Zvaliduje profil zhoršení sítě (se zadaným protokolem i jeho podporu proxy)"""
+    from app.simulators.impairment import supports_impairment, validate_impairment
+    
+    if impairment and protocol is not None and not supports_impairment(protocol):
+        raise ValueError(f"Protokol {protocol.value} zhoršení sítě nepodporuje")
+    return validate_impairment(impairment)
+
+
+def _validate_protocol_settings(protocol: ProtocolType, settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Zvaliduje nastavení protokolu proti jeho deklaraci"""
+    from app.simulators.protocol_settings import validate_protocol_settings
+    
+    return validate_protocol_settings(protocol, settings)
 
 
 class MachineCreate(MachineBase):
     """Schema pro vytvoření stroje"""
-    pass
+    
+    @field_validator("impairment")
+    @classmethod
+    def _check_impairment(cls, value: Optional[Dict[str, Any]], info: ValidationInfo) -> Optional[Dict[str, float]]:
+        """Profil zhoršení sítě jen u protokolů, kterým lze předřadit proxy"""
+        return _validate_impairment(value, info.data.get("protocol"))
 
 
 class MachineUpdate(SQLModel):
@@ -59,6 +155,31 @@ class MachineUpdate(SQLModel):
     host: Optional[str] = None
     port: Optional[int] = None
     is_enabled: Optional[bool] = None
+    priority: Optional[MachinePriority] = None
+    process_model: Optional[str] = None
+    process_params: Optional[Dict[str, Any]] = None
+    impairment: Optional[Dict[str, Any]] = None
+    protocol_settings: Optional[Dict[str, Any]] = None
+    
+    @field_validator("name", "protocol", "host", "port", "is_enabled", "priority")
+    @classmethod
+    def _check_not_null(cls, value: Any, info: ValidationInfo) -> Any:
+        """Sloupec nepovoluje NULL - vynechané pole se nemění, explicitní null se odmítne"""
+        if value is None:
+            raise ValueError(f"Pole '{info.field_name}' nesmí být null")
+        return value
+    
+    @field_validator("process_model")
+    @classmethod
+    def _validate_process_model(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            _validate_process(value, None)
+        return value
+    
+    @field_validator("impairment")
+    @classmethod
+    def _check_impairment(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+        return _validate_impairment(value)
 
 
 class MachineRead(MachineBase):
@@ -66,3 +187,10 @@ class MachineRead(MachineBase):
     id: int
     created_at: datetime
     updated_at: datetime
+    
+    @field_serializer("protocol_settings")
+    def _mask_protocol_settings(self, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Tajná nastavení (heslo) se v odpovědích nevrací"""
+        from app.simulators.protocol_settings import mask_protocol_settings
+        
+        return mask_protocol_settings(self.protocol, value)
@@ -4,8 +4,11 @@ Model pro senzor (Sensor) - hodnoty vystavované strojem
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional, TYPE_CHECKING
-from sqlmodel import SQLModel, Field, Relationship
+from typing import Any, Dict, Optional, TYPE_CHECKING
+from pydantic import ValidationInfo, field_validator, model_validator
+from sqlmodel import SQLModel, Field, Relationship, JSON
+
+from app.models.timestamps import utc_now
 
 if TYPE_CHECKING:
     from app.models.machine import Machine
@@ -19,7 +22,10 @@ class DataType(str, Enum):
 
 
 class SimulationType(str, Enum):
-    """Typ simulace hodnot"""
+    """
+    Vestavěné typy simulace hodnot.
+    Senzor může použít libovolný typ z registru app.services.simulation_types.
+    """
     RANDOM = "random"      # Náhodné hodnoty v rozsahu min-max
     SINE = "sine"          # Sinusový průběh
     STEP = "step"          # Skokové změny
@@ -35,15 +41,49 @@ class SensorBase(SQLModel):
     initial_value: float = Field(default=0.0, description="Počáteční hodnota")
     min_value: float = Field(default=0.0, description="Minimální hodnota pro simulaci")
     max_value: float = Field(default=100.0, description="Maximální hodnota pro simulaci")
-    simulation_type: SimulationType = Field(
-        default=SimulationType.RANDOM,
-        description="Typ simulace hodnot"
+    simulation_type: str = Field(
+        default=SimulationType.RANDOM.value,
+        description="Typ simulace hodnot (název z registru typů simulace)"
+    )
+    simulation_params: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_type=JSON,
+        description="Parametry typu simulace (např. {\"period\": 10})"
+    )
+    formula: Optional[str] = Field(
+        default=None,
+        description="Vzorec odvozeného senzoru (typ simulace 'formula'), např. 'napeti * proud'"
+    )
+    alarms: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_type=JSON,
+        description="Limity alarmů (např. {\"hi\": 80, \"hihi\": 95, \"deadband\": 2, \"delay\": 3})"
     )
     # Pro Modbus - adresa registru
     register_address: Optional[int] = Field(
         default=None,
         description="Adresa Modbus registru (auto-přiřazeno pokud None)"
     )
+    
+    @model_validator(mode="after")
+    def _validate_simulation(self):
+        """Typ simulace musí být registrován a parametry musí odpovídat jeho deklaraci"""
+        self.simulation_params = _validate_simulation(self.simulation_type, self.simulation_params)
+        if self.formula is None:
+            _validate_formula(self.simulation_type, None)
+        _validate_waveform(self.simulation_type, self.data_type)
+        return self
+    
+    @field_validator("formula")
+    @classmethod
+    def _check_formula(cls, value: Optional[str], info: ValidationInfo) -> Optional[str]:
+        """Vzorec mají jen odvozené senzory a musí být syntakticky platný"""
+        return _validate_formula(info.data.get("simulation_type"), value)
+    
+    @field_validator("alarms")
+    @classmethod
+    def _check_alarms(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+        return _validate_alarms(value)
 
 
 class Sensor(SensorBase, table=True):
@@ -52,15 +92,44 @@ class Sensor(SensorBase, table=True):
     
     id: Optional[int] = Field(default=None, primary_key=True)
     machine_id: int = Field(foreign_key="machines.id", index=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
+    updated_at: datetime = Field(default_factory=utc_now)
     
     # Relace na stroj
     machine: Optional["Machine"] = Relationship(back_populates="sensors")
     
     def update_timestamp(self):
         """Aktualizuje čas poslední úpravy"""
-        self.updated_at = datetime.utcnow()
+        self.updated_at = utc_now()
+
+
+def _validate_simulation(simulation_type: str, params: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Zvaliduje typ simulace a jeho parametry proti registru"""
+    # Import až zde - registr typů importuje services, které importují modely
+    from app.services.simulation_types import validate_params
+    
+    return validate_params(simulation_type, params)
+
+
+def _validate_formula(simulation_type: Optional[str], formula: Optional[str]) -> Optional[str]:
+    """Zvaliduje syntaxi vzorce (odkazy na senzory a cykly se ověřují nad celým strojem)"""
+    from app.services.formulas import validate_formula
+    
+    return validate_formula(simulation_type, formula)
+
+
+def _validate_waveform(simulation_type: str, data_type: DataType) -> None:
+    """Průběh (waveform) musí mít datový typ FLOAT"""
+    from app.services.waveforms import validate_waveform
+    
+    validate_waveform(simulation_type, data_type)
+
+
+def _validate_alarms(alarms: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Zvaliduje limity alarmů (pořadí lolo <= lo < hi <= hihi)"""
+    from app.services.alarms import validate_alarms
+    
+    return validate_alarms(alarms)
 
 
 class SensorCreate(SensorBase):
@@ -76,8 +145,36 @@ class SensorUpdate(SQLModel):
     initial_value: Optional[float] = None
     min_value: Optional[float] = None
     max_value: Optional[float] = None
-    simulation_type: Optional[SimulationType] = None
+    simulation_type: Optional[str] = None
+    simulation_params: Optional[Dict[str, Any]] = None
+    formula: Optional[str] = None
+    alarms: Optional[Dict[str, Any]] = None
     register_address: Optional[int] = None
+    
+    @field_validator("name", "data_type", "initial_value", "min_value", "max_value", "simulation_type")
+    @classmethod
+    def _check_not_null(cls, value: Any, info: ValidationInfo) -> Any:
+        """Sloupec nepovoluje NULL - vynechané pole se nemění, explicitní null se odmítne"""
+        if value is None:
+            raise ValueError(f"Pole '{info.field_name}' nesmí být null")
+        return value
+    
+    @field_validator("simulation_type")
+    @classmethod
+    def _validate_simulation_type(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            _validate_simulation(value, None)
+        return value
+    
+    @field_validator("alarms")
+    @classmethod
+    def _check_alarms(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+        return _validate_alarms(value)
+
+
+class SensorBatchUpdate(SensorUpdate):
+    """Schema pro hromadnou aktualizaci senzorů - položka s ID senzoru"""
+    id: int
 
 
 class SensorRead(SensorBase):
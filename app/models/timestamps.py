@@ -0,0 +1,13 @@
+"""
+Časové značky modelů a API
+
+Všechny časy se ukládají a vrací jako naivní UTC (bez časové zóny),
+stejně jako sloupce created_at/updated_at v databázi.
+"""
+
+from datetime import datetime, timezone
+
+
+def utc_now() -> datetime:
+    """Aktuální čas v UTC bez časové zóny (náhrada za zastaralé datetime.utcnow)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
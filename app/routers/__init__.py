@@ -7,6 +7,11 @@ from app.routers.machines import router as machines_router
 from app.routers.api import router as api_router
 from app.routers.simulation import router as simulation_router
 from app.routers.sensors import router as sensors_router
+from app.routers.fleet import router as fleet_router
+from app.routers.metrics import router as metrics_router
+from app.routers.admin import router as admin_router
+from app.routers.alarms import router as alarms_router
+from app.routers.scenarios import router as scenarios_router
 
 __all__ = [
     "dashboard_router",
@@ -14,4 +19,9 @@ __all__ = [
     "api_router",
     "simulation_router",
     "sensors_router",
+    "fleet_router",
+    "metrics_router",
+    "admin_router",
+    "alarms_router",
+    "scenarios_router",
 ]
@@ -0,0 +1,114 @@
+"""
+Administrátorské API - diagnostika běžícího procesu
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import PROFILE_DEFAULT_INTERVAL_MS, PROFILE_MAX_SECONDS
+from app.services.capacity import capacity_planner
+from app.services.load_shedding import load_shedder
+from app.services.loop_lag import loop_lag_monitor
+from app.services.profiler import PROFILE_MODES, ProfilerBusyError, profiler
+from app.simulators.manager import simulation_manager
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.post("/profile")
+async def api_profile(
+    seconds: float = Query(default=10.0, gt=0, le=PROFILE_MAX_SECONDS),
+    mode: str = Query(default="sample", description="sample nebo cprofile"),
+    interval_ms: float = Query(default=PROFILE_DEFAULT_INTERVAL_MS, ge=1.0, le=1000.0),
+    limit: int = Query(default=50, gt=0, le=1000),
+):
+    """
+    Profiluje běžící event loop po zadanou dobu a vrátí agregované statistiky.
+    Simulace běží dál; collapsed zásobníky (režim sample) jsou poté
+    ke stažení na /api/admin/profile/last.collapsed.
+    """
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=422, detail=f"Podporované režimy: {', '.join(PROFILE_MODES)}")
+    
+    try:
+        result = await profiler.capture(seconds, mode, interval_ms, limit)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return result.to_dict()
+
+
+@router.get("/profile/last")
+async def api_profile_last():
+    """Vrátí statistiky posledního profilování"""
+    if profiler.last_result is None:
+        raise HTTPException(status_code=404, detail="Žádné profilování zatím neproběhlo")
+    return profiler.last_result.to_dict()
+
+
+@router.get("/profile/last.collapsed", response_class=PlainTextResponse)
+async def api_profile_last_collapsed():
+    """Stáhne zásobníky posledního profilování ve formátu collapsed (flamegraph)"""
+    result = profiler.last_result
+    if result is None or not result.collapsed:
+        raise HTTPException(status_code=404, detail="Žádné zásobníky k dispozici")
+    return PlainTextResponse(
+        result.collapsed,
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
+@router.get("/loop-incidents")
+async def api_loop_incidents(limit: int = Query(default=50, gt=0, le=1000)):
+    """
+    Vrátí poslední zablokování event loopu nad prahem (nejnovější první)
+    včetně zásobníku a tasku, který v době blokování běžel.
+    """
+    return {
+        "threshold_ms": round(loop_lag_monitor.threshold * 1000, 1),
+        "last_lag_ms": round(loop_lag_monitor.last_lag * 1000, 3),
+        "max_lag_ms": round(loop_lag_monitor.max_lag * 1000, 3),
+        "incidents_total": loop_lag_monitor.incidents_total,
+        "incidents": [incident.to_dict() for incident in loop_lag_monitor.get_incidents(limit)],
+    }
+
+
+@router.delete("/loop-incidents")
+async def api_clear_loop_incidents():
+    """Smaže evidované incidenty a maximum lagu"""
+    loop_lag_monitor.clear_incidents()
+    return {"status": "ok"}
+
+
+@router.get("/capacity")
+async def api_capacity():
+    """
+    Vrátí odhad zátěže event loopu běžícími simulacemi, rezervu do rozpočtu,
+    kolik tagů se ještě vejde pro jednotlivé protokoly a stroje ve frontě.
+    """
+    return simulation_manager.capacity_status()
+
+
+@router.post("/capacity/calibrate")
+async def api_capacity_calibrate():
+    """
+    Zkalibruje model nákladů krátkým benchmarkem všech protokolů (několik sekund)
+    a spustí stroje z fronty, které se podle nového modelu vejdou.
+    """
+    try:
+        await capacity_planner.calibrate()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Kalibrace selhala: {e}")
+    started = await simulation_manager.drain_queue()
+    status = simulation_manager.capacity_status()
+    status["started_from_queue"] = started
+    return status
+
+
+@router.get("/load-shedding")
+async def api_load_shedding(limit: int = Query(default=50, gt=0, le=1000)):
+    """
+    Vrátí stav regulátoru zátěže - zpomalené stroje s aktuálním a jmenovitým
+    intervalem aktualizace a poslední změny rychlosti (nejnovější první).
+    """
+    return load_shedder.status(limit)
@@ -0,0 +1,78 @@
+"""
+API limitních alarmů - aktivní alarmy, historie přechodů a SSE stream
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.config import ALARM_HISTORY_SIZE, ALARM_STREAM_KEEPALIVE
+from app.services.alarms import AlarmEvent, alarm_hub
+from app.simulators.manager import simulation_manager
+
+router = APIRouter(prefix="/api/alarms", tags=["alarms"])
+
+
+def _format_sse(event: AlarmEvent) -> str:
+    """Zformátuje přechod alarmu jako SSE zprávu"""
+    return f"id: {event.id}\nevent: alarm\ndata: {json.dumps(event.to_dict())}\n\n"
+
+
+@router.get("")
+async def api_active_alarms(machine_id: Optional[int] = None):
+    """Vrátí aktivní alarmy běžících simulací (nejzávažnější první)"""
+    events = simulation_manager.get_active_alarms(machine_id)
+    events.sort(key=lambda event: (-event.severity, event.timestamp))
+    return [event.to_dict() for event in events]
+
+
+@router.get("/events")
+async def api_alarm_events(
+    since_id: int = Query(default=0, ge=0, description="Vrátit jen přechody s vyšším ID"),
+    machine_id: Optional[int] = None,
+    limit: int = Query(default=100, gt=0, le=ALARM_HISTORY_SIZE),
+):
+    """Vrátí historii přechodů alarmů (nejstarší první)"""
+    return [event.to_dict() for event in alarm_hub.history(since_id, machine_id, limit)]
+
+
+@router.get("/stream")
+async def api_alarm_stream(
+    request: Request,
+    machine_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(default=None),
+):
+    """
+    Server-Sent Events s přechody alarmů.
+    Po obnovení spojení (hlavička Last-Event-ID) se nejprve doručí
+    zmeškané přechody z historie.
+    """
+    queue = alarm_hub.subscribe()
+    backlog = alarm_hub.history(last_event_id, machine_id) if last_event_id is not None else []
+
+    async def stream():
+        try:
+            last_id = last_event_id or 0
+            for event in backlog:
+                last_id = event.id
+                yield _format_sse(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), ALARM_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event.id <= last_id or (machine_id is not None and event.machine_id != machine_id):
+                    continue
+                yield _format_sse(event)
+        finally:
+            alarm_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,16 +2,64 @@
 REST API endpoints pro programatický přístup
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, insert, text
 from sqlmodel import Session, select
-from typing import List
+from typing import Dict, Iterable, List, Optional
 
-from app.database import get_session
-from app.models import Machine, MachineCreate, MachineUpdate
+from app.database import engine, get_session
+from app.models import Machine, MachineCreate, MachineUpdate, Sensor, SensorCreate, utc_now
 from app.models.machine import MachineRead
+from app.models.sensor import SensorBatchUpdate, SensorRead
+from app.services.formulas import FormulaError, check_machine_formulas, validate_formula
+from app.services.waveforms import validate_waveform
+from app.services.process_models import process_models, validate_process_params
+from app.services.simulation_types import simulation_types, validate_params
+from app.simulators.impairment import supports_impairment, validate_impairment
+from app.simulators.protocol_settings import (
+    keep_secret_settings,
+    protocol_settings_specs,
+    validate_protocol_settings,
+)
+from app.simulators.manager import simulation_manager
+from app.templating import machine_cards
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# Maximální počet parametrů v jednom SQL dotazu (limit SQLite je 32766)
+SQL_CHUNK_SIZE = 5000
+
+
+def _chunks(items: List, size: int = SQL_CHUNK_SIZE) -> Iterable[List]:
+    """Rozdělí seznam na části pro dotazy s IN (...)"""
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def _check_formulas(session: Session, machine_ids: Iterable[int]) -> None:
+    """Ověří vzorce dotčených strojů před commitem, při chybě transakci zahodí (422)"""
+    try:
+        check_machine_formulas(session, machine_ids)
+    except FormulaError as e:
+        session.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _load_sensors(session: Session, sensor_ids: List[int]) -> Dict[int, Sensor]:
+    """Načte senzory podle ID, chybějící ID ohlásí jako 404"""
+    sensors: Dict[int, Sensor] = {}
+    for chunk in _chunks(sorted(set(sensor_ids))):
+        for sensor in session.exec(select(Sensor).where(Sensor.id.in_(chunk))).all():
+            sensors[sensor.id] = sensor
+    
+    missing = sorted(set(sensor_ids) - sensors.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Senzory nenalezeny: {missing}")
+    return sensors
+
 
 @router.get("/machines", response_model=List[MachineRead])
 async def api_list_machines(session: Session = Depends(get_session)):
@@ -51,13 +99,42 @@ async def api_update_machine(
         raise HTTPException(status_code=404, detail="Stroj nenalezen")
     
     update_data = machine_data.model_dump(exclude_unset=True)
+    if "process_model" in update_data and update_data["process_model"] != machine.process_model:
+        machine.process_params = None  # parametry původního modelu neplatí pro nový
+    if "protocol" in update_data and update_data["protocol"] != machine.protocol:
+        machine.protocol_settings = None  # nastavení původního protokolu neplatí pro nový
+        if not supports_impairment(update_data["protocol"]):
+            machine.impairment = None  # nový protokol proxy nepodporuje
+    current_settings = machine.protocol_settings
     for key, value in update_data.items():
         setattr(machine, key, value)
+    # Maska hesla z GET zachová uložené heslo
+    machine.protocol_settings = keep_secret_settings(machine.protocol, machine.protocol_settings, current_settings)
+    
+    if machine.impairment and not supports_impairment(machine.protocol):
+        raise HTTPException(status_code=422, detail=f"Protokol {machine.protocol.value} zhoršení sítě nepodporuje")
+    
+    try:
+        if machine.process_model is None:
+            machine.process_params = None
+        else:
+            machine.process_params = validate_process_params(machine.process_model, machine.process_params)
+        machine.protocol_settings = validate_protocol_settings(machine.protocol, machine.protocol_settings)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
     machine.update_timestamp()
     session.add(machine)
     session.commit()
     session.refresh(machine)
+    
+    # Běžící simulace převezme procesní model a prioritu bez restartu
+    await simulation_manager.apply_process_model(machine)
+    simulation_manager.apply_priority(machine)
+    if "impairment" in update_data:
+        await simulation_manager.apply_impairment(machine)
+    if "protocol_settings" in update_data:
+        await simulation_manager.apply_protocol_settings(machine)
     return machine
 
 
@@ -70,10 +147,234 @@ async def api_delete_machine(machine_id: int, session: Session = Depends(get_ses
     
     session.delete(machine)
     session.commit()
+    machine_cards.invalidate(machine_id)
     return {"message": "Stroj smazán", "id": machine_id}
 
 
+def _impairment_status(machine: Machine) -> dict:
+    """Profil zhoršení sítě stroje a počítadla běžící proxy"""
+    simulator = simulation_manager.get_simulator(machine.id)
+    stats = simulator.get_impairment_stats() if simulator is not None else None
+    return {
+        "machine_id": machine.id,
+        "profile": machine.impairment,
+        "active": stats is not None,
+        "stats": stats.to_dict() if stats is not None else None,
+    }
+
+
+@router.get("/machines/{machine_id}/impairment")
+async def api_get_impairment(machine_id: int, session: Session = Depends(get_session)):
+    """Vrátí profil zhoršení sítě a počítadla proxy (zahozené, pozdržené odpovědi...)"""
+    machine = session.get(Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Stroj nenalezen")
+    return _impairment_status(machine)
+
+
+@router.put("/machines/{machine_id}/impairment")
+async def api_set_impairment(
+    machine_id: int,
+    profile: Dict[str, float] = Body(..., examples=[{"latency_ms": 200, "jitter_ms": 50, "drop_rate": 0.05}]),
+    session: Session = Depends(get_session),
+):
+    """
+    Nastaví profil zhoršení sítě stroje.
+    Změna parametrů běžící proxy platí okamžitě, první zapnutí restartuje server
+    (klienti se musí znovu připojit, průběhy hodnot navazují).
+    """
+    machine = session.get(Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Stroj nenalezen")
+    if not supports_impairment(machine.protocol):
+        raise HTTPException(status_code=422, detail=f"Protokol {machine.protocol.value} zhoršení sítě nepodporuje")
+    try:
+        machine.impairment = validate_impairment(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    machine.update_timestamp()
+    session.add(machine)
+    session.commit()
+    session.refresh(machine)
+    await simulation_manager.apply_impairment(machine)
+    return _impairment_status(machine)
+
+
+@router.delete("/machines/{machine_id}/impairment")
+async def api_delete_impairment(machine_id: int, session: Session = Depends(get_session)):
+    """Vypne zhoršení sítě - běžící server se restartuje bez proxy"""
+    machine = session.get(Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Stroj nenalezen")
+    
+    machine.impairment = None
+    machine.update_timestamp()
+    session.add(machine)
+    session.commit()
+    session.refresh(machine)
+    await simulation_manager.apply_impairment(machine)
+    return _impairment_status(machine)
+
+
+@router.post("/machines/{machine_id}/impairment/disconnect")
+async def api_disconnect_clients(machine_id: int):
+    """Jednorázově odpojí všechny klienty stroje (jen se zapnutým zhoršením sítě)"""
+    simulator = simulation_manager.get_simulator(machine_id)
+    if simulator is None or simulator.get_impairment_stats() is None:
+        raise HTTPException(status_code=409, detail="Stroj neběží se zhoršením sítě")
+    return {"machine_id": machine_id, "disconnected": simulation_manager.disconnect_clients(machine_id)}
+
+
+@router.get("/sensors", response_model=List[SensorRead])
+async def api_list_sensors(machine_id: Optional[int] = None, session: Session = Depends(get_session)):
+    """Vrátí seznam senzorů (volitelně jen pro daný stroj)"""
+    query = select(Sensor).order_by(Sensor.id)
+    if machine_id is not None:
+        query = query.where(Sensor.machine_id == machine_id)
+    return session.exec(query).all()
+
+
+@router.get("/sensors/{sensor_id}", response_model=SensorRead)
+async def api_get_sensor(sensor_id: int, session: Session = Depends(get_session)):
+    """Vrátí detail senzoru"""
+    sensor = session.get(Sensor, sensor_id)
+    if not sensor:
+        raise HTTPException(status_code=404, detail="Senzor nenalezen")
+    return sensor
+
+
+@router.post("/sensors", response_model=List[SensorRead])
+async def api_create_sensors(sensors_data: List[SensorCreate], session: Session = Depends(get_session)):
+    """Vytvoří senzory hromadně v jedné transakci"""
+    if not sensors_data:
+        return []
+    
+    machine_ids = sorted({sensor.machine_id for sensor in sensors_data})
+    existing = set()
+    for chunk in _chunks(machine_ids):
+        existing.update(session.exec(select(Machine.id).where(Machine.id.in_(chunk))).all())
+    missing = sorted(set(machine_ids) - existing)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Stroje nenalezeny: {missing}")
+    
+    now = utc_now()
+    rows = [
+        {**sensor.model_dump(), "created_at": now, "updated_at": now}
+        for sensor in sensors_data
+    ]
+    sensors = session.scalars(
+        insert(Sensor).returning(Sensor, sort_by_parameter_order=True),
+        rows,
+    ).all()
+    result = [SensorRead.model_validate(sensor) for sensor in sensors]
+    _check_formulas(session, machine_ids)
+    session.commit()
+    machine_cards.invalidate(*machine_ids)
+    
+    # Běžící simulace převezmou změny bez restartu
+    await simulation_manager.refresh_sensors(session, machine_ids)
+    return result
+
+
+@router.patch("/sensors", response_model=List[SensorRead])
+async def api_update_sensors(sensors_data: List[SensorBatchUpdate], session: Session = Depends(get_session)):
+    """Aktualizuje senzory hromadně v jedné transakci"""
+    sensors = _load_sensors(session, [item.id for item in sensors_data])
+    
+    updated: Dict[int, Sensor] = {}
+    for item in sensors_data:
+        sensor = sensors[item.id]
+        changes = item.model_dump(exclude_unset=True, exclude={"id"})
+        # Parametry původního typu simulace pro nový typ neplatí
+        if changes.get("simulation_type", sensor.simulation_type) != sensor.simulation_type:
+            changes.setdefault("simulation_params", None)
+        for key, value in changes.items():
+            setattr(sensor, key, value)
+        try:
+            sensor.simulation_params = validate_params(sensor.simulation_type, sensor.simulation_params)
+            sensor.formula = validate_formula(sensor.simulation_type, sensor.formula)
+            validate_waveform(sensor.simulation_type, sensor.data_type)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Senzor {sensor.id}: {e}")
+        sensor.update_timestamp()
+        updated[sensor.id] = sensor
+    
+    session.flush()
+    result = [SensorRead.model_validate(sensor) for sensor in updated.values()]
+    _check_formulas(session, {sensor.machine_id for sensor in result})
+    session.commit()
+    machine_cards.invalidate(*{sensor.machine_id for sensor in result})
+    
+    await simulation_manager.refresh_sensors(session, {sensor.machine_id for sensor in result})
+    return result
+
+
+@router.delete("/sensors")
+async def api_delete_sensors(sensor_ids: List[int] = Body(...), session: Session = Depends(get_session)):
+    """Smaže senzory hromadně v jedné transakci (tělo požadavku = seznam ID)"""
+    sensors = _load_sensors(session, sensor_ids)
+    machine_ids = {sensor.machine_id for sensor in sensors.values()}
+    
+    for chunk in _chunks(sorted(set(sensor_ids))):
+        session.execute(delete(Sensor).where(Sensor.id.in_(chunk)))
+    _check_formulas(session, machine_ids)
+    session.commit()
+    machine_cards.invalidate(*machine_ids)
+    
+    await simulation_manager.refresh_sensors(session, machine_ids)
+    return {"message": "Senzory smazány", "ids": sorted(set(sensor_ids))}
+
+
+@router.get("/simulation-types")
+async def api_simulation_types():
+    """Vrátí registrované typy simulace včetně jejich parametrů"""
+    return [spec.to_dict() for spec in simulation_types()]
+
+
+@router.get("/process-models")
+async def api_process_models():
+    """Vrátí registrované procesní modely strojů včetně jejich parametrů"""
+    return [spec.to_dict() for spec in process_models()]
+
+
+@router.get("/protocol-settings")
+async def api_protocol_settings():
+    """Vrátí deklarovaná nastavení protokolů (Machine.protocol_settings)"""
+    return protocol_settings_specs()
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok", "service": "PLC Simulator"}
+
+
+def _database_reachable() -> bool:
+    """Ověří spojení s databází"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint - 503, dokud start aplikace nenaplánoval autostart
+    nebo není dostupná databáze. Autostart běží na pozadí a připravenost
+    neblokuje, jeho průběh se vrací v položce 'autostart'.
+    """
+    progress = simulation_manager.startup_progress
+    database = await asyncio.to_thread(_database_reachable)
+    ready = simulation_manager.ready and database
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content=jsonable_encoder({
+            "status": "ready" if ready else "not_ready",
+            "database": database,
+            "autostart": progress.to_dict(),
+        }),
+    )
@@ -4,16 +4,14 @@ Dashboard routes - hlavní UI stránky
 
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+from sqlmodel import Session, func, select
 
-from app.config import TEMPLATES_DIR
 from app.database import get_session
-from app.models import Machine
+from app.models import Machine, Sensor
 from app.simulators.manager import simulation_manager
+from app.templating import templates
 
 router = APIRouter(tags=["dashboard"])
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -27,7 +25,10 @@ async def dashboard(request: Request, session: Session = Depends(get_session)):
     # Spočítat statistiky
     running_count = len(running_ids)
     stopped_count = len(machines) - running_count
-    total_sensors = sum(len(m.sensors) if m.sensors else 0 for m in machines)
+    # Jedním dotazem - senzory strojů se načítají jen pro karty, které nejsou v cache
+    total_sensors = session.exec(select(func.count(Sensor.id))).one()
+    # Odhad zátěže event loopu a rezerva do rozpočtu kapacity
+    capacity = simulation_manager.capacity_status()
     
     return templates.TemplateResponse(
         "dashboard.html",
@@ -35,9 +36,11 @@ async def dashboard(request: Request, session: Session = Depends(get_session)):
             "request": request,
             "machines": machines,
             "running_ids": running_ids,
+            "queued_ids": capacity["queued"],
             "running_count": running_count,
             "stopped_count": stopped_count,
             "total_sensors": total_sensors,
+            "capacity": capacity,
             "title": "PLC Simulátor - Dashboard"
         }
     )
@@ -0,0 +1,93 @@
+"""
+REST API pro hromadnou správu flotily - generování ze šablony, export a import
+
+Hromadná práce s databází a serializace běží ve vlákně (asyncio.to_thread) -
+event loop sdílí všechny simulátory a sekundy blokování by zastavily všechna PLC.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from sqlmodel import Session
+
+from app.config import FLEET_BATCH_SIZE
+from app.database import get_session
+from app.models import FleetConfig, FleetGenerate, FleetImportResult
+from app.services.fleet import (
+    FleetFileError,
+    PortAllocationError,
+    export_fleet,
+    fleet_from_csv,
+    fleet_to_csv,
+    generate_fleet,
+    import_fleet,
+)
+
+router = APIRouter(prefix="/api/fleet", tags=["fleet"])
+
+
+@router.post("/generate", response_model=FleetImportResult)
+async def api_generate_fleet(request: FleetGenerate, session: Session = Depends(get_session)):
+    """Vygeneruje zadaný počet strojů ze šablony s automatickým přidělením portů"""
+    if request.port_end < request.port_start:
+        raise HTTPException(status_code=422, detail="Neplatný rozsah portů")
+    
+    try:
+        return await asyncio.to_thread(generate_fleet, session, request, FLEET_BATCH_SIZE)
+    except PortAllocationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FleetFileError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _export_content(session: Session, format: str) -> str:
+    """Načte a serializuje konfiguraci flotily (běží ve vlákně)"""
+    config = export_fleet(session)
+    if format == "csv":
+        return fleet_to_csv(config)
+    return config.model_dump_json()
+
+
+@router.get("/export", response_model=FleetConfig)
+async def api_export_fleet(format: str = "json", session: Session = Depends(get_session)):
+    """Exportuje konfiguraci všech strojů a senzorů (format=json nebo csv)"""
+    if format not in ("json", "csv"):
+        raise HTTPException(status_code=422, detail="Podporované formáty: json, csv")
+    
+    content = await asyncio.to_thread(_export_content, session, format)
+    if format == "csv":
+        return Response(
+            content=content,
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="fleet.csv"'},
+        )
+    return Response(content=content, media_type="application/json")
+
+
+@router.post("/import", response_model=FleetImportResult)
+async def api_import_fleet(config: FleetConfig, session: Session = Depends(get_session)):
+    """Importuje konfiguraci flotily ve formátu JSON"""
+    try:
+        return await asyncio.to_thread(import_fleet, session, config, FLEET_BATCH_SIZE)
+    except PortAllocationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def _import_csv(session: Session, body: bytes) -> FleetImportResult:
+    """Načte CSV a importuje flotilu (běží ve vlákně)"""
+    config = fleet_from_csv(body.decode("utf-8-sig"))
+    return import_fleet(session, config, FLEET_BATCH_SIZE)
+
+
+@router.post("/import/csv", response_model=FleetImportResult)
+async def api_import_fleet_csv(request: Request, session: Session = Depends(get_session)):
+    """Importuje konfiguraci flotily z CSV (tělo požadavku ve formátu exportu)"""
+    body = await request.body()
+    
+    try:
+        return await asyncio.to_thread(_import_csv, session, body)
+    except PortAllocationError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (FleetFileError, UnicodeDecodeError, KeyError) as e:
+        raise HTTPException(status_code=422, detail=f"Neplatné CSV: {e}")
@@ -4,16 +4,64 @@ CRUD operace pro stroje - HTMX endpoints
 
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session, select
 from typing import Optional
 
-from app.config import TEMPLATES_DIR, DEFAULT_OPC_UA_PORT, DEFAULT_MODBUS_PORT
+from app.config import DEFAULT_OPC_UA_PORT, DEFAULT_MODBUS_PORT, DEFAULT_MQTT_PORT
 from app.database import get_session
-from app.models import Machine, MachineCreate, ProtocolType
+from app.models import Machine, MachineCreate, MachinePriority, ProtocolType
+from app.services.process_models import process_models, validate_process_params
+from app.simulators.manager import simulation_manager
+from app.simulators.protocol_settings import (
+    keep_secret_settings,
+    mask_protocol_settings,
+    protocol_settings,
+    validate_protocol_settings,
+)
+from app.templating import machine_cards, templates
 
 router = APIRouter(prefix="/machines", tags=["machines"])
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
+
+
+async def _process_form(request: Request, process_model: str) -> tuple:
+    """
+    Načte procesní model a jeho parametry z formuláře (pole "process.<název>").
+    
+    Returns:
+        (model nebo None, zvalidované parametry)
+    """
+    if not process_model:
+        return None, None
+    
+    form = await request.form()
+    params = {
+        key[len("process."):]: value
+        for key, value in form.items()
+        if key.startswith("process.") and value != ""
+    }
+    try:
+        return process_model, validate_process_params(process_model, params)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _settings_form(request: Request, protocol: ProtocolType) -> Optional[dict]:
+    """
+    Načte nastavení protokolu z formuláře (pole "settings.<název>").
+    Ukládají se jen hodnoty odlišné od výchozích.
+    """
+    form = await request.form()
+    values = {
+        key[len("settings."):]: value
+        for key, value in form.items()
+        if key.startswith("settings.") and value != ""
+    }
+    try:
+        settings = validate_protocol_settings(protocol, values) or {}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    defaults = {setting.name: setting.default for setting in protocol_settings(protocol)}
+    return {name: value for name, value in settings.items() if value != defaults[name]} or None
 
 
 @router.get("/list", response_class=HTMLResponse)
@@ -42,8 +90,16 @@ async def machine_form(request: Request, machine_id: Optional[int] = None, sessi
             "request": request,
             "machine": machine,
             "protocols": ProtocolType,
+            "priorities": MachinePriority,
+            "process_models": process_models(),
+            "selected_model": machine.process_model if machine else None,
+            "selected_params": (machine.process_params if machine else None) or {},
+            "protocol_settings": {protocol.value: protocol_settings(protocol) for protocol in ProtocolType},
+            "selected_protocol": machine.protocol.value if machine else ProtocolType.OPC_UA.value,
+            "selected_settings": (mask_protocol_settings(machine.protocol, machine.protocol_settings) if machine else None) or {},
             "default_opc_port": DEFAULT_OPC_UA_PORT,
             "default_modbus_port": DEFAULT_MODBUS_PORT,
+            "default_mqtt_port": DEFAULT_MQTT_PORT,
         }
     )
 
@@ -58,8 +114,12 @@ async def create_machine(
     host: str = Form("127.0.0.1"),
     port: int = Form(...),
     is_enabled: bool = Form(True),
+    priority: MachinePriority = Form(MachinePriority.NORMAL),
+    process_model: str = Form(""),
 ):
     """Vytvoří nový stroj"""
+    process_model, process_params = await _process_form(request, process_model)
+    settings = await _settings_form(request, protocol)
     machine = Machine(
         name=name,
         description=description,
@@ -67,29 +127,27 @@ async def create_machine(
         host=host,
         port=port,
         is_enabled=is_enabled,
+        priority=priority,
+        process_model=process_model,
+        process_params=process_params,
+        protocol_settings=settings,
     )
     session.add(machine)
     session.commit()
     session.refresh(machine)
     
     # Vrátíme kartu nového stroje
-    return templates.TemplateResponse(
-        "partials/machine_card.html",
-        {"request": request, "machine": machine}
-    )
+    return HTMLResponse(machine_cards.render(machine))
 
 
 @router.get("/{machine_id}", response_class=HTMLResponse)
-async def get_machine(request: Request, machine_id: int, session: Session = Depends(get_session)):
+async def get_machine(machine_id: int, session: Session = Depends(get_session)):
     """Vrátí detail stroje"""
     machine = session.get(Machine, machine_id)
     if not machine:
         raise HTTPException(status_code=404, detail="Stroj nenalezen")
     
-    return templates.TemplateResponse(
-        "partials/machine_card.html",
-        {"request": request, "machine": machine}
-    )
+    return HTMLResponse(machine_cards.render(machine))
 
 
 @router.put("/{machine_id}", response_class=HTMLResponse)
@@ -103,11 +161,18 @@ async def update_machine(
     host: str = Form("127.0.0.1"),
     port: int = Form(...),
     is_enabled: bool = Form(True),
+    priority: MachinePriority = Form(MachinePriority.NORMAL),
+    process_model: str = Form(""),
 ):
     """Aktualizuje stroj"""
     machine = session.get(Machine, machine_id)
     if not machine:
         raise HTTPException(status_code=404, detail="Stroj nenalezen")
+    process_model, process_params = await _process_form(request, process_model)
+    settings = await _settings_form(request, protocol)
+    # Maska hesla ve formuláři zachová uložené heslo (jen u stejného protokolu)
+    current_settings = machine.protocol_settings if protocol == machine.protocol else None
+    settings = keep_secret_settings(protocol, settings, current_settings)
     
     machine.name = name
     machine.description = description
@@ -115,16 +180,22 @@ async def update_machine(
     machine.host = host
     machine.port = port
     machine.is_enabled = is_enabled
+    machine.priority = priority
+    machine.process_model = process_model
+    machine.process_params = process_params
+    machine.protocol_settings = settings
     machine.update_timestamp()
     
     session.add(machine)
     session.commit()
     session.refresh(machine)
     
-    return templates.TemplateResponse(
-        "partials/machine_card.html",
-        {"request": request, "machine": machine}
-    )
+    # Běžící simulace převezme procesní model a prioritu bez restartu, změna nastavení protokolu ji restartuje
+    await simulation_manager.apply_process_model(machine)
+    simulation_manager.apply_priority(machine)
+    await simulation_manager.apply_protocol_settings(machine)
+    
+    return HTMLResponse(machine_cards.render(machine))
 
 
 @router.delete("/{machine_id}", response_class=HTMLResponse)
@@ -136,6 +207,7 @@ async def delete_machine(machine_id: int, session: Session = Depends(get_session
     
     session.delete(machine)
     session.commit()
+    machine_cards.invalidate(machine_id)
     
     # Vrátíme prázdný response pro HTMX (element zmizí)
     return HTMLResponse(content="", status_code=200)
@@ -0,0 +1,19 @@
+"""
+Endpoint s metrikami ve formátu Prometheus
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Vrátí metriky simulátorů ve formátu Prometheus"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
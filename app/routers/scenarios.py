@@ -0,0 +1,82 @@
+"""
+API scénářů - spuštění časové osy skriptovaných událostí a stav běhů
+"""
+
+from typing import Any, List, Optional, Tuple
+
+from fastapi import APIRouter, Body, HTTPException, Query
+from sqlmodel import Session
+
+from app.config import SCENARIO_MAX_SPEED
+from app.database import engine
+from app.models import Machine, Sensor
+from app.services.scenarios import compile_scenario, scenario_runner
+from app.simulators.manager import simulation_manager
+
+router = APIRouter(prefix="/api/scenarios", tags=["scenarios"])
+
+
+def _load_machine(machine_id: int) -> Optional[Tuple[Machine, List[Sensor]]]:
+    """Načte stroj a jeho senzory z databáze (i pro akci start během scénáře)"""
+    with Session(engine) as session:
+        machine = session.get(Machine, machine_id)
+        if machine is None:
+            return None
+        return machine, sorted(machine.sensors, key=lambda sensor: sensor.id)
+
+
+def _compile(data: Any):
+    try:
+        return compile_scenario(data, _load_machine)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("")
+async def api_start_scenario(
+    scenario: Any = Body(...),
+    speed: Optional[float] = Query(
+        default=None, gt=0, le=SCENARIO_MAX_SPEED, description="Přepíše zrychlení ze scénáře",
+    ),
+):
+    """Přeloží a spustí scénář, vrátí stav běhu"""
+    compiled = _compile(scenario)
+    run = scenario_runner.start(compiled, simulation_manager, _load_machine, speed)
+    return run.to_dict()
+
+
+@router.post("/validate")
+async def api_validate_scenario(scenario: Any = Body(...)):
+    """Přeloží scénář bez spuštění a vrátí seřazenou frontu událostí"""
+    compiled = _compile(scenario)
+    return {
+        "name": compiled.name,
+        "speed": compiled.speed,
+        "duration": compiled.duration,
+        "events": [event.to_dict() for event in compiled.events],
+    }
+
+
+@router.get("")
+async def api_list_scenarios():
+    """Vrátí běžící a nedávno dokončené běhy scénářů"""
+    return [run.to_dict() for run in scenario_runner.runs()]
+
+
+@router.get("/{run_id}")
+async def api_get_scenario(run_id: int):
+    """Vrátí stav běhu scénáře"""
+    run = scenario_runner.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Běh scénáře nenalezen")
+    return run.to_dict()
+
+
+@router.delete("/{run_id}")
+async def api_stop_scenario(run_id: int):
+    """Přeruší běh scénáře (provedené změny zůstávají, překrytí lze zrušit akcí release)"""
+    run = scenario_runner.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Běh scénáře nenalezen")
+    await run.stop()
+    return run.to_dict()
@@ -4,16 +4,28 @@ CRUD operace pro senzory - HTMX endpoints
 
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session, select
 from typing import Optional
 
-from app.config import TEMPLATES_DIR
 from app.database import get_session
 from app.models import Machine, Sensor, SensorCreate, DataType, SimulationType
+from app.services.alarms import ALARM_KEYS, validate_alarms
+from app.services.formulas import FormulaError, check_machine_formulas, validate_formula
+from app.services.waveforms import validate_waveform
+from app.services.simulation_types import simulation_types, validate_params
+from app.simulators.manager import simulation_manager
+from app.templating import machine_cards, templates
 
 router = APIRouter(prefix="/sensors", tags=["sensors"])
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
+
+
+def _check_formulas(session: Session, machine_id: int) -> None:
+    """Ověří vzorce stroje před commitem, při chybě (např. odkaz na smazaný senzor) vrátí 422"""
+    try:
+        check_machine_formulas(session, [machine_id])
+    except FormulaError as e:
+        session.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
 
 
 @router.get("/form/{machine_id}", response_class=HTMLResponse)
@@ -39,7 +51,9 @@ async def sensor_form(
             "machine": machine,
             "sensor": sensor,
             "data_types": DataType,
-            "simulation_types": SimulationType,
+            "simulation_types": simulation_types(),
+            "selected_type": sensor.simulation_type if sensor else SimulationType.RANDOM.value,
+            "selected_params": (sensor.simulation_params if sensor else None) or {},
         }
     )
 
@@ -52,29 +66,56 @@ async def create_sensor(
     name: str = Form(...),
     unit: str = Form(None),
     data_type: DataType = Form(DataType.FLOAT),
-    simulation_type: SimulationType = Form(SimulationType.RANDOM),
+    simulation_type: str = Form(SimulationType.RANDOM.value),
     initial_value: float = Form(0.0),
     min_value: float = Form(0.0),
     max_value: float = Form(100.0),
+    formula: str = Form(None),
 ):
     """Vytvoří nový senzor"""
     machine = session.get(Machine, machine_id)
     if not machine:
         raise HTTPException(status_code=404, detail="Stroj nenalezen")
     
+    # Parametry typu simulace přichází jako pole "param.<název>"
+    form = await request.form()
+    params = {
+        key[len("param."):]: value
+        for key, value in form.items()
+        if key.startswith("param.") and value != ""
+    }
+    # Limity alarmů jako pole "alarm.<název>", prázdné se nevyhodnocují
+    alarm_values = {key: form.get(f"alarm.{key}") for key in ALARM_KEYS}
+    try:
+        simulation_params = validate_params(simulation_type, params)
+        formula = validate_formula(simulation_type, formula)
+        validate_waveform(simulation_type, data_type)
+        alarms = validate_alarms({key: value for key, value in alarm_values.items() if value})
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
     sensor = Sensor(
         machine_id=machine_id,
         name=name,
         unit=unit if unit else None,
         data_type=data_type,
         simulation_type=simulation_type,
+        simulation_params=simulation_params,
+        formula=formula,
+        alarms=alarms,
         initial_value=initial_value,
         min_value=min_value,
         max_value=max_value,
     )
     session.add(sensor)
+    session.flush()
+    _check_formulas(session, machine_id)
     session.commit()
     session.refresh(sensor)
+    machine_cards.invalidate(machine_id)
+    
+    # Běžící simulace převezme nový senzor bez restartu
+    await simulation_manager.refresh_sensors(session, [machine_id])
     
     # Vrátíme řádek nového senzoru
     return templates.TemplateResponse(
@@ -90,8 +131,14 @@ async def delete_sensor(sensor_id: int, session: Session = Depends(get_session))
     if not sensor:
         raise HTTPException(status_code=404, detail="Senzor nenalezen")
     
+    machine_id = sensor.machine_id
     session.delete(sensor)
+    session.flush()
+    _check_formulas(session, machine_id)
     session.commit()
+    machine_cards.invalidate(machine_id)
+    
+    await simulation_manager.refresh_sensors(session, [machine_id])
     
     return HTMLResponse(content="", status_code=200)
 
@@ -2,19 +2,18 @@
 Routes pro správu simulací - start/stop/status
 """
 
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Body, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session
 
-from app.config import TEMPLATES_DIR
 from app.database import get_session
 from app.models import Machine
+from app.services.process_models import MachineState
 from app.simulators.manager import simulation_manager
 from app.simulators.base import SimulatorStatus
+from app.templating import machine_cards, templates
 
 router = APIRouter(prefix="/simulation", tags=["simulation"])
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 
 @router.post("/{machine_id}/start", response_class=HTMLResponse)
@@ -34,6 +33,10 @@ async def start_simulation(
     # Spustit simulaci
     success = await simulation_manager.start_simulation(machine, sensors)
     
+    # Start čeká ve frontě na volnou kapacitu
+    if simulation_manager.get_status(machine_id) == SimulatorStatus.QUEUED:
+        return HTMLResponse(machine_cards.render(machine, SimulatorStatus.QUEUED.value, is_running=False))
+    
     if not success:
         error = simulation_manager.get_error_message(machine_id)
         return templates.TemplateResponse(
@@ -47,20 +50,11 @@ async def start_simulation(
         )
     
     # Vrátit aktualizovanou kartu
-    return templates.TemplateResponse(
-        "partials/machine_card.html",
-        {
-            "request": request,
-            "machine": machine,
-            "status": simulation_manager.get_status(machine_id),
-            "is_running": True,
-        }
-    )
+    return HTMLResponse(machine_cards.render(machine, simulation_manager.get_status(machine_id), is_running=True))
 
 
 @router.post("/{machine_id}/stop", response_class=HTMLResponse)
 async def stop_simulation(
-    request: Request,
     machine_id: int,
     session: Session = Depends(get_session),
 ):
@@ -71,15 +65,7 @@ async def stop_simulation(
     
     await simulation_manager.stop_simulation(machine_id)
     
-    return templates.TemplateResponse(
-        "partials/machine_card.html",
-        {
-            "request": request,
-            "machine": machine,
-            "status": SimulatorStatus.STOPPED,
-            "is_running": False,
-        }
-    )
+    return HTMLResponse(machine_cards.render(machine, SimulatorStatus.STOPPED, is_running=False))
 
 
 @router.get("/{machine_id}/status", response_class=HTMLResponse)
@@ -122,3 +108,27 @@ async def get_sensor_values(machine_id: int):
         "status": simulation_manager.get_status(machine_id).value,
         "values": values,
     }
+
+
+@router.get("/{machine_id}/process")
+async def get_process_state(machine_id: int):
+    """Vrátí stav procesního modelu stroje (JSON)"""
+    simulator = simulation_manager.get_simulator(machine_id)
+    if simulator is None:
+        return {"running": False, "process": None}
+    
+    return {"running": True, "process": simulator.get_process_state()}
+
+
+@router.post("/{machine_id}/process/state")
+async def set_process_state(machine_id: int, state: MachineState = Body(..., embed=True)):
+    """Přepne stav procesního modelu běžícího stroje (např. vyvolání poruchy)"""
+    simulator = simulation_manager.get_simulator(machine_id)
+    if simulator is None:
+        raise HTTPException(status_code=404, detail="Simulace neběží")
+    
+    try:
+        simulator.set_process_state(state)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"running": True, "process": simulator.get_process_state()}
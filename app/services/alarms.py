@@ -0,0 +1,416 @@
+"""
+Limitní alarmy senzorů (HIHI/HI/LO/LOLO) s hysterezí a zpožděním
+
+AlarmEngine drží limity všech senzorů simulátoru ve sloupcích a po každém
+generování hodnot je porovná najednou. Pro každý senzor je předpočítané
+pásmo (band_lo, band_hi), ve kterém se jeho stav alarmu nemůže změnit -
+v klidovém ticku tak stojí jeden senzor jediné zřetězené porovnání
+band_lo < hodnota < band_hi. Podrobné vyhodnocení (hystereze, zpoždění)
+proběhne jen u senzorů mimo pásmo a ven jdou pouze přechody stavů
+(AlarmEvent) - ty publikují simulátory protokolů a AlarmHub (REST, SSE).
+
+Konfigurace senzoru (pole alarms):
+    {"hihi": 95, "hi": 80, "lo": 10, "lolo": 5, "deadband": 2, "delay": 3}
+Chybějící limit se nevyhodnocuje. Alarm odchází až při návratu o deadband
+za limit, přechod se provede až když nová úroveň trvá alespoň delay sekund.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ALARM_LIMITS = ("hihi", "hi", "lo", "lolo")
+ALARM_KEYS = ALARM_LIMITS + ("deadband", "delay")
+
+
+class AlarmLevel(str, Enum):
+    """Úroveň alarmu senzoru"""
+    NORMAL = "normal"
+    HI = "hi"
+    HIHI = "hihi"
+    LO = "lo"
+    LOLO = "lolo"
+
+
+# Interní kód úrovně: záporné = pod limitem, kladné = nad limitem
+_LEVELS = {-2: AlarmLevel.LOLO, -1: AlarmLevel.LO, 0: AlarmLevel.NORMAL, 1: AlarmLevel.HI, 2: AlarmLevel.HIHI}
+
+# Závažnost podle OPC UA (1-1000)
+SEVERITY = {
+    AlarmLevel.NORMAL: 100,
+    AlarmLevel.HI: 600,
+    AlarmLevel.LO: 600,
+    AlarmLevel.HIHI: 900,
+    AlarmLevel.LOLO: 900,
+}
+
+
+def validate_alarms(alarms: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """
+    Zvaliduje konfiguraci alarmů senzoru.
+
+    Returns:
+        Konfigurace převedená na float, None pokud nejsou alarmy zadány
+
+    Raises:
+        ValueError: Neznámý klíč, nečíselná nebo nekonečná hodnota, limity ve špatném pořadí
+    """
+    if not alarms:
+        return None
+
+    result: Dict[str, float] = {}
+    for key, value in alarms.items():
+        if key not in ALARM_KEYS:
+            raise ValueError(f"Neznámý parametr alarmu '{key}' (povolené: {', '.join(ALARM_KEYS)})")
+        if value is None:
+            continue
+        try:
+            result[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parametr alarmu '{key}' musí být číslo") from None
+        if not math.isfinite(result[key]):
+            raise ValueError(f"Parametr alarmu '{key}' musí být konečné číslo")
+
+    if not any(key in result for key in ALARM_LIMITS):
+        raise ValueError("Alarm musí mít alespoň jeden limit (hihi, hi, lo, lolo)")
+    for key in ("deadband", "delay"):
+        if result.get(key, 0.0) < 0:
+            raise ValueError(f"Parametr alarmu '{key}' nesmí být záporný")
+
+    ordered = [(key, result[key]) for key in ("lolo", "lo", "hi", "hihi") if key in result]
+    for (low_key, low), (high_key, high) in zip(ordered, ordered[1:]):
+        if low > high or (low == high and (low_key, high_key) == ("lo", "hi")):
+            raise ValueError(f"Limit alarmu '{low_key}' musí být menší než '{high_key}'")
+    return result
+
+
+@dataclass
+class AlarmEvent:
+    """Přechod stavu alarmu senzoru"""
+    machine_id: int
+    sensor_id: int
+    sensor_name: str
+    level: AlarmLevel
+    previous: AlarmLevel
+    value: Any
+    limit: Optional[float]
+    timestamp: float
+    id: int = 0  # pořadové číslo přidělené AlarmHubem
+
+    @property
+    def active(self) -> bool:
+        return self.level != AlarmLevel.NORMAL
+
+    @property
+    def severity(self) -> int:
+        return SEVERITY[self.level if self.active else self.previous]
+
+    def to_dict(self) -> dict:
+        """Převede událost na slovník pro API"""
+        return {
+            "id": self.id,
+            "machine_id": self.machine_id,
+            "sensor_id": self.sensor_id,
+            "sensor_name": self.sensor_name,
+            "level": self.level.value,
+            "previous": self.previous.value,
+            "active": self.active,
+            "severity": self.severity,
+            "value": self.value,
+            "limit": self.limit,
+            "timestamp": self.timestamp,
+        }
+
+
+class AlarmEngine:
+    """Alarmy všech senzorů jednoho simulátoru"""
+
+    def __init__(self, machine_id: int):
+        self.machine_id = machine_id
+        self._ids: List[int] = []
+        self._names: List[str] = []
+        self._configs: List[tuple] = []
+        self._hihi: List[float] = []
+        self._hi: List[float] = []
+        self._lo: List[float] = []
+        self._lolo: List[float] = []
+        self._deadband: List[float] = []
+        self._delay: List[float] = []
+        self._level: List[int] = []
+        self._band_lo: List[float] = []
+        self._band_hi: List[float] = []
+        self._pending: Dict[int, Tuple[int, float]] = {}  # index -> (cílová úroveň, od kdy)
+        self._active: Dict[int, AlarmEvent] = {}          # sensor_id -> poslední aktivní přechod
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def configure(self, sensors: Iterable[Any], now: Optional[float] = None) -> List[AlarmEvent]:
+        """
+        Nastaví senzory s alarmy (objekty s atributy id, name, alarms).
+        Senzory s nezměněnou konfigurací si ponechají stav alarmu.
+
+        Returns:
+            Návraty do normálu pro aktivní alarmy odebraných nebo změněných senzorů
+        """
+        now = time.time() if now is None else now
+        previous = {
+            sensor_id: (config, level)
+            for sensor_id, config, level in zip(self._ids, self._configs, self._level)
+        }
+        pending = {self._ids[index]: item for index, item in self._pending.items()}
+        active = self._active
+        self.__init__(self.machine_id)
+
+        for sensor in sensors:
+            if not sensor.alarms:
+                continue
+            alarms = sensor.alarms
+            config = (sensor.name,) + tuple(alarms.get(key) for key in ALARM_KEYS)
+            hihi = alarms.get("hihi", math.inf)
+            hi = min(alarms.get("hi", math.inf), hihi)
+            lolo = alarms.get("lolo", -math.inf)
+            lo = max(alarms.get("lo", -math.inf), lolo)
+
+            index = len(self._ids)
+            self._ids.append(sensor.id)
+            self._names.append(sensor.name)
+            self._configs.append(config)
+            self._hihi.append(hihi)
+            self._hi.append(hi)
+            self._lo.append(lo)
+            self._lolo.append(lolo)
+            self._deadband.append(alarms.get("deadband", 0.0))
+            self._delay.append(alarms.get("delay", 0.0))
+            self._level.append(0)
+            self._band_lo.append(0.0)
+            self._band_hi.append(0.0)
+
+            kept = previous.pop(sensor.id, None)
+            if kept is not None and kept[0] == config:
+                self._level[index] = kept[1]
+                if sensor.id in pending:
+                    self._pending[index] = pending[sensor.id]
+                if sensor.id in active:
+                    self._active[sensor.id] = active[sensor.id]
+            self._update_band(index)
+
+        # Aktivní alarmy senzorů, které zmizely nebo mají novou konfiguraci, odchází
+        cleared = []
+        for sensor_id, event in active.items():
+            if sensor_id not in self._active:
+                cleared.append(self._clear_event(event, now))
+        return cleared
+
+    def reset(self, now: Optional[float] = None) -> List[AlarmEvent]:
+        """
+        Vrátí všechny alarmy do normálu (např. při zastavení simulace).
+
+        Returns:
+            Návraty do normálu pro dosud aktivní alarmy
+        """
+        now = time.time() if now is None else now
+        cleared = [self._clear_event(event, now) for event in self._active.values()]
+        self._active.clear()
+        self._pending.clear()
+        for index in range(len(self._ids)):
+            self._level[index] = 0
+            self._update_band(index)
+        return cleared
+
+    def _clear_event(self, event: AlarmEvent, now: float) -> AlarmEvent:
+        return AlarmEvent(
+            machine_id=self.machine_id,
+            sensor_id=event.sensor_id,
+            sensor_name=event.sensor_name,
+            level=AlarmLevel.NORMAL,
+            previous=event.level,
+            value=None,
+            limit=None,
+            timestamp=now,
+        )
+
+    def _update_band(self, index: int) -> None:
+        """Přepočítá pásmo hodnot, ve kterém se stav alarmu senzoru nemění"""
+        level = self._level[index]
+        deadband = self._deadband[index]
+        hihi, hi, lo, lolo = self._hihi[index], self._hi[index], self._lo[index], self._lolo[index]
+        if level == 0:
+            band = (lo, hi)
+        elif level == 1:
+            band = (hi - deadband, hihi)
+        elif level == 2:
+            band = (hihi - deadband, math.inf)
+        elif level == -1:
+            band = (lolo, lo + deadband)
+        else:
+            band = (-math.inf, lolo + deadband)
+        self._band_lo[index], self._band_hi[index] = band
+
+    def _target(self, index: int, value: float) -> int:
+        """Úroveň, do které hodnota patří, s ohledem na hysterezi aktuální úrovně"""
+        hihi, hi, lo, lolo = self._hihi[index], self._hi[index], self._lo[index], self._lolo[index]
+        if value >= hihi:
+            target = 2
+        elif value >= hi:
+            target = 1
+        elif value <= lolo:
+            target = -2
+        elif value <= lo:
+            target = -1
+        else:
+            target = 0
+
+        level = self._level[index]
+        deadband = self._deadband[index]
+        if level > 0 and 0 <= target < level:
+            # Alarm drží, dokud hodnota neklesne o deadband pod limit
+            held = 2 if value >= hihi - deadband else 1 if value >= hi - deadband else 0
+            target = max(target, min(level, held))
+        elif level < 0 and level < target <= 0:
+            held = -2 if value <= lolo + deadband else -1 if value <= lo + deadband else 0
+            target = min(target, max(level, held))
+        return target
+
+    def evaluate(self, states: Dict[int, Any], now: Optional[float] = None) -> List[AlarmEvent]:
+        """
+        Vyhodnotí alarmy všech senzorů.
+
+        Args:
+            states: ID senzoru -> stav s atributem current_value
+
+        Returns:
+            Přechody stavů alarmů v tomto ticku
+        """
+        now = time.time() if now is None else now
+        events: List[AlarmEvent] = []
+        pending = self._pending
+        for index, sensor_id, band_lo, band_hi in zip(
+            range(len(self._ids)), self._ids, self._band_lo, self._band_hi
+        ):
+            value = states[sensor_id].current_value
+            if band_lo < value < band_hi:
+                if pending and index in pending:
+                    del pending[index]
+                continue
+            self._check(index, value, now, events)
+        return events
+
+    def _check(self, index: int, value: Any, now: float, events: List[AlarmEvent]) -> None:
+        """Podrobné vyhodnocení senzoru mimo klidové pásmo"""
+        target = self._target(index, value)
+        if target == self._level[index]:
+            self._pending.pop(index, None)
+            return
+
+        delay = self._delay[index]
+        if delay > 0:
+            pending = self._pending.get(index)
+            if pending is None or pending[0] != target:
+                self._pending[index] = (target, now)
+                return
+            if now - pending[1] < delay:
+                return
+            del self._pending[index]
+
+        previous = self._level[index]
+        self._level[index] = target
+        self._update_band(index)
+
+        limit = {2: self._hihi, 1: self._hi, -1: self._lo, -2: self._lolo}.get(target or previous)[index]
+        event = AlarmEvent(
+            machine_id=self.machine_id,
+            sensor_id=self._ids[index],
+            sensor_name=self._names[index],
+            level=_LEVELS[target],
+            previous=_LEVELS[previous],
+            value=value,
+            limit=limit,
+            timestamp=now,
+        )
+        if event.active:
+            self._active[event.sensor_id] = event
+        else:
+            self._active.pop(event.sensor_id, None)
+        events.append(event)
+
+    def sensors(self) -> Dict[int, str]:
+        """ID a názvy senzorů s alarmy"""
+        return dict(zip(self._ids, self._names))
+
+    def level(self, sensor_id: int) -> AlarmLevel:
+        """Aktuální úroveň alarmu senzoru (NORMAL i pro senzory bez alarmů)"""
+        event = self._active.get(sensor_id)
+        return event.level if event is not None else AlarmLevel.NORMAL
+
+    def active(self) -> List[AlarmEvent]:
+        """Aktivní alarmy (přechod, kterým alarm vznikl)"""
+        return list(self._active.values())
+
+
+class AlarmHub:
+    """
+    Sběrnice přechodů alarmů ze všech simulátorů - historie pro REST API
+    a fronty odběratelů SSE streamu.
+    """
+
+    def __init__(self, history_size: int, queue_size: int):
+        self._history: deque = deque(maxlen=history_size)
+        self._queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._next_id = 1
+        self.dropped = 0  # události zahozené kvůli plné frontě pomalého odběratele
+
+    def publish(self, events: List[AlarmEvent]) -> None:
+        """Přidělí událostem pořadová čísla, uloží je do historie a rozešle odběratelům"""
+        for event in events:
+            event.id = self._next_id
+            self._next_id += 1
+            self._history.append(event)
+            for queue in self._subscribers:
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.dropped += 1
+
+    def history(
+        self,
+        since_id: int = 0,
+        machine_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[AlarmEvent]:
+        """Události s ID větším než since_id (nejstarší první)"""
+        events = [
+            event for event in self._history
+            if event.id > since_id and (machine_id is None or event.machine_id == machine_id)
+        ]
+        if limit is not None:
+            events = events[-limit:]
+        return events
+
+    def subscribe(self) -> asyncio.Queue:
+        """Zaregistruje odběratele (fronta nových událostí)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Zruší odběratele"""
+        self._subscribers.discard(queue)
+
+
+def _create_hub() -> AlarmHub:
+    from app.config import ALARM_HISTORY_SIZE, ALARM_STREAM_QUEUE_SIZE
+
+    return AlarmHub(ALARM_HISTORY_SIZE, ALARM_STREAM_QUEUE_SIZE)
+
+
+# Globální instance
+alarm_hub = _create_hub()
@@ -0,0 +1,357 @@
+"""
+Plánování kapacity a řízení přijetí simulátorů (admission control)
+
+Všechny simulátory tickují v jednom event loopu, tj. na jednom jádře. Když se
+spustí víc strojů, než loop stihne, zpožďují se ticky všech strojů najednou.
+
+Model nákladů: doba ticku = base + per_tag × počet tagů, zvlášť pro každý
+protokol. Koeficienty kalibruje krátký vestavěný benchmark (calibrate) - dočasný
+stroj každého protokolu na lokálním portu změřený se dvěma počty tagů,
+v samostatném vlákně s vlastním event loopem, aby start serverů neblokoval
+běžící simulace.
+
+Odhad zátěže:
+- vytížení = Σ doba ticku / interval ticku (podíl jednoho jádra)
+- zpoždění ticku = střední čekání ve frontě event loopu podle Pollaczek-Chinčinova
+  vzorce M/G/1: Σ (doba ticku² / interval) / (2 × (1 - vytížení))
+
+U běžících strojů se místo modelu bere naměřená doba ticku (BaseSimulator.tick_cost).
+"""
+
+import asyncio
+import logging
+import statistics
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from app.config import (
+    CAPACITY_ADMISSION,
+    CAPACITY_CALIBRATION_TAGS,
+    CAPACITY_CALIBRATION_TICKS,
+    CAPACITY_CPU_BUDGET,
+    CAPACITY_LATENCY_BUDGET,
+    SIMULATION_UPDATE_INTERVAL,
+)
+from app.models import DataType, Machine, ProtocolType, Sensor, SimulationType, utc_now
+
+if TYPE_CHECKING:
+    from app.simulators.base import BaseSimulator
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_MODES = ("refuse", "queue", "off")
+
+
+@dataclass
+class CostModel:
+    """Lineární model doby ticku jednoho stroje"""
+    base: float          # s na tick bez ohledu na počet tagů
+    per_tag: float       # s na tag a tick
+    calibrated: bool = False
+
+    def tick_cost(self, tags: int) -> float:
+        return self.base + self.per_tag * tags
+
+    def to_dict(self) -> dict:
+        return {
+            "base_us": round(self.base * 1e6, 2),
+            "per_tag_us": round(self.per_tag * 1e6, 3),
+            "calibrated": self.calibrated,
+        }
+
+
+# Výchozí koeficienty (base, per_tag) do první kalibrace - řádově podle kalibrace na vývojovém stroji
+_DEFAULT_MODELS = {
+    ProtocolType.OPC_UA: (50e-6, 50e-6),
+    ProtocolType.MODBUS: (30e-6, 4e-6),
+    ProtocolType.MQTT: (50e-6, 2e-6),
+}
+
+
+@dataclass
+class CapacityEstimate:
+    """Odhad zátěže event loopu ticky simulátorů"""
+    machines: int
+    tags: int
+    utilization: float    # podíl jednoho jádra
+    tick_delay: float     # střední čekání ticku ve frontě (s)
+    second_moment: float = 0.0  # Σ doba ticku² / interval - pro přičtení dalších strojů
+
+    def exceeds(self, cpu_budget: float, latency_budget: float) -> Optional[str]:
+        """Důvod překročení rozpočtu, None pokud se do něj odhad vejde"""
+        if self.utilization > cpu_budget:
+            return f"vytížení {self.utilization:.1%} > rozpočet {cpu_budget:.1%}"
+        if self.tick_delay > latency_budget:
+            return f"zpoždění ticku {self.tick_delay * 1000:.1f} ms > rozpočet {latency_budget * 1000:.0f} ms"
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "machines": self.machines,
+            "tags": self.tags,
+            "utilization": round(self.utilization, 4),
+            "tick_delay_ms": round(self.tick_delay * 1000, 3) if self.tick_delay != float("inf") else None,
+        }
+
+
+@dataclass
+class AdmissionDecision:
+    """Výsledek posouzení startu stroje"""
+    admitted: bool
+    projected: CapacityEstimate
+    tick_cost: float      # odhad doby ticku nového stroje (s)
+    tags: int
+    reason: Optional[str] = None
+
+    @property
+    def load(self) -> Tuple[float, float, int]:
+        """Zátěž stroje ve tvaru (doba ticku, interval, počet tagů) - rezervace do doby startu"""
+        return self.tick_cost, SIMULATION_UPDATE_INTERVAL, self.tags
+
+
+def _estimate(loads: Iterable[Tuple[float, float, int]], base: Optional[CapacityEstimate] = None) -> CapacityEstimate:
+    """Odhad z (doba ticku, interval, počet tagů) jednotlivých strojů, případně přidaných k odhadu base"""
+    machines = tags = 0
+    utilization = second_moment = 0.0
+    if base is not None:
+        machines, tags, utilization, second_moment = base.machines, base.tags, base.utilization, base.second_moment
+    for cost, interval, tag_count in loads:
+        machines += 1
+        tags += tag_count
+        utilization += cost / interval
+        second_moment += cost * cost / interval
+    if utilization >= 1.0:
+        tick_delay = float("inf")
+    else:
+        tick_delay = second_moment / (2 * (1 - utilization))
+    return CapacityEstimate(machines, tags, utilization, tick_delay, second_moment)
+
+
+def _calibration_sensors(count: int) -> List[Sensor]:
+    """Senzory kalibračního stroje se střídajícími se datovými typy a typy simulace"""
+    data_types = [DataType.FLOAT, DataType.INT, DataType.BOOL]
+    simulation_types = list(SimulationType)
+    return [
+        Sensor(
+            id=i,
+            machine_id=0,
+            name=f"tag_{i:05d}",
+            data_type=data_types[i % len(data_types)],
+            simulation_type=simulation_types[i % len(simulation_types)],
+            min_value=0.0,
+            max_value=100.0,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+async def _mqtt_sink() -> asyncio.AbstractServer:
+    """Lokální broker pro kalibraci MQTT - potvrdí připojení a zprávy zahazuje"""
+    from app.simulators.mqtt_client import CONNACK, CONNECT, PINGREQ, PINGRESP
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        with suppress(asyncio.IncompleteReadError, ConnectionError):
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length = shift = 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                await reader.readexactly(length)
+                if header & 0xF0 == CONNECT:
+                    writer.write(bytes((CONNACK, 2, 0, 0)))
+                elif header & 0xF0 == PINGREQ:
+                    writer.write(bytes((PINGRESP, 0)))
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _measure(protocol: ProtocolType, tag_counts: Tuple[int, ...], ticks: int) -> List[Tuple[int, float]]:
+    """Změří medián doby ticku dočasného stroje pro každý počet tagů"""
+    from app.simulators.base import SimulatorStatus
+    from app.simulators.impairment import free_local_port
+    from app.simulators.registry import get_simulator_class
+
+    simulator_class = get_simulator_class(protocol)
+    sink = await _mqtt_sink() if protocol == ProtocolType.MQTT else None
+    port = sink.sockets[0].getsockname()[1] if sink is not None else free_local_port()
+    machine = Machine(id=0, name="capacity-calibration", protocol=protocol, host="127.0.0.1", port=port)
+    simulator = simulator_class(machine, _calibration_sensors(tag_counts[0]))
+    try:
+        await simulator._start_server()
+        # Update loop se nespouští, stav RUNNING jen aby živé změny senzorů došly i na server
+        simulator.status = SimulatorStatus.RUNNING
+        points = []
+        for count in tag_counts:
+            # Další body živým přidáním senzorů - server (adresní prostor OPC UA) se startuje jen jednou
+            if count != len(simulator.sensor_states):
+                await simulator.apply_sensors(_calibration_sensors(count))
+            samples = []
+            for _ in range(ticks + 2):
+                generate_time, publish_time = await simulator._tick()
+                samples.append(generate_time + publish_time)
+            points.append((count, statistics.median(samples[2:])))
+        return points
+    finally:
+        await simulator._stop_server()
+        if sink is not None:
+            sink.close()
+            await sink.wait_closed()
+
+
+def _fit(points: List[Tuple[int, float]]) -> CostModel:
+    """Lineární model dvěma krajními body měření"""
+    (tags_low, cost_low), (tags_high, cost_high) = points[0], points[-1]
+    per_tag = max((cost_high - cost_low) / (tags_high - tags_low), 0.0)
+    return CostModel(base=max(cost_low - per_tag * tags_low, 0.0), per_tag=per_tag, calibrated=True)
+
+
+class CapacityPlanner:
+    """Model nákladů simulátorů a rozhodování o přijetí nových strojů"""
+
+    def __init__(
+        self,
+        cpu_budget: float = CAPACITY_CPU_BUDGET,
+        latency_budget: float = CAPACITY_LATENCY_BUDGET,
+        admission: str = CAPACITY_ADMISSION,
+    ):
+        if admission not in ADMISSION_MODES:
+            raise ValueError(f"Neznámý režim přijetí '{admission}', podporované: {', '.join(ADMISSION_MODES)}")
+        self.cpu_budget = cpu_budget
+        self.latency_budget = latency_budget
+        self.admission = admission
+        self.models: Dict[ProtocolType, CostModel] = {
+            protocol: CostModel(base, per_tag) for protocol, (base, per_tag) in _DEFAULT_MODELS.items()
+        }
+        self.calibrated_at: Optional[datetime] = None
+        self._calibration: Optional[asyncio.Task] = None
+
+    def estimate_tick(self, protocol: ProtocolType, tags: int) -> float:
+        """Odhad doby ticku stroje podle modelu (s)"""
+        return self.models[protocol].tick_cost(tags)
+
+    def _load(self, simulator: "BaseSimulator") -> Tuple[float, float, int]:
+        # Jmenovitý interval i u strojů zpomalených regulátorem zátěže - při volné
+        # kapacitě se jim rychlost vrátí, přijetí s tím musí počítat
+        tags = len(simulator.sensor_states)
+        cost = simulator.tick_cost
+        if cost is None:
+            cost = self.estimate_tick(simulator.machine.protocol, tags)
+        return cost, SIMULATION_UPDATE_INTERVAL, tags
+
+    def estimate(
+        self,
+        simulators: Iterable["BaseSimulator"],
+        reserved: Iterable[Tuple[float, float, int]] = (),
+    ) -> CapacityEstimate:
+        """Odhad zátěže daných (běžících) simulátorů a rezervací právě startujících strojů"""
+        return _estimate([*(self._load(simulator) for simulator in simulators), *reserved])
+
+    def admit(
+        self,
+        machine: Machine,
+        tags: int,
+        simulators: Iterable["BaseSimulator"],
+        reserved: Iterable[Tuple[float, float, int]] = (),
+    ) -> AdmissionDecision:
+        """
+        Posoudí start stroje vedle běžících simulátorů a rezervací startujících strojů
+        (AdmissionDecision.load). V režimu "off" se start vždy přijme, odhad se jen vrátí.
+        """
+        cost = self.estimate_tick(machine.protocol, tags)
+        projected = _estimate([(cost, SIMULATION_UPDATE_INTERVAL, tags)], self.estimate(simulators, reserved))
+        reason = projected.exceeds(self.cpu_budget, self.latency_budget)
+        return AdmissionDecision(
+            admitted=reason is None or self.admission == "off",
+            projected=projected,
+            tick_cost=cost,
+            tags=tags,
+            reason=reason,
+        )
+
+    def free_tags(self, current: CapacityEstimate) -> Dict[str, int]:
+        """Kolik tagů by se ještě vešlo do rozpočtu jedním strojem daného protokolu"""
+        free = {}
+        for protocol, model in self.models.items():
+            low, high = 0, 1
+            # Hranice zdvojováním, pak půlení - doba ticku s počtem tagů monotónně roste
+            while high <= 10_000_000 and self._fits(current, model, high):
+                low, high = high, high * 2
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self._fits(current, model, middle):
+                    low = middle
+                else:
+                    high = middle
+            free[protocol.value] = low
+        return free
+
+    def _fits(self, current: CapacityEstimate, model: CostModel, tags: int) -> bool:
+        projected = _estimate([(model.tick_cost(tags), SIMULATION_UPDATE_INTERVAL, tags)], current)
+        return projected.exceeds(self.cpu_budget, self.latency_budget) is None
+
+    def status(
+        self,
+        simulators: Iterable["BaseSimulator"],
+        reserved: Iterable[Tuple[float, float, int]] = (),
+    ) -> dict:
+        """Odhad zátěže, rezerva a model nákladů pro API a dashboard"""
+        current = self.estimate(simulators, reserved)
+        return {
+            "admission": self.admission,
+            "cpu_budget": self.cpu_budget,
+            "latency_budget_ms": round(self.latency_budget * 1000, 3),
+            "update_interval": SIMULATION_UPDATE_INTERVAL,
+            "current": current.to_dict(),
+            "headroom": round(max(self.cpu_budget - current.utilization, 0.0), 4),
+            "free_tags": self.free_tags(current),
+            "calibrating": self.calibrating,
+            "calibrated_at": self.calibrated_at.isoformat() if self.calibrated_at else None,
+            "models": {protocol.value: model.to_dict() for protocol, model in self.models.items()},
+        }
+
+    @property
+    def calibrating(self) -> bool:
+        return self._calibration is not None and not self._calibration.done()
+
+    async def calibrate(
+        self,
+        tag_counts: Tuple[int, ...] = CAPACITY_CALIBRATION_TAGS,
+        ticks: int = CAPACITY_CALIBRATION_TICKS,
+    ) -> Dict[ProtocolType, CostModel]:
+        """
+        Zkalibruje model nákladů krátkým benchmarkem všech protokolů.
+        Souběžná volání počkají na jednu probíhající kalibraci.
+        """
+        if not self.calibrating:
+            self._calibration = asyncio.create_task(self._run_calibration(tuple(tag_counts), ticks))
+        await asyncio.shield(self._calibration)
+        return self.models
+
+    async def _run_calibration(self, tag_counts: Tuple[int, ...], ticks: int) -> None:
+        async def measure_all() -> Dict[ProtocolType, List[Tuple[int, float]]]:
+            return {protocol: await _measure(protocol, tag_counts, ticks) for protocol in self.models}
+
+        # Vlastní event loop ve vlákně - start serverů (u OPC UA načtení adresního
+        # prostoru) neblokuje běžící simulace ani webové rozhraní
+        results = await asyncio.to_thread(asyncio.run, measure_all())
+        for protocol, points in results.items():
+            self.models[protocol] = _fit(points)
+        self.calibrated_at = utc_now()
+        logger.info(
+            "Kalibrace kapacity: "
+            + ", ".join(
+                f"{protocol.value} {model.base * 1e6:.0f} µs + {model.per_tag * 1e6:.2f} µs/tag"
+                for protocol, model in self.models.items()
+            )
+        )
+
+
+# Globální instance
+capacity_planner = CapacityPlanner()
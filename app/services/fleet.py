@@ -0,0 +1,369 @@
+"""
+Deklarativní popis flotily strojů a senzorů (JSON/YAML/CSV)
+
+Formát souboru:
+
+    machines:
+      - name: Lis-01
+        protocol: opc_ua
+        host: 127.0.0.1
+        port: 4840
+        sensors:
+          - name: teplota
+            unit: °C
+            simulation_type: sine
+            min_value: 20
+            max_value: 80
+
+Modul záměrně neimportuje webovou vrstvu ani databázové připojení,
+aby ho mohl použít headless runner. Funkce pracující s databází
+dostávají session jako parametr.
+"""
+
+import csv
+import io
+import json
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple, Union
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from pydantic import ValidationError
+
+from app.models import Machine, ProtocolType, Sensor, utc_now
+from app.models.machine import MachineBase
+from app.models.sensor import SensorBase
+from app.models.fleet import (
+    FleetConfig,
+    FleetGenerate,
+    FleetImportResult,
+    MachineConfig,
+)
+from app.simulators.protocol_settings import strip_secret_settings
+
+# Adresy, na kterých server naslouchá na všech rozhraních - port obsadí pro všechny hosty
+WILDCARD_HOSTS = ("0.0.0.0", "::")
+
+# Sloupce CSV exportu - jeden řádek na senzor, údaje stroje se opakují
+MACHINE_FIELDS = list(MachineBase.model_fields)
+SENSOR_FIELDS = list(SensorBase.model_fields)
+CSV_COLUMNS = [f"machine_{name}" for name in MACHINE_FIELDS] + [f"sensor_{name}" for name in SENSOR_FIELDS]
+
+
+class FleetFileError(ValueError):
+    """Chyba při načítání popisu flotily"""
+
+
+class PortAllocationError(ValueError):
+    """V zadaném rozsahu není dostatek volných portů"""
+
+
+def parse_fleet(data: Any) -> FleetConfig:
+    """
+    Zvaliduje popis flotily.
+    Povoluje i holý seznam strojů místo slovníku s klíčem 'machines'.
+    """
+    if isinstance(data, list):
+        data = {"machines": data}
+
+    if not isinstance(data, dict) or not isinstance(data.get("machines"), list):
+        raise FleetFileError("Popis flotily neobsahuje seznam 'machines'")
+
+    try:
+        return FleetConfig.model_validate(data)
+    except ValidationError as e:
+        raise FleetFileError(f"Neplatný popis flotily: {e}") from e
+
+
+def load_fleet_file(path: Union[str, Path]) -> FleetConfig:
+    """Načte popis flotily ze souboru JSON, YAML nebo CSV (podle přípony)"""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        return fleet_from_csv(text)
+
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            raise FleetFileError(
+                "Pro načtení YAML souboru je potřeba balíček pyyaml (pip install pyyaml)"
+            ) from e
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+
+    return parse_fleet(data)
+
+
+def build_fleet(config: FleetConfig, include_disabled: bool = False) -> List[Tuple[Machine, List[Sensor]]]:
+    """
+    Sestaví z popisu flotily instance strojů a senzorů bez databáze.
+    ID jsou přiřazena sekvenčně od 1.
+
+    Args:
+        config: Popis flotily
+        include_disabled: Zahrnout i stroje s is_enabled = False
+
+    Returns:
+        Seznam dvojic (stroj, senzory stroje)
+    """
+    fleet: List[Tuple[Machine, List[Sensor]]] = []
+    sensor_id = 0
+
+    for machine_id, machine_config in enumerate(config.machines, start=1):
+        if not machine_config.is_enabled and not include_disabled:
+            continue
+
+        machine = Machine(id=machine_id, **machine_config.model_dump(exclude={"sensors"}))
+        sensors: List[Sensor] = []
+        for sensor_config in machine_config.sensors:
+            sensor_id += 1
+            sensors.append(Sensor(id=sensor_id, machine_id=machine_id, **sensor_config.model_dump()))
+
+        fleet.append((machine, sensors))
+
+    return fleet
+
+
+# =============================================================================
+# Databázové operace
+# =============================================================================
+
+def allocate_ports(used: Set[int], count: int, port_start: int, port_end: int) -> List[int]:
+    """
+    Přidělí count portů z rozsahu port_start..port_end, které nejsou v used.
+
+    Raises:
+        PortAllocationError: V rozsahu není dostatek volných portů
+    """
+    ports: List[int] = []
+    for port in range(port_start, port_end + 1):
+        if port not in used:
+            ports.append(port)
+            if len(ports) == count:
+                return ports
+
+    raise PortAllocationError(
+        f"V rozsahu {port_start}-{port_end} je volných jen {len(ports)} portů, požadováno {count}"
+    )
+
+
+def _hosts_conflict(host: str, other: str) -> bool:
+    """Zda servery na dvou adresách nemohou sdílet port (wildcard adresa koliduje se všemi)"""
+    return host == other or host in WILDCARD_HOSTS or other in WILDCARD_HOSTS
+
+
+def _used_ports(session: Session, host: str) -> Set[int]:
+    """
+    Vrátí porty již obsazené stroji na daném hostu včetně strojů na wildcard adrese
+    (MQTT stroje sdílí port brokeru, neobsazují ho). Wildcard host koliduje se všemi stroji.
+    """
+    query = select(Machine.port).where(Machine.protocol != ProtocolType.MQTT)
+    if host not in WILDCARD_HOSTS:
+        query = query.where(Machine.host.in_((host, *WILDCARD_HOSTS)))
+    return set(session.exec(query).all())
+
+
+def insert_machines(session: Session, machines: List[MachineConfig], batch_size: int) -> FleetImportResult:
+    """
+    Hromadně vloží stroje a jejich senzory.
+    Stroje se vkládají po dávkách batch_size (jeden INSERT pro dávku), vše v jedné
+    transakci - při chybě se nevloží nic.
+    """
+    machine_ids: List[int] = []
+    sensors_total = 0
+    batch_size = max(1, batch_size)
+
+    try:
+        for offset in range(0, len(machines), batch_size):
+            batch = machines[offset:offset + batch_size]
+            now = utc_now()
+
+            machine_rows = [
+                {**config.model_dump(exclude={"sensors"}), "created_at": now, "updated_at": now}
+                for config in batch
+            ]
+            ids = session.execute(
+                insert(Machine).returning(Machine.id, sort_by_parameter_order=True),
+                machine_rows,
+            ).scalars().all()
+
+            sensor_rows = [
+                {**sensor.model_dump(), "machine_id": machine_id, "created_at": now, "updated_at": now}
+                for machine_id, config in zip(ids, batch)
+                for sensor in config.sensors
+            ]
+            if sensor_rows:
+                session.execute(insert(Sensor), sensor_rows)
+
+            machine_ids.extend(ids)
+            sensors_total += len(sensor_rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return FleetImportResult(
+        created_machines=len(machine_ids),
+        created_sensors=sensors_total,
+        machine_ids=machine_ids,
+    )
+
+
+def generate_fleet(session: Session, request: FleetGenerate, batch_size: int) -> FleetImportResult:
+    """
+    Vygeneruje request.count strojů podle šablony.
+    Porty se přidělují z rozsahu tak, aby nekolidovaly s existujícími stroji.
+    MQTT stroje publikují na společný broker - všechny dostanou port šablony.
+    """
+    template = request.template
+    if template.protocol == ProtocolType.MQTT:
+        ports = [template.port] * request.count
+    else:
+        ports = allocate_ports(
+            _used_ports(session, template.host),
+            request.count,
+            request.port_start,
+            request.port_end,
+        )
+
+    machines: List[MachineConfig] = []
+    for i, port in enumerate(ports):
+        try:
+            name = request.name_pattern.format(name=template.name, n=request.start_index + i)
+        except (KeyError, IndexError, ValueError) as e:
+            raise FleetFileError(f"Neplatný vzor názvu '{request.name_pattern}': {e}") from e
+        machines.append(template.model_copy(update={"name": name, "port": port}))
+
+    return insert_machines(session, machines, request.batch_size or batch_size)
+
+
+def import_fleet(session: Session, config: FleetConfig, batch_size: int) -> FleetImportResult:
+    """
+    Importuje konfiguraci flotily.
+
+    Raises:
+        PortAllocationError: Port stroje koliduje s existujícím strojem nebo jiným strojem v importu
+    """
+    used: Dict[str, Set[int]] = {}          # host -> porty obsazené v databázi
+    claimed: Dict[int, List[str]] = {}      # port -> hosty strojů z importu
+    for machine in config.machines:
+        if machine.protocol == ProtocolType.MQTT:
+            continue
+        if machine.host not in used:
+            used[machine.host] = _used_ports(session, machine.host)
+        if machine.port in used[machine.host] or any(
+            _hosts_conflict(machine.host, host) for host in claimed.get(machine.port, ())
+        ):
+            raise PortAllocationError(
+                f"Port {machine.host}:{machine.port} stroje '{machine.name}' je již obsazen"
+            )
+        claimed.setdefault(machine.port, []).append(machine.host)
+
+    return insert_machines(session, config.machines, batch_size)
+
+
+def export_fleet(session: Session) -> FleetConfig:
+    """
+    Exportuje kompletní konfiguraci všech strojů a senzorů.
+    Čte přímo sloupce bez ORM objektů - u velkých flotil je to řádově rychlejší.
+    """
+    machine_rows = session.exec(
+        select(Machine.id, *(getattr(Machine, name) for name in MACHINE_FIELDS)).order_by(Machine.id)
+    ).all()
+    sensor_rows = session.exec(
+        select(Sensor.machine_id, *(getattr(Sensor, name) for name in SENSOR_FIELDS)).order_by(Sensor.id)
+    ).all()
+
+    machines: Dict[int, Dict[str, Any]] = {}
+    for machine_id, *values in machine_rows:
+        machine = dict(zip(MACHINE_FIELDS, values))
+        # Hesla a jiná tajná nastavení do exportu nepatří
+        machine["protocol_settings"] = strip_secret_settings(
+            ProtocolType(machine["protocol"]), machine["protocol_settings"]
+        )
+        machines[machine_id] = {**machine, "sensors": []}
+
+    for machine_id, *values in sensor_rows:
+        machines[machine_id]["sensors"].append(dict(zip(SENSOR_FIELDS, values)))
+
+    return FleetConfig.model_validate({"machines": list(machines.values())})
+
+
+# =============================================================================
+# CSV
+# =============================================================================
+
+def _csv_value(value: Any) -> Any:
+    """Převede hodnotu na buňku CSV"""
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _parse_csv_value(value: str) -> Any:
+    """Převede buňku CSV zpět (prázdná buňka = výchozí hodnota)"""
+    if value[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def fleet_to_csv(config: FleetConfig) -> str:
+    """Převede konfiguraci na CSV - jeden řádek na senzor"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+
+    for machine in config.machines:
+        machine_cells = {
+            f"machine_{name}": _csv_value(getattr(machine, name)) for name in MACHINE_FIELDS
+        }
+        if not machine.sensors:
+            writer.writerow(machine_cells)
+            continue
+        for sensor in machine.sensors:
+            writer.writerow({
+                **machine_cells,
+                **{f"sensor_{name}": _csv_value(getattr(sensor, name)) for name in SENSOR_FIELDS},
+            })
+
+    return output.getvalue()
+
+
+def fleet_from_csv(text: str) -> FleetConfig:
+    """
+    Načte konfiguraci z CSV exportu.
+    Řádky se stejnými údaji stroje patří k jednomu stroji.
+    """
+    machines: Dict[Tuple, Dict[str, Any]] = {}
+    reader = csv.DictReader(io.StringIO(text))
+
+    for row in reader:
+        machine_data = {
+            name: _parse_csv_value(row[f"machine_{name}"])
+            for name in MACHINE_FIELDS
+            if row.get(f"machine_{name}")
+        }
+        key = tuple(sorted((k, str(v)) for k, v in machine_data.items()))
+        machine = machines.setdefault(key, {**machine_data, "sensors": []})
+
+        sensor_data = {
+            name: _parse_csv_value(row[f"sensor_{name}"])
+            for name in SENSOR_FIELDS
+            if row.get(f"sensor_{name}")
+        }
+        if sensor_data:
+            machine["sensors"].append(sensor_data)
+
+    return parse_fleet(list(machines.values()))
@@ -0,0 +1,422 @@
+"""
+Odvozené senzory - hodnota vypočtená vzorcem z jiných senzorů stroje
+
+Vzorec je výraz v syntaxi Pythonu nad názvy senzorů stejného stroje:
+
+    napeti * proud
+    mean(t1, t2, t3, t4)
+    tag("Teplota motoru") - tag("Teplota okolí")
+    max(tlak - 2.5, 0) if bezi else 0
+
+Povolené jsou jen číselné konstanty, aritmetika, porovnání, and/or/not,
+podmíněný výraz a funkce z FUNCTIONS. Název senzoru, který není platný
+identifikátor, se zapíše jako tag("název").
+
+Vzorec se při konfiguraci jednou přeloží (ast) na funkci - v ticku se už
+nic neparsuje ani neinterpretuje. Vzorce stroje tvoří graf závislostí
+(DAG), který se vyhodnocuje v topologickém pořadí a přepočítávají se jen
+vzorce, jejichž vstupy se v daném ticku změnily. Cyklické závislosti se
+odmítnou už při ukládání konfigurace.
+"""
+
+import ast
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlmodel import Session, select
+
+from app.models.sensor import Sensor
+
+logger = logging.getLogger(__name__)
+
+# Typ simulace odvozených senzorů
+FORMULA_TYPE = "formula"
+
+# Maximální délka vzorce (ochrana před patologickými výrazy)
+MAX_FORMULA_LENGTH = 1000
+
+
+class FormulaError(ValueError):
+    """Neplatný vzorec nebo graf vzorců"""
+    pass
+
+
+def _mean(*values: float) -> float:
+    return sum(values) / len(values)
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+FUNCTIONS: Dict[str, Callable[..., float]] = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "sum": lambda *values: sum(values),
+    "mean": _mean,
+    "clamp": _clamp,
+    "round": round,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "hypot": math.hypot,
+}
+
+# Počet argumentů funkcí (min, max), None = neomezeně
+ARITY: Dict[str, Tuple[int, Optional[int]]] = {
+    "abs": (1, 1),
+    "min": (2, None),
+    "max": (2, None),
+    "sum": (1, None),
+    "mean": (1, None),
+    "clamp": (3, 3),
+    "round": (1, 2),
+    "sqrt": (1, 1),
+    "exp": (1, 1),
+    "log": (1, 2),
+    "log10": (1, 1),
+    "sin": (1, 1),
+    "cos": (1, 1),
+    "tan": (1, 1),
+    "hypot": (1, None),
+}
+
+CONSTANTS: Dict[str, float] = {"pi": math.pi, "e": math.e}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.Name, ast.Constant, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+# Název argumentu přeložené funkce - seznam hodnot vstupů
+_ARG = "_v"
+
+
+@dataclass
+class CompiledFormula:
+    """Přeložený vzorec"""
+    expression: str
+    inputs: Tuple[str, ...]                      # názvy senzorů v pořadí argumentů
+    fn: Callable[[Sequence[float]], float]
+
+
+class _Compiler(ast.NodeTransformer):
+    """Ověří povolené konstrukce a nahradí odkazy na senzory indexy do _v"""
+
+    def __init__(self):
+        self.inputs: List[str] = []
+
+    def _input(self, name: str, node: ast.AST) -> ast.AST:
+        if name not in self.inputs:
+            self.inputs.append(name)
+        subscript = ast.Subscript(
+            value=ast.Name(id=_ARG, ctx=ast.Load()),
+            slice=ast.Constant(value=self.inputs.index(name)),
+            ctx=ast.Load(),
+        )
+        return ast.copy_location(subscript, node)
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"Nepovolená konstrukce ve vzorci: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        if isinstance(node.value, bool):
+            return node
+        if not isinstance(node.value, (int, float)):
+            raise FormulaError(f"Nepovolená konstanta ve vzorci: {node.value!r}")
+        # Jen float - celočíselná aritmetika by umožnila obří mocniny
+        return ast.copy_location(ast.Constant(value=float(node.value)), node)
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in CONSTANTS:
+            return ast.copy_location(ast.Constant(value=CONSTANTS[node.id]), node)
+        if node.id in FUNCTIONS or node.id == "tag":
+            raise FormulaError(f"Funkci '{node.id}' je nutné zavolat")
+        return self._input(node.id, node)
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise FormulaError("Povolena jsou jen volání funkcí s pozičními argumenty")
+
+        name = node.func.id
+        if name == "tag":
+            if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant) \
+                    or not isinstance(node.args[0].value, str):
+                raise FormulaError('tag() očekává název senzoru jako řetězec, např. tag("Teplota motoru")')
+            return self._input(node.args[0].value, node)
+
+        if name not in FUNCTIONS:
+            raise FormulaError(f"Neznámá funkce: {name}")
+        low, high = ARITY[name]
+        if len(node.args) < low or (high is not None and len(node.args) > high):
+            expected = f"{low}" if low == high else f"{low} až {high}" if high else f"alespoň {low}"
+            raise FormulaError(f"Funkce '{name}': počet argumentů {expected}, zadáno {len(node.args)}")
+        if name == "round" and len(node.args) == 2:
+            # Počet desetinných míst zůstává celé číslo (float round() odmítne)
+            ndigits = node.args[1]
+            if not isinstance(ndigits, ast.Constant) or type(ndigits.value) is not int:
+                raise FormulaError("round() očekává počet desetinných míst jako celé číslo, např. round(a, 2)")
+            node.args = [self.visit(node.args[0]), ndigits]
+            return node
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+
+def compile_formula(expression: str) -> CompiledFormula:
+    """
+    Přeloží vzorec na funkci fn(hodnoty vstupů).
+
+    Raises:
+        FormulaError: Syntaktická chyba nebo nepovolená konstrukce
+    """
+    if not expression or not expression.strip():
+        raise FormulaError("Vzorec je prázdný")
+    if len(expression) > MAX_FORMULA_LENGTH:
+        raise FormulaError(f"Vzorec je delší než {MAX_FORMULA_LENGTH} znaků")
+
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Syntaktická chyba ve vzorci: {e.msg}") from None
+
+    compiler = _Compiler()
+    body = compiler.visit(tree).body
+    function = ast.Expression(body=ast.Lambda(
+        args=ast.arguments(
+            posonlyargs=[], args=[ast.arg(arg=_ARG)], kwonlyargs=[],
+            kw_defaults=[], defaults=[],
+        ),
+        body=body,
+    ))
+    ast.fix_missing_locations(function)
+    code = compile(function, "<vzorec>", "eval")
+    fn = eval(code, {"__builtins__": {}, **FUNCTIONS})  # jen vytvoření funkce, jednou
+    return CompiledFormula(expression=expression, inputs=tuple(compiler.inputs), fn=fn)
+
+
+def _to_float(value: Any) -> float:
+    return round(float(value), 2)
+
+
+def _to_int(value: Any) -> int:
+    return int(round(value))
+
+
+def _converter(data_type: Any) -> Callable[[Any], Any]:
+    """Převod výsledku vzorce na datový typ senzoru"""
+    data_type = getattr(data_type, "value", data_type)
+    if data_type == "int":
+        return _to_int
+    if data_type == "bool":
+        return bool
+    return _to_float
+
+
+@dataclass
+class _Node:
+    """Vzorec jednoho senzoru v grafu"""
+    sensor_id: int
+    name: str
+    convert: Callable[[Any], Any]
+    inputs: List[int]
+    fn: Callable[[Sequence[float]], float]
+    fresh: bool = True    # ještě nevyhodnocen (úspěšně) - vyhodnotí se bez ohledu na změny vstupů
+    failed: bool = False  # poslední vyhodnocení skončilo chybou (loguje se jen první)
+
+
+@dataclass
+class FormulaGraph:
+    """
+    Vzorce senzorů jednoho stroje v topologickém pořadí.
+    Vstupy jsou ID senzorů (běžných i odvozených).
+    """
+    order: List[_Node] = field(default_factory=list)
+    sources: List[int] = field(default_factory=list)   # vstupy, které nejsou vzorce
+    _cache: Dict[int, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @classmethod
+    def build(cls, sensors: Iterable[Any], strict: bool = True) -> "FormulaGraph":
+        """
+        Sestaví graf ze senzorů stroje (objekty s atributy id, name, simulation_type,
+        formula, data_type a initial_value; u konfigurací bez ID se použije pořadí).
+
+        Args:
+            strict: Chybný vzorec nebo cyklus vyvolá výjimku; jinak se
+                    takové vzorce jen vynechají a zalogují
+
+        Raises:
+            FormulaError: Neplatný vzorec, neznámý nebo nejednoznačný senzor, cyklus
+        """
+        sensors = list(sensors)
+        ids = [
+            index if getattr(sensor, "id", None) is None else sensor.id
+            for index, sensor in enumerate(sensors)
+        ]
+        by_name: Dict[str, int] = {}
+        duplicate: Set[str] = set()
+        for sensor_id, sensor in zip(ids, sensors):
+            if sensor.name in by_name:
+                duplicate.add(sensor.name)
+            by_name[sensor.name] = sensor_id
+
+        graph = cls()
+        nodes: Dict[int, _Node] = {}
+        for sensor_id, sensor in zip(ids, sensors):
+            if sensor.simulation_type != FORMULA_TYPE:
+                continue
+            try:
+                compiled = compile_formula(sensor.formula or "")
+                inputs = []
+                for name in compiled.inputs:
+                    if name not in by_name:
+                        raise FormulaError(f"neznámý senzor '{name}'")
+                    if name in duplicate:
+                        raise FormulaError(f"název senzoru '{name}' není jednoznačný")
+                    inputs.append(by_name[name])
+            except FormulaError as e:
+                error = FormulaError(f"Vzorec senzoru '{sensor.name}': {e}")
+                if strict:
+                    raise error from None
+                logger.error(str(error))
+                continue
+            nodes[sensor_id] = _Node(sensor_id, sensor.name, _converter(sensor.data_type), inputs, compiled.fn)
+            graph._cache[sensor_id] = sensor.initial_value
+
+        # Topologické řazení (Kahn) - co zbyde, leží na cyklu nebo za ním
+        dependents: Dict[int, List[int]] = {sensor_id: [] for sensor_id in nodes}
+        pending: Dict[int, int] = {}
+        for node in nodes.values():
+            formula_inputs = {i for i in node.inputs if i in nodes}
+            pending[node.sensor_id] = len(formula_inputs)
+            for input_id in formula_inputs:
+                dependents[input_id].append(node.sensor_id)
+
+        ready = [sensor_id for sensor_id, count in pending.items() if count == 0]
+        while ready:
+            sensor_id = ready.pop()
+            graph.order.append(nodes[sensor_id])
+            for dependent in dependents[sensor_id]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(graph.order) < len(nodes):
+            ordered = {node.sensor_id for node in graph.order}
+            names = sorted(node.name for node in nodes.values() if node.sensor_id not in ordered)
+            error = FormulaError(f"Cyklická závislost vzorců: {', '.join(names)}")
+            if strict:
+                raise error
+            logger.error(str(error))
+            for sensor_id in nodes.keys() - ordered:
+                graph._cache.pop(sensor_id, None)
+
+        graph.sources = sorted({i for node in graph.order for i in node.inputs if i not in nodes})
+        return graph
+
+    def evaluate(self, states: Dict[int, Any]) -> List[Tuple[int, Any]]:
+        """
+        Přepočítá vzorce, jejichž vstupy se od minulého volání změnily.
+
+        Args:
+            states: ID senzoru -> stav s atributem current_value (hodnoty běžných senzorů)
+
+        Returns:
+            Dvojice (ID senzoru, nová hodnota) pro vzorce, jejichž hodnota se změnila
+        """
+        cache = self._cache
+        dirty: Set[int] = set()
+        for sensor_id in self.sources:
+            value = states[sensor_id].current_value
+            if sensor_id not in cache or cache[sensor_id] != value:
+                cache[sensor_id] = value
+                dirty.add(sensor_id)
+
+        changed: List[Tuple[int, Any]] = []
+        for node in self.order:
+            if not node.fresh and dirty.isdisjoint(node.inputs):
+                continue
+            try:
+                value = node.convert(node.fn([cache[i] for i in node.inputs]))
+            except (ArithmeticError, ValueError, TypeError) as e:
+                if not node.failed:
+                    logger.warning(f"Vzorec senzoru '{node.name}' nelze vyhodnotit: {e}")
+                node.failed = True
+                continue
+            node.failed = False
+            if node.fresh or cache[node.sensor_id] != value:
+                node.fresh = False
+                cache[node.sensor_id] = value
+                dirty.add(node.sensor_id)
+                changed.append((node.sensor_id, value))
+        return changed
+
+
+def check_formulas(sensors: Iterable[Any]) -> None:
+    """
+    Ověří vzorce senzorů jednoho stroje (syntaxe, odkazy, cykly).
+
+    Raises:
+        FormulaError: Neplatná konfigurace vzorců
+    """
+    FormulaGraph.build(sensors, strict=True)
+
+
+def validate_formula(simulation_type: str, formula: Optional[str]) -> Optional[str]:
+    """
+    Ověří syntaxi vzorce senzoru (odkazy na senzory ověřuje až check_formulas).
+
+    Returns:
+        Vzorec bez okrajových mezer, None u senzorů bez vzorce
+
+    Raises:
+        FormulaError: Chybějící nebo syntakticky neplatný vzorec
+    """
+    if simulation_type != FORMULA_TYPE:
+        return None
+    if not formula or not formula.strip():
+        raise FormulaError("Senzor typu vzorec musí mít zadaný vzorec")
+    compile_formula(formula)
+    return formula.strip()
+
+
+def check_machine_formulas(session: Session, machine_ids: Iterable[int]) -> None:
+    """
+    Ověří vzorce strojů v rozpracované transakci (před commitem) - zachytí
+    odkazy na smazané či přejmenované senzory i nově vzniklé cykly.
+    Kontrolují se jen stroje, které mají alespoň jeden odvozený senzor.
+
+    Raises:
+        FormulaError: Neplatná konfigurace vzorců některého stroje
+    """
+    machine_ids = sorted(set(machine_ids))
+    with_formulas: Set[int] = set()
+    for offset in range(0, len(machine_ids), 5000):
+        chunk = machine_ids[offset:offset + 5000]
+        with_formulas.update(session.exec(
+            select(Sensor.machine_id)
+            .where(Sensor.machine_id.in_(chunk), Sensor.simulation_type == FORMULA_TYPE)
+            .distinct()
+        ).all())
+
+    columns = (Sensor.id, Sensor.name, Sensor.simulation_type, Sensor.formula, Sensor.data_type, Sensor.initial_value)
+    for machine_id in sorted(with_formulas):
+        rows = session.exec(select(*columns).where(Sensor.machine_id == machine_id)).all()
+        try:
+            check_formulas(rows)
+        except FormulaError as e:
+            raise FormulaError(f"Stroj {machine_id}: {e}") from None
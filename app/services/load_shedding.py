@@ -0,0 +1,303 @@
+"""
+Adaptivní zpomalování simulátorů při přetížení (load shedding)
+
+Když event loop nestíhá, zpozdí se ticky všech strojů najednou a nekontrolovaně.
+Regulátor každých LOAD_SHEDDING_INTERVAL sekund vyhodnotí dvě měřené veličiny:
+- vytížení loopu ticky = Σ naměřená doba ticku / skutečný interval stroje
+- průměrné zpoždění event loopu za periodu (loop_lag_monitor)
+
+Nad horním prahem kterékoli z nich zdvojnásobí interval aktualizace strojů
+nejnižší priority, které ještě nejsou na LOAD_SHEDDING_MAX_SLOWDOWN (nejdřív LOW,
+potom NORMAL). Stroje s prioritou CRITICAL se nezpomalují nikdy. Pod dolními prahy
+se rychlost vrací v opačném pořadí, jen pokud obnovení podle naměřených dob ticku
+nepřekročí horní práh vytížení. Za periodu se provede nejvýš jeden krok, mezi
+prahy se nic nemění - regulátor tak nekmitá.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.config import (
+    LOAD_SHEDDING_HIGH_LAG,
+    LOAD_SHEDDING_HIGH_UTILIZATION,
+    LOAD_SHEDDING_HISTORY_SIZE,
+    LOAD_SHEDDING_INTERVAL,
+    LOAD_SHEDDING_LOW_LAG,
+    LOAD_SHEDDING_LOW_UTILIZATION,
+    LOAD_SHEDDING_MAX_SLOWDOWN,
+    SIMULATION_UPDATE_INTERVAL,
+)
+from app.models import MachinePriority, utc_now
+from app.services.loop_lag import loop_lag_monitor
+from app.services.metrics import LOAD_SHEDDING_CHANGES, Gauge, registry
+
+if TYPE_CHECKING:
+    from app.simulators.base import BaseSimulator
+
+logger = logging.getLogger(__name__)
+
+# Pořadí zpomalování - obnovuje se v opačném pořadí
+SHED_ORDER = (MachinePriority.LOW, MachinePriority.NORMAL)
+
+
+@dataclass
+class SheddingEvent:
+    """Jedna změna rychlosti aktualizace skupiny strojů stejné priority"""
+    timestamp: datetime
+    action: str                  # degrade / restore
+    priority: MachinePriority
+    slowdowns: Dict[int, int]    # machine_id -> nový násobek intervalu
+    utilization: float
+    lag: float
+    reason: str
+
+    def to_dict(self) -> dict:
+        """Převede událost na slovník pro API"""
+        return {
+            "timestamp": self.timestamp.isoformat(),
+            "action": self.action,
+            "priority": self.priority.value,
+            "slowdowns": self.slowdowns,
+            "utilization": round(self.utilization, 4),
+            "lag_ms": round(self.lag * 1000, 3),
+            "reason": self.reason,
+        }
+
+
+@dataclass
+class Degradation:
+    """Zpomalený stroj"""
+    machine_id: int
+    name: str
+    priority: MachinePriority
+    slowdown: int
+    since: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        """Převede zpomalení na slovník pro API"""
+        return {
+            "machine_id": self.machine_id,
+            "name": self.name,
+            "priority": self.priority.value,
+            "slowdown": self.slowdown,
+            "update_interval": SIMULATION_UPDATE_INTERVAL * self.slowdown,
+            "nominal_interval": SIMULATION_UPDATE_INTERVAL,
+            "since": self.since.isoformat() if self.since else None,
+        }
+
+
+def _utilization(simulator: "BaseSimulator") -> float:
+    """Podíl jádra, který stroj spotřebuje ticky při aktuálním zpomalení"""
+    if simulator.tick_cost is None:
+        return 0.0
+    return simulator.tick_cost / (SIMULATION_UPDATE_INTERVAL * simulator.slowdown)
+
+
+class LoadShedder:
+    """Zpětnovazební regulátor rychlosti aktualizace strojů podle zátěže event loopu"""
+
+    def __init__(
+        self,
+        interval: float = LOAD_SHEDDING_INTERVAL,
+        high_utilization: float = LOAD_SHEDDING_HIGH_UTILIZATION,
+        low_utilization: float = LOAD_SHEDDING_LOW_UTILIZATION,
+        high_lag: float = LOAD_SHEDDING_HIGH_LAG,
+        low_lag: float = LOAD_SHEDDING_LOW_LAG,
+        max_slowdown: int = LOAD_SHEDDING_MAX_SLOWDOWN,
+        history_size: int = LOAD_SHEDDING_HISTORY_SIZE,
+    ):
+        self.interval = interval
+        self.high_utilization = high_utilization
+        self.low_utilization = low_utilization
+        self.high_lag = high_lag
+        self.low_lag = low_lag
+        self.max_slowdown = max_slowdown
+        # Poslední změřené hodnoty
+        self.utilization = 0.0
+        self.lag = 0.0
+        # Přetížení trvá, ale všechny zpomalitelné stroje jsou na maximu
+        self.saturated = False
+        self.events: Deque[SheddingEvent] = deque(maxlen=history_size)
+
+        self._since: Dict[int, datetime] = {}  # machine_id -> začátek zpomalení
+        self._simulators: Optional[Callable[[], Iterable["BaseSimulator"]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, simulators: Callable[[], Iterable["BaseSimulator"]]) -> None:
+        """Spustí regulátor nad běžícími simulátory, které vrací simulators()"""
+        self._simulators = simulators
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Zastaví regulátor (zpomalené stroje zůstávají zpomalené)"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        """Smyčka regulátoru"""
+        loop_lag_monitor.take_mean_lag()  # zahodit lag naměřený před startem
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.evaluate(list(self._simulators()), loop_lag_monitor.take_mean_lag())
+            except Exception as e:
+                logger.error(f"Chyba regulátoru zátěže: {e}")
+
+    def evaluate(self, simulators: List["BaseSimulator"], lag: float) -> Optional[SheddingEvent]:
+        """
+        Jeden krok regulátoru.
+
+        Args:
+            simulators: Běžící simulátory
+            lag: Průměrné zpoždění event loopu za uplynulou periodu (s)
+
+        Returns:
+            Provedená změna rychlosti, nebo None
+        """
+        utilization = sum(_utilization(simulator) for simulator in simulators)
+        self.utilization, self.lag = utilization, lag
+        # Restartovaný nebo zastavený stroj běží jmenovitou rychlostí
+        degraded = {simulator.machine.id for simulator in simulators if simulator.slowdown > 1}
+        for machine_id in set(self._since) - degraded:
+            del self._since[machine_id]
+
+        if utilization > self.high_utilization:
+            return self._degrade(simulators, f"vytížení {utilization:.1%} > {self.high_utilization:.0%}")
+        if lag > self.high_lag:
+            return self._degrade(
+                simulators, f"zpoždění loopu {lag * 1000:.1f} ms > {self.high_lag * 1000:.0f} ms"
+            )
+        self.saturated = False
+        if utilization < self.low_utilization and lag < self.low_lag:
+            return self._restore(simulators)
+        return None
+
+    def _degrade(self, simulators: List["BaseSimulator"], reason: str) -> Optional[SheddingEvent]:
+        """Zpomalí stroje nejnižší priority, které ještě nejsou na maximu"""
+        for priority in SHED_ORDER:
+            group = [
+                simulator for simulator in simulators
+                if simulator.machine.priority == priority and simulator.slowdown < self.max_slowdown
+            ]
+            if group:
+                self.saturated = False
+                return self._apply("degrade", priority, group, 2, reason)
+
+        if not self.saturated:
+            logger.warning(f"Přetížení trvá ({reason}), zpomalitelné stroje jsou na maximu")
+            self.saturated = True
+        return None
+
+    def _restore(self, simulators: List["BaseSimulator"]) -> Optional[SheddingEvent]:
+        """Zrychlí zpomalené stroje nejvyšší priority, pokud se obnovení vejde pod horní práh"""
+        for priority in reversed(SHED_ORDER):
+            group = [
+                simulator for simulator in simulators
+                if simulator.machine.priority == priority and simulator.slowdown > 1
+            ]
+            if not group:
+                continue
+            # Poloviční interval = dvojnásobné vytížení strojů skupiny
+            projected = self.utilization + sum(_utilization(simulator) for simulator in group)
+            if projected > self.high_utilization:
+                return None
+            return self._apply("restore", priority, group, 0.5, f"rezerva - odhad vytížení po obnovení {projected:.1%}")
+        return None
+
+    def _apply(
+        self,
+        action: str,
+        priority: MachinePriority,
+        group: List["BaseSimulator"],
+        factor: float,
+        reason: str,
+    ) -> SheddingEvent:
+        """Vynásobí zpomalení skupiny strojů a zaznamená událost"""
+        now = utc_now()
+        slowdowns = {}
+        for simulator in group:
+            slowdown = min(max(int(simulator.slowdown * factor), 1), self.max_slowdown)
+            simulator.slowdown = slowdown
+            slowdowns[simulator.machine.id] = slowdown
+            if slowdown > 1:
+                self._since.setdefault(simulator.machine.id, now)
+            else:
+                self._since.pop(simulator.machine.id, None)
+
+        event = SheddingEvent(now, action, priority, slowdowns, self.utilization, self.lag, reason)
+        self.events.append(event)
+        LOAD_SHEDDING_CHANGES.labels(action).inc()
+        if action == "degrade":
+            logger.warning(f"Zpomaleno {len(group)} strojů priority {priority.value} ({reason})")
+        else:
+            logger.info(f"Obnovena rychlost {len(group)} strojů priority {priority.value} ({reason})")
+        return event
+
+    def degradations(self, simulators: Iterable["BaseSimulator"]) -> List[Degradation]:
+        """Zpomalené stroje (nejvíc zpomalené první)"""
+        degraded = [
+            Degradation(
+                machine_id=simulator.machine.id,
+                name=simulator.machine.name,
+                priority=MachinePriority(simulator.machine.priority),
+                slowdown=simulator.slowdown,
+                since=self._since.get(simulator.machine.id),
+            )
+            for simulator in simulators
+            if simulator.slowdown > 1
+        ]
+        degraded.sort(key=lambda degradation: (-degradation.slowdown, degradation.machine_id))
+        return degraded
+
+    def status(self, limit: Optional[int] = None) -> dict:
+        """Stav regulátoru, zpomalené stroje a poslední změny rychlosti pro API"""
+        simulators = list(self._simulators()) if self._simulators else []
+        events = list(reversed(self.events))
+        return {
+            "enabled": self.running,
+            "saturated": self.saturated,
+            "utilization": round(self.utilization, 4),
+            "lag_ms": round(self.lag * 1000, 3),
+            "thresholds": {
+                "high_utilization": self.high_utilization,
+                "low_utilization": self.low_utilization,
+                "high_lag_ms": self.high_lag * 1000,
+                "low_lag_ms": self.low_lag * 1000,
+            },
+            "max_slowdown": self.max_slowdown,
+            "degraded": [degradation.to_dict() for degradation in self.degradations(simulators)],
+            "events": [event.to_dict() for event in events[:limit]],
+        }
+
+    def collect_metrics(self) -> Dict[Tuple[str], float]:
+        """Počet zpomalených strojů podle priority (pro /metrics)"""
+        counts: Dict[Tuple[str], float] = {(priority.value,): 0 for priority in SHED_ORDER}
+        for simulator in self._simulators() if self._simulators else ():
+            if simulator.slowdown > 1:
+                key = (MachinePriority(simulator.machine.priority).value,)
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+# Globální instance
+load_shedder = LoadShedder()
+
+registry.register(Gauge(
+    "plc_sim_degraded_simulators",
+    "Počet strojů zpomalených regulátorem zátěže",
+    ("priority",),
+    callback=load_shedder.collect_metrics,
+))
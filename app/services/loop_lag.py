@@ -0,0 +1,281 @@
+"""
+Měření zpoždění (lag) asyncio event loopu a watchdog blokujících callbacků
+
+Webové routy, databáze i všechny protokolové servery sdílí jeden event loop.
+Monitor se periodicky uspí na pevný interval a měří, o kolik později se probudil -
+to je doba, po kterou loop blokoval jiný callback.
+
+Samotné změření lagu ale neřekne, kdo loop blokoval - v okamžiku měření už
+callback doběhl. Proto paralelně běží vlákno watchdogu, které si všimne
+opožděného probuzení ještě během blokování a zachytí zásobník vlákna
+s event loopem a právě běžící task. Volitelně se přidají i hlášení
+asyncio debug režimu o pomalých callbacích (Executing <Handle ...> took ...).
+"""
+
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+
+from app.config import (
+    LOOP_LAG_ASYNCIO_DEBUG,
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_MAX_INCIDENTS,
+    LOOP_LAG_THRESHOLD,
+)
+from app.models import utc_now
+from app.services.metrics import LOOP_INCIDENTS, LOOP_LAG
+from app.services.profiler import shorten_path
+
+logger = logging.getLogger(__name__)
+
+# Maximální počet rámců zásobníku uložených u incidentu (od vrcholu)
+MAX_STACK_DEPTH = 40
+
+
+@dataclass
+class LoopIncident:
+    """Jedno zablokování event loopu nad prahem"""
+    detected_at: datetime
+    lag: float = 0.0
+    task: Optional[str] = None
+    coroutine: Optional[str] = None
+    stack: List[str] = field(default_factory=list)
+    slow_callbacks: List[str] = field(default_factory=list)
+    # monotonic čas začátku blokování - jen pro párování s hlášeními asyncio
+    _started: float = field(default=0.0, repr=False)
+    # Kód vnější korutiny zásobníku - task se podle něj dohledá ve vlákně loopu
+    _coro_code: Optional[object] = field(default=None, repr=False)
+    
+    def to_dict(self) -> dict:
+        """Převede incident na slovník pro API"""
+        data = asdict(self)
+        data.pop("_started")
+        data.pop("_coro_code")
+        data["lag_ms"] = round(self.lag * 1000, 1)
+        return data
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Zachytává hlášení asyncio debug režimu o pomalých callbacích"""
+    
+    def __init__(self, records: Deque[Tuple[float, str]]):
+        super().__init__(level=logging.WARNING)
+        self.records = records
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if message.startswith("Executing"):
+            self.records.append((time.monotonic(), message))
+
+
+def _outer_coroutine_code(frame):
+    """Kód nejvzdálenější korutiny na zásobníku - korutina tasku, jehož krok běží"""
+    code = None
+    while frame is not None:
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:
+            code = frame.f_code
+        frame = frame.f_back
+    return code
+
+
+def _format_stack(frame) -> List[str]:
+    """Převede zásobník na seznam 'soubor:řádek funkce' (kořen první)"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{shorten_path(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class LoopLagMonitor:
+    """Periodicky měří zpoždění event loopu, zapisuje ho do metrik a eviduje incidenty"""
+    
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.1,
+        max_incidents: int = 100,
+        asyncio_debug: bool = False,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.asyncio_debug = asyncio_debug
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.incidents: Deque[LoopIncident] = deque(maxlen=max_incidents)
+        self.incidents_total = 0
+        # Součet a počet měření od posledního take_mean_lag (regulátor zátěže)
+        self._window_sum = 0.0
+        self._window_count = 0
+        
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        # Plánovaný čas probuzení měřicí smyčky (time.monotonic = loop.time)
+        self._expected_wakeup = 0.0
+        # Incident zachycený watchdogem, který ještě neskončil
+        self._pending: Optional[LoopIncident] = None
+        self._pending_lock = threading.Lock()
+        self._slow_callbacks: Deque[Tuple[float, str]] = deque(maxlen=50)
+        self._log_handler: Optional[_SlowCallbackHandler] = None
+    
+    def start(self) -> None:
+        """Spustí měření na pozadí v běžícím event loopu a vlákno watchdogu"""
+        if self._task is not None and not self._task.done():
+            return
+        
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._expected_wakeup = time.monotonic() + self.interval
+        self._task = asyncio.create_task(self._run())
+        
+        self._watchdog_stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="plc-sim-loop-watchdog", daemon=True)
+        self._watchdog.start()
+        
+        if self.asyncio_debug:
+            # Debug režim asyncio loguje každý callback delší než slow_callback_duration
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.threshold
+            self._log_handler = _SlowCallbackHandler(self._slow_callbacks)
+            logging.getLogger("asyncio").addHandler(self._log_handler)
+    
+    async def stop(self) -> None:
+        """Zastaví měření i watchdog"""
+        self._watchdog_stop.set()
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+        
+        if self._log_handler:
+            logging.getLogger("asyncio").removeHandler(self._log_handler)
+            self._log_handler = None
+        
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+    
+    def get_incidents(self, limit: Optional[int] = None) -> List[LoopIncident]:
+        """Vrátí poslední incidenty (nejnovější první)"""
+        incidents = list(reversed(self.incidents))
+        return incidents[:limit] if limit else incidents
+    
+    def take_mean_lag(self) -> float:
+        """Průměrný lag od posledního volání (okno se vynuluje)"""
+        mean = self._window_sum / self._window_count if self._window_count else self.last_lag
+        self._window_sum = 0.0
+        self._window_count = 0
+        return mean
+    
+    def clear_incidents(self) -> None:
+        """Smaže evidované incidenty a maximum lagu"""
+        self.incidents.clear()
+        self.max_lag = 0.0
+    
+    async def _run(self) -> None:
+        """Měřicí smyčka"""
+        loop = asyncio.get_running_loop()
+        lag_metric = LOOP_LAG.labels()
+        
+        while True:
+            scheduled = loop.time() + self.interval
+            self._expected_wakeup = scheduled
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._window_sum += lag
+            self._window_count += 1
+            lag_metric.observe(lag)
+            
+            if lag >= self.threshold:
+                self._record_incident(lag, scheduled)
+            elif self._pending is not None:
+                # Watchdog zachytil jen krátké zdržení na hraně prahu
+                with self._pending_lock:
+                    self._pending = None
+    
+    def _record_incident(self, lag: float, scheduled: float) -> None:
+        """Dokončí incident po probuzení loopu (doplní změřený lag)"""
+        with self._pending_lock:
+            incident, self._pending = self._pending, None
+        
+        if incident is None or incident._started != scheduled:
+            # Blokování bylo kratší než perioda watchdogu - bez zásobníku
+            incident = LoopIncident(detected_at=utc_now(), _started=scheduled)
+        
+        incident.lag = lag
+        if incident._coro_code is not None:
+            self._resolve_task(incident)
+        incident.slow_callbacks = [
+            message for t, message in self._slow_callbacks if t >= incident._started
+        ]
+        
+        self.incidents.append(incident)
+        self.incidents_total += 1
+        LOOP_INCIDENTS.inc()
+        
+        where = incident.stack[-1] if incident.stack else (incident.coroutine or "neznámo")
+        logger.warning(f"Event loop blokován {lag * 1000:.0f} ms ({where})")
+    
+    @staticmethod
+    def _resolve_task(incident: LoopIncident) -> None:
+        """
+        Doplní task, jehož korutina blokovala loop (volá se ve vlákně loopu -
+        asyncio.current_task ani all_tasks nejsou z vlákna watchdogu bezpečné).
+        """
+        code = incident._coro_code
+        incident.coroutine = code.co_qualname
+        tasks = [task for task in asyncio.all_tasks() if getattr(task.get_coro(), "cr_code", None) is code]
+        if len(tasks) == 1:
+            incident.task = tasks[0].get_name()
+    
+    def _watch(self) -> None:
+        """Vlákno watchdogu - zachytí zásobník loopu, pokud se nestihl probudit"""
+        period = max(0.005, self.threshold / 4)
+        
+        while not self._watchdog_stop.wait(period):
+            overdue = time.monotonic() - self._expected_wakeup
+            if overdue < self.threshold or self._pending is not None:
+                continue
+            
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            
+            # Korutina, jejíž krok právě běží (None = obyčejný callback, např. protokol) -
+            # jen ze zásobníku, task se dohledá až ve vlákně loopu
+            incident = LoopIncident(
+                detected_at=utc_now(),
+                stack=_format_stack(frame),
+                _started=self._expected_wakeup,
+                _coro_code=_outer_coroutine_code(frame),
+            )
+            del frame
+            
+            with self._pending_lock:
+                self._pending = incident
+
+
+# Globální instance
+loop_lag_monitor = LoopLagMonitor(
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_THRESHOLD,
+    LOOP_LAG_MAX_INCIDENTS,
+    LOOP_LAG_ASYNCIO_DEBUG,
+)
@@ -0,0 +1,277 @@
+"""
+Metriky ve formátu Prometheus (text exposition format 0.0.4)
+
+Lehká implementace bez závislostí. Zápis do metriky v hot path (tick simulátoru)
+je jen přičtení do seznamu/slovníku - potomka s konkrétními labely si volající
+získá jednou přes labels() a dál používá přímo.
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Výchozí hranice histogramu v sekundách - pokrývají rozsah 100 µs až 10 s
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    """Sestaví část {a="1",b="2"} pro řádek metriky"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    """Escapuje hodnotu labelu"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """Formátuje číselnou hodnotu"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    """Společný základ metrik"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+
+    def labels(self, *values) -> object:
+        """Vrátí (a případně vytvoří) potomka pro dané hodnoty labelů"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def remove(self, *values) -> None:
+        """Odebere potomka (např. po zastavení simulátoru)"""
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    @abstractmethod
+    def _new_child(self) -> object:
+        """Vytvoří potomka pro jednu kombinaci hodnot labelů"""
+        pass
+
+    @abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """Vrátí řádky vzorků metriky"""
+        pass
+
+    def render(self) -> str:
+        """Vrátí textovou reprezentaci metriky"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _ValueChild:
+    """Potomek čítače/měřidla - jedna hodnota"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotónně rostoucí čítač"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Zvýší čítač bez labelů"""
+        self.labels().inc(amount)
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    """
+    Měřidlo. Volitelný callback se volá až při scrapu a vrací
+    slovník {hodnoty labelů: hodnota} - vhodné pro stavové veličiny.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float) -> None:
+        """Nastaví měřidlo bez labelů"""
+        self.labels().set(value)
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def _samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            values = self.callback()
+        else:
+            values = {key: child.value for key, child in self._children.items()}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    """Potomek histogramu - počty v intervalech, součet a počet pozorování"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # poslední = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Histogram s pevnými hranicemi intervalů"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float) -> None:
+        """Zaznamená pozorování do histogramu bez labelů"""
+        self.labels().observe(value)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _samples(self) -> Iterable[str]:
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class MetricsRegistry:
+    """Registr metrik aplikace"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Zaregistruje metriku a vrátí ji"""
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Zaregistruje callback volaný jednou na začátku každého scrapu - spočítá
+        hodnoty několika měřidel jedním průchodem a nastaví je přes labels().set()
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Vrátí všechny metriky v textovém formátu Prometheus"""
+        for collector in self._collectors:
+            collector()
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+# Globální registr a metriky simulátorů
+registry = MetricsRegistry()
+
+TICK_DURATION = registry.register(Histogram(
+    "plc_sim_tick_duration_seconds",
+    "Doba jednoho ticku simulátoru (generování + publikace)",
+    ("machine_id", "protocol"),
+))
+GENERATE_DURATION = registry.register(Histogram(
+    "plc_sim_generate_duration_seconds",
+    "Doba generování hodnot všech senzorů stroje v jednom ticku",
+    ("protocol",),
+))
+PUBLISH_DURATION = registry.register(Histogram(
+    "plc_sim_publish_duration_seconds",
+    "Doba publikace hodnot na server protokolu (_update_values)",
+    ("protocol",),
+))
+TICK_ERRORS = registry.register(Counter(
+    "plc_sim_tick_errors_total",
+    "Počet chyb v update loopu simulátorů",
+    ("protocol",),
+))
+LOOP_LAG = registry.register(Histogram(
+    "plc_sim_event_loop_lag_seconds",
+    "Zpoždění event loopu oproti plánovanému probuzení",
+))
+LOOP_INCIDENTS = registry.register(Counter(
+    "plc_sim_event_loop_incidents_total",
+    "Počet zablokování event loopu nad prahem LOOP_LAG_THRESHOLD",
+))
+ALARM_TRANSITIONS = registry.register(Counter(
+    "plc_sim_alarm_transitions_total",
+    "Počet přechodů limitních alarmů senzorů podle nové úrovně",
+    ("level",),
+))
+MACHINE_CARD_RENDERS = registry.register(Counter(
+    "plc_sim_machine_card_renders_total",
+    "Počet vyžádání karty stroje podle výsledku cache (hit/miss)",
+    ("result",),
+))
+LOAD_SHEDDING_CHANGES = registry.register(Counter(
+    "plc_sim_load_shedding_changes_total",
+    "Počet změn rychlosti aktualizace strojů regulátorem zátěže (degrade/restore)",
+    ("action",),
+))
@@ -0,0 +1,312 @@
+"""
+Procesní modely strojů - korelované chování všech senzorů stroje
+
+Procesní model je stavový automat stroje (idle/running/fault/maintenance)
+se sdílenými latentními veličinami (zatížení, otáčky, teplota, vibrace,
+počet cyklů). Vyhodnocuje se jednou za tick simulátoru a senzory s typy
+simulace "process_*" (viz app.services.simulation_types) z něj jen levnou
+transformací odvozují své hodnoty - lis se tak chová jako lis a stojí to
+méně CPU než samostatný generátor pro každý tag.
+
+Normalizované veličiny (0-1, senzor je mapuje do rozsahu min-max):
+    load, speed, temperature, vibration, running
+Ostatní:
+    state   - kód stavu (0 idle, 1 running, 2 fault, 3 maintenance)
+    cycles  - počet dokončených pracovních cyklů
+
+Vlastní model je potomek ProcessModel registrovaný přes register_process_model().
+"""
+
+import math
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.simulation_types import SimulationParam, validate_declared_params
+
+# Maximální krok modelu - po dlouhé pauze (uspání, zastavení) model neskáče
+MAX_STEP = 10.0
+
+PROCESS_VARIABLES = ("state", "running", "load", "speed", "temperature", "vibration", "cycles")
+
+
+class MachineState(str, Enum):
+    """Stav stroje v procesním modelu"""
+    IDLE = "idle"
+    RUNNING = "running"
+    FAULT = "fault"
+    MAINTENANCE = "maintenance"
+
+
+STATE_CODES = {
+    MachineState.IDLE: 0,
+    MachineState.RUNNING: 1,
+    MachineState.FAULT: 2,
+    MachineState.MAINTENANCE: 3,
+}
+
+
+class ProcessModel(ABC):
+    """
+    Základ procesního modelu.
+    Potomek implementuje step(now), který aktualizuje slovník values.
+    """
+
+    def __init__(self, params: Dict[str, float], now: Optional[float] = None):
+        self.params = params
+        self.values: Dict[str, float] = {name: 0.0 for name in PROCESS_VARIABLES}
+        self.state = MachineState.IDLE
+        self.state_since = time.time() if now is None else now
+
+    @abstractmethod
+    def step(self, now: float) -> None:
+        """Posune model do času now"""
+        pass
+
+    def set_state(self, state: MachineState, now: Optional[float] = None) -> None:
+        """Přepne stav stroje (např. vyvolání poruchy z API)"""
+        self.state = state
+        self.state_since = time.time() if now is None else now
+        self.values["state"] = float(STATE_CODES[state])
+        self.values["running"] = 1.0 if state == MachineState.RUNNING else 0.0
+
+    def export_state(self) -> List[float]:
+        """Stav modelu pro snapshot (kód stavu, začátek stavu, veličiny v pořadí PROCESS_VARIABLES)"""
+        return [float(STATE_CODES[self.state]), self.state_since, *(self.values[name] for name in PROCESS_VARIABLES)]
+
+    def restore(self, state: Sequence[float]) -> bool:
+        """Obnoví stav ze snapshotu, False při neplatném stavu"""
+        size = 2 + len(PROCESS_VARIABLES)
+        states = {code: machine_state for machine_state, code in STATE_CODES.items()}
+        if len(state) < size or int(state[0]) not in states:
+            return False
+        self.state = states[int(state[0])]
+        self.state_since = state[1]
+        self.values.update(zip(PROCESS_VARIABLES, state[2:size]))
+        return True
+
+    def to_dict(self) -> dict:
+        """Stav modelu pro API"""
+        return {
+            "state": self.state.value,
+            "state_since": self.state_since,
+            "variables": {name: round(value, 4) for name, value in self.values.items()},
+        }
+
+
+class StateMachineModel(ProcessModel):
+    """
+    Obecný stroj: střídá práci a prostoje, občas se porouchá a po odpracování
+    servisního intervalu jde do údržby. Doby stavů jsou exponenciálně
+    rozdělené se zadanou střední hodnotou, nulová střední doba znamená,
+    že stav sám neskončí (např. mtbf = 0 - stroj se neporouchá).
+    """
+
+    def __init__(self, params: Dict[str, float], now: Optional[float] = None):
+        super().__init__(params, now)
+        self._last: Optional[float] = None
+        self._until = math.inf      # konec aktuálního stavu
+        self._fault_at = math.inf   # okamžik poruchy (jen ve stavu running)
+        self._run_hours = 0.0       # odpracovaný čas od poslední údržby
+        self._load_setpoint = params["load_nominal"]
+        self.set_state(MachineState.RUNNING, self.state_since)
+
+    def _duration(self, mean: float) -> float:
+        return random.expovariate(1.0 / mean) if mean > 0 else math.inf
+
+    def set_state(self, state: MachineState, now: Optional[float] = None) -> None:
+        super().set_state(state, now)
+        now = self.state_since
+        params = self.params
+        self._fault_at = math.inf
+        if state == MachineState.RUNNING:
+            self._until = now + self._duration(params["run_time"])
+            self._fault_at = now + self._duration(params["mtbf"])
+        elif state == MachineState.IDLE:
+            self._until = now + self._duration(params["idle_time"])
+        elif state == MachineState.FAULT:
+            self._until = now + self._duration(params["repair_time"])
+        else:
+            self._until = now + params["maintenance_time"]
+            self._run_hours = 0.0
+
+    def _advance_state(self, now: float) -> None:
+        """Přechody stavového automatu"""
+        if self.state == MachineState.RUNNING:
+            interval = self.params["maintenance_interval"]
+            if interval > 0 and self._run_hours >= interval:
+                self.set_state(MachineState.MAINTENANCE, now)
+            elif now >= self._fault_at:
+                self.set_state(MachineState.FAULT, now)
+            elif now >= self._until:
+                self.set_state(MachineState.IDLE, now)
+        elif now >= self._until:
+            next_state = MachineState.RUNNING if self.state == MachineState.IDLE else MachineState.IDLE
+            self.set_state(next_state, now)
+
+    def step(self, now: float) -> None:
+        if self._last is None:
+            self._last = now
+        dt = min(max(now - self._last, 0.0), MAX_STEP)
+        self._last = now
+
+        self._advance_state(now)
+
+        params = self.params
+        values = self.values
+        running = self.state == MachineState.RUNNING
+        if running:
+            self._run_hours += dt
+
+        # Žádané zatížení - Ornstein-Uhlenbeck kolem jmenovité hodnoty
+        theta = 1.0 / 30.0
+        self._load_setpoint += theta * (params["load_nominal"] - self._load_setpoint) * dt
+        self._load_setpoint += params["load_variation"] * math.sqrt(2 * theta * dt) * random.gauss(0.0, 1.0)
+        self._load_setpoint = min(max(self._load_setpoint, 0.0), 1.0)
+
+        # Setrvačnost veličin - členy 1. řádu
+        load_target = self._load_setpoint if running else 0.0
+        speed_target = 1.0 if running else 0.0
+        values["load"] += (load_target - values["load"]) * (1.0 - math.exp(-dt / 2.0))
+        values["speed"] += (speed_target - values["speed"]) * (1.0 - math.exp(-dt / params["spindle_ramp"]))
+        heat = values["load"] * values["speed"]
+        values["temperature"] += (heat - values["temperature"]) * (1.0 - math.exp(-dt / params["thermal_tau"]))
+
+        interval = params["maintenance_interval"]
+        wear = min(self._run_hours / interval, 1.0) if interval > 0 else 0.0
+        values["vibration"] = min(values["speed"] * (0.2 + 0.6 * values["load"] + 0.2 * wear), 1.0)
+
+        if running:
+            values["cycles"] += values["speed"] * dt / params["cycle_time"]
+
+    def export_state(self) -> List[float]:
+        last = math.nan if self._last is None else self._last
+        return [*super().export_state(), last, self._until, self._fault_at, self._run_hours, self._load_setpoint]
+
+    def restore(self, state: Sequence[float]) -> bool:
+        extra = state[2 + len(PROCESS_VARIABLES):]
+        if len(extra) != 5 or not super().restore(state):
+            return False
+        last, self._until, self._fault_at, self._run_hours, self._load_setpoint = extra
+        self._last = None if math.isnan(last) else last
+        return True
+
+    def to_dict(self) -> dict:
+        result = super().to_dict()
+        result["run_hours"] = round(self._run_hours, 1)
+        return result
+
+
+@dataclass(frozen=True)
+class ProcessModelSpec:
+    """Popis procesního modelu"""
+    name: str
+    label: str
+    factory: Callable[[Dict[str, float], Optional[float]], ProcessModel]
+    params: Tuple[SimulationParam, ...] = ()
+    description: str = ""
+
+    def to_dict(self) -> dict:
+        """Popis modelu pro API a formuláře"""
+        return {
+            "name": self.name,
+            "label": self.label,
+            "description": self.description,
+            "params": [
+                {
+                    "name": param.name,
+                    "label": param.label,
+                    "default": param.default,
+                    "min": param.min,
+                    "max": param.max,
+                }
+                for param in self.params
+            ],
+            "variables": list(PROCESS_VARIABLES),
+        }
+
+
+_registry: Dict[str, ProcessModelSpec] = {}
+
+
+def register_process_model(spec: ProcessModelSpec, replace: bool = False) -> ProcessModelSpec:
+    """
+    Zaregistruje procesní model.
+
+    Raises:
+        ValueError: Model se stejným názvem již existuje (a replace = False)
+    """
+    if spec.name in _registry and not replace:
+        raise ValueError(f"Procesní model '{spec.name}' je již registrován")
+    _registry[spec.name] = spec
+    return spec
+
+
+def get_process_model(name: str) -> ProcessModelSpec:
+    """
+    Vrátí procesní model podle názvu.
+
+    Raises:
+        ValueError: Neznámý procesní model
+    """
+    spec = _registry.get(name)
+    if spec is None:
+        raise ValueError(f"Neznámý procesní model: {name}")
+    return spec
+
+
+def process_models() -> List[ProcessModelSpec]:
+    """Vrátí všechny registrované procesní modely"""
+    return list(_registry.values())
+
+
+def validate_process_params(name: str, params: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """
+    Zvaliduje parametry procesního modelu.
+
+    Raises:
+        ValueError: Neznámý model nebo neplatný parametr
+    """
+    spec = get_process_model(name)
+    return validate_declared_params(spec.params, params, f"Procesní model '{name}'")
+
+
+def create_process_model(
+    name: str,
+    params: Optional[Dict[str, Any]] = None,
+    now: Optional[float] = None,
+) -> ProcessModel:
+    """
+    Vytvoří instanci procesního modelu, chybějící parametry doplní výchozími.
+
+    Raises:
+        ValueError: Neznámý model nebo neplatný parametr
+    """
+    spec = get_process_model(name)
+    values = {param.name: param.default for param in spec.params}
+    values.update(validate_process_params(name, params) or {})
+    return spec.factory(values, now)
+
+
+register_process_model(ProcessModelSpec(
+    name="machine",
+    label="Obecný stroj",
+    factory=StateMachineModel,
+    params=(
+        SimulationParam("run_time", "Střední doba práce [s]", 600.0, min=0.0),
+        SimulationParam("idle_time", "Střední doba prostoje [s]", 120.0, min=0.0),
+        SimulationParam("mtbf", "Střední doba mezi poruchami [s]", 3600.0, min=0.0),
+        SimulationParam("repair_time", "Střední doba opravy [s]", 300.0, min=0.0),
+        SimulationParam("maintenance_interval", "Servisní interval (odpracováno) [s]", 28800.0, min=0.0),
+        SimulationParam("maintenance_time", "Doba údržby [s]", 1800.0, min=0.0),
+        SimulationParam("load_nominal", "Jmenovité zatížení (0-1)", 0.7, min=0.0, max=1.0),
+        SimulationParam("load_variation", "Kolísání zatížení (0-1)", 0.1, min=0.0, max=1.0),
+        SimulationParam("spindle_ramp", "Časová konstanta otáček [s]", 5.0, min=0.01),
+        SimulationParam("thermal_tau", "Tepelná časová konstanta [s]", 120.0, min=0.01),
+        SimulationParam("cycle_time", "Doba pracovního cyklu [s]", 6.0, min=0.01),
+    ),
+    description="Práce/prostoj/porucha/údržba, zatížení, otáčky, teplota, vibrace a cykly",
+))
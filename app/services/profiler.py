@@ -0,0 +1,257 @@
+"""
+Profilování běžícího procesu na vyžádání
+
+Dva režimy:
+
+- sample: vlákno na pozadí v pravidelném intervalu čte zásobník vlákna
+  s event loopem (sys._current_frames). Režie je malá a nezávisí na počtu
+  volání, proto je režim vhodný i pro produkční provoz.
+- cprofile: deterministický cProfile po zadanou dobu. Přesné počty volání,
+  ale výrazně zpomaluje celý proces - jen pro krátká měření.
+
+Výsledkem jsou agregované statistiky funkcí a u režimu sample i zásobníky
+ve formátu "collapsed" (flamegraph.pl, speedscope, inferno).
+"""
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.config import BASE_DIR
+from app.models import utc_now
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+class ProfilerBusyError(RuntimeError):
+    """Jiné profilování právě probíhá"""
+
+
+@dataclass
+class FunctionStats:
+    """Statistika jedné funkce"""
+    function: str
+    self_samples: int = 0
+    total_samples: int = 0
+    calls: int = 0
+    self_time: float = 0.0
+    total_time: float = 0.0
+
+
+@dataclass
+class ProfileResult:
+    """Výsledek jednoho profilování"""
+    mode: str
+    seconds: float
+    interval_ms: float
+    started_at: datetime
+    samples: int = 0
+    idle_samples: int = 0
+    top: List[FunctionStats] = field(default_factory=list)
+    collapsed: str = ""
+
+    def to_dict(self) -> dict:
+        """Převede výsledek na slovník pro API (bez collapsed zásobníků)"""
+        data = asdict(self)
+        data.pop("collapsed")
+        data["has_collapsed"] = bool(self.collapsed)
+        return data
+
+
+# Popisky funkcí se cachují podle code objektu - při samplování se opakují
+_labels: Dict[object, str] = {}
+_SITE_MARKERS = ("site-packages" + os.sep, "dist-packages" + os.sep)
+_PATH_PREFIXES = (str(BASE_DIR) + os.sep, sysconfig.get_paths()["stdlib"] + os.sep)
+
+
+def shorten_path(path: str) -> str:
+    """Zkrátí cestu k souboru na relativní cestu v projektu, balíčku nebo stdlib"""
+    for marker in _SITE_MARKERS:
+        index = path.rfind(marker)
+        if index >= 0:
+            return path[index + len(marker):]
+    for prefix in _PATH_PREFIXES:
+        if path.startswith(prefix):
+            return path[len(prefix):]
+    return path
+
+
+def _code_label(code) -> str:
+    """Vrátí čitelný popisek funkce: modul/soubor.py:funkce"""
+    label = _labels.get(code)
+    if label is None:
+        name = getattr(code, "co_qualname", code.co_name)
+        # ';' odděluje rámce ve formátu collapsed
+        label = _labels[code] = f"{shorten_path(code.co_filename)}:{name}".replace(";", ":")
+    return label
+
+
+class _Sampler(threading.Thread):
+    """Vlákno, které periodicky zaznamenává zásobník cílového vlákna"""
+
+    def __init__(self, thread_id: int, interval: float, seconds: float):
+        super().__init__(name="plc-sim-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.seconds = seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def run(self) -> None:
+        deadline = time.perf_counter() + self.seconds
+        next_sample = time.perf_counter()
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                # Kořen zásobníku první
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+            del frame
+
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Nestíháme - nedoháníme zmeškané vzorky
+                next_sample = time.perf_counter()
+
+
+def _sample_result(result: ProfileResult, sampler: _Sampler, limit: int) -> None:
+    """Agreguje vzorky do statistik a collapsed zásobníků"""
+    collapsed: Counter = Counter()
+    stats: Dict[str, FunctionStats] = {}
+
+    for codes, count in sampler.stacks.items():
+        # Loop čeká v selectoru na I/O - nic nepočítá
+        if codes[-1].co_name == "select" and codes[-1].co_filename.endswith("selectors.py"):
+            result.idle_samples += count
+        labels = [_code_label(code) for code in codes]
+        collapsed[";".join(labels)] += count
+
+        for label in set(labels):
+            stats.setdefault(label, FunctionStats(label)).total_samples += count
+        stats.setdefault(labels[-1], FunctionStats(labels[-1])).self_samples += count
+
+    result.samples = sampler.samples
+    result.collapsed = "".join(f"{stack} {count}\n" for stack, count in collapsed.most_common())
+    result.top = sorted(
+        stats.values(),
+        key=lambda s: (s.self_samples, s.total_samples),
+        reverse=True,
+    )[:limit]
+
+
+def _cprofile_result(result: ProfileResult, profile: cProfile.Profile, limit: int) -> None:
+    """Převede výstup cProfile na statistiky funkcí"""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    top: List[Tuple[float, FunctionStats]] = []
+
+    for (filename, line, name), (_, calls, self_time, total_time, _) in stats.stats.items():
+        if filename == "~":
+            label = name  # vestavěná funkce
+        else:
+            label = f"{shorten_path(filename)}:{line}:{name}"
+        top.append((self_time, FunctionStats(
+            label,
+            calls=calls,
+            self_time=round(self_time, 6),
+            total_time=round(total_time, 6),
+        )))
+
+    top.sort(key=lambda item: item[0], reverse=True)
+    result.top = [item for _, item in top[:limit]]
+
+
+class Profiler:
+    """
+    Spouští profilování běžícího event loopu.
+    Současně smí běžet jen jedno měření, simulace při něm běží dál.
+    """
+
+    def __init__(self):
+        self._running = False
+        self.last_result: Optional[ProfileResult] = None
+
+    @property
+    def running(self) -> bool:
+        """Probíhá právě profilování"""
+        return self._running
+
+    async def capture(
+        self,
+        seconds: float,
+        mode: str = "sample",
+        interval_ms: float = 5.0,
+        limit: int = 50,
+    ) -> ProfileResult:
+        """
+        Profiluje event loop po dobu seconds. Musí být voláno z vlákna event loopu.
+
+        Args:
+            seconds: Doba měření
+            mode: "sample" nebo "cprofile"
+            interval_ms: Interval samplování v ms (jen režim sample)
+            limit: Počet funkcí ve statistice
+
+        Raises:
+            ProfilerBusyError: Jiné profilování právě probíhá
+            ValueError: Neznámý režim
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Neznámý režim profilování: {mode}")
+        if self._running:
+            raise ProfilerBusyError("Profilování již probíhá")
+
+        self._running = True
+        result = ProfileResult(
+            mode=mode,
+            seconds=seconds,
+            interval_ms=interval_ms if mode == "sample" else 0.0,
+            started_at=utc_now(),
+        )
+
+        try:
+            if mode == "sample":
+                sampler = _Sampler(threading.get_ident(), interval_ms / 1000, seconds)
+                sampler.start()
+                # Čekání v loopu - vzorkuje se právě jeho běžný provoz
+                while sampler.is_alive():
+                    await asyncio.sleep(0.1)
+                _sample_result(result, sampler, limit)
+            else:
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    await asyncio.sleep(seconds)
+                finally:
+                    profile.disable()
+                _cprofile_result(result, profile, limit)
+        finally:
+            self._running = False
+
+        self.last_result = result
+        return result
+
+
+# Globální instance
+profiler = Profiler()
@@ -0,0 +1,577 @@
+"""
+Scénáře - časová osa skriptovaných událostí provozu
+
+Scénář popisuje reprodukovatelný sled událostí v sekundách od spuštění:
+
+    {"name": "Porucha lisu", "speed": 1, "events": [
+        {"at": 0,  "action": "start",   "machine_id": 3},
+        {"at": 30, "action": "fault",   "machine_id": 3},
+        {"at": 60, "action": "ramp",    "machine_id": 3, "sensor": "Teplota", "percent": 20, "duration": 10},
+        {"at": 90, "action": "recover", "machine_id": 3}
+    ]}
+
+Před spuštěním se scénář přeloží (compile_scenario): ověří se stroje a senzory,
+názvy senzorů se převedou na ID a události se stabilně seřadí podle času do
+fronty. Běh (ScenarioRun) pak jen čeká na čas další události a provede ji -
+simulátory v tickách žádné události neprochází. Změny hodnot senzorů jsou
+překrytí (SensorOverride) uložená v simulátoru, která se v ticku aplikují jen
+na dotčené senzory. Průběh rampy se počítá z plánovaného času události, takže
+nezávisí na tom, kdy přesně se událost nebo tick provedly.
+
+Čas scénáře měří SimulationClock - reálný (speed = 1) nebo zrychlený
+(speed > 1): časová osa i doby ramp proběhnou speed-krát rychleji,
+generátory senzorů a procesní modely běží dál v reálném čase.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.services.process_models import MachineState
+
+if TYPE_CHECKING:
+    from app.models import Machine, Sensor
+    from app.simulators.manager import SimulationManager
+
+logger = logging.getLogger(__name__)
+
+# Vyhledání stroje a jeho senzorů podle ID (databáze, popis flotily v headless režimu)
+MachineResolver = Callable[[int], Optional[Tuple["Machine", List["Sensor"]]]]
+
+
+class OverrideMode(str, Enum):
+    """Způsob překrytí hodnoty generátoru"""
+    VALUE = "value"    # pevná hodnota
+    SCALE = "scale"    # násobek generované hodnoty
+    OFFSET = "offset"  # posun generované hodnoty
+
+    @property
+    def neutral(self) -> float:
+        """Úroveň, která generovanou hodnotu nemění (začátek první rampy)"""
+        return 1.0 if self == OverrideMode.SCALE else 0.0
+
+
+class SensorOverride:
+    """Překrytí hodnoty senzoru - lineární přechod úrovně ze start_level na end_level v čase t0..t1"""
+
+    __slots__ = ("mode", "start_level", "end_level", "t0", "t1")
+
+    def __init__(self, mode: OverrideMode, start_level: float, end_level: float, t0: float, t1: float):
+        self.mode = mode
+        self.start_level = start_level
+        self.end_level = end_level
+        self.t0 = t0
+        self.t1 = t1
+
+    def level(self, now: float) -> float:
+        """Úroveň překrytí v čase now (před začátkem počáteční, po konci koncová)"""
+        if now >= self.t1:
+            return self.end_level
+        if now <= self.t0:
+            return self.start_level
+        progress = (now - self.t0) / (self.t1 - self.t0)
+        return self.start_level + (self.end_level - self.start_level) * progress
+
+    def apply(self, value: float, now: float) -> float:
+        """Překryje vygenerovanou hodnotu"""
+        level = self.level(now)
+        if self.mode == OverrideMode.SCALE:
+            return value * level
+        if self.mode == OverrideMode.OFFSET:
+            return value + level
+        return level
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode.value,
+            "from": self.start_level,
+            "to": self.end_level,
+            "start": self.t0,
+            "end": self.t1,
+        }
+
+
+class SimulationClock:
+    """
+    Čas scénáře v sekundách od spuštění.
+    Při zrychlení speed uběhne za jednu reálnou sekundu speed sekund scénáře.
+    """
+
+    def __init__(self, speed: float = 1.0):
+        if speed <= 0:
+            raise ValueError("Zrychlení času scénáře musí být kladné")
+        self.speed = speed
+        self.started_at: Optional[float] = None  # reálný čas spuštění (time.time)
+        self._origin = 0.0                       # time.monotonic při spuštění
+
+    def start(self) -> None:
+        """Nastaví počátek času scénáře na aktuální okamžik"""
+        self.started_at = time.time()
+        self._origin = time.monotonic()
+
+    def now(self) -> float:
+        """Aktuální čas scénáře"""
+        return (time.monotonic() - self._origin) * self.speed
+
+    def to_wall(self, at: float) -> float:
+        """Reálný čas (time.time), kdy nastane čas scénáře at"""
+        return self.started_at + at / self.speed
+
+    async def sleep_until(self, at: float) -> None:
+        """Počká na čas scénáře at"""
+        delay = (at - self.now()) / self.speed
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ScenarioAction(str, Enum):
+    """Akce události scénáře"""
+    START = "start"            # spustit simulaci stroje
+    STOP = "stop"              # zastavit simulaci stroje
+    FAULT = "fault"            # porucha (procesní model -> fault)
+    RECOVER = "recover"        # zotavení (procesní model -> running, zrušení překrytí senzorů)
+    STATE = "state"            # přepnutí stavu procesního modelu
+    SET = "set"                # pevná hodnota senzoru
+    RAMP = "ramp"              # lineární změna hodnoty senzoru po dobu duration
+    RELEASE = "release"        # zrušení překrytí senzoru (bez senzoru = všech senzorů stroje)
+    IMPAIRMENT = "impairment"  # profil zhoršení sítě (null = bez proxy), nemění konfiguraci v databázi
+
+
+# Povolené položky událostí podle akce (kromě at, action, machine_id)
+_ACTION_FIELDS: Dict[ScenarioAction, Tuple[str, ...]] = {
+    ScenarioAction.START: (),
+    ScenarioAction.STOP: (),
+    ScenarioAction.FAULT: (),
+    ScenarioAction.RECOVER: (),
+    ScenarioAction.STATE: ("state",),
+    ScenarioAction.SET: ("sensor", "value"),
+    ScenarioAction.RAMP: ("sensor", "to", "percent", "offset", "duration"),
+    ScenarioAction.RELEASE: ("sensor",),
+    ScenarioAction.IMPAIRMENT: ("profile",),
+}
+
+_RAMP_TARGETS = ("to", "percent", "offset")
+
+# Senzory bez vlastního generátoru nelze překrýt
+_NOT_OVERRIDABLE = ("formula", "waveform")
+
+
+@dataclass(frozen=True)
+class ScenarioEvent:
+    """Přeložená událost scénáře"""
+    at: float
+    action: ScenarioAction
+    machine_id: int
+    sensor_id: Optional[int] = None
+    state: Optional[MachineState] = None
+    mode: Optional[OverrideMode] = None
+    target: float = 0.0
+    duration: float = 0.0
+    profile: Optional[Dict[str, float]] = None
+
+    def to_dict(self) -> dict:
+        result: Dict[str, Any] = {"at": self.at, "action": self.action.value, "machine_id": self.machine_id}
+        if self.sensor_id is not None:
+            result["sensor_id"] = self.sensor_id
+        if self.state is not None:
+            result["state"] = self.state.value
+        if self.mode is not None:
+            result.update(mode=self.mode.value, target=self.target, duration=self.duration)
+        if self.action == ScenarioAction.IMPAIRMENT:
+            result["profile"] = self.profile
+        return result
+
+
+@dataclass
+class Scenario:
+    """Přeložený scénář - události seřazené podle času"""
+    name: str
+    speed: float
+    events: List[ScenarioEvent]
+
+    @property
+    def duration(self) -> float:
+        """Čas poslední události"""
+        return self.events[-1].at if self.events else 0.0
+
+
+def _number(index: int, name: str, value: Any, minimum: Optional[float] = None) -> float:
+    """Převede položku události na číslo"""
+    if isinstance(value, bool):
+        value = None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Událost {index}: '{name}' musí být číslo")
+    if not math.isfinite(number):
+        raise ValueError(f"Událost {index}: '{name}' musí být konečné číslo")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"Událost {index}: '{name}' nesmí být menší než {minimum:g}")
+    return number
+
+
+class _Compiler:
+    """Překlad událostí s cache načtených strojů"""
+
+    def __init__(self, resolve: MachineResolver):
+        self._resolve = resolve
+        self._machines: Dict[int, Tuple["Machine", Dict[Union[int, str], "Sensor"]]] = {}
+
+    def machine(self, index: int, machine_id: Any) -> Tuple["Machine", Dict[Union[int, str], "Sensor"]]:
+        if isinstance(machine_id, bool) or not isinstance(machine_id, int):
+            raise ValueError(f"Událost {index}: 'machine_id' musí být celé číslo")
+        if machine_id not in self._machines:
+            resolved = self._resolve(machine_id)
+            if resolved is None:
+                raise ValueError(f"Událost {index}: stroj {machine_id} neexistuje")
+            machine, sensors = resolved
+            lookup: Dict[Union[int, str], "Sensor"] = {}
+            for sensor in sensors:
+                lookup[sensor.id] = sensor
+                lookup.setdefault(sensor.name, sensor)
+            self._machines[machine_id] = (machine, lookup)
+        return self._machines[machine_id]
+
+    def event(self, index: int, raw: Any) -> ScenarioEvent:
+        if not isinstance(raw, dict):
+            raise ValueError(f"Událost {index}: musí být objekt")
+        try:
+            action = ScenarioAction(raw.get("action"))
+        except ValueError:
+            actions = ", ".join(action.value for action in ScenarioAction)
+            raise ValueError(f"Událost {index}: neznámá akce '{raw.get('action')}' (podporované: {actions})")
+        allowed = {"at", "action", "machine_id", *_ACTION_FIELDS[action]}
+        unknown = set(raw) - allowed
+        if unknown:
+            raise ValueError(f"Událost {index}: neznámé položky akce {action.value}: {', '.join(sorted(unknown))}")
+        if "at" not in raw:
+            raise ValueError(f"Událost {index}: chybí čas 'at'")
+
+        at = _number(index, "at", raw["at"], minimum=0.0)
+        machine_id = raw.get("machine_id")
+        machine, sensors = self.machine(index, machine_id)
+
+        if action in (ScenarioAction.FAULT, ScenarioAction.STATE) and not machine.process_model:
+            raise ValueError(f"Událost {index}: stroj {machine_id} nemá procesní model")
+
+        if action == ScenarioAction.STATE:
+            try:
+                state = MachineState(raw.get("state"))
+            except ValueError:
+                raise ValueError(f"Událost {index}: neznámý stav stroje '{raw.get('state')}'")
+            return ScenarioEvent(at, action, machine_id, state=state)
+
+        if action == ScenarioAction.IMPAIRMENT:
+            from app.simulators.impairment import validate_impairment
+
+            try:
+                profile = validate_impairment(raw.get("profile"))
+            except ValueError as e:
+                raise ValueError(f"Událost {index}: {e}")
+            return ScenarioEvent(at, action, machine_id, profile=profile)
+
+        if action in (ScenarioAction.SET, ScenarioAction.RAMP) or "sensor" in raw:
+            reference = raw.get("sensor")
+            sensor = None
+            if isinstance(reference, (int, str)) and not isinstance(reference, bool):
+                sensor = sensors.get(reference)
+            if sensor is None:
+                raise ValueError(f"Událost {index}: stroj {machine_id} nemá senzor {reference!r}")
+            if action != ScenarioAction.RELEASE and sensor.simulation_type in _NOT_OVERRIDABLE:
+                raise ValueError(
+                    f"Událost {index}: hodnotu senzoru '{sensor.name}' typu {sensor.simulation_type} nelze překrýt"
+                )
+            sensor_id = sensor.id
+        else:
+            sensor_id = None
+
+        if action == ScenarioAction.SET:
+            value = _number(index, "value", raw.get("value"))
+            return ScenarioEvent(at, action, machine_id, sensor_id, mode=OverrideMode.VALUE, target=value)
+
+        if action == ScenarioAction.RAMP:
+            targets = [name for name in _RAMP_TARGETS if name in raw]
+            if len(targets) != 1:
+                raise ValueError(
+                    f"Událost {index}: rampa vyžaduje právě jednu z položek {', '.join(_RAMP_TARGETS)}"
+                )
+            name = targets[0]
+            value = _number(index, name, raw[name])
+            duration = _number(index, "duration", raw.get("duration", 0.0), minimum=0.0)
+            if name == "percent":
+                mode, value = OverrideMode.SCALE, 1.0 + value / 100.0
+            elif name == "offset":
+                mode = OverrideMode.OFFSET
+            else:
+                mode = OverrideMode.VALUE
+            return ScenarioEvent(at, action, machine_id, sensor_id, mode=mode, target=value, duration=duration)
+
+        return ScenarioEvent(at, action, machine_id, sensor_id)
+
+
+def compile_scenario(data: Any, resolve: MachineResolver, max_events: Optional[int] = None) -> Scenario:
+    """
+    Přeloží popis scénáře na seřazenou frontu událostí.
+
+    Args:
+        data: Popis scénáře (objekt s položkami name, speed, events)
+        resolve: Vyhledání stroje a jeho senzorů podle ID
+        max_events: Maximální počet událostí (výchozí SCENARIO_MAX_EVENTS)
+
+    Raises:
+        ValueError: Neplatný scénář, neexistující stroj nebo senzor
+    """
+    from app.config import SCENARIO_MAX_EVENTS, SCENARIO_MAX_SPEED
+
+    if not isinstance(data, dict):
+        raise ValueError("Scénář musí být objekt s položkou 'events'")
+    unknown = set(data) - {"name", "speed", "events"}
+    if unknown:
+        raise ValueError(f"Neznámé položky scénáře: {', '.join(sorted(unknown))}")
+    events = data.get("events")
+    if not isinstance(events, list) or not events:
+        raise ValueError("Scénář musí obsahovat neprázdný seznam 'events'")
+    limit = SCENARIO_MAX_EVENTS if max_events is None else max_events
+    if len(events) > limit:
+        raise ValueError(f"Scénář má {len(events)} událostí, maximum je {limit}")
+
+    speed = _speed(data.get("speed", 1.0), SCENARIO_MAX_SPEED)
+    compiler = _Compiler(resolve)
+    compiled = [compiler.event(index, raw) for index, raw in enumerate(events, start=1)]
+    # Stabilní řazení - události se stejným časem se provedou v pořadí zápisu
+    compiled.sort(key=lambda event: event.at)
+    return Scenario(str(data.get("name") or "scénář"), speed, compiled)
+
+
+def _speed(value: Any, maximum: float) -> float:
+    """Zvaliduje zrychlení času scénáře"""
+    try:
+        speed = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("Zrychlení 'speed' musí být číslo")
+    if not 0 < speed <= maximum:
+        raise ValueError(f"Zrychlení 'speed' musí být v rozsahu (0, {maximum:g}]")
+    return speed
+
+
+def load_scenario_file(path: Union[str, Path]) -> Any:
+    """Načte popis scénáře ze souboru JSON nebo YAML (podle přípony)"""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ValueError("Pro načtení YAML souboru je potřeba balíček pyyaml (pip install pyyaml)") from e
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+class ScenarioStatus(str, Enum):
+    """Stav běhu scénáře"""
+    RUNNING = "running"
+    FINISHED = "finished"
+    STOPPED = "stopped"
+
+
+@dataclass
+class ScenarioError:
+    """Událost, kterou se nepodařilo provést"""
+    event: ScenarioEvent
+    message: str
+
+    def to_dict(self) -> dict:
+        return {**self.event.to_dict(), "error": self.message}
+
+
+@dataclass
+class ScenarioRun:
+    """Jeden běh scénáře"""
+    id: int
+    scenario: Scenario
+    clock: SimulationClock
+    manager: "SimulationManager"
+    resolve: MachineResolver
+    status: ScenarioStatus = ScenarioStatus.RUNNING
+    position: int = 0  # index další události ve frontě
+    finished_at: Optional[float] = None
+    errors: List[ScenarioError] = field(default_factory=list)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def start(self) -> None:
+        """Spustí čas scénáře a zpracování fronty událostí"""
+        self.clock.start()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Scénář '{self.scenario.name}' (běh {self.id}) spuštěn: {len(self.scenario.events)} událostí, "
+            f"{self.scenario.duration:g} s, zrychlení {self.clock.speed:g}x"
+        )
+
+    async def stop(self) -> None:
+        """Přeruší běh (už provedené změny zůstávají)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._finish(ScenarioStatus.STOPPED)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Počká na dokončení nebo přerušení běhu, False při vypršení timeoutu"""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _finish(self, status: ScenarioStatus) -> None:
+        self.status = status
+        self.finished_at = time.time()
+        self._done.set()
+        logger.info(
+            f"Scénář '{self.scenario.name}' (běh {self.id}) {status.value}: "
+            f"{self.position}/{len(self.scenario.events)} událostí, {len(self.errors)} chyb"
+        )
+
+    async def _run(self) -> None:
+        events = self.scenario.events
+        clock = self.clock
+        while self.position < len(events):
+            event = events[self.position]
+            await clock.sleep_until(event.at)
+            try:
+                await self._apply(event, clock.to_wall(event.at))
+            except Exception as e:
+                self.errors.append(ScenarioError(event, str(e)))
+                logger.warning(f"Scénář '{self.scenario.name}' t={event.at:g} s {event.action.value}: {e}")
+            self.position += 1
+        self._finish(ScenarioStatus.FINISHED)
+
+    async def _apply(self, event: ScenarioEvent, at: float) -> None:
+        """Provede událost, at = plánovaný reálný čas události"""
+        manager = self.manager
+        action = event.action
+
+        if action == ScenarioAction.START:
+            resolved = self.resolve(event.machine_id)
+            if resolved is None:
+                raise ValueError(f"Stroj {event.machine_id} neexistuje")
+            machine, sensors = resolved
+            if not await manager.start_simulation(machine, sensors):
+                raise RuntimeError(manager.get_error_message(event.machine_id) or "Simulaci nelze spustit")
+            return
+        if action == ScenarioAction.STOP:
+            await manager.stop_simulation(event.machine_id)
+            return
+
+        simulator = manager.get_simulator(event.machine_id)
+        if simulator is None or not manager.is_running(event.machine_id):
+            raise ValueError(f"Simulace stroje {event.machine_id} neběží")
+
+        if action == ScenarioAction.FAULT:
+            simulator.set_process_state(MachineState.FAULT, at)
+        elif action == ScenarioAction.STATE:
+            simulator.set_process_state(event.state, at)
+        elif action == ScenarioAction.RECOVER:
+            if simulator.get_process_state() is not None:
+                simulator.set_process_state(MachineState.RUNNING, at)
+            simulator.release_overrides()
+        elif action in (ScenarioAction.SET, ScenarioAction.RAMP):
+            simulator.set_override(event.sensor_id, event.mode, event.target, at, event.duration / self.clock.speed)
+        elif action == ScenarioAction.RELEASE:
+            simulator.release_overrides(None if event.sensor_id is None else [event.sensor_id])
+        elif action == ScenarioAction.IMPAIRMENT:
+            if not simulator.apply_impairment(event.profile):
+                await manager.apply_impairment(simulator.machine)
+
+    def to_dict(self) -> dict:
+        events = self.scenario.events
+        next_event = None
+        if self.status == ScenarioStatus.RUNNING and self.position < len(events):
+            next_event = events[self.position]
+        if self.finished_at is None:
+            elapsed = self.clock.now()
+        else:
+            elapsed = (self.finished_at - self.clock.started_at) * self.clock.speed
+        return {
+            "id": self.id,
+            "name": self.scenario.name,
+            "status": self.status.value,
+            "speed": self.clock.speed,
+            "started_at": self.clock.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round(elapsed, 3),
+            "duration": self.scenario.duration,
+            "events": len(events),
+            "applied": self.position,
+            "next_event": next_event.to_dict() if next_event else None,
+            "errors": [error.to_dict() for error in self.errors],
+        }
+
+
+class ScenarioRunner:
+    """Běžící a nedávno dokončené běhy scénářů"""
+
+    def __init__(self, history_size: int):
+        self._runs: Dict[int, ScenarioRun] = {}
+        self._history_size = history_size
+        self._next_id = 1
+
+    def start(
+        self,
+        scenario: Scenario,
+        manager: "SimulationManager",
+        resolve: MachineResolver,
+        speed: Optional[float] = None,
+    ) -> ScenarioRun:
+        """Spustí přeložený scénář (speed přepíše zrychlení ze scénáře)"""
+        run = ScenarioRun(
+            self._next_id, scenario, SimulationClock(speed or scenario.speed), manager, resolve
+        )
+        self._next_id += 1
+        self._runs[run.id] = run
+        self._prune()
+        run.start()
+        return run
+
+    def _prune(self) -> None:
+        """Zapomene nejstarší dokončené běhy nad limit historie"""
+        finished = [run_id for run_id, run in self._runs.items() if run.status != ScenarioStatus.RUNNING]
+        for run_id in finished[:max(len(finished) - self._history_size, 0)]:
+            del self._runs[run_id]
+
+    def get(self, run_id: int) -> Optional[ScenarioRun]:
+        return self._runs.get(run_id)
+
+    def runs(self) -> List[ScenarioRun]:
+        return list(self._runs.values())
+
+    async def stop(self, run_id: int) -> bool:
+        """Přeruší běh, False pokud neexistuje"""
+        run = self._runs.get(run_id)
+        if run is None:
+            return False
+        await run.stop()
+        return True
+
+    async def stop_all(self) -> None:
+        """Přeruší všechny běžící scénáře (ukončení aplikace)"""
+        for run in list(self._runs.values()):
+            await run.stop()
+
+
+def _create_runner() -> ScenarioRunner:
+    from app.config import SCENARIO_HISTORY_SIZE
+
+    return ScenarioRunner(SCENARIO_HISTORY_SIZE)
+
+
+# Globální instance
+scenario_runner = _create_runner()
@@ -0,0 +1,417 @@
+"""
+Registr typů simulace hodnot senzorů
+
+Typ simulace deklaruje své parametry a implementuje dávkovou funkci
+generate(t, columns), která pro všechny senzory daného typu najednou vrátí
+seznam surových hodnot. Vestavěné typy jsou registrované stejně jako typy
+třetích stran - dispatch je vyhledání v tabulce a obojí běží stejně rychle.
+
+Vlastní typ:
+
+    from app.services.simulation_types import SimulationParam, SimulationTypeSpec, register_simulation_type
+
+    def generate_square(t, columns):
+        period = columns.params["period"]
+        return [
+            hi if (ti % p) < p / 2 else lo
+            for ti, p, lo, hi in zip(t, period, columns.min_value, columns.max_value)
+        ]
+
+    register_simulation_type(SimulationTypeSpec(
+        name="square",
+        label="Obdélníková",
+        generate=generate_square,
+        params=(SimulationParam("period", "Perioda [s]", 4.0, min=0.1),),
+    ))
+
+Balíčky třetích stran mohou typ zaregistrovat i přes entry point
+ve skupině "plc_sim.simulation_types" (objekt SimulationTypeSpec).
+
+Modul záměrně neimportuje modely ani databázi - používají ho i validátory modelů.
+"""
+
+import logging
+import math
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "plc_sim.simulation_types"
+
+
+@dataclass(frozen=True)
+class SimulationParam:
+    """Číselný parametr typu simulace"""
+    name: str
+    label: str
+    default: float
+    min: Optional[float] = None
+    max: Optional[float] = None
+    description: str = ""
+
+
+class GeneratorColumns:
+    """
+    Sloupcová data senzorů jednoho typu simulace - vstup funkce generate().
+
+    Každý atribut je seznam s jednou položkou na senzor (stejné pořadí jako t).
+    params obsahuje sloupec pro každý deklarovaný parametr, data sloupce
+    proměnného stavu (viz SimulationTypeSpec.init_state), které generate
+    smí měnit na místě. context jsou skalární veličiny sdílené všemi senzory
+    stroje (proměnné procesního modelu, viz app.services.process_models).
+    """
+
+    __slots__ = ("min_value", "max_value", "initial_value", "params", "data", "context")
+
+    def __init__(
+        self,
+        param_names: Sequence[str] = (),
+        state_names: Sequence[str] = (),
+        context: Optional[Dict[str, float]] = None,
+    ):
+        self.min_value: List[float] = []
+        self.max_value: List[float] = []
+        self.initial_value: List[float] = []
+        self.params: Dict[str, List[float]] = {name: [] for name in param_names}
+        self.data: Dict[str, List[float]] = {name: [] for name in state_names}
+        self.context: Dict[str, float] = {} if context is None else context
+
+    def __len__(self) -> int:
+        return len(self.min_value)
+
+
+# Signatura dávkového generátoru: (t, columns) -> surové hodnoty
+GenerateFn = Callable[[List[float], GeneratorColumns], Sequence[float]]
+# Inicializace stavu jednoho senzoru: skalární hodnoty senzoru -> počáteční stav
+InitStateFn = Callable[[Dict[str, float]], Dict[str, float]]
+
+
+@dataclass(frozen=True)
+class SimulationTypeSpec:
+    """Popis typu simulace"""
+    name: str
+    label: str
+    generate: GenerateFn
+    params: Tuple[SimulationParam, ...] = ()
+    init_state: Optional[InitStateFn] = None
+    state_fields: Tuple[str, ...] = ()
+    description: str = ""
+
+    @property
+    def param_names(self) -> Tuple[str, ...]:
+        return tuple(param.name for param in self.params)
+
+    def to_dict(self) -> dict:
+        """Popis typu pro API a formuláře"""
+        return {
+            "name": self.name,
+            "label": self.label,
+            "description": self.description,
+            "params": [
+                {
+                    "name": param.name,
+                    "label": param.label,
+                    "default": param.default,
+                    "min": param.min,
+                    "max": param.max,
+                    "description": param.description,
+                }
+                for param in self.params
+            ],
+        }
+
+
+_registry: Dict[str, SimulationTypeSpec] = {}
+_plugins_loaded = False
+
+
+def register_simulation_type(spec: SimulationTypeSpec, replace: bool = False) -> SimulationTypeSpec:
+    """
+    Zaregistruje typ simulace.
+
+    Raises:
+        ValueError: Typ se stejným názvem již existuje (a replace = False)
+    """
+    if spec.name in _registry and not replace:
+        raise ValueError(f"Typ simulace '{spec.name}' je již registrován")
+    if spec.init_state is not None and not spec.state_fields:
+        raise ValueError(f"Typ simulace '{spec.name}' s init_state musí deklarovat state_fields")
+    _registry[spec.name] = spec
+    return spec
+
+
+def _load_plugins() -> None:
+    """Načte typy simulace registrované přes entry pointy (jednou)"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+
+    from importlib.metadata import entry_points
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            spec = entry_point.load()
+            if isinstance(spec, SimulationTypeSpec):
+                register_simulation_type(spec, replace=True)
+        except Exception as e:
+            logger.error(f"Nelze načíst typ simulace {entry_point.name}: {e}")
+
+
+def get_simulation_type(name: str) -> SimulationTypeSpec:
+    """
+    Vrátí typ simulace podle názvu.
+
+    Raises:
+        ValueError: Neznámý typ simulace
+    """
+    spec = _registry.get(name)
+    if spec is None:
+        _load_plugins()
+        spec = _registry.get(name)
+        if spec is None:
+            raise ValueError(f"Neznámý typ simulace: {name}")
+    return spec
+
+
+def simulation_types() -> List[SimulationTypeSpec]:
+    """Vrátí všechny registrované typy simulace"""
+    _load_plugins()
+    return list(_registry.values())
+
+
+def validate_declared_params(
+    declared: Sequence[SimulationParam],
+    params: Optional[Dict[str, Any]],
+    owner: str,
+) -> Optional[Dict[str, float]]:
+    """
+    Zvaliduje parametry proti deklaraci (neznámé názvy, čísla, rozsahy).
+
+    Args:
+        declared: Deklarované parametry
+        params: Zadané parametry
+        owner: Popis vlastníka parametrů pro chybová hlášení
+
+    Returns:
+        Parametry převedené na float, None pokud nejsou zadány
+
+    Raises:
+        ValueError: Neplatný parametr
+    """
+    if not params:
+        return None
+
+    by_name = {param.name: param for param in declared}
+    result: Dict[str, float] = {}
+    for key, value in params.items():
+        param = by_name.get(key)
+        if param is None:
+            raise ValueError(f"{owner} nemá parametr '{key}'")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parametr '{key}' musí být číslo") from None
+        if param.min is not None and number < param.min:
+            raise ValueError(f"Parametr '{key}' musí být alespoň {param.min}")
+        if param.max is not None and number > param.max:
+            raise ValueError(f"Parametr '{key}' může být nejvýše {param.max}")
+        result[key] = number
+    return result
+
+
+def validate_params(name: str, params: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """
+    Zvaliduje parametry typu simulace (neznámé názvy, čísla, rozsahy).
+
+    Returns:
+        Parametry převedené na float, None pokud nejsou zadány
+
+    Raises:
+        ValueError: Neplatný typ simulace nebo parametr
+    """
+    spec = get_simulation_type(name)
+    return validate_declared_params(spec.params, params, f"Typ simulace '{name}'")
+
+
+# =============================================================================
+# Vestavěné typy
+# =============================================================================
+
+def _generate_constant(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Konstantní hodnota = počáteční hodnota"""
+    return columns.initial_value
+
+
+def _generate_random(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Náhodná hodnota v rozsahu min-max"""
+    rnd = random.random
+    return [lo + rnd() * (hi - lo) for lo, hi in zip(columns.min_value, columns.max_value)]
+
+
+def _generate_sine(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Sinusový průběh mezi min a max"""
+    sin = math.sin
+    tau = 2 * math.pi
+    return [
+        lo + (sin(tau * ti / period) + 1) * 0.5 * (hi - lo)
+        for ti, period, lo, hi in zip(t, columns.params["period"], columns.min_value, columns.max_value)
+    ]
+
+
+def _init_step(values: Dict[str, float]) -> Dict[str, float]:
+    return {"current": values["initial_value"], "last_step": 0.0}
+
+
+def _generate_step(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Každých interval sekund skok na náhodnou hodnotu v rozsahu"""
+    current = columns.data["current"]
+    last_step = columns.data["last_step"]
+    interval = columns.params["interval"]
+    lo, hi = columns.min_value, columns.max_value
+    rnd = random.random
+
+    for i, ti in enumerate(t):
+        if ti - last_step[i] >= interval[i]:
+            current[i] = lo[i] + rnd() * (hi[i] - lo[i])
+            last_step[i] = ti
+    return current
+
+
+def _generate_ramp(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Lineární nárůst z min do max za duration sekund a zpět (ping-pong)"""
+    result = []
+    append = result.append
+    for ti, duration, lo, hi in zip(t, columns.params["duration"], columns.min_value, columns.max_value):
+        phase = (ti / duration) % 2.0
+        if phase <= 1.0:
+            append(lo + phase * (hi - lo))
+        else:
+            append(hi - (phase - 1.0) * (hi - lo))
+    return result
+
+
+def _process_scaled(variable: str) -> GenerateFn:
+    """Normalizovaná veličina procesního modelu (0-1) namapovaná do min-max s rovnoměrným šumem"""
+    def generate(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+        value = columns.context.get(variable, 0.0)
+        if "noise" not in columns.params:
+            return [lo + value * (hi - lo) for lo, hi in zip(columns.min_value, columns.max_value)]
+        rnd = random.random
+        return [
+            lo + (value + noise * (2.0 * rnd() - 1.0)) * (hi - lo)
+            for noise, lo, hi in zip(columns.params["noise"], columns.min_value, columns.max_value)
+        ]
+    return generate
+
+
+def _generate_process_state(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Kód stavu stroje (0 idle, 1 running, 2 fault, 3 maintenance)"""
+    return [columns.context.get("state", 0.0)] * len(t)
+
+
+def _generate_process_cycles(t: List[float], columns: GeneratorColumns) -> Sequence[float]:
+    """Počítadlo cyklů od min, při dosažení max přeteče zpět na min"""
+    cycles = math.floor(columns.context.get("cycles", 0.0))
+    return [
+        lo + (cycles % (hi - lo) if hi > lo else 0)
+        for lo, hi in zip(columns.min_value, columns.max_value)
+    ]
+
+
+register_simulation_type(SimulationTypeSpec(
+    name="random",
+    label="Náhodná",
+    generate=_generate_random,
+    description="Náhodné hodnoty v rozsahu min-max",
+))
+register_simulation_type(SimulationTypeSpec(
+    name="sine",
+    label="Sinusová",
+    generate=_generate_sine,
+    params=(SimulationParam("period", "Perioda [s]", 10.0, min=0.01),),
+    description="Sinusový průběh mezi min a max",
+))
+register_simulation_type(SimulationTypeSpec(
+    name="step",
+    label="Skoková",
+    generate=_generate_step,
+    params=(SimulationParam("interval", "Interval skoku [s]", 2.0, min=0.0),),
+    init_state=_init_step,
+    state_fields=("current", "last_step"),
+    description="Skokové změny na náhodnou hodnotu v pravidelném intervalu",
+))
+register_simulation_type(SimulationTypeSpec(
+    name="ramp",
+    label="Lineární (rampa)",
+    generate=_generate_ramp,
+    params=(SimulationParam("duration", "Doba nárůstu min→max [s]", 20.0, min=0.01),),
+    description="Lineární nárůst a pokles mezi min a max",
+))
+register_simulation_type(SimulationTypeSpec(
+    name="constant",
+    label="Konstantní",
+    generate=_generate_constant,
+    description="Konstantní hodnota (počáteční hodnota)",
+))
+
+# Odvozený senzor - hodnotu počítá graf vzorců simulátoru (app.services.formulas),
+# generátor jen drží počáteční hodnotu pro použití mimo simulátor
+register_simulation_type(SimulationTypeSpec(
+    name="formula",
+    label="Vzorec",
+    generate=_generate_constant,
+    description="Hodnota vypočtená vzorcem z jiných senzorů stroje (např. napeti * proud)",
+))
+
+# Průběh (waveform) - bloky vzorků generuje WaveformBank simulátoru (app.services.waveforms),
+# skalární hodnotou senzoru je RMS bloku; generátor jen drží počáteční hodnotu
+WAVEFORM_MAX_SAMPLES = 16384
+register_simulation_type(SimulationTypeSpec(
+    name="waveform",
+    label="Průběh (blok vzorků)",
+    generate=_generate_constant,
+    params=(
+        SimulationParam("sample_rate", "Vzorkovací frekvence [Hz]", 10000.0, min=100.0, max=50000.0),
+        SimulationParam("samples", "Počet vzorků v bloku", 1024.0, min=16.0, max=WAVEFORM_MAX_SAMPLES),
+        SimulationParam("frequency", "Základní frekvence [Hz]", 50.0, min=0.0),
+        SimulationParam("amplitude", "Amplituda", 1.0, min=0.0),
+        SimulationParam("harmonics", "Počet harmonických", 3.0, min=1.0, max=50.0),
+        SimulationParam("noise", "Šum (směrodatná odchylka)", 0.05, min=0.0),
+        SimulationParam("fault_frequency", "Frekvence poruchy [Hz]", 0.0, min=0.0,
+                        description="Opakovací frekvence rázů (např. vada ložiska), 0 = bez poruchy"),
+        SimulationParam("fault_amplitude", "Amplituda rázů poruchy", 0.0, min=0.0),
+    ),
+    description="Blok vzorků za tick (harmonické + šum + rázy poruchy), hodnota senzoru = RMS bloku",
+))
+
+# Typy odvozené z procesního modelu stroje (bez modelu vrací min_value)
+_PROCESS_NOISE = SimulationParam("noise", "Šum (± podíl rozsahu)", 0.01, min=0.0, max=1.0)
+for _variable, _label, _description in (
+    ("load", "Proces: zatížení", "Zatížení stroje z procesního modelu"),
+    ("speed", "Proces: otáčky", "Otáčky vřetene/pohonu z procesního modelu"),
+    ("temperature", "Proces: teplota", "Teplota sledující zatížení s tepelnou setrvačností"),
+    ("vibration", "Proces: vibrace", "Vibrace podle otáček, zatížení a opotřebení"),
+    ("running", "Proces: běží", "1 (max) pokud stroj pracuje, jinak 0 (min)"),
+):
+    register_simulation_type(SimulationTypeSpec(
+        name=f"process_{_variable}",
+        label=_label,
+        generate=_process_scaled(_variable),
+        params=(_PROCESS_NOISE,) if _variable != "running" else (),
+        description=_description,
+    ))
+register_simulation_type(SimulationTypeSpec(
+    name="process_state",
+    label="Proces: stav stroje",
+    generate=_generate_process_state,
+    description="Kód stavu stroje (0 idle, 1 running, 2 fault, 3 maintenance)",
+))
+register_simulation_type(SimulationTypeSpec(
+    name="process_cycles",
+    label="Proces: počet cyklů",
+    generate=_generate_process_cycles,
+    description="Počítadlo pracovních cyklů (přetéká z max na min)",
+))
@@ -0,0 +1,214 @@
+"""
+Snapshot běhového stavu simulací - teplý restart služby
+
+Při restartu služby by se všechny generátory vrátily na začátek (čas startu,
+stav typu step, procesní model...) a běžící simulace by zůstaly zastavené.
+Snapshot proto periodicky a při ukončení uloží množinu běžících strojů a stav
+jejich generátorů do kompaktního binárního souboru; při startu se stroje
+hromadně spustí znovu s obnoveným stavem a průběhy navazují.
+
+Formát (little endian), za hlavičkou zlib komprimované tělo:
+    hlavička  "PLCS" | verze u16 | čas vytvoření f64 | počet strojů u32
+    stroj     ID u32 | CRC konfigurace procesu u32 | počet senzorů u32 | počet hodnot procesu u16
+              | hodnoty procesního modelu f64 * n
+    senzor    ID u32 | CRC konfigurace u32 | čas startu f64 | hodnota f64 | počet stavových polí u8
+              | stavová pole f64 * n
+
+Stav senzoru se obnoví jen při shodném CRC konfigurace (sensor_config) - senzor
+změněný mezi uložením a startem začíná znovu od počáteční hodnoty.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import struct
+import time
+import zlib
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"PLCS"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHdI")
+_MACHINE = struct.Struct("<IIIH")
+_SENSOR = struct.Struct("<IIddB")
+
+
+def config_crc(config: object) -> int:
+    """Otisk konfigurace (senzoru, procesního modelu) pro kontrolu při obnově"""
+    return zlib.crc32(repr(config).encode())
+
+
+@dataclass
+class SensorSnapshot:
+    """Uložený stav senzoru"""
+    crc: int
+    start: float  # čas startu generátoru (NaN = senzor bez generátoru, např. vzorec)
+    value: float
+    state: Tuple[float, ...] = ()
+
+
+@dataclass
+class MachineSnapshot:
+    """Uložený stav běžící simulace stroje"""
+    machine_id: int
+    process_crc: int = 0
+    process: List[float] = field(default_factory=list)
+    sensors: Dict[int, SensorSnapshot] = field(default_factory=dict)
+
+
+@dataclass
+class Snapshot:
+    """Běžící simulace v okamžiku uložení"""
+    created_at: float = field(default_factory=time.time)
+    machines: Dict[int, MachineSnapshot] = field(default_factory=dict)
+
+
+def encode_snapshot(snapshot: Snapshot, level: int = 6) -> bytes:
+    """Zakóduje snapshot do binárního formátu"""
+    parts: List[bytes] = []
+    append = parts.append
+    pack_machine = _MACHINE.pack
+    pack_sensor = _SENSOR.pack
+    for machine in snapshot.machines.values():
+        append(pack_machine(machine.machine_id, machine.process_crc, len(machine.sensors), len(machine.process)))
+        if machine.process:
+            append(struct.pack(f"<{len(machine.process)}d", *machine.process))
+        for sensor_id, sensor in machine.sensors.items():
+            append(pack_sensor(sensor_id, sensor.crc, sensor.start, sensor.value, len(sensor.state)))
+            if sensor.state:
+                append(struct.pack(f"<{len(sensor.state)}d", *sensor.state))
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, snapshot.created_at, len(snapshot.machines))
+    return header + zlib.compress(b"".join(parts), level)
+
+
+def decode_snapshot(data: bytes) -> Snapshot:
+    """
+    Dekóduje snapshot z binárního formátu.
+
+    Raises:
+        ValueError: Poškozený soubor nebo nepodporovaná verze
+    """
+    try:
+        magic, version, created_at, machine_count = _HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Soubor není snapshot simulátoru")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Nepodporovaná verze snapshotu {version}")
+        body = zlib.decompress(data[_HEADER.size:])
+
+        snapshot = Snapshot(created_at=created_at)
+        unpack_machine = _MACHINE.unpack_from
+        unpack_sensor = _SENSOR.unpack_from
+        offset = 0
+        for _ in range(machine_count):
+            machine_id, process_crc, sensor_count, process_count = unpack_machine(body, offset)
+            offset += _MACHINE.size
+            process = list(struct.unpack_from(f"<{process_count}d", body, offset))
+            offset += 8 * process_count
+            machine = MachineSnapshot(machine_id, process_crc, process)
+            sensors = machine.sensors
+            for _ in range(sensor_count):
+                sensor_id, crc, start, value, state_count = unpack_sensor(body, offset)
+                offset += _SENSOR.size
+                state = struct.unpack_from(f"<{state_count}d", body, offset) if state_count else ()
+                offset += 8 * state_count
+                sensors[sensor_id] = SensorSnapshot(crc, start, value, state)
+            snapshot.machines[machine_id] = machine
+    except (struct.error, zlib.error) as e:
+        raise ValueError(f"Poškozený snapshot: {e}") from e
+    if offset != len(body):
+        raise ValueError("Poškozený snapshot: nadbytečná data")
+    return snapshot
+
+
+def write_snapshot(path: Path, snapshot: Snapshot) -> int:
+    """
+    Atomicky zapíše snapshot (dočasný soubor + přejmenování).
+
+    Returns:
+        Velikost souboru v bajtech
+    """
+    data = encode_snapshot(snapshot)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_snapshot(path: Path) -> Optional[Snapshot]:
+    """Načte snapshot, None pokud neexistuje nebo je poškozený (poškozený se jen zaloguje)"""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        return decode_snapshot(data)
+    except ValueError as e:
+        logger.warning(f"Snapshot {path} nelze načíst: {e}")
+        return None
+
+
+def is_restorable(sensor: SensorSnapshot) -> bool:
+    """Senzor má uložený čas startu generátoru"""
+    return not math.isnan(sensor.start)
+
+
+class SnapshotWriter:
+    """
+    Periodické ukládání snapshotu na pozadí.
+    Stav se zachytí v event loopu (callback capture), kódování a zápis
+    běží ve vlákně, aby neblokovaly ticky simulátorů.
+    """
+
+    def __init__(self, path: Path, interval: float, capture: Callable[[], Snapshot]):
+        self.path = path
+        self.interval = interval
+        self.capture = capture
+        self.last_saved: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    def start(self) -> None:
+        """Spustí periodické ukládání"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Zastaví periodické ukládání"""
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def save(self) -> Snapshot:
+        """Zachytí a uloží aktuální stav"""
+        snapshot = self.capture()
+        async with self._write_lock:
+            t_start = time.perf_counter()
+            size = await asyncio.to_thread(write_snapshot, self.path, snapshot)
+        self.last_saved = snapshot.created_at
+        logger.debug(
+            f"Snapshot uložen: {len(snapshot.machines)} strojů, {size} B, "
+            f"{(time.perf_counter() - t_start) * 1000:.1f} ms"
+        )
+        return snapshot
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception as e:
+                logger.error(f"Chyba při ukládání snapshotu: {e}")
@@ -1,132 +1,271 @@
 """
 Generátory hodnot pro simulaci senzorů
+
+GeneratorBank drží všechny senzory simulátoru ve sloupcích seskupených podle
+typu simulace a datového typu. V každém ticku se pro každou skupinu zavolá
+jednou dávková funkce generate() registrovaného typu simulace
+(viz app.services.simulation_types) a výsledky se převedou na datový typ.
+
+Volitelný procesní model stroje (app.services.process_models) se posouvá jednou
+za tick před generováním skupin a jeho veličiny dostávají všechny skupiny
+v GeneratorColumns.context.
+
+Stav generátorů (čas startu a stavové sloupce typu) lze vyexportovat a po
+restartu služby obnovit (viz app.services.snapshot) - průběhy pak navazují.
+
+ValueGenerator je tenká fasáda nad jednou skupinou pro použití s jediným senzorem.
 """
 
-import math
-import random
 import time
-from typing import Union
-from app.models.sensor import SimulationType, DataType
+from itertools import repeat
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from app.models.sensor import DataType
+from app.services.simulation_types import GeneratorColumns, SimulationTypeSpec, get_simulation_type
+
+if TYPE_CHECKING:
+    from app.services.process_models import ProcessModel
+
+Value = Union[float, int, bool]
+
+
+class _Group:
+    """Senzory se stejným typem simulace a datovým typem"""
+
+    __slots__ = ("spec", "data_type", "ids", "positions", "start", "threshold", "columns")
+
+    def __init__(self, spec: SimulationTypeSpec, data_type: DataType, context: Optional[Dict[str, float]] = None):
+        self.spec = spec
+        self.data_type = data_type
+        self.ids: List[int] = []
+        self.positions: Dict[int, int] = {}
+        self.start: List[float] = []
+        self.threshold: List[float] = []  # hranice pro BOOL (střed rozsahu)
+        self.columns = GeneratorColumns(spec.param_names, spec.state_fields, context)
+
+    def add(
+        self,
+        sensor_id: int,
+        min_value: float,
+        max_value: float,
+        initial_value: float,
+        params: Optional[Dict[str, float]],
+        start: float,
+    ) -> None:
+        columns = self.columns
+        self.positions[sensor_id] = len(self.ids)
+        self.ids.append(sensor_id)
+        self.start.append(start)
+        self.threshold.append((min_value + max_value) / 2)
+        columns.min_value.append(min_value)
+        columns.max_value.append(max_value)
+        columns.initial_value.append(initial_value)
+
+        params = params or {}
+        values = {"min_value": min_value, "max_value": max_value, "initial_value": initial_value}
+        for param in self.spec.params:
+            value = float(params.get(param.name, param.default))
+            columns.params[param.name].append(value)
+            values[param.name] = value
+
+        if self.spec.init_state is not None:
+            state = self.spec.init_state(values)
+            for name in self.spec.state_fields:
+                columns.data[name].append(state[name])
+
+    def remove(self, sensor_id: int) -> None:
+        """Odebere senzor prohozením s posledním (O(1) pro všechny sloupce)"""
+        position = self.positions.pop(sensor_id)
+        last = len(self.ids) - 1
+        columns = self.columns
+        lists = [self.ids, self.start, self.threshold, columns.min_value, columns.max_value, columns.initial_value]
+        lists.extend(columns.params.values())
+        lists.extend(columns.data.values())
+
+        if position != last:
+            moved_id = self.ids[last]
+            for values in lists:
+                values[position] = values[last]
+            self.positions[moved_id] = position
+        for values in lists:
+            values.pop()
+
+    def export_state(self) -> Iterator[Tuple[int, float, Tuple[float, ...]]]:
+        """Čas startu a proměnný stav každého senzoru skupiny"""
+        data = [self.columns.data[name] for name in self.spec.state_fields]
+        return zip(self.ids, self.start, zip(*data) if data else repeat(()))
+
+    def restore(self, sensor_id: int, start: float, state: Sequence[float]) -> bool:
+        """Obnoví čas startu a stav senzoru, False při nesouhlasícím počtu stavových polí"""
+        fields = self.spec.state_fields
+        if len(state) != len(fields):
+            return False
+        position = self.positions[sensor_id]
+        self.start[position] = start
+        for name, value in zip(fields, state):
+            self.columns.data[name][position] = value
+        return True
+
+    def generate(self, now: float) -> List[Value]:
+        """Vygeneruje hodnoty všech senzorů skupiny převedené na datový typ"""
+        t = [now - start for start in self.start]
+        raw = self.spec.generate(t, self.columns)
+        if len(raw) != len(t):
+            raise ValueError(
+                f"Typ simulace '{self.spec.name}' vrátil {len(raw)} hodnot místo {len(t)}"
+            )
+
+        if self.data_type == DataType.FLOAT:
+            return [round(value, 2) for value in raw]
+        if self.data_type == DataType.INT:
+            return [int(round(value)) for value in raw]
+        return [value > threshold for value, threshold in zip(raw, self.threshold)]
+
+
+class GeneratorBank:
+    """Generátory hodnot všech senzorů jednoho simulátoru"""
+
+    def __init__(self):
+        self._groups: Dict[Tuple[str, DataType], _Group] = {}
+        self._group_of: Dict[int, _Group] = {}
+        self.process: Optional["ProcessModel"] = None
+        self.context: Dict[str, float] = {}  # veličiny procesního modelu sdílené skupinami
+
+    def __len__(self) -> int:
+        return len(self._group_of)
+
+    def __contains__(self, sensor_id: int) -> bool:
+        return sensor_id in self._group_of
+
+    def add(
+        self,
+        sensor_id: int,
+        simulation_type: str,
+        data_type: DataType,
+        min_value: float,
+        max_value: float,
+        initial_value: float = 0.0,
+        params: Optional[Dict[str, float]] = None,
+        start: Optional[float] = None,
+    ) -> None:
+        """
+        Přidá senzor (existující senzor se stejným ID nahradí).
+
+        Raises:
+            ValueError: Neznámý typ simulace
+        """
+        if sensor_id in self._group_of:
+            self.remove(sensor_id)
+
+        spec = get_simulation_type(simulation_type)
+        key = (spec.name, data_type)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(spec, data_type, self.context)
+
+        group.add(
+            sensor_id,
+            min_value,
+            max_value,
+            initial_value,
+            params,
+            time.time() if start is None else start,
+        )
+        self._group_of[sensor_id] = group
+
+    def add_sensor(self, sensor, start: Optional[float] = None) -> None:
+        """Přidá senzor podle jeho konfigurace (model Sensor)"""
+        self.add(
+            sensor.id,
+            sensor.simulation_type,
+            sensor.data_type,
+            sensor.min_value,
+            sensor.max_value,
+            sensor.initial_value,
+            sensor.simulation_params,
+            start,
+        )
+
+    def set_process(self, process: Optional["ProcessModel"]) -> None:
+        """Nastaví procesní model stroje (None = bez modelu)"""
+        self.process = process
+        self.context.clear()
+        if process is not None:
+            self.context.update(process.values)
+
+    def remove(self, sensor_id: int) -> None:
+        """Odebere senzor (neznámé ID ignoruje)"""
+        group = self._group_of.pop(sensor_id, None)
+        if group is None:
+            return
+        group.remove(sensor_id)
+        if not group.ids:
+            del self._groups[(group.spec.name, group.data_type)]
+
+    def export_state(self) -> Iterator[Tuple[int, float, Tuple[float, ...]]]:
+        """
+        Stav generátorů pro snapshot.
+
+        Returns:
+            Iterátor trojic (ID senzoru, čas startu, hodnoty stavových polí typu)
+        """
+        for group in self._groups.values():
+            yield from group.export_state()
+
+    def restore(self, sensor_id: int, start: float, state: Sequence[float]) -> bool:
+        """
+        Obnoví stav generátoru senzoru ze snapshotu.
+
+        Returns:
+            False pokud senzor v bance není nebo stav neodpovídá typu simulace
+        """
+        group = self._group_of.get(sensor_id)
+        return group is not None and group.restore(sensor_id, start, state)
+
+    def generate(self, now: Optional[float] = None) -> Iterator[Tuple[int, Value]]:
+        """
+        Vygeneruje hodnoty všech senzorů pro čas now (výchozí aktuální čas).
+
+        Returns:
+            Iterátor dvojic (ID senzoru, hodnota)
+        """
+        if now is None:
+            now = time.time()
+        if self.process is not None:
+            self.process.step(now)
+            self.context.update(self.process.values)
+        for group in list(self._groups.values()):
+            yield from zip(group.ids, group.generate(now))
 
 
 class ValueGenerator:
     """
-    Generátor hodnot pro simulaci senzorů.
-    Podporuje různé typy simulace: random, sine, step, ramp, constant
+    Generátor hodnot pro jeden senzor.
+    Podporuje všechny registrované typy simulace (random, sine, step, ramp, constant, ...).
     """
-    
+
     def __init__(
         self,
-        simulation_type: SimulationType,
+        simulation_type: str,
         data_type: DataType,
         min_value: float,
         max_value: float,
         initial_value: float = 0.0,
+        params: Optional[Dict[str, float]] = None,
     ):
         self.simulation_type = simulation_type
         self.data_type = data_type
         self.min_value = min_value
         self.max_value = max_value
         self.initial_value = initial_value
-        
-        # Interní stav
-        self._current_value = initial_value
-        self._start_time = time.time()
-        self._step_direction = 1  # Pro RAMP: 1 = nahoru, -1 = dolů
-        self._last_step_time = time.time()
-        
-    def get_value(self) -> Union[float, int, bool]:
+        self.params = params
+        self.reset()
+
+    def get_value(self) -> Value:
         """Vrátí aktuální hodnotu podle typu simulace"""
-        
-        if self.simulation_type == SimulationType.CONSTANT:
-            raw_value = self.initial_value
-            
-        elif self.simulation_type == SimulationType.RANDOM:
-            raw_value = self._generate_random()
-            
-        elif self.simulation_type == SimulationType.SINE:
-            raw_value = self._generate_sine()
-            
-        elif self.simulation_type == SimulationType.STEP:
-            raw_value = self._generate_step()
-            
-        elif self.simulation_type == SimulationType.RAMP:
-            raw_value = self._generate_ramp()
-            
-        else:
-            raw_value = self.initial_value
-        
-        # Převod na správný datový typ
-        return self._convert_to_type(raw_value)
-    
-    def _generate_random(self) -> float:
-        """Generuje náhodnou hodnotu v rozsahu min-max"""
-        return random.uniform(self.min_value, self.max_value)
-    
-    def _generate_sine(self) -> float:
-        """
-        Generuje sinusový průběh.
-        Perioda je 10 sekund, hodnoty oscillují mezi min a max.
-        """
-        elapsed = time.time() - self._start_time
-        period = 10.0  # sekund
-        
-        # Sinusová vlna od 0 do 1
-        normalized = (math.sin(2 * math.pi * elapsed / period) + 1) / 2
-        
-        # Škálování na rozsah
-        return self.min_value + normalized * (self.max_value - self.min_value)
-    
-    def _generate_step(self) -> float:
-        """
-        Generuje skokové změny.
-        Každé 2 sekundy se hodnota změní na náhodnou hodnotu v rozsahu.
-        """
-        current_time = time.time()
-        step_interval = 2.0  # sekund
-        
-        if current_time - self._last_step_time >= step_interval:
-            self._current_value = random.uniform(self.min_value, self.max_value)
-            self._last_step_time = current_time
-            
-        return self._current_value
-    
-    def _generate_ramp(self) -> float:
-        """
-        Generuje lineární nárůst/pokles.
-        Hodnota se pomalu zvyšuje/snižuje a pak obrací směr.
-        """
-        elapsed = time.time() - self._start_time
-        
-        # Rychlost změny: celý rozsah za 20 sekund
-        rate = (self.max_value - self.min_value) / 20.0
-        
-        # Aktuální pozice v cyklu (ping-pong efekt)
-        cycle_position = (elapsed * rate) % (2 * (self.max_value - self.min_value))
-        
-        if cycle_position <= (self.max_value - self.min_value):
-            # Vzestupná fáze
-            return self.min_value + cycle_position
-        else:
-            # Sestupná fáze
-            return self.max_value - (cycle_position - (self.max_value - self.min_value))
-    
-    def _convert_to_type(self, value: float) -> Union[float, int, bool]:
-        """Převede hodnotu na správný datový typ"""
-        
-        if self.data_type == DataType.BOOL:
-            # Pro bool: hodnota nad středem rozsahu = True
-            threshold = (self.min_value + self.max_value) / 2
-            return value > threshold
-            
-        elif self.data_type == DataType.INT:
-            return int(round(value))
-            
-        else:  # FLOAT
-            return round(value, 2)
-    
+        return self._group.generate(time.time())[0]
+
     def reset(self):
         """Resetuje generátor do počátečního stavu"""
-        self._current_value = self.initial_value
-        self._start_time = time.time()
-        self._last_step_time = time.time()
+        self._group = _Group(get_simulation_type(self.simulation_type), self.data_type)
+        self._group.add(0, self.min_value, self.max_value, self.initial_value, self.params, time.time())
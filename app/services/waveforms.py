@@ -0,0 +1,156 @@
+"""
+Vysokofrekvenční průběhy (vibrace, proudová signatura) jako bloky vzorků
+
+Senzor s typem simulace "waveform" vystavuje v každém ticku blok N vzorků
+vzorkovaných frekvencí sample_rate: offset (initial_value) + harmonické
+základní frekvence s amplitudou klesající 1/h + gaussovský šum + periodické
+tlumené rázy poruchy (např. vada ložiska). Skalární hodnota senzoru je RMS
+bloku - s ní pracují alarmy, vzorce i historie.
+
+Blok se neskládá vzorek po vzorku. Harmonické i rázy jsou periodické, takže
+se jedna perioda předpočítá do tabulky a blok je výřez tabulky podle
+absolutního indexu vzorku (spojitá fáze mezi ticky); šum je výřez sdílené
+tabulky šumu senzoru (2N předškálovaných vzorků) na náhodném offsetu.
+Blok jsou tak nejvýše dva výřezy a dvě sčítání map(add, ...) nad seznamy,
+tj. smyčky v C - cena bloku je desítky ns na vzorek, nezávisí na vzorkovací
+frekvenci a generátor nevolá random/sin pro jednotlivé vzorky.
+
+Základní frekvence a frekvence poruchy se zaokrouhlují tak, aby perioda
+byla celý počet vzorků (f = sample_rate / round(sample_rate / f)).
+"""
+
+import math
+import random
+from operator import add
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.simulation_types import get_simulation_type
+
+WAVEFORM_TYPE = "waveform"
+
+def validate_waveform(simulation_type: Optional[str], data_type) -> None:
+    """
+    Průběh je vždy reálné číslo (RMS i vzorky jsou Float).
+
+    Raises:
+        ValueError: Průběh s jiným datovým typem než FLOAT
+    """
+    if simulation_type == WAVEFORM_TYPE and getattr(data_type, "value", data_type) != "float":
+        raise ValueError("Typ simulace 'waveform' vyžaduje datový typ FLOAT")
+
+
+def waveform_samples(sensor) -> Optional[int]:
+    """Počet vzorků v bloku senzoru, None pro senzory jiného typu"""
+    if sensor.simulation_type != WAVEFORM_TYPE:
+        return None
+    params = sensor.simulation_params or {}
+    return int(params.get("samples", _defaults()["samples"]))
+
+
+def _defaults() -> Dict[str, float]:
+    return {param.name: param.default for param in get_simulation_type(WAVEFORM_TYPE).params}
+
+
+def _tile(period: List[float], length: int) -> List[float]:
+    """Opakuje periodu, dokud tabulka nepokryje výřez libovolného začátku periody"""
+    return (period * (length // len(period) + 2))[:len(period) + length]
+
+
+class Waveform:
+    """Předpočítané tabulky průběhu jednoho senzoru"""
+
+    __slots__ = ("sample_rate", "samples", "base", "base_period", "fault", "fault_period", "noise")
+
+    def __init__(self, offset: float, params: Optional[Dict[str, float]] = None):
+        values = _defaults()
+        values.update(params or {})
+        self.sample_rate = values["sample_rate"]
+        self.samples = n = int(values["samples"])
+        noise = values["noise"]
+
+        # Harmonické: jedna perioda základní frekvence
+        frequency = values["frequency"]
+        amplitude = values["amplitude"]
+        if frequency > 0 and amplitude > 0:
+            period = max(2, round(self.sample_rate / frequency))
+            harmonics = range(1, int(values["harmonics"]) + 1)
+            tau = 2 * math.pi / period
+            base = [
+                offset + sum(amplitude / h * math.sin(tau * h * k) for h in harmonics)
+                for k in range(period)
+            ]
+        else:
+            base = [offset]
+        self.base_period = len(base)
+        self.base = _tile(base, n)
+
+        # Porucha: tlumený ráz na rezonanci sample_rate / 8 jednou za periodu
+        self.fault: Optional[List[float]] = None
+        self.fault_period = 1
+        fault_frequency = values["fault_frequency"]
+        fault_amplitude = values["fault_amplitude"]
+        if fault_frequency > 0 and fault_amplitude > 0:
+            period = max(2, round(self.sample_rate / fault_frequency))
+            decay = max(1.0, period / 10)
+            ring = math.pi / 4  # 2π / 8 vzorků
+            impulse = [
+                fault_amplitude * math.exp(-k / decay) * math.sin(ring * k)
+                for k in range(period)
+            ]
+            self.fault_period = period
+            self.fault = _tile(impulse, n)
+
+        # Šum: 2N vzorků s danou směrodatnou odchylkou, blok bere výřez od náhodného offsetu
+        gauss = random.gauss
+        self.noise = [gauss(0.0, noise) for _ in range(2 * n)] if noise > 0 else None
+
+    def block(self, now: float) -> List[float]:
+        """Blok vzorků začínající v čase now"""
+        n = self.samples
+        index = int(now * self.sample_rate)  # absolutní index prvního vzorku
+        start = index % self.base_period
+        block = self.base[start:start + n]
+        if self.fault is not None:
+            start = index % self.fault_period
+            block = list(map(add, block, self.fault[start:start + n]))
+        if self.noise is not None:
+            start = random.randrange(n)
+            block = list(map(add, block, self.noise[start:start + n]))
+        return block
+
+
+def block_rms(block: List[float]) -> float:
+    """RMS bloku vzorků"""
+    return math.sqrt(math.sumprod(block, block) / len(block)) if block else 0.0
+
+
+class WaveformBank:
+    """Průběhy všech waveform senzorů jednoho simulátoru"""
+
+    def __init__(self):
+        self._waveforms: Dict[int, Waveform] = {}
+
+    def __len__(self) -> int:
+        return len(self._waveforms)
+
+    def __contains__(self, sensor_id: int) -> bool:
+        return sensor_id in self._waveforms
+
+    def add_sensor(self, sensor) -> None:
+        """Přidá senzor podle jeho konfigurace (model Sensor)"""
+        self._waveforms[sensor.id] = Waveform(sensor.initial_value, sensor.simulation_params)
+
+    def remove(self, sensor_id: int) -> None:
+        """Odebere senzor (neznámé ID ignoruje)"""
+        self._waveforms.pop(sensor_id, None)
+
+    def generate(self, now: float) -> Iterator[Tuple[int, float, List[float]]]:
+        """
+        Vygeneruje bloky všech senzorů.
+
+        Returns:
+            Iterátor trojic (ID senzoru, RMS bloku, blok)
+        """
+        for sensor_id, waveform in self._waveforms.items():
+            block = waveform.block(now)
+            yield sensor_id, round(block_rms(block), 2), block
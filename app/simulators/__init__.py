@@ -4,8 +4,11 @@ Simulátory pro OPC UA a Modbus TCP
 
 from app.simulators.manager import SimulationManager
 from app.simulators.base import BaseSimulator
+from app.simulators.registry import get_simulator_class, register_simulator
 
 __all__ = [
     "SimulationManager",
     "BaseSimulator",
+    "get_simulator_class",
+    "register_simulator",
 ]
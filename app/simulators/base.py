@@ -4,21 +4,41 @@ Abstraktní třída pro simulátory
 
 import asyncio
 import logging
+import math
+import operator
+import time
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass, field
 
-from app.models import Machine, Sensor
-from app.services.value_generator import ValueGenerator
+from app.models import DataType, Machine, Sensor
+from app.models.sensor import SensorBase
+from app.services.alarms import AlarmEngine, AlarmEvent, alarm_hub
+from app.services.formulas import FORMULA_TYPE, FormulaGraph
+from app.services.process_models import MachineState, create_process_model
+from app.services.scenarios import OverrideMode, SensorOverride
+from app.services.snapshot import MachineSnapshot, SensorSnapshot, config_crc, is_restorable
+from app.services.value_generator import GeneratorBank
+from app.services.waveforms import WAVEFORM_TYPE, WaveformBank
+from app.services.metrics import (
+    ALARM_TRANSITIONS, TICK_DURATION, GENERATE_DURATION, PUBLISH_DURATION, TICK_ERRORS,
+)
+from app.simulators.impairment import (
+    ImpairmentProfile, ImpairmentProxy, ImpairmentStats, free_local_port, supports_impairment,
+)
 
 logger = logging.getLogger(__name__)
 
+# Váha posledního ticku v klouzavém průměru doby ticku (BaseSimulator.tick_cost)
+TICK_COST_SMOOTHING = 0.2
+
 
 class SimulatorStatus(str, Enum):
     """Stav simulátoru"""
     STOPPED = "stopped"
     STARTING = "starting"
+    QUEUED = "queued"  # čeká na volnou kapacitu (admission control)
     RUNNING = "running"
     STOPPING = "stopping"
     ERROR = "error"
@@ -28,8 +48,16 @@ class SimulatorStatus(str, Enum):
 class SensorState:
     """Stav senzoru v simulaci"""
     sensor: Sensor
-    generator: ValueGenerator
     current_value: float = 0.0
+    config: tuple = ()  # konfigurace senzoru v okamžiku vytvoření (viz sensor_config)
+    block: Optional[list] = None  # poslední blok vzorků (jen waveform senzory)
+    _crc: Optional[int] = field(default=None, repr=False)
+    
+    def config_crc(self) -> int:
+        """Otisk konfigurace pro snapshot (konfigurace stavu se nemění, počítá se jednou)"""
+        if self._crc is None:
+            self._crc = config_crc(self.config)
+        return self._crc
 
 
 @dataclass
@@ -39,6 +67,52 @@ class SimulatorState:
     status: SimulatorStatus = SimulatorStatus.STOPPED
     error_message: Optional[str] = None
     sensors: Dict[int, SensorState] = field(default_factory=dict)
+    slowdown: int = 1
+
+
+@dataclass
+class SensorChanges:
+    """Rozdíl mezi běžící a novou konfigurací senzorů"""
+    added: List[SensorState] = field(default_factory=list)
+    removed: List[SensorState] = field(default_factory=list)
+    changed: List[Tuple[SensorState, SensorState]] = field(default_factory=list)  # (starý, nový)
+    
+    def is_empty(self) -> bool:
+        """Konfigurace se nezměnila"""
+        return not (self.added or self.removed or self.changed)
+    
+    def summary(self) -> Dict[str, List[int]]:
+        """Vrátí ID přidaných, odebraných a změněných senzorů"""
+        return {
+            "added": [state.sensor.id for state in self.added],
+            "removed": [state.sensor.id for state in self.removed],
+            "changed": [new.sensor.id for _, new in self.changed],
+        }
+
+
+_config_from_dict = operator.itemgetter(*SensorBase.model_fields)
+_config_from_attrs = operator.attrgetter(*SensorBase.model_fields)
+
+
+def coerce_value(data_type: DataType, value: float):
+    """Převede číselnou hodnotu na datový typ senzoru"""
+    if data_type == DataType.BOOL:
+        return value >= 0.5
+    if data_type == DataType.INT:
+        return int(round(value))
+    return round(value, 2)
+
+
+def sensor_config(sensor: Sensor) -> tuple:
+    """
+    Konfigurace senzoru relevantní pro simulaci (pro porovnání změn).
+    Načtené sloupce čte přímo z __dict__ - u tisíců senzorů výrazně rychlejší
+    než přístup přes ORM atributy.
+    """
+    try:
+        return _config_from_dict(sensor.__dict__)
+    except KeyError:
+        return _config_from_attrs(sensor)
 
 
 class BaseSimulator(ABC):
@@ -54,22 +128,57 @@ class BaseSimulator(ABC):
         self.error_message: Optional[str] = None
         self._task: Optional[asyncio.Task] = None
         self._stop_event = asyncio.Event()
+        self._first_update = asyncio.Event()
+        # Zámek mezi tickem update loopu a živou rekonfigurací senzorů
+        self._lock = asyncio.Lock()
+        # Adresa, na které naslouchá server - se zhoršením sítě interní port za proxy
+        self.bind_address: Tuple[str, int] = (machine.host, machine.port)
+        self._proxy: Optional[ImpairmentProxy] = None
+        # Naměřená doba ticku (klouzavý průměr v sekundách), None = zatím neproběhl
+        self.tick_cost: Optional[float] = None
+        # Násobek intervalu aktualizace - při přetížení ho zvyšuje regulátor zátěže (load_shedding)
+        self.slowdown = 1
         
-        # Inicializace generátorů pro každý senzor
-        self.sensor_states: Dict[int, SensorState] = {}
+        # Generátory hodnot všech senzorů - dávkově podle typu simulace
+        self._bank = GeneratorBank()
+        # Průběhy (waveform) - bloky vzorků, hodnota senzoru je RMS bloku
+        self._waveforms = WaveformBank()
+        self.sensor_states: Dict[int, SensorState] = {
+            sensor.id: self._create_sensor_state(sensor) for sensor in sensors
+        }
         for sensor in sensors:
-            generator = ValueGenerator(
-                simulation_type=sensor.simulation_type,
-                data_type=sensor.data_type,
-                min_value=sensor.min_value,
-                max_value=sensor.max_value,
-                initial_value=sensor.initial_value,
-            )
-            self.sensor_states[sensor.id] = SensorState(
-                sensor=sensor,
-                generator=generator,
-                current_value=sensor.initial_value,
-            )
+            self._add_generator(sensor)
+        # Odvozené senzory - vzorce přeložené jednou, vyhodnocované v topologickém pořadí
+        self._formulas = FormulaGraph.build(sensors, strict=False)
+        # Limitní alarmy - vyhodnocují se po vygenerování hodnot celého stroje
+        self._alarms = AlarmEngine(machine.id)
+        self._alarms.configure(sensors)
+        # Překrytí hodnot senzorů scénářem (app.services.scenarios) - aplikují se jen na dotčené senzory
+        self._overrides: Dict[int, SensorOverride] = {}
+        self._process_config: tuple = (None, None)
+        if machine.process_model:
+            self._bank.set_process(create_process_model(machine.process_model, machine.process_params))
+            self._process_config = (machine.process_model, machine.process_params)
+    
+    def _add_generator(self, sensor: Sensor) -> None:
+        """Zařadí senzor do banky generátorů podle typu simulace (vzorce počítá FormulaGraph)"""
+        if sensor.simulation_type == WAVEFORM_TYPE:
+            self._waveforms.add_sensor(sensor)
+        elif sensor.simulation_type != FORMULA_TYPE:
+            self._bank.add_sensor(sensor)
+    
+    def _remove_generator(self, sensor_id: int) -> None:
+        """Odebere senzor ze všech bank generátorů"""
+        self._bank.remove(sensor_id)
+        self._waveforms.remove(sensor_id)
+    
+    def _create_sensor_state(self, sensor: Sensor) -> SensorState:
+        """Vytvoří stav senzoru"""
+        return SensorState(
+            sensor=sensor,
+            current_value=sensor.initial_value,
+            config=sensor_config(sensor),
+        )
     
     @abstractmethod
     async def _start_server(self) -> None:
@@ -86,6 +195,176 @@ class BaseSimulator(ABC):
         """Aktualizuje hodnoty na serveru"""
         pass
     
+    @abstractmethod
+    async def _apply_changes(self, changes: SensorChanges) -> None:
+        """
+        Promítne změny senzorů do běžícího serveru (uzly, registry).
+        Volá se pod zámkem, sensor_states ještě obsahuje původní stav.
+        """
+        pass
+    
+    async def _publish_alarms(self, events: List[AlarmEvent]) -> None:
+        """
+        Promítne přechody alarmů do serveru protokolu (události, stavové bity).
+        Volá se pod zámkem jen při změně stavu některého alarmu.
+        """
+        pass
+    
+    async def _emit_alarms(self, events: List[AlarmEvent]) -> None:
+        """Publikuje přechody alarmů na server (pokud běží) a do AlarmHubu"""
+        if self.status == SimulatorStatus.RUNNING:
+            await self._publish_alarms(events)
+        alarm_hub.publish(events)
+        for event in events:
+            ALARM_TRANSITIONS.labels(event.level.value).inc()
+    
+    async def apply_sensors(self, sensors: List[Sensor]) -> Dict[str, List[int]]:
+        """
+        Živě aplikuje novou sadu senzorů bez restartu serveru.
+        
+        Nezměněné senzory si ponechají generátor i uzel/registry,
+        klientská spojení zůstávají zachována.
+        
+        Returns:
+            ID přidaných, odebraných a změněných senzorů
+        """
+        new_sensors = {sensor.id: sensor for sensor in sensors}
+        changes = SensorChanges()
+        
+        for sensor_id, state in self.sensor_states.items():
+            sensor = new_sensors.get(sensor_id)
+            if sensor is None:
+                changes.removed.append(state)
+            elif sensor_config(sensor) != state.config:
+                changes.changed.append((state, self._create_sensor_state(sensor)))
+        
+        for sensor_id, sensor in new_sensors.items():
+            if sensor_id not in self.sensor_states:
+                changes.added.append(self._create_sensor_state(sensor))
+        
+        if changes.is_empty():
+            return changes.summary()
+        
+        async with self._lock:
+            # Alarmy se přenastaví před změnou serveru - ten už vidí jejich nový stav
+            cleared = self._alarms.configure(sensors)
+            if self.status == SimulatorStatus.RUNNING:
+                await self._apply_changes(changes)
+            
+            sensor_states = dict(self.sensor_states)
+            for state in changes.removed:
+                del sensor_states[state.sensor.id]
+                self._remove_generator(state.sensor.id)
+                self._overrides.pop(state.sensor.id, None)
+            for _, state in changes.changed:
+                sensor_states[state.sensor.id] = state
+                self._overrides.pop(state.sensor.id, None)
+                self._remove_generator(state.sensor.id)
+                self._add_generator(state.sensor)
+            for state in changes.added:
+                sensor_states[state.sensor.id] = state
+                self._add_generator(state.sensor)
+            self.sensor_states = sensor_states
+            self.sensors = list(sensors)
+            self._formulas = FormulaGraph.build(sensors, strict=False)
+            if cleared:
+                await self._emit_alarms(cleared)
+        
+        logger.info(
+            f"Simulátor {self.machine.name}: živá změna senzorů "
+            f"(+{len(changes.added)} / -{len(changes.removed)} / ~{len(changes.changed)})"
+        )
+        return changes.summary()
+    
+    async def apply_process_model(self, process_model: Optional[str], params: Optional[dict] = None) -> None:
+        """
+        Živě vymění procesní model stroje (None = bez modelu).
+        Při nezměněné konfiguraci model běží dál se svým stavem.
+        
+        Raises:
+            ValueError: Neznámý model nebo neplatný parametr
+        """
+        if (process_model, params) == self._process_config:
+            return
+        process = create_process_model(process_model, params) if process_model else None
+        async with self._lock:
+            self._bank.set_process(process)
+            self._process_config = (process_model, params)
+        logger.info(f"Simulátor {self.machine.name}: procesní model {process_model or 'žádný'}")
+    
+    def set_process_state(self, state: MachineState, now: Optional[float] = None) -> None:
+        """
+        Přepne stav procesního modelu (např. vyvolání poruchy).
+        
+        Args:
+            state: Nový stav
+            now: Okamžik přechodu (výchozí aktuální čas) - scénáře předávají plánovaný čas události
+        
+        Raises:
+            ValueError: Stroj nemá procesní model
+        """
+        if self._bank.process is None:
+            raise ValueError(f"Stroj {self.machine.name} nemá procesní model")
+        self._bank.process.set_state(state, now)
+    
+    def get_process_state(self) -> Optional[dict]:
+        """Vrátí stav procesního modelu, None pokud stroj model nemá"""
+        if self._bank.process is None:
+            return None
+        return self._bank.process.to_dict()
+    
+    def set_override(
+        self,
+        sensor_id: int,
+        mode: OverrideMode,
+        target: float,
+        start: float,
+        duration: float = 0.0,
+    ) -> SensorOverride:
+        """
+        Překryje hodnotu senzoru - lineární přechod na target od času start po dobu duration.
+        Přechod navazuje na aktuální překrytí stejného režimu (jinak na neutrální
+        úroveň, u režimu VALUE na aktuální hodnotu senzoru).
+        
+        Raises:
+            ValueError: Neznámý senzor nebo senzor bez vlastního generátoru (vzorec, průběh)
+        """
+        state = self.sensor_states.get(sensor_id)
+        if state is None:
+            raise ValueError(f"Senzor {sensor_id} na stroji {self.machine.name} neexistuje")
+        sensor = state.sensor
+        if sensor.simulation_type in (FORMULA_TYPE, WAVEFORM_TYPE):
+            raise ValueError(f"Hodnotu senzoru '{sensor.name}' typu {sensor.simulation_type} nelze překrýt")
+        
+        current = self._overrides.get(sensor_id)
+        if current is not None and current.mode == mode:
+            origin = current.level(start)
+        elif mode == OverrideMode.VALUE:
+            origin = float(state.current_value)
+        else:
+            origin = mode.neutral
+        override = SensorOverride(mode, origin, target, start, start + duration)
+        self._overrides[sensor_id] = override
+        return override
+    
+    def release_overrides(self, sensor_ids: Optional[List[int]] = None) -> int:
+        """Zruší překrytí zadaných senzorů (None = všech), vrátí počet zrušených"""
+        if sensor_ids is None:
+            count = len(self._overrides)
+            self._overrides = {}
+            return count
+        return sum(self._overrides.pop(sensor_id, None) is not None for sensor_id in sensor_ids)
+    
+    def get_overrides(self) -> Dict[int, SensorOverride]:
+        """Vrátí aktivní překrytí hodnot senzorů"""
+        return dict(self._overrides)
+    
+    def restore_overrides(self, overrides: Dict[int, SensorOverride]) -> None:
+        """Převezme překrytí z předchozí instance simulátoru (restart serveru), jen pro existující senzory"""
+        self._overrides = {
+            sensor_id: override for sensor_id, override in overrides.items() if sensor_id in self.sensor_states
+        }
+    
     async def start(self) -> bool:
         """Spustí simulaci"""
         if self.status == SimulatorStatus.RUNNING:
@@ -95,8 +374,17 @@ class BaseSimulator(ABC):
         try:
             self.status = SimulatorStatus.STARTING
             self._stop_event.clear()
+            self._first_update.clear()
+            
+            impairment = self.machine.impairment if supports_impairment(self.machine.protocol) else None
+            if impairment is not None:
+                self.bind_address = ("127.0.0.1", free_local_port())
+            else:
+                self.bind_address = (self.machine.host, self.machine.port)
             
             await self._start_server()
+            if impairment is not None:
+                await self._start_proxy(ImpairmentProfile.from_dict(impairment))
             
             self.status = SimulatorStatus.RUNNING
             self.error_message = None
@@ -131,7 +419,16 @@ class BaseSimulator(ABC):
                 except asyncio.CancelledError:
                     pass
             
+            async with self._lock:
+                cleared = self._alarms.reset()
+                if cleared:
+                    await self._emit_alarms(cleared)
+            
+            if self._proxy is not None:
+                await self._proxy.stop()
+                self._proxy = None
             await self._stop_server()
+            TICK_DURATION.remove(self.machine.id, self.machine.protocol.value)
             
             self.status = SimulatorStatus.STOPPED
             self.error_message = None
@@ -145,23 +442,175 @@ class BaseSimulator(ABC):
             logger.error(f"Chyba při zastavování simulátoru {self.machine.name}: {e}")
             return False
     
+    async def _start_proxy(self, profile: ImpairmentProfile) -> None:
+        """Spustí proxy se zhoršením sítě na adrese stroje (při chybě zastaví i server)"""
+        proxy = ImpairmentProxy(
+            (self.machine.host, self.machine.port), self.bind_address, self.machine.protocol, profile
+        )
+        try:
+            await proxy.start()
+        except Exception:
+            await self._stop_server()
+            raise
+        self._proxy = proxy
+    
+    def apply_impairment(self, impairment: Optional[dict]) -> bool:
+        """
+        Živě změní profil zhoršení sítě běžící proxy.
+        
+        Returns:
+            False pokud se proxy musí přidat nebo odebrat - to vyžaduje restart serveru
+        """
+        self.machine.impairment = impairment
+        if self.status != SimulatorStatus.RUNNING or not supports_impairment(self.machine.protocol):
+            return True
+        if (impairment is None) != (self._proxy is None):
+            return False
+        if self._proxy is not None:
+            self._proxy.profile = ImpairmentProfile.from_dict(impairment)
+        return True
+    
+    def get_impairment_stats(self) -> Optional[ImpairmentStats]:
+        """Počítadla proxy zhoršení sítě, None pokud stroj běží bez ní"""
+        return self._proxy.stats if self._proxy is not None else None
+    
+    def disconnect_clients(self) -> int:
+        """Odpojí všechny klienty přes proxy (jen se zhoršením sítě), vrátí jejich počet"""
+        return self._proxy.disconnect_all() if self._proxy is not None else 0
+    
+    async def _tick(self) -> Tuple[float, float]:
+        """
+        Jeden tick simulace - vygenerování hodnot všech senzorů a publikace na server.
+        
+        Returns:
+            (doba generování, doba publikace) v sekundách
+        """
+        perf_counter = time.perf_counter
+        async with self._lock:
+            t_start = perf_counter()
+            now = time.time()
+            
+            # Aktualizovat hodnoty senzorů
+            sensor_states = self.sensor_states
+            for sensor_id, value in self._bank.generate(now):
+                sensor_states[sensor_id].current_value = value
+            if self._waveforms:
+                for sensor_id, value, block in self._waveforms.generate(now):
+                    state = sensor_states[sensor_id]
+                    state.current_value = value
+                    state.block = block
+            if self._overrides:
+                for sensor_id, override in self._overrides.items():
+                    state = sensor_states[sensor_id]
+                    state.current_value = coerce_value(
+                        state.sensor.data_type, override.apply(state.current_value, now)
+                    )
+            if self._formulas:
+                for sensor_id, value in self._formulas.evaluate(sensor_states):
+                    sensor_states[sensor_id].current_value = value
+            alarm_events = self._alarms.evaluate(sensor_states, now) if self._alarms else None
+            t_generated = perf_counter()
+            
+            # Publikovat na server
+            await self._update_values()
+            if alarm_events:
+                await self._emit_alarms(alarm_events)
+            t_published = perf_counter()
+        
+        return t_generated - t_start, t_published - t_generated
+    
     async def _update_loop(self) -> None:
         """Hlavní smyčka pro aktualizaci hodnot"""
         from app.config import SIMULATION_UPDATE_INTERVAL
         
+        # Potomci metrik se získají jednou - v ticku už jen zápis čísel
+        protocol = self.machine.protocol.value
+        tick_metric = TICK_DURATION.labels(self.machine.id, protocol)
+        generate_metric = GENERATE_DURATION.labels(protocol)
+        publish_metric = PUBLISH_DURATION.labels(protocol)
+        errors_metric = TICK_ERRORS.labels(protocol)
+        
         while not self._stop_event.is_set():
             try:
-                # Aktualizovat hodnoty senzorů
-                for sensor_id, state in self.sensor_states.items():
-                    state.current_value = state.generator.get_value()
+                generate_time, publish_time = await self._tick()
+                tick_time = generate_time + publish_time
                 
-                # Publikovat na server
-                await self._update_values()
+                generate_metric.observe(generate_time)
+                publish_metric.observe(publish_time)
+                tick_metric.observe(tick_time)
+                # Klouzavý průměr doby ticku pro plánování kapacity
+                if self.tick_cost is None:
+                    self.tick_cost = tick_time
+                else:
+                    self.tick_cost += TICK_COST_SMOOTHING * (tick_time - self.tick_cost)
+                self._first_update.set()
                 
             except Exception as e:
+                errors_metric.inc()
                 logger.error(f"Chyba v update loop: {e}")
             
-            await asyncio.sleep(SIMULATION_UPDATE_INTERVAL)
+            await asyncio.sleep(SIMULATION_UPDATE_INTERVAL * self.slowdown)
+    
+    async def wait_first_update(self, timeout: Optional[float] = None) -> bool:
+        """
+        Počká, až server vystaví první sadu hodnot.
+        
+        Returns:
+            True pokud byly hodnoty publikovány před vypršením timeoutu
+        """
+        try:
+            await asyncio.wait_for(self._first_update.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def get_active_alarms(self) -> List[AlarmEvent]:
+        """Vrátí aktivní alarmy stroje"""
+        return self._alarms.active()
+    
+    def get_client_count(self) -> int:
+        """Vrátí počet připojených klientů"""
+        return 0
+    
+    def export_state(self) -> MachineSnapshot:
+        """Zachytí stav generátorů, hodnot a procesního modelu pro snapshot"""
+        generators = {sensor_id: (start, state) for sensor_id, start, state in self._bank.export_state()}
+        snapshot = MachineSnapshot(self.machine.id)
+        process = self._bank.process
+        if process is not None:
+            snapshot.process_crc = config_crc(self._process_config)
+            snapshot.process = process.export_state()
+        no_generator = (math.nan, ())
+        for sensor_id, state in self.sensor_states.items():
+            start, values = generators.get(sensor_id, no_generator)
+            snapshot.sensors[sensor_id] = SensorSnapshot(
+                state.config_crc(), start, float(state.current_value), values
+            )
+        return snapshot
+    
+    def restore_state(self, snapshot: MachineSnapshot) -> int:
+        """
+        Obnoví stav ze snapshotu (před startem serveru).
+        Senzory se změněnou konfigurací a procesní model s jinými parametry začínají znovu.
+        
+        Returns:
+            Počet obnovených senzorů
+        """
+        process = self._bank.process
+        if process is not None and snapshot.process and snapshot.process_crc == config_crc(self._process_config):
+            if process.restore(snapshot.process):
+                self._bank.context.update(process.values)
+        
+        restored = 0
+        for sensor_id, saved in snapshot.sensors.items():
+            state = self.sensor_states.get(sensor_id)
+            if state is None or saved.crc != state.config_crc():
+                continue
+            if is_restorable(saved) and not self._bank.restore(sensor_id, saved.start, saved.state):
+                continue
+            state.current_value = coerce_value(state.sensor.data_type, saved.value)
+            restored += 1
+        return restored
     
     def get_state(self) -> SimulatorState:
         """Vrátí aktuální stav simulátoru"""
@@ -170,6 +619,7 @@ class BaseSimulator(ABC):
             status=self.status,
             error_message=self.error_message,
             sensors=self.sensor_states,
+            slowdown=self.slowdown,
         )
     
     def get_current_values(self) -> Dict[str, float]:
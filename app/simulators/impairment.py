@@ -0,0 +1,323 @@
+"""
+Simulace zhoršené sítě - zpoždění, výpadky odpovědí, odpojování, omezení pásma
+
+Stroj s profilem (Machine.impairment) nevystavuje server přímo: server naslouchá
+na volném portu na 127.0.0.1 a na adrese stroje běží TCP proxy, která odpovědi
+serveru (směr server -> klient) zpožďuje, zahazuje, pozdržuje a omezuje na
+zadanou propustnost. Požadavky klienta prochází beze změny.
+
+Odpovědi se rozdělují na zprávy podle hlavičky protokolu (Modbus MBAP,
+OPC UA message header), takže zahazuje a zpožďuje se vždy celá zpráva.
+Pořadí zpráv se zachovává - pozdržená odpověď zdrží i následující, jako
+u skutečného PLC s jedním komunikačním vláknem.
+
+Profil se dá měnit za běhu (ImpairmentProxy.profile), změna platí od další zprávy.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import socket
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from app.models import ProtocolType
+
+logger = logging.getLogger(__name__)
+
+# Kvantum odesílání při omezené propustnosti (podíl sekundy)
+BANDWIDTH_QUANTUM = 0.05
+
+
+@dataclass
+class ImpairmentProfile:
+    """Parametry zhoršení odpovědí serveru"""
+    latency_ms: float = 0.0           # přidané zpoždění každé odpovědi
+    jitter_ms: float = 0.0            # rovnoměrný rozptyl zpoždění ± jitter_ms
+    drop_rate: float = 0.0            # pravděpodobnost zahození odpovědi (0-1)
+    stall_rate: float = 0.0           # pravděpodobnost pozdržení odpovědi (0-1)
+    stall_ms: float = 0.0             # délka pozdržení
+    bandwidth: float = 0.0            # propustnost odpovědí v B/s (0 = neomezeno)
+    disconnect_interval: float = 0.0  # periodické odpojení všech klientů v s (0 = vypnuto)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ImpairmentProfile":
+        """Vytvoří profil ze zvalidovaného slovníku (chybějící položky = bez zhoršení)"""
+        return cls(**(data or {}))
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+    @property
+    def passthrough(self) -> bool:
+        """Profil odpovědi nijak nemění"""
+        return not (self.latency_ms or self.jitter_ms or self.drop_rate or self.stall_rate or self.bandwidth)
+
+
+_PROFILE_FIELDS = {field.name for field in fields(ImpairmentProfile)}
+_RATE_FIELDS = ("drop_rate", "stall_rate")
+
+
+def validate_impairment(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """
+    Zvaliduje profil zhoršení sítě.
+
+    Returns:
+        Profil s hodnotami převedenými na float, None = stroj bez proxy
+
+    Raises:
+        ValueError: Neznámá položka, nekonečná hodnota nebo hodnota mimo rozsah
+    """
+    if data is None:
+        return None
+    unknown = set(data) - _PROFILE_FIELDS
+    if unknown:
+        raise ValueError(f"Neznámé parametry zhoršení sítě: {', '.join(sorted(unknown))}")
+
+    result: Dict[str, float] = {}
+    for name, value in data.items():
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parametr zhoršení sítě '{name}' musí být číslo")
+        if not math.isfinite(value):
+            raise ValueError(f"Parametr zhoršení sítě '{name}' musí být konečné číslo")
+        if value < 0:
+            raise ValueError(f"Parametr zhoršení sítě '{name}' nesmí být záporný")
+        if name in _RATE_FIELDS and value > 1:
+            raise ValueError(f"Parametr zhoršení sítě '{name}' musí být v rozsahu 0-1")
+        result[name] = value
+    return result
+
+
+def _modbus_frame_size(buffer: bytearray) -> Optional[int]:
+    """Délka Modbus TCP rámce (MBAP hlavička 6 B + pole délky)"""
+    if len(buffer) < 6:
+        return None
+    return 6 + int.from_bytes(buffer[4:6], "big")
+
+
+def _opc_ua_frame_size(buffer: bytearray) -> Optional[int]:
+    """Délka OPC UA zprávy (typ 3 B + chunk 1 B + délka 4 B včetně hlavičky)"""
+    if len(buffer) < 8:
+        return None
+    return int.from_bytes(buffer[4:8], "little")
+
+
+_FRAMERS: Dict[ProtocolType, Callable[[bytearray], Optional[int]]] = {
+    ProtocolType.MODBUS: _modbus_frame_size,
+    ProtocolType.OPC_UA: _opc_ua_frame_size,
+}
+
+
+def supports_impairment(protocol: ProtocolType) -> bool:
+    """Proxy zhoršení sítě lze předřadit jen serverům (MQTT stroj je klient brokeru)"""
+    return protocol in _FRAMERS
+
+
+def free_local_port(host: str = "127.0.0.1") -> int:
+    """Najde volný TCP port pro interní server za proxy"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class ImpairmentStats:
+    """Počítadla proxy od jejího startu"""
+    connections: int = 0
+    active_connections: int = 0
+    responses: int = 0
+    dropped: int = 0
+    stalled: int = 0
+    disconnects: int = 0
+    bytes_sent: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _Connection:
+    """Jedno klientské spojení přes proxy"""
+
+    __slots__ = ("client", "upstream", "queue", "last_delivery")
+
+    def __init__(self, client: asyncio.StreamWriter, upstream: asyncio.StreamWriter):
+        self.client = client
+        self.upstream = upstream
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.last_delivery = 0.0  # čas doručení poslední naplánované odpovědi (loop.time)
+
+    def abort(self) -> None:
+        """Tvrdě ukončí obě strany spojení"""
+        self.client.transport.abort()
+        self.upstream.transport.abort()
+
+
+class ImpairmentProxy:
+    """TCP proxy se zhoršením odpovědí před serverem jednoho stroje"""
+
+    def __init__(
+        self,
+        listen: Tuple[str, int],
+        target: Tuple[str, int],
+        protocol: ProtocolType,
+        profile: ImpairmentProfile,
+    ):
+        self.listen = listen
+        self.target = target
+        self.profile = profile
+        self.stats = ImpairmentStats()
+        self._frame_size = _FRAMERS.get(protocol)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[_Connection] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._disconnect_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Začne naslouchat na adrese stroje"""
+        self._server = await asyncio.start_server(self._handle, *self.listen)
+        self._disconnect_task = asyncio.create_task(self._disconnect_loop())
+        logger.info(
+            f"Proxy zhoršení sítě {self.listen[0]}:{self.listen[1]} -> {self.target[0]}:{self.target[1]}"
+        )
+
+    async def stop(self) -> None:
+        """Přestane naslouchat a ukončí všechna spojení"""
+        if self._disconnect_task:
+            self._disconnect_task.cancel()
+            self._disconnect_task = None
+        if self._server:
+            self._server.close()
+            self._server = None
+        # Přerušená spojení ukončí obsluhu sama (zrušení tasku obsluhy asyncio.start_server
+        # by při dokončení ohlásil jako chybu callbacku)
+        for connection in list(self._connections):
+            connection.abort()
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=1.0)
+
+    def disconnect_all(self) -> int:
+        """Odpojí všechny klienty (server i proxy běží dál), vrátí počet spojení"""
+        connections = list(self._connections)
+        for connection in connections:
+            connection.abort()
+        self.stats.disconnects += len(connections)
+        return len(connections)
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        """Obslouží jedno klientské spojení"""
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(*self.target)
+        except OSError as e:
+            logger.warning(f"Proxy: server {self.target[0]}:{self.target[1]} nedostupný: {e}")
+            client_writer.transport.abort()
+            self._tasks.discard(task)
+            return
+
+        connection = _Connection(client_writer, upstream_writer)
+        self._connections.add(connection)
+        self.stats.connections += 1
+        self.stats.active_connections = len(self._connections)
+        workers = [
+            asyncio.create_task(self._forward(client_reader, upstream_writer)),
+            asyncio.create_task(self._receive(upstream_reader, connection)),
+            asyncio.create_task(self._send(connection)),
+        ]
+        try:
+            await asyncio.wait(workers, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            connection.abort()
+            self._connections.discard(connection)
+            self.stats.active_connections = len(self._connections)
+            self._tasks.discard(task)
+
+    @staticmethod
+    async def _forward(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Požadavky klienta beze změny"""
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+
+    async def _receive(self, reader: asyncio.StreamReader, connection: _Connection) -> None:
+        """Rozdělí odpovědi serveru na zprávy a naplánuje jejich doručení"""
+        buffer = bytearray()
+        frame_size = self._frame_size
+        while data := await reader.read(65536):
+            buffer += data
+            while buffer:
+                size = frame_size(buffer) if frame_size else len(buffer)
+                if size is None:
+                    break
+                if size <= 0:
+                    size = len(buffer)  # neplatná hlavička - předat, co je k dispozici
+                if len(buffer) < size:
+                    break
+                frame = bytes(buffer[:size])
+                del buffer[:size]
+                self._schedule(connection, frame)
+
+    def _schedule(self, connection: _Connection, frame: bytes) -> None:
+        """Rozhodne o osudu odpovědi podle aktuálního profilu"""
+        profile = self.profile
+        stats = self.stats
+        stats.responses += 1
+        if profile.passthrough and connection.queue.empty():
+            connection.client.write(frame)
+            stats.bytes_sent += len(frame)
+            return
+        if profile.drop_rate and random.random() < profile.drop_rate:
+            stats.dropped += 1
+            return
+
+        delay = profile.latency_ms
+        if profile.jitter_ms:
+            delay += random.uniform(-profile.jitter_ms, profile.jitter_ms)
+        if profile.stall_rate and random.random() < profile.stall_rate:
+            delay += profile.stall_ms
+            stats.stalled += 1
+        deliver_at = max(asyncio.get_running_loop().time() + max(delay, 0.0) / 1000, connection.last_delivery)
+        connection.last_delivery = deliver_at
+        connection.queue.put_nowait((deliver_at, frame))
+
+    async def _send(self, connection: _Connection) -> None:
+        """Doručuje naplánované odpovědi v pořadí, s omezením propustnosti"""
+        loop = asyncio.get_running_loop()
+        writer = connection.client
+        stats = self.stats
+        while True:
+            deliver_at, frame = await connection.queue.get()
+            wait = deliver_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            bandwidth = self.profile.bandwidth
+            if not bandwidth:
+                writer.write(frame)
+            else:
+                quantum = max(1, int(bandwidth * BANDWIDTH_QUANTUM))
+                for offset in range(0, len(frame), quantum):
+                    chunk = frame[offset:offset + quantum]
+                    writer.write(chunk)
+                    await asyncio.sleep(len(chunk) / bandwidth)
+            stats.bytes_sent += len(frame)
+            await writer.drain()
+
+    async def _disconnect_loop(self) -> None:
+        """Periodicky odpojuje klienty podle profilu (interval se čte znovu v každém cyklu)"""
+        while True:
+            interval = self.profile.disconnect_interval
+            if not interval:
+                await asyncio.sleep(1.0)
+                continue
+            await asyncio.sleep(interval)
+            if self.profile.disconnect_interval:
+                count = self.disconnect_all()
+                if count:
+                    logger.info(f"Proxy {self.listen[0]}:{self.listen[1]}: odpojeno {count} klientů")
@@ -2,18 +2,56 @@
 SimulationManager - správa běžících simulací
 """
 
+import asyncio
 import logging
-from typing import Dict, Optional, List
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, List, Tuple
 from sqlmodel import Session, select
 
-from app.models import Machine, Sensor, ProtocolType
+from app.config import CAPACITY_QUEUE_INTERVAL
+from app.models import Machine, MachinePriority, Sensor, ProtocolType, utc_now
+from app.services.alarms import AlarmEvent
+from app.services.capacity import AdmissionDecision, capacity_planner
+from app.services.metrics import Gauge, registry
+from app.services.snapshot import MachineSnapshot, Snapshot
 from app.simulators.base import BaseSimulator, SimulatorStatus, SimulatorState
-from app.simulators.opc_ua import OpcUaSimulator
-from app.simulators.modbus_tcp import ModbusTcpSimulator
+from app.simulators.registry import get_simulator_class, is_loaded
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class StartupProgress:
+    """Průběh automatického spouštění strojů po startu aplikace"""
+    total: int = 0
+    started: int = 0
+    failed: int = 0
+    queued: int = 0
+    in_progress: bool = False
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    failed_ids: List[int] = field(default_factory=list)
+    
+    @property
+    def complete(self) -> bool:
+        """Autostart doběhl (nebo nebyl vůbec spuštěn)"""
+        return not self.in_progress
+    
+    def to_dict(self) -> dict:
+        """Převede průběh na slovník pro API"""
+        data = asdict(self)
+        data["complete"] = self.complete
+        return data
+
+
+def _endpoint(machine: Machine) -> tuple:
+    """Parametry stroje, jejichž změna vyžaduje restart serveru"""
+    return (machine.name, machine.protocol, machine.host, machine.port, machine.protocol_settings)
+
+
 class SimulationManager:
     """
     Singleton manager pro správu všech běžících simulací.
@@ -32,43 +70,343 @@ class SimulationManager:
     def __init__(self):
         if not self._initialized:
             self._simulators: Dict[int, BaseSimulator] = {}
+            self.startup_progress = StartupProgress()
+            # Start aplikace proběhl (autostart je naplánovaný na pozadí) - do té doby /ready vrací 503
+            self.ready = False
+            # Stroje ze snapshotu, které autostart ještě nespustil (zůstávají v dalším snapshotu)
+            self._pending_restore: Dict[int, MachineSnapshot] = {}
+            # Starty čekající na volnou kapacitu (režim "queue") v pořadí požadavků
+            self._queue: "OrderedDict[int, Tuple[Machine, List[Sensor], Optional[MachineSnapshot]]]" = OrderedDict()
+            # Důvod posledního odmítnutého startu (režim "refuse")
+            self._rejected: Dict[int, str] = {}
+            # Zátěž přijatých strojů, jejichž server se právě spouští (machine_id -> zátěž) -
+            # souběžné starty (dávky autostartu) se posuzují i proti sobě navzájem
+            self._reserved: Dict[int, Tuple[float, float, int]] = {}
+            # Periodické zpracování fronty - kapacita se uvolní i bez zastavení stroje
+            # (chyba simulátoru, levnější ticky než odhad, přepočet modelu)
+            self._queue_task: Optional[asyncio.Task] = None
             self._initialized = True
             logger.info("SimulationManager inicializován")
     
-    async def start_simulation(self, machine: Machine, sensors: List[Sensor]) -> bool:
+    async def start_simulation(
+        self,
+        machine: Machine,
+        sensors: List[Sensor],
+        restore: Optional[MachineSnapshot] = None,
+    ) -> bool:
         """
         Spustí simulaci pro daný stroj.
         
         Args:
             machine: Stroj k simulaci
             sensors: Seznam senzorů stroje
+            restore: Uložený stav generátorů (teplý restart), u běžící simulace se ignoruje
             
         Returns:
             True pokud se simulace úspěšně spustila
         """
         machine_id = machine.id
+        overrides = {}
+        self._rejected.pop(machine_id, None)
         
-        # Pokud již běží, zastavit
+        # Pokud již běží se stejným endpointem, jen živě aplikovat senzory
+        running = self._simulators.get(machine_id)
+        if (
+            running is not None
+            and running.status == SimulatorStatus.RUNNING
+            and _endpoint(running.machine) == _endpoint(machine)
+        ):
+            if running.apply_impairment(machine.impairment):
+                await running.apply_process_model(machine.process_model, machine.process_params)
+                await running.apply_sensors(sensors)
+                return True
+            # Přidání/odebrání proxy zhoršení sítě mění bind serveru - restart se zachováním
+            # stavu generátorů i překrytí hodnot běžícím scénářem
+            restore = restore or running.export_state()
+            overrides = running.get_overrides()
+        
+        # Nový start posoudí plánovač kapacity, restart běžícího stroje už je přijatý
+        if running is None or running.status != SimulatorStatus.RUNNING:
+            self._queue.pop(machine_id, None)
+            decision = self._admit(machine, sensors)
+            if not decision.admitted:
+                if capacity_planner.admission == "queue":
+                    self._queue[machine_id] = (machine, sensors, restore)
+                    logger.warning(f"Simulace {machine.name} čeká ve frontě na kapacitu: {decision.reason}")
+                else:
+                    self._rejected[machine_id] = f"Nedostatečná kapacita: {decision.reason}"
+                    logger.warning(f"Start simulace {machine.name} odmítnut: {decision.reason}")
+                return False
+        
+        # Jinak zastavit a spustit znovu
         if machine_id in self._simulators:
-            await self.stop_simulation(machine_id)
+            await self._stop(machine_id)
         
-        # Vytvořit správný typ simulátoru
-        if machine.protocol == ProtocolType.OPC_UA:
-            simulator = OpcUaSimulator(machine, sensors)
+        return await self._launch(machine, sensors, restore, overrides)
+    
+    async def _launch(
+        self,
+        machine: Machine,
+        sensors: List[Sensor],
+        restore: Optional[MachineSnapshot] = None,
+        overrides: Optional[dict] = None,
+    ) -> bool:
+        """Vytvoří a spustí simulátor stroje (bez posouzení kapacity), uvolní rezervaci kapacity"""
+        try:
+            return await self._start_simulator(machine, sensors, restore, overrides)
+        finally:
+            self._reserved.pop(machine.id, None)
+    
+    async def _start_simulator(
+        self,
+        machine: Machine,
+        sensors: List[Sensor],
+        restore: Optional[MachineSnapshot],
+        overrides: Optional[dict],
+    ) -> bool:
+        # Vytvořit správný typ simulátoru. Implementace protokolu se načte až při
+        # prvním použití - import ve vlákně, aby neblokoval běžící servery.
+        if is_loaded(machine.protocol):
+            simulator_class = get_simulator_class(machine.protocol)
         else:
-            simulator = ModbusTcpSimulator(machine, sensors)
+            simulator_class = await asyncio.to_thread(get_simulator_class, machine.protocol)
+        simulator = simulator_class(machine, sensors)
+        if restore is not None:
+            restored = simulator.restore_state(restore)
+            logger.debug(f"Simulace {machine.name}: obnoveno {restored}/{len(sensors)} senzorů ze snapshotu")
+        if overrides:
+            simulator.restore_overrides(overrides)
         
         # Spustit
         success = await simulator.start()
         
         if success:
-            self._simulators[machine_id] = simulator
+            self._simulators[machine.id] = simulator
             logger.info(f"Simulace {machine.name} spuštěna ({machine.protocol.value})")
         else:
             logger.error(f"Nepodařilo se spustit simulaci {machine.name}")
         
         return success
     
+    async def drain_queue(self) -> int:
+        """
+        Spustí stroje z fronty, které se vejdou do rozpočtu kapacity.
+        Fronta se zpracovává v pořadí - první nepřijatý stroj ji zastaví.
+        
+        Returns:
+            Počet spuštěných strojů
+        """
+        started = 0
+        while self._queue:
+            machine_id, (machine, sensors, restore) = next(iter(self._queue.items()))
+            if not self._admit(machine, sensors).admitted:
+                break
+            del self._queue[machine_id]
+            if await self._launch(machine, sensors, restore):
+                started += 1
+        return started
+    
+    def start_queue_drain(self, interval: float = CAPACITY_QUEUE_INTERVAL) -> None:
+        """Spustí periodické spouštění strojů z fronty, jakmile se vejdou do rozpočtu"""
+        if self._queue_task is None or self._queue_task.done():
+            self._queue_task = asyncio.create_task(self._drain_periodically(interval))
+    
+    async def stop_queue_drain(self) -> None:
+        """Zastaví periodické zpracování fronty"""
+        if self._queue_task:
+            self._queue_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._queue_task
+            self._queue_task = None
+    
+    async def _drain_periodically(self, interval: float) -> None:
+        """Smyčka periodického zpracování fronty"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self._queue:
+                continue
+            try:
+                started = await self.drain_queue()
+                if started:
+                    logger.info(f"Z fronty na kapacitu spuštěno {started} strojů, čeká {len(self._queue)}")
+            except Exception as e:
+                logger.error(f"Chyba zpracování fronty na kapacitu: {e}")
+    
+    def _admit(self, machine: Machine, sensors: List[Sensor]) -> AdmissionDecision:
+        """
+        Posoudí start stroje a přijatému rezervuje kapacitu do konce startu (_launch).
+        Mezi posouzením a rezervací nesmí být await - jinak by souběžné starty
+        viděly stejnou zátěž a přijaly se všechny.
+        """
+        reserved = [load for machine_id, load in self._reserved.items() if machine_id != machine.id]
+        decision = capacity_planner.admit(machine, len(sensors), self._running_simulators(), reserved)
+        if decision.admitted:
+            self._reserved[machine.id] = decision.load
+        return decision
+    
+    def _running_simulators(self) -> List[BaseSimulator]:
+        return [
+            simulator
+            for simulator in self._simulators.values()
+            if simulator.status in (SimulatorStatus.RUNNING, SimulatorStatus.STARTING)
+        ]
+    
+    async def autostart(
+        self,
+        machines: List[Tuple[Machine, List[Sensor]]],
+        batch_size: int,
+        batch_interval: float,
+        snapshot: Optional[Snapshot] = None,
+    ) -> StartupProgress:
+        """
+        Postupně spustí simulace zadaných strojů po dávkách.
+        
+        Stroje v jedné dávce startují souběžně, mezi dávkami se čeká
+        batch_interval sekund, aby najednou nenabíhaly stovky serverů.
+        
+        Args:
+            machines: Seznam dvojic (stroj, senzory stroje)
+            batch_size: Počet strojů spouštěných v jedné dávce
+            batch_interval: Pauza mezi dávkami (v sekundách)
+            snapshot: Snapshot z minulého běhu - stroje v něm navážou uloženým stavem
+            
+        Returns:
+            Výsledný průběh spouštění
+        """
+        batch_size = max(1, batch_size)
+        progress = StartupProgress(
+            total=len(machines),
+            in_progress=True,
+            started_at=utc_now(),
+        )
+        self.startup_progress = progress
+        logger.info(f"Autostart: spouštím {len(machines)} strojů po dávkách {batch_size}")
+        saved = snapshot.machines if snapshot is not None else {}
+        self._pending_restore = {
+            machine.id: saved[machine.id] for machine, _ in machines if machine.id in saved
+        }
+        
+        try:
+            for offset in range(0, len(machines), batch_size):
+                batch = machines[offset:offset + batch_size]
+                results = await asyncio.gather(
+                    *(
+                        self.start_simulation(machine, sensors, self._pending_restore.get(machine.id))
+                        for machine, sensors in batch
+                    ),
+                    return_exceptions=True,
+                )
+                
+                for (machine, _), result in zip(batch, results):
+                    self._pending_restore.pop(machine.id, None)
+                    if result is True:
+                        progress.started += 1
+                    elif machine.id in self._queue:
+                        progress.queued += 1
+                    else:
+                        progress.failed += 1
+                        progress.failed_ids.append(machine.id)
+                
+                if offset + batch_size < len(machines):
+                    await asyncio.sleep(batch_interval)
+        finally:
+            progress.in_progress = False
+            progress.finished_at = utc_now()
+        
+        logger.info(
+            f"Autostart dokončen: {progress.started} spuštěno, {progress.queued} ve frontě, {progress.failed} selhalo"
+        )
+        return progress
+    
+    async def apply_sensors(self, machine_id: int, sensors: List[Sensor]) -> Optional[Dict[str, List[int]]]:
+        """
+        Živě aplikuje změněnou sadu senzorů na běžící simulaci (bez restartu serveru).
+        
+        Returns:
+            Souhrn změn, nebo None pokud simulace neběží
+        """
+        simulator = self._simulators.get(machine_id)
+        if simulator is None:
+            return None
+        
+        return await simulator.apply_sensors(sensors)
+    
+    async def apply_process_model(self, machine: Machine) -> bool:
+        """
+        Živě aplikuje procesní model stroje na běžící simulaci.
+        
+        Returns:
+            False pokud simulace neběží
+        """
+        simulator = self._simulators.get(machine.id)
+        if simulator is None:
+            return False
+        
+        await simulator.apply_process_model(machine.process_model, machine.process_params)
+        return True
+    
+    async def apply_impairment(self, machine: Machine) -> bool:
+        """
+        Živě aplikuje profil zhoršení sítě na běžící simulaci.
+        Zapnutí nebo vypnutí proxy restartuje server, generátory navážou uloženým stavem.
+        
+        Returns:
+            False pokud simulace neběží
+        """
+        if not self.is_running(machine.id):
+            return False
+        
+        return await self.start_simulation(machine, self._simulators[machine.id].sensors)
+    
+    async def apply_protocol_settings(self, machine: Machine) -> bool:
+        """
+        Aplikuje změněná nastavení protokolu na běžící simulaci.
+        Server (spojení s brokerem) se restartuje, generátory navážou uloženým stavem.
+        
+        Returns:
+            False pokud simulace neběží
+        """
+        simulator = self._simulators.get(machine.id)
+        if simulator is None or simulator.status != SimulatorStatus.RUNNING:
+            return False
+        if simulator.machine.protocol_settings == machine.protocol_settings:
+            return True
+        
+        return await self.start_simulation(machine, simulator.sensors, simulator.export_state())
+    
+    def apply_priority(self, machine: Machine) -> bool:
+        """
+        Převezme změněnou prioritu stroje do běžící simulace. Kritický stroj se hned
+        vrátí na jmenovitou rychlost, ostatní upraví regulátor zátěže v další periodě.
+        
+        Returns:
+            False pokud simulace neběží
+        """
+        simulator = self._simulators.get(machine.id)
+        if simulator is None:
+            return False
+        
+        simulator.machine.priority = machine.priority
+        if machine.priority == MachinePriority.CRITICAL:
+            simulator.slowdown = 1
+        return True
+    
+    def disconnect_clients(self, machine_id: int) -> int:
+        """Odpojí klienty stroje přes proxy zhoršení sítě, vrátí jejich počet"""
+        simulator = self._simulators.get(machine_id)
+        return simulator.disconnect_clients() if simulator is not None else 0
+    
+    async def refresh_sensors(self, session: Session, machine_ids: Iterable[int]) -> None:
+        """Načte aktuální senzory z databáze a živě je aplikuje na běžící simulace daných strojů"""
+        for machine_id in set(machine_ids):
+            if machine_id not in self._simulators:
+                continue
+            
+            sensors = session.exec(
+                select(Sensor).where(Sensor.machine_id == machine_id).order_by(Sensor.id)
+            ).all()
+            await self.apply_sensors(machine_id, list(sensors))
+    
     async def stop_simulation(self, machine_id: int) -> bool:
         """
         Zastaví simulaci pro daný stroj.
@@ -79,10 +417,24 @@ class SimulationManager:
         Returns:
             True pokud se simulace úspěšně zastavila
         """
+        self._pending_restore.pop(machine_id, None)
+        self._rejected.pop(machine_id, None)
+        if self._queue.pop(machine_id, None) is not None:
+            logger.info(f"Stroj {machine_id} odebrán z fronty na kapacitu")
+            return True
         if machine_id not in self._simulators:
             logger.warning(f"Simulace pro stroj {machine_id} neběží")
             return True
         
+        success = await self._stop(machine_id)
+        # Uvolněná kapacita - spustit čekající stroje
+        if success and self._queue:
+            await self.drain_queue()
+        
+        return success
+    
+    async def _stop(self, machine_id: int) -> bool:
+        """Zastaví simulátor stroje (bez zpracování fronty)"""
         simulator = self._simulators[machine_id]
         success = await simulator.stop()
         
@@ -94,6 +446,7 @@ class SimulationManager:
     
     async def stop_all(self) -> None:
         """Zastaví všechny běžící simulace"""
+        self._queue.clear()
         machine_ids = list(self._simulators.keys())
         
         for machine_id in machine_ids:
@@ -101,8 +454,22 @@ class SimulationManager:
         
         logger.info("Všechny simulace zastaveny")
     
+    def capture_snapshot(self) -> Snapshot:
+        """
+        Zachytí běžící simulace a stav jejich generátorů.
+        Stroje ze snapshotu, které autostart zatím nespustil, se převezmou beze změny.
+        """
+        snapshot = Snapshot()
+        snapshot.machines.update(self._pending_restore)
+        for machine_id, simulator in self._simulators.items():
+            if simulator.status == SimulatorStatus.RUNNING:
+                snapshot.machines[machine_id] = simulator.export_state()
+        return snapshot
+    
     def get_status(self, machine_id: int) -> SimulatorStatus:
         """Vrátí stav simulace pro daný stroj"""
+        if machine_id in self._queue:
+            return SimulatorStatus.QUEUED
         if machine_id not in self._simulators:
             return SimulatorStatus.STOPPED
         
@@ -130,20 +497,106 @@ class SimulationManager:
             if sim.status == SimulatorStatus.RUNNING
         ]
     
+    def get_running_simulators(self) -> List[BaseSimulator]:
+        """Vrátí instance všech běžících simulátorů"""
+        return [sim for sim in self._simulators.values() if sim.status == SimulatorStatus.RUNNING]
+    
+    def get_simulator(self, machine_id: int) -> Optional[BaseSimulator]:
+        """Vrátí instanci simulátoru pro daný stroj"""
+        return self._simulators.get(machine_id)
+    
     def get_error_message(self, machine_id: int) -> Optional[str]:
-        """Vrátí chybovou zprávu pokud simulace selhala"""
+        """Vrátí chybovou zprávu pokud simulace selhala (nebo byl start odmítnut pro kapacitu)"""
         if machine_id not in self._simulators:
-            return None
+            return self._rejected.get(machine_id)
         
         return self._simulators[machine_id].error_message
     
+    def get_queued(self) -> List[int]:
+        """Vrátí ID strojů čekajících na kapacitu v pořadí fronty"""
+        return list(self._queue)
+    
+    def capacity_status(self) -> dict:
+        """Odhad zátěže a rezerva kapacity běžících simulací pro API a dashboard"""
+        status = capacity_planner.status(self._running_simulators(), self._reserved.values())
+        status["queued"] = self.get_queued()
+        status["degraded"] = sum(1 for simulator in self._simulators.values() if simulator.slowdown > 1)
+        return status
+    
     def is_running(self, machine_id: int) -> bool:
         """Zjistí zda simulace běží"""
         return (
             machine_id in self._simulators
             and self._simulators[machine_id].status == SimulatorStatus.RUNNING
         )
+    
+    def get_active_alarms(self, machine_id: Optional[int] = None) -> List[AlarmEvent]:
+        """Vrátí aktivní alarmy všech simulací (nebo jednoho stroje)"""
+        simulators = (
+            [self._simulators[machine_id]] if machine_id in self._simulators
+            else [] if machine_id is not None
+            else self._simulators.values()
+        )
+        return [event for simulator in simulators for event in simulator.get_active_alarms()]
+    
+    def collect_metrics(self) -> Dict[str, Dict[Tuple[str], float]]:
+        """
+        Spočítá stavové metriky běžících simulací po protokolech.
+        Volá se až při scrapu /metrics, tick simulátorů nezatěžuje.
+        """
+        running: Dict[Tuple[str], float] = {(protocol.value,): 0 for protocol in ProtocolType}
+        sensors: Dict[Tuple[str], float] = dict(running)
+        clients: Dict[Tuple[str], float] = dict(running)
+        alarms: Dict[Tuple[str], float] = dict(running)
+        
+        for simulator in self._simulators.values():
+            if simulator.status != SimulatorStatus.RUNNING:
+                continue
+            key = (simulator.machine.protocol.value,)
+            running[key] += 1
+            sensors[key] += len(simulator.sensor_states)
+            clients[key] += simulator.get_client_count()
+            alarms[key] += len(simulator.get_active_alarms())
+        
+        return {"running": running, "sensors": sensors, "clients": clients, "alarms": alarms}
 
 
 # Globální instance
 simulation_manager = SimulationManager()
+
+SIMULATORS_RUNNING = registry.register(Gauge(
+    "plc_sim_simulators_running",
+    "Počet běžících simulátorů",
+    ("protocol",),
+))
+SENSORS = registry.register(Gauge(
+    "plc_sim_sensors",
+    "Počet senzorů v běžících simulátorech",
+    ("protocol",),
+))
+CONNECTED_CLIENTS = registry.register(Gauge(
+    "plc_sim_connected_clients",
+    "Počet připojených klientů",
+    ("protocol",),
+))
+ACTIVE_ALARMS = registry.register(Gauge(
+    "plc_sim_active_alarms",
+    "Počet aktivních limitních alarmů",
+    ("protocol",),
+))
+
+
+def _collect_simulator_metrics() -> None:
+    """Nastaví stavová měřidla simulací - jeden průchod simulátory za scrape"""
+    metrics = simulation_manager.collect_metrics()
+    for gauge, name in (
+        (SIMULATORS_RUNNING, "running"),
+        (SENSORS, "sensors"),
+        (CONNECTED_CLIENTS, "clients"),
+        (ACTIVE_ALARMS, "alarms"),
+    ):
+        for key, value in metrics[name].items():
+            gauge.labels(*key).set(value)
+
+
+registry.add_collector(_collect_simulator_metrics)
@@ -3,10 +3,9 @@ Modbus TCP Simulátor
 Používá knihovnu pymodbus v3.7+
 """
 
-import asyncio
 import logging
 import struct
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 
 from pymodbus.datastore import (
     ModbusServerContext,
@@ -16,10 +15,22 @@ from pymodbus.datastore import (
 from pymodbus.server import ModbusTcpServer
 
 from app.models import Machine, Sensor, DataType
-from app.simulators.base import BaseSimulator
+from app.services.alarms import AlarmEvent, AlarmLevel
+from app.services.waveforms import waveform_samples
+from app.simulators.base import BaseSimulator, SensorChanges
 
 logger = logging.getLogger(__name__)
 
+# Stavové slovo alarmu v input registru: bit0 HI, bit1 HIHI, bit2 LO, bit3 LOLO
+# (HIHI zahrnuje i překročení HI, LOLO i podkročení LO)
+ALARM_STATUS_BITS = {
+    AlarmLevel.NORMAL: 0,
+    AlarmLevel.HI: 0b0001,
+    AlarmLevel.HIHI: 0b0011,
+    AlarmLevel.LO: 0b0100,
+    AlarmLevel.LOLO: 0b1100,
+}
+
 
 class ModbusTcpSimulator(BaseSimulator):
     """
@@ -31,6 +42,13 @@ class ModbusTcpSimulator(BaseSimulator):
     - BOOL: 1 registr (0 nebo 1)
     
     Registry jsou přiřazovány sekvenčně od adresy 0.
+    
+    Průběh (waveform) má za 2 registry RMS blok N registrů se vzorky
+    (uint16, rozsah min_value..max_value škálovaný na 0..65535).
+    
+    Senzory s alarmy mají na počáteční adrese svých registrů navíc
+    stavové slovo alarmu v input registru (FC4, viz ALARM_STATUS_BITS)
+    a discrete input (FC2) = alarm aktivní.
     """
     
     def __init__(self, machine: Machine, sensors: List[Sensor]):
@@ -40,6 +58,38 @@ class ModbusTcpSimulator(BaseSimulator):
         self._register_map: Dict[int, tuple] = {}  # sensor_id -> (start_addr, num_registers)
         self._current_address = 0
     
+    @staticmethod
+    def _register_count(sensor: Sensor) -> int:
+        """Počet registrů podle datového typu"""
+        samples = waveform_samples(sensor)
+        if samples is not None:
+            return 2 + samples  # RMS (float) + blok vzorků
+        if sensor.data_type == DataType.FLOAT:
+            return 2  # 32-bit float = 2x 16-bit registry
+        return 1  # INT a BOOL = 1 registr
+    
+    def _allocate_registers(self, sensor: Sensor) -> Tuple[int, int]:
+        """
+        Přiřadí senzoru rozsah registrů.
+        Senzor s definovanou adresou ji dostane, ostatní se řadí za poslední obsazený registr.
+        """
+        # Pokud má senzor definovanou adresu, použij ji
+        if sensor.register_address is not None:
+            start_addr = sensor.register_address
+        else:
+            start_addr = self._current_address
+        
+        num_registers = self._register_count(sensor)
+        self._register_map[sensor.id] = (start_addr, num_registers)
+        
+        # Posunout adresu pro další senzor
+        self._current_address = max(self._current_address, start_addr + num_registers)
+        
+        logger.debug(
+            f"Modbus: Senzor {sensor.name} -> registry {start_addr}-{start_addr + num_registers - 1}"
+        )
+        return start_addr, num_registers
+    
     def _calculate_register_map(self) -> int:
         """
         Vypočítá mapování senzorů na registry.
@@ -47,32 +97,52 @@ class ModbusTcpSimulator(BaseSimulator):
         """
         self._current_address = 0
         
-        for sensor_id, state in self.sensor_states.items():
-            sensor = state.sensor
-            
-            # Pokud má senzor definovanou adresu, použij ji
-            if sensor.register_address is not None:
-                start_addr = sensor.register_address
-            else:
-                start_addr = self._current_address
-            
-            # Počet registrů podle datového typu
-            if sensor.data_type == DataType.FLOAT:
-                num_registers = 2  # 32-bit float = 2x 16-bit registry
-            else:
-                num_registers = 1  # INT a BOOL = 1 registr
-            
-            self._register_map[sensor_id] = (start_addr, num_registers)
-            
-            # Posunout adresu pro další senzor
-            self._current_address = max(self._current_address, start_addr + num_registers)
-            
-            logger.debug(
-                f"Modbus: Senzor {sensor.name} -> registry {start_addr}-{start_addr + num_registers - 1}"
-            )
+        for state in self.sensor_states.values():
+            self._allocate_registers(state.sensor)
         
         return self._current_address
     
+    def _ensure_capacity(self, total_registers: int) -> None:
+        """Zvětší datové bloky na místě, pokud mapa registrů přerostla jejich velikost"""
+        for block in self._context.store.values():
+            missing = total_registers + 10 - len(block.values)
+            if missing > 0:
+                block.values.extend([block.default_value] * missing)
+    
+    async def _apply_changes(self, changes: SensorChanges) -> None:
+        """
+        Živě upraví mapu registrů.
+        Adresy nezměněných senzorů zůstávají, nové senzory se přidávají na konec.
+        """
+        if not self._context:
+            return
+        
+        for state in changes.removed:
+            start_addr, num_registers = self._register_map.pop(state.sensor.id)
+            self._context.setValues(3, start_addr, [0] * num_registers)
+            self._clear_alarm_status(start_addr)
+        
+        for old, new in changes.changed:
+            start_addr, num_registers = self._register_map[old.sensor.id]
+            same_slot = (
+                new.sensor.register_address == old.sensor.register_address
+                and self._register_count(new.sensor) == num_registers
+            )
+            if not same_slot:
+                self._context.setValues(3, start_addr, [0] * num_registers)
+                self._clear_alarm_status(start_addr)
+                del self._register_map[old.sensor.id]
+                self._allocate_registers(new.sensor)
+        
+        for state in changes.added:
+            self._allocate_registers(state.sensor)
+        
+        self._ensure_capacity(self._current_address)
+        
+        # Přesunuté senzory si alarm ponechávají - stav se zapíše na novou adresu
+        for _, new in changes.changed:
+            self._write_alarm_status(new.sensor.id, self._alarms.level(new.sensor.id))
+    
     async def _start_server(self) -> None:
         """Spustí Modbus TCP server"""
         # Vypočítat mapování registrů
@@ -98,15 +168,12 @@ class ModbusTcpSimulator(BaseSimulator):
         # Vytvořit a spustit server
         self._server = ModbusTcpServer(
             context=server_context,
-            address=(self.machine.host, self.machine.port),
+            address=self.bind_address,
         )
         
-        # Spustit server v background
+        # Spustit server v background - po návratu už server naslouchá
         await self._server.serve_forever(background=True)
         
-        # Krátké čekání na start serveru
-        await asyncio.sleep(0.3)
-        
         logger.info(f"Modbus TCP server spuštěn: {self.machine.host}:{self.machine.port}")
     
     async def _stop_server(self) -> None:
@@ -134,6 +201,8 @@ class ModbusTcpSimulator(BaseSimulator):
             
             start_addr, num_registers = self._register_map[sensor_id]
             values = self._value_to_registers(state.current_value, state.sensor.data_type)
+            if state.block is not None:
+                values += self._block_to_registers(state.block, state.sensor)
             
             try:
                 # Zápis do holding registrů (function code 3)
@@ -141,6 +210,44 @@ class ModbusTcpSimulator(BaseSimulator):
             except Exception as e:
                 logger.error(f"Chyba při zápisu do Modbus registru: {e}")
     
+    async def _publish_alarms(self, events: List[AlarmEvent]) -> None:
+        """Zapíše stavové slovo a bit alarmu u senzorů, kterých se přechod týká"""
+        if not self._context:
+            return
+        
+        for event in events:
+            self._write_alarm_status(event.sensor_id, event.level)
+    
+    def _write_alarm_status(self, sensor_id: int, level: AlarmLevel) -> None:
+        """Zapíše stav alarmu senzoru do input registru a discrete inputu"""
+        if sensor_id not in self._register_map:
+            return
+        start_addr, _ = self._register_map[sensor_id]
+        self._context.setValues(4, start_addr, [ALARM_STATUS_BITS[level]])
+        self._context.setValues(2, start_addr, [level != AlarmLevel.NORMAL])
+    
+    def _clear_alarm_status(self, start_addr: int) -> None:
+        """Vynuluje stav alarmu na uvolněné adrese"""
+        self._context.setValues(4, start_addr, [0])
+        self._context.setValues(2, start_addr, [False])
+    
+    def get_client_count(self) -> int:
+        """Vrátí počet připojených Modbus klientů"""
+        if self._server is None:
+            return 0
+        return len(self._server.active_connections)
+    
+    @staticmethod
+    def _block_to_registers(block: List[float], sensor: Sensor) -> List[int]:
+        """Převede blok vzorků na uint16 registry (min_value -> 0, max_value -> 65535)"""
+        low = sensor.min_value
+        span = sensor.max_value - low
+        scale = 65535 / span if span > 0 else 0.0
+        return [
+            0 if raw < 0 else 65535 if raw > 65535 else raw
+            for raw in [int((value - low) * scale) for value in block]
+        ]
+    
     def _value_to_registers(self, value: float, data_type: DataType) -> List[int]:
         """
         Převede hodnotu na Modbus registry.
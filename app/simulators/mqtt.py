@@ -0,0 +1,338 @@
+"""
+MQTT Simulátor
+Publikuje hodnoty stroje na MQTT broker - jedna zpráva na stroj a tick.
+
+Stroj je klient: host a port stroje jsou adresa brokeru. Kódování zpráv
+(Machine.protocol_settings, viz app.simulators.protocol_settings):
+
+- json: {prefix}/{stroj}/data      {"timestamp": ms, "seq": n, "values": {...}, "samples": {...}}
+        {prefix}/{stroj}/status    "online" / "offline" (retained, offline i jako Last Will)
+        {prefix}/{stroj}/alarms    přechody alarmů
+- sparkplug: Sparkplug B - NBIRTH s názvy a aliasy metrik, NDATA jen s aliasy,
+        NDEATH jako Last Will (bdSeq). Alarmy jsou metriky "Alarms/<senzor>".
+
+Při report_by_exception se publikují jen hodnoty změněné o více než
+deadband, jednou za refresh_interval celá sada. Bloky vzorků průběhů
+(waveform) se posílají vždy.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import suppress
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import MQTT_MAX_INFLIGHT, MQTT_RECONNECT_MAX, MQTT_RECONNECT_MIN
+from app.models import DataType, Machine, ProtocolType, Sensor
+from app.services.alarms import AlarmEvent
+from app.services.waveforms import WAVEFORM_TYPE
+from app.simulators import sparkplug
+from app.simulators.base import BaseSimulator, SensorChanges
+from app.simulators.mqtt_client import MqttClient, MqttError, Will
+from app.simulators.protocol_settings import resolve_protocol_settings
+
+logger = logging.getLogger(__name__)
+
+_CONVERTERS: Dict[DataType, Callable[[Any], Any]] = {
+    DataType.FLOAT: float,
+    DataType.INT: int,
+    DataType.BOOL: bool,
+}
+
+# Bod publikace: (sensor_id, název, převod hodnoty, necitlivost, metrika hodnoty, metrika bloku)
+Point = Tuple[int, str, Callable[[Any], Any], float, Optional[sparkplug.MetricEncoder], Optional[sparkplug.MetricEncoder]]
+
+
+class MqttSimulator(BaseSimulator):
+    """
+    MQTT klient publikující hodnoty senzorů v dávkách.
+
+    Zprávy se skládají z předpočítaných bodů publikace (_prepare), které se
+    přestaví až po změně senzorů. Aliasy Sparkplug metrik jsou odvozené
+    z ID senzoru, takže zůstávají stejné i po znovuzrození (rebirth).
+    """
+
+    def __init__(self, machine: Machine, sensors: List[Sensor]):
+        super().__init__(machine, sensors)
+        settings = resolve_protocol_settings(ProtocolType.MQTT, machine.protocol_settings)
+        self.settings = settings
+        self._sparkplug = settings["encoding"] == "sparkplug"
+        self._qos: int = settings["qos"]
+        self._rbe: bool = settings["report_by_exception"]
+        self._deadband: float = settings["deadband"]
+        self._refresh: float = settings["refresh_interval"]
+
+        node = sparkplug.sanitize_id(machine.name)
+        if self._sparkplug:
+            group = sparkplug.sanitize_id(settings["group_id"])
+            self._data_topic = sparkplug.topic(group, "NDATA", node)
+            self._birth_topic = sparkplug.topic(group, "NBIRTH", node)
+            self._death_topic = sparkplug.topic(group, "NDEATH", node)
+        else:
+            base = f"{settings['topic_prefix'].rstrip('/')}/{node}"
+            self._data_topic = f"{base}/data"
+            self._status_topic = f"{base}/status"
+            self._alarms_topic = f"{base}/alarms"
+
+        self._client: Optional[MqttClient] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._points: Optional[List[Point]] = None
+        self._alarm_metrics: Dict[int, sparkplug.MetricEncoder] = {}
+        self._last_sent: Dict[int, Any] = {}  # report-by-exception: naposledy publikované hodnoty
+        self._last_full = 0.0
+        self._needs_birth = True
+        self._seq = 0
+        self._bdseq = 0
+        self._next_bdseq = 0
+
+    def _prepare(self) -> None:
+        """Předpočítá body publikace a Sparkplug metriky z aktuálních senzorů"""
+        points: List[Point] = []
+        for sensor_id, state in self.sensor_states.items():
+            sensor = state.sensor
+            metric = block_metric = None
+            if self._sparkplug:
+                metric = sparkplug.MetricEncoder(
+                    sensor.name, sensor_id * 4, sparkplug.DATA_TYPES[sensor.data_type]
+                )
+                if sensor.simulation_type == WAVEFORM_TYPE:
+                    block_metric = sparkplug.MetricEncoder(
+                        f"{sensor.name}/samples", sensor_id * 4 + 1, sparkplug.SP_FLOAT_ARRAY
+                    )
+            deadband = self._deadband if sensor.data_type != DataType.BOOL else 0.0
+            points.append((sensor_id, sensor.name, _CONVERTERS[sensor.data_type], deadband, metric, block_metric))
+        self._points = points
+        self._alarm_metrics = {
+            sensor_id: sparkplug.MetricEncoder(f"Alarms/{name}", sensor_id * 4 + 2, sparkplug.SP_STRING)
+            for sensor_id, name in self._alarms.sensors().items()
+        } if self._sparkplug else {}
+
+    # -------------------------------------------------------------------------
+    # Spojení
+    # -------------------------------------------------------------------------
+
+    def _offline_message(self) -> tuple:
+        """Zpráva o odpojení stroje (topic, payload, qos, retain) - Last Will i při řádném zastavení"""
+        if self._sparkplug:
+            now_ms = int(time.time() * 1000)
+            death = sparkplug.payload(now_ms, [sparkplug.bdseq_metric(self._bdseq, now_ms)], None)
+            return self._death_topic, death, 1, False
+        return self._status_topic, b"offline", self._qos, True
+
+    def _will(self) -> Will:
+        """Last Will nového spojení - NDEATH nese bdSeq následujícího NBIRTH"""
+        if self._sparkplug:
+            self._bdseq = self._next_bdseq
+            self._next_bdseq = (self._bdseq + 1) % 256
+        return Will(*self._offline_message())
+
+    async def _connect(self) -> None:
+        """Připojí se k brokeru a ohlásí stroj (JSON status, Sparkplug NBIRTH v příštím ticku)"""
+        settings = self.settings
+        client = MqttClient(
+            settings["client_id"] or f"plcsim-{self.machine.id}",
+            keepalive=settings["keepalive"],
+            username=settings["username"] or None,
+            password=settings["password"] or None,
+            max_inflight=MQTT_MAX_INFLIGHT,
+        )
+        await client.connect(self.machine.host, self.machine.port, self._will())
+        if not self._sparkplug:
+            await client.publish(self._status_topic, b"online", self._qos, retain=True)
+        self._client = client
+        self._needs_birth = True
+        self._last_sent.clear()
+
+    def _reconnect_later(self) -> None:
+        """Po ztrátě spojení se v pozadí připojuje znovu (s prodlužující se pauzou)"""
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        """Pokusy o připojení do úspěchu nebo zastavení simulátoru"""
+        delay = MQTT_RECONNECT_MIN
+        while not self._stop_event.is_set():
+            await asyncio.sleep(delay)
+            if self._client is not None:
+                await self._client.disconnect()
+                self._client = None
+            try:
+                await self._connect()
+                logger.info(f"MQTT: {self.machine.name} znovu připojen k {self.machine.host}:{self.machine.port}")
+                return
+            except MqttError as e:
+                delay = min(delay * 2, MQTT_RECONNECT_MAX)
+                logger.warning(f"MQTT: {self.machine.name} - {e}, další pokus za {delay:g} s")
+
+    async def _publish(self, topic: str, payload: bytes, qos: Optional[int] = None, retain: bool = False) -> bool:
+        """Publikuje zprávu, při ztrátě spojení naplánuje nové připojení"""
+        client = self._client
+        if client is None or not client.connected:
+            self._reconnect_later()
+            return False
+        try:
+            await client.publish(topic, payload, self._qos if qos is None else qos, retain)
+            return True
+        except (MqttError, OSError) as e:
+            logger.warning(f"MQTT: {self.machine.name} - publikace selhala: {e}")
+            self._reconnect_later()
+            return False
+
+    # -------------------------------------------------------------------------
+    # BaseSimulator
+    # -------------------------------------------------------------------------
+
+    async def _start_server(self) -> None:
+        """Připojí se k MQTT brokeru"""
+        await self._connect()
+        logger.info(
+            f"MQTT klient {self.machine.name} připojen: {self.machine.host}:{self.machine.port} "
+            f"({'Sparkplug B' if self._sparkplug else 'JSON'})"
+        )
+
+    async def _stop_server(self) -> None:
+        """Ohlásí odpojení (offline / NDEATH) a odpojí se od brokeru"""
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reconnect_task
+            self._reconnect_task = None
+
+        client = self._client
+        if client is not None:
+            if client.connected:
+                # Korektní DISCONNECT Last Will nespustí - zpráva se posílá sama
+                with suppress(MqttError, OSError):
+                    await client.publish(*self._offline_message())
+            await client.disconnect()
+            self._client = None
+
+        logger.info(f"MQTT klient {self.machine.name} odpojen")
+
+    async def _apply_changes(self, changes: SensorChanges) -> None:
+        """Změna senzorů - body publikace se přestaví, Sparkplug uzel se znovu zrodí (NBIRTH)"""
+        for state in changes.removed:
+            self._last_sent.pop(state.sensor.id, None)
+        for old, _ in changes.changed:
+            self._last_sent.pop(old.sensor.id, None)
+        self._points = None
+        self._needs_birth = True
+
+    async def _update_values(self) -> None:
+        """Publikuje hodnoty stroje jednou zprávou"""
+        if self._client is None or not self._client.connected:
+            self._reconnect_later()
+            return
+        if self._points is None:
+            self._prepare()
+
+        now = time.time()
+        if self._sparkplug and self._needs_birth:
+            await self._publish_birth(now)
+            return
+
+        full = not self._rbe or (self._refresh > 0 and now - self._last_full >= self._refresh)
+        selected = self._select(full)
+        if not selected:
+            return
+
+        payload = self._encode_sparkplug(now, selected) if self._sparkplug else self._encode_json(now, selected)
+        if await self._publish(self._data_topic, payload) and full:
+            self._last_full = now
+
+    def _select(self, full: bool) -> List[Tuple[Point, Any, Optional[list]]]:
+        """Vybere hodnoty k publikaci (při report-by-exception jen změněné nad necitlivost)"""
+        states = self.sensor_states
+        rbe = self._rbe
+        last_sent = self._last_sent
+        selected = []
+        for point in self._points:
+            sensor_id = point[0]
+            state = states[sensor_id]
+            value = point[2](state.current_value)
+            block = state.block
+            if not rbe:
+                selected.append((point, value, block))
+                continue
+            if not full and block is None:
+                previous = last_sent.get(sensor_id)
+                if previous is not None and abs(value - previous) <= point[3]:
+                    continue
+            last_sent[sensor_id] = value
+            selected.append((point, value, block))
+        return selected
+
+    def _encode_json(self, now: float, selected: List[Tuple[Point, Any, Optional[list]]]) -> bytes:
+        values = {}
+        samples = {}
+        for point, value, block in selected:
+            values[point[1]] = value
+            if block is not None:
+                samples[point[1]] = block
+        self._seq += 1
+        message = {"timestamp": int(now * 1000), "seq": self._seq, "values": values}
+        if samples:
+            message["samples"] = samples
+        return json.dumps(message, separators=(",", ":")).encode()
+
+    def _encode_sparkplug(self, now: float, selected: List[Tuple[Point, Any, Optional[list]]]) -> bytes:
+        now_ms = int(now * 1000)
+        timestamp = sparkplug.timestamp_field(now_ms)
+        metrics = []
+        for point, value, block in selected:
+            metrics.append(point[4].data(value, timestamp))
+            if block is not None and point[5] is not None:
+                metrics.append(point[5].data(block, timestamp))
+        return sparkplug.payload(now_ms, metrics, self._next_seq())
+
+    def _next_seq(self) -> int:
+        """Sparkplug seq 0-255 (NBIRTH má 0)"""
+        self._seq = (self._seq + 1) % 256
+        return self._seq
+
+    async def _publish_birth(self, now: float) -> None:
+        """NBIRTH - všechny metriky s názvy, aliasy, typy a aktuálními hodnotami"""
+        now_ms = int(now * 1000)
+        timestamp = sparkplug.timestamp_field(now_ms)
+        states = self.sensor_states
+        metrics = [sparkplug.bdseq_metric(self._bdseq, now_ms)]
+        for sensor_id, _, convert, _, metric, block_metric in self._points:
+            state = states[sensor_id]
+            value = convert(state.current_value)
+            metrics.append(metric.birth(value, timestamp))
+            if block_metric is not None:
+                metrics.append(block_metric.birth(state.block or [], timestamp))
+            self._last_sent[sensor_id] = value
+        for sensor_id, metric in self._alarm_metrics.items():
+            metrics.append(metric.birth(self._alarms.level(sensor_id).value, timestamp))
+
+        self._seq = 0
+        if await self._publish(self._birth_topic, sparkplug.payload(now_ms, metrics, 0)):
+            self._needs_birth = False
+            self._last_full = now
+
+    async def _publish_alarms(self, events: List[AlarmEvent]) -> None:
+        """Publikuje přechody alarmů (JSON zpráva, u Sparkplug NDATA s metrikami Alarms/...)"""
+        if self._client is None or not self._client.connected:
+            return
+        if not self._sparkplug:
+            alarms = [{key: value for key, value in event.to_dict().items() if key != "id"} for event in events]
+            await self._publish(self._alarms_topic, json.dumps(alarms, separators=(",", ":")).encode())
+            return
+
+        if self._needs_birth:
+            return  # aktuální úrovně alarmů ponese NBIRTH
+        now_ms = int(time.time() * 1000)
+        timestamp = sparkplug.timestamp_field(now_ms)
+        metrics = [
+            self._alarm_metrics[event.sensor_id].data(event.level.value, timestamp)
+            for event in events
+            if event.sensor_id in self._alarm_metrics
+        ]
+        if metrics:
+            await self._publish(self._data_topic, sparkplug.payload(now_ms, metrics, self._next_seq()))
+
+    def get_client_count(self) -> int:
+        """Vrátí 1 při navázaném spojení s brokerem"""
+        return 1 if self._client is not None and self._client.connected else 0
@@ -0,0 +1,236 @@
+"""
+Minimální asyncio MQTT 3.1.1 klient pro publikaci hodnot
+
+Umí jen to, co simulátor potřebuje: CONNECT (s přihlášením a Last Will),
+PUBLISH s QoS 0/1, keepalive (PINGREQ) a DISCONNECT. Příchozí PUBLISH
+(odběry) nepodporuje. QoS 1 zprávy se nečekají jednotlivě - počet
+nepotvrzených zpráv omezuje okno max_inflight.
+"""
+
+import asyncio
+import logging
+import struct
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Typy paketů (horní 4 bity prvního bajtu)
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+CONNACK_ERRORS = {
+    1: "nepodporovaná verze protokolu",
+    2: "odmítnuté ID klienta",
+    3: "broker není dostupný",
+    4: "chybné jméno nebo heslo",
+    5: "klient nemá oprávnění",
+}
+
+
+class MqttError(ConnectionError):
+    """Chyba spojení s MQTT brokerem"""
+
+
+def encode_length(length: int) -> bytes:
+    """Zakóduje zbývající délku paketu (1-4 bajty po 7 bitech)"""
+    encoded = bytearray()
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        if length:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def encode_string(value: str) -> bytes:
+    """UTF-8 řetězec s 2bajtovou délkou"""
+    data = value.encode()
+    return struct.pack(">H", len(data)) + data
+
+
+@dataclass
+class Will:
+    """Zpráva, kterou broker publikuje při ztrátě spojení klienta"""
+    topic: str
+    payload: bytes
+    qos: int = 0
+    retain: bool = False
+
+
+class MqttClient:
+    """Spojení s MQTT brokerem"""
+
+    def __init__(
+        self,
+        client_id: str,
+        keepalive: int = 60,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        max_inflight: int = 1000,
+    ):
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.username = username
+        self.password = password
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tasks: list = []
+        self._next_id = 1
+        self._inflight: Set[int] = set()
+        self._window = asyncio.Semaphore(max_inflight)
+        self._connected = False
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    async def connect(self, host: str, port: int, will: Optional[Will] = None, timeout: float = 5.0) -> None:
+        """
+        Připojí se k brokeru (clean session).
+
+        Raises:
+            MqttError: Broker nedostupný nebo spojení odmítl
+        """
+        try:
+            self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise MqttError(f"MQTT broker {host}:{port} nedostupný: {e}") from e
+
+        flags = 0x02  # clean session
+        payload = encode_string(self.client_id)
+        if will is not None:
+            flags |= 0x04 | (will.qos << 3) | (0x20 if will.retain else 0)
+            payload += encode_string(will.topic) + struct.pack(">H", len(will.payload)) + will.payload
+        if self.username:
+            flags |= 0x80
+            payload += encode_string(self.username)
+            if self.password:
+                flags |= 0x40
+                payload += encode_string(self.password)
+        body = encode_string("MQTT") + bytes((4, flags)) + struct.pack(">H", self.keepalive) + payload
+        self._writer.write(bytes((CONNECT,)) + encode_length(len(body)) + body)
+
+        try:
+            header = await asyncio.wait_for(self._reader.readexactly(4), timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self._abort()
+            raise MqttError(f"MQTT broker {host}:{port} neodpověděl na CONNECT") from e
+        if header[0] != CONNACK or header[3] != 0:
+            self._abort()
+            reason = CONNACK_ERRORS.get(header[3], f"kód {header[3]}")
+            raise MqttError(f"MQTT broker {host}:{port} odmítl spojení: {reason}")
+
+        self._connected = True
+        self._tasks = [asyncio.create_task(self._read_loop())]
+        if self.keepalive:
+            self._tasks.append(asyncio.create_task(self._ping_loop()))
+
+    async def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False) -> None:
+        """
+        Odešle zprávu. U QoS 1 čeká jen při plném okně nepotvrzených zpráv.
+
+        Raises:
+            MqttError: Spojení není navázáno
+        """
+        if not self._connected:
+            raise MqttError("MQTT klient není připojen")
+        topic_bytes = encode_string(topic)
+        if qos:
+            await self._window.acquire()
+            packet_id = self._next_id
+            self._next_id = packet_id % 65535 + 1
+            self._inflight.add(packet_id)
+            variable = topic_bytes + struct.pack(">H", packet_id)
+        else:
+            variable = topic_bytes
+        first = PUBLISH | (qos << 1) | (1 if retain else 0)
+        length = len(variable) + len(payload)
+        packet = bytes((first,)) + encode_length(length) + variable
+        self._writer.write(packet)
+        self._writer.write(payload)
+        self.messages_sent += 1
+        self.bytes_sent += len(packet) + len(payload)
+        await self._writer.drain()
+
+    async def disconnect(self) -> None:
+        """Korektně ukončí spojení (broker nepublikuje Last Will)"""
+        if self._writer is None:
+            return
+        if self._connected:
+            with suppress(OSError):
+                self._writer.write(bytes((DISCONNECT, 0)))
+                await self._writer.drain()
+        self._connected = False
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self._writer.close()
+        with suppress(OSError):
+            await self._writer.wait_closed()
+        self._writer = None
+
+    def _abort(self) -> None:
+        if self._writer is not None:
+            self._writer.transport.abort()
+
+    def _lost(self, reason: str) -> None:
+        """Spojení se ztratilo - uvolní čekající publikace"""
+        if self._connected:
+            logger.warning(f"MQTT klient {self.client_id}: spojení ztraceno ({reason})")
+        self._connected = False
+        for _ in self._inflight:
+            self._window.release()
+        self._inflight.clear()
+
+    async def _read_loop(self) -> None:
+        """Čte potvrzení od brokeru"""
+        reader = self._reader
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length = 0
+                shift = 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+                if header[0] & 0xF0 == PUBACK and len(body) >= 2:
+                    packet_id = struct.unpack(">H", body[:2])[0]
+                    if packet_id in self._inflight:
+                        self._inflight.discard(packet_id)
+                        self._window.release()
+        except asyncio.IncompleteReadError:
+            self._lost("spojení uzavřeno brokerem")
+        except OSError as e:
+            self._lost(str(e))
+
+    async def _ping_loop(self) -> None:
+        """Keepalive - PINGREQ v polovině intervalu"""
+        while self._connected:
+            await asyncio.sleep(self.keepalive / 2)
+            if self._writer.transport.is_closing():
+                self._lost("spojení uzavřeno")
+                return
+            try:
+                self._writer.write(bytes((PINGREQ, 0)))
+                await self._writer.drain()
+            except OSError as e:
+                self._lost(str(e))
+                return
@@ -4,14 +4,29 @@ Používá knihovnu asyncua (opcua-asyncio)
 """
 
 import logging
+import time
 from typing import Dict, Optional, List
 from asyncua import Server, ua
+from asyncua.common.manage_nodes import delete_nodes
 
-from app.models import Machine, Sensor, DataType
-from app.simulators.base import BaseSimulator
+from app.models import Machine, Sensor, DataType, ProtocolType
+from app.services.alarms import AlarmEvent, AlarmLevel
+from app.services.waveforms import waveform_samples
+from app.simulators.base import BaseSimulator, SensorChanges, SensorState
+from app.simulators.opc_ua_history import BufferHistoryManager, HistoryBuffer, TagSeries
+from app.simulators.opc_ua_limits import ServerLimits, install_limits
+from app.simulators.protocol_settings import resolve_protocol_settings
 
 logger = logging.getLogger(__name__)
 
+# Pole události ExclusiveLevelAlarmType s limitem dané úrovně
+_LIMIT_FIELDS = {
+    AlarmLevel.HIHI: "HighHighLimit",
+    AlarmLevel.HI: "HighLimit",
+    AlarmLevel.LO: "LowLimit",
+    AlarmLevel.LOLO: "LowLowLimit",
+}
+
 
 class OpcUaSimulator(BaseSimulator):
     """
@@ -19,6 +34,19 @@ class OpcUaSimulator(BaseSimulator):
     
     Struktura adresního prostoru:
     Root → Objects → Machines → {machine_name} → {sensor_name}
+    Root → Objects → Machines → {machine_name} → Alarms → {sensor_name} (úroveň alarmu)
+    
+    Přechody alarmů se vysílají jako události ExclusiveLevelAlarmType
+    se zdrojem ve složce stroje.
+    
+    Proměnné senzorů jsou historizované (HistoryRead raw i agregace)
+    z kruhového bufferu v paměti, viz opc_ua_history.
+    
+    Výkonnostní limity serveru (intervaly, relace, fronty, chunky) se berou
+    z nastavení protokolu stroje, viz opc_ua_limits.
+    
+    Průběh (waveform) má pod proměnnou s RMS navíc pole vzorků posledního bloku:
+    ... → {sensor_name} → Samples (Float[N])
     """
     
     def __init__(self, machine: Machine, sensors: List[Sensor]):
@@ -26,16 +54,40 @@ class OpcUaSimulator(BaseSimulator):
         self._server: Optional[Server] = None
         self._nodes: Dict[int, object] = {}  # sensor_id -> UA node
         self._ua_types: Dict[int, ua.VariantType] = {}  # sensor_id -> UA type
+        self._ns_idx: int = 0
+        self._machine_folder = None
+        self._alarm_folder = None
+        self._alarm_nodes: Dict[int, object] = {}  # sensor_id -> UA node s úrovní alarmu
+        self._alarm_names: Dict[int, str] = {}     # sensor_id -> BrowseName uzlu alarmu
+        self._alarm_events = None                  # generátor událostí alarmů
+        self._history: Optional[HistoryBuffer] = None
+        self._history_series: Dict[int, TagSeries] = {}  # sensor_id -> historie hodnot
+        self._sample_nodes: Dict[int, tuple] = {}  # sensor_id -> (UA pole vzorků průběhu, proměnná senzoru)
     
     async def _start_server(self) -> None:
         """Spustí OPC UA server"""
+        from app.config import OPC_UA_HISTORY_SIZE, OPC_UA_HISTORY_MAX_RESPONSE
+        
         self._server = Server()
         
+        # Limity serveru z nastavení stroje (před init, kvůli službě subscriptions)
+        settings = resolve_protocol_settings(ProtocolType.OPC_UA, self.machine.protocol_settings)
+        install_limits(self._server, ServerLimits.from_settings(settings))
+        
+        # Historie hodnot v paměti místo výchozího úložiště asyncua
+        if OPC_UA_HISTORY_SIZE > 0:
+            self._history = HistoryBuffer(OPC_UA_HISTORY_SIZE, OPC_UA_HISTORY_MAX_RESPONSE)
+            iserver = self._server.iserver
+            iserver.history_manager = BufferHistoryManager(iserver, self._history)
+        
         await self._server.init()
         
         # Nastavení endpointu
         endpoint = f"opc.tcp://{self.machine.host}:{self.machine.port}"
         self._server.set_endpoint(endpoint)
+        # Za proxy zhoršení sítě server naslouchá jinde, klientům ale inzeruje adresu stroje
+        if self.bind_address != (self.machine.host, self.machine.port):
+            self._server.socket_address = self.bind_address
         
         # Nastavení jména serveru
         self._server.set_server_name(f"PLC Simulator - {self.machine.name}")
@@ -51,37 +103,195 @@ class OpcUaSimulator(BaseSimulator):
         machines_folder = await objects.add_folder(idx, "Machines")
         
         # Složka pro tento stroj
-        machine_folder = await machines_folder.add_folder(idx, self.machine.name)
+        self._ns_idx = idx
+        self._machine_folder = await machines_folder.add_folder(idx, self.machine.name)
         
         # Přidání senzorů jako proměnných
-        for sensor_id, state in self.sensor_states.items():
-            sensor = state.sensor
-            
-            # Určení UA datového typu
-            ua_type = self._get_ua_type(sensor.data_type)
-            initial_value = self._convert_value(state.current_value, sensor.data_type)
-            
-            # Vytvoření proměnné
-            node = await machine_folder.add_variable(
-                idx,
-                sensor.name,
-                initial_value,
-                varianttype=ua_type,
-            )
-            
-            # Povolit zápis (pro případné ruční změny)
-            await node.set_writable()
-            
-            self._nodes[sensor_id] = node
-            self._ua_types[sensor_id] = ua_type
-            
-            logger.debug(f"OPC UA: Přidán senzor {sensor.name} ({sensor.data_type.value})")
+        for state in self.sensor_states.values():
+            await self._add_sensor_node(state)
+        
+        # Alarmy: proměnné s úrovní a generátor událostí
+        self._alarm_folder = await self._machine_folder.add_folder(idx, "Alarms")
+        await self._sync_alarm_nodes()
+        self._alarm_events = await self._server.get_event_generator(
+            ua.ObjectIds.ExclusiveLevelAlarmType, self._machine_folder
+        )
         
         # Spustit server
         await self._server.start()
         
         logger.info(f"OPC UA server spuštěn: {endpoint}")
     
+    async def _add_sensor_node(self, state: SensorState) -> None:
+        """Přidá proměnnou senzoru do složky stroje"""
+        sensor = state.sensor
+        
+        # Určení UA datového typu
+        ua_type = self._get_ua_type(sensor.data_type)
+        initial_value = self._convert_value(state.current_value, sensor.data_type)
+        
+        # Vytvoření proměnné
+        node = await self._machine_folder.add_variable(
+            self._ns_idx,
+            sensor.name,
+            initial_value,
+            varianttype=ua_type,
+        )
+        
+        # Povolit zápis (pro případné ruční změny) a čtení historie
+        access_level = {ua.AccessLevel.CurrentRead, ua.AccessLevel.CurrentWrite}
+        if self._history is not None:
+            access_level.add(ua.AccessLevel.HistoryRead)
+            self._history_series[sensor.id] = self._history.add(node.nodeid, ua_type)
+            await self._server.write_attribute_value(
+                node.nodeid, ua.DataValue(ua.Variant(True, ua.VariantType.Boolean)), ua.AttributeIds.Historizing
+            )
+        access = ua.DataValue(ua.Variant(ua.AccessLevel.to_bitfield(access_level), ua.VariantType.Byte))
+        await self._server.write_attribute_value(node.nodeid, access, ua.AttributeIds.AccessLevel)
+        await self._server.write_attribute_value(node.nodeid, access, ua.AttributeIds.UserAccessLevel)
+        
+        self._nodes[sensor.id] = node
+        self._ua_types[sensor.id] = ua_type
+        
+        samples = waveform_samples(sensor)
+        if samples is not None:
+            await self._add_sample_node(sensor.id, node, samples)
+        
+        logger.debug(f"OPC UA: Přidán senzor {sensor.name} ({sensor.data_type.value})")
+    
+    async def _add_sample_node(self, sensor_id: int, parent, samples: int) -> None:
+        """Přidá pod proměnnou průběhu jednorozměrné pole vzorků bloku"""
+        node = await parent.add_variable(
+            self._ns_idx,
+            "Samples",
+            ua.Variant([0.0] * samples, ua.VariantType.Float),
+        )
+        await self._server.write_attribute_value(
+            node.nodeid, ua.DataValue(ua.Variant(ua.ValueRank.OneDimension, ua.VariantType.Int32)),
+            ua.AttributeIds.ValueRank,
+        )
+        await self._server.write_attribute_value(
+            node.nodeid, ua.DataValue(ua.Variant([samples], ua.VariantType.UInt32)),
+            ua.AttributeIds.ArrayDimensions,
+        )
+        self._sample_nodes[sensor_id] = (node, parent)
+    
+    async def _remove_sensor_nodes(self, sensor_ids: List[int]) -> None:
+        """
+        Odebere proměnné senzorů z adresního prostoru.
+        
+        Místo plošného hledání referencí v celém adresním prostoru (výchozí chování
+        asyncua) se odstraní jen reference ze složky stroje - jiné na uzel nevedou.
+        """
+        for sensor_id in sensor_ids:
+            if sensor_id in self._sample_nodes:
+                node, parent = self._sample_nodes.pop(sensor_id)
+                await self._delete_nodes(parent, [node])
+        nodes = [self._nodes.pop(sensor_id) for sensor_id in sensor_ids if sensor_id in self._nodes]
+        for sensor_id in sensor_ids:
+            self._ua_types.pop(sensor_id, None)
+            self._history_series.pop(sensor_id, None)
+        if self._history is not None:
+            for node in nodes:
+                self._history.remove(node.nodeid)
+        await self._delete_nodes(self._machine_folder, nodes)
+    
+    async def _delete_nodes(self, parent, nodes: List) -> None:
+        """Smaže uzly včetně reference z nadřazené složky"""
+        if not nodes:
+            return
+        
+        references = []
+        for node in nodes:
+            item = ua.DeleteReferencesItem()
+            item.SourceNodeId = parent.nodeid
+            item.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HasComponent)
+            item.IsForward = True
+            item.TargetNodeId = node.nodeid
+            item.DeleteBidirectional = True
+            references.append(item)
+        
+        session = self._server.iserver.isession
+        await session.delete_references(references)
+        await delete_nodes(session, nodes, recursive=False, delete_target_references=False)
+    
+    async def _apply_changes(self, changes: SensorChanges) -> None:
+        """Živě upraví adresní prostor - ostatní uzly a klientské relace zůstávají"""
+        if not self._server:
+            return
+        
+        # Název (BrowseName), datový typ ani délku pole vzorků nelze změnit na místě - uzel se vytvoří znovu
+        recreated = [
+            new for old, new in changes.changed
+            if old.sensor.name != new.sensor.name
+            or old.sensor.data_type != new.sensor.data_type
+            or waveform_samples(old.sensor) != waveform_samples(new.sensor)
+        ]
+        
+        await self._remove_sensor_nodes(
+            [state.sensor.id for state in changes.removed] + [state.sensor.id for state in recreated]
+        )
+        
+        for state in recreated + changes.added:
+            await self._add_sensor_node(state)
+        
+        await self._sync_alarm_nodes()
+    
+    async def _sync_alarm_nodes(self) -> None:
+        """Srovná proměnné alarmů se senzory, které mají nastavené limity"""
+        wanted = self._alarms.sensors()
+        stale = [
+            sensor_id for sensor_id, name in self._alarm_names.items()
+            if wanted.get(sensor_id) != name
+        ]
+        await self._delete_nodes(self._alarm_folder, [self._alarm_nodes.pop(sensor_id) for sensor_id in stale])
+        for sensor_id in stale:
+            del self._alarm_names[sensor_id]
+        
+        for sensor_id, name in wanted.items():
+            if sensor_id in self._alarm_nodes:
+                continue
+            self._alarm_nodes[sensor_id] = await self._alarm_folder.add_variable(
+                self._ns_idx,
+                name,
+                self._alarms.level(sensor_id).value,
+                varianttype=ua.VariantType.String,
+            )
+            self._alarm_names[sensor_id] = name
+    
+    async def _publish_alarms(self, events: List[AlarmEvent]) -> None:
+        """Aktualizuje proměnné alarmů a vyšle událost za každý přechod"""
+        if not self._server:
+            return
+        
+        for event in events:
+            node = self._alarm_nodes.get(event.sensor_id)
+            if node is not None:
+                await node.write_value(ua.Variant(event.level.value, ua.VariantType.String))
+            
+            active = event.active
+            level = event.level if active else event.previous
+            ev = self._alarm_events.event
+            source = self._nodes.get(event.sensor_id)
+            if source is not None:
+                ev.SourceNode = source.nodeid
+                ev.InputNode = source.nodeid
+            ev.SourceName = event.sensor_name
+            ev.ConditionName = event.sensor_name
+            ev.Severity = event.severity
+            ev.Retain = active
+            setattr(ev, "ActiveState/Id", active)
+            setattr(ev, "EnabledState/Id", True)
+            ev.ActiveState = ua.LocalizedText("Active" if active else "Inactive")
+            ev.HighHighLimit = ev.HighLimit = ev.LowLimit = ev.LowLowLimit = None
+            if event.limit is not None:
+                setattr(ev, _LIMIT_FIELDS[level], event.limit)
+            message = (
+                f"{event.sensor_name}: {level.value.upper()} ({event.value} / limit {event.limit})"
+                if active else f"{event.sensor_name}: návrat z {level.value.upper()}"
+            )
+            await self._alarm_events.trigger(message=message)
+    
     async def _stop_server(self) -> None:
         """Zastaví OPC UA server"""
         if self._server:
@@ -89,6 +299,14 @@ class OpcUaSimulator(BaseSimulator):
             self._server = None
             self._nodes.clear()
             self._ua_types.clear()
+            self._machine_folder = None
+            self._alarm_folder = None
+            self._alarm_nodes.clear()
+            self._alarm_names.clear()
+            self._alarm_events = None
+            self._history = None
+            self._history_series.clear()
+            self._sample_nodes.clear()
             logger.info("OPC UA server zastaven")
     
     async def _update_values(self) -> None:
@@ -96,18 +314,45 @@ class OpcUaSimulator(BaseSimulator):
         if not self._server:
             return
         
+        history = self._history
+        history_series = self._history_series
+        if history is not None:
+            slot = history.next_slot(time.time())
+        
         for sensor_id, state in self.sensor_states.items():
             if sensor_id in self._nodes:
                 node = self._nodes[sensor_id]
                 ua_type = self._ua_types[sensor_id]
-                value = self._convert_value(state.current_value, state.sensor.data_type)
-                
                 try:
+                    value = self._convert_value(state.current_value, state.sensor.data_type)
+                    # Uložení do historie v try - hodnota mimo rozsah pole (int32) nesmí
+                    # přerušit publikaci ostatních senzorů ani commit historie
+                    if history is not None:
+                        history_series[sensor_id].values[slot] = value
+                    
                     # Použít ua.Variant s explicitním typem pro správný zápis
                     variant = ua.Variant(value, ua_type)
                     await node.write_value(variant)
                 except Exception as e:
                     logger.error(f"Chyba při zápisu hodnoty {state.sensor.name}: {e}")
+        
+        if history is not None:
+            history.commit()
+        
+        for sensor_id, (node, _) in self._sample_nodes.items():
+            block = self.sensor_states[sensor_id].block
+            if block is None:
+                continue
+            try:
+                await node.write_value(ua.Variant(block, ua.VariantType.Float))
+            except Exception as e:
+                logger.error(f"Chyba při zápisu vzorků {self.sensor_states[sensor_id].sensor.name}: {e}")
+    
+    def get_client_count(self) -> int:
+        """Vrátí počet připojených OPC UA klientů"""
+        if self._server is None or self._server.bserver is None:
+            return 0
+        return len(self._server.bserver.clients)
     
     def _get_ua_type(self, data_type: DataType) -> ua.VariantType:
         """Převede datový typ na UA VariantType"""
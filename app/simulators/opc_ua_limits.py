@@ -0,0 +1,153 @@
+"""
+Výkonnostní limity OPC UA serveru stroje (nastavení protokolu opc_ua)
+
+asyncua z limitů serveru nabízí jen transportní (Server.limits) - revidované
+intervaly a velikosti front přebírá beze změny od klienta a počet relací
+omezuje jen globálně pro celý proces. Simulátor proto před init() serveru
+nahradí službu subscriptions vlastní LimitedSubscriptionService a obalí
+vytváření relací, obojí jen pro svůj server.
+
+Limit se uplatní při vytvoření subscription / monitorované položky / relace,
+už existující objekty se nemění (změna nastavení stroj restartuje).
+"""
+
+import logging
+import math
+import weakref
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List
+
+from asyncua import Server, ua
+from asyncua.common.connection import TransportLimits
+from asyncua.common.utils import ServiceError
+from asyncua.crypto.permission_rules import SimpleRoleRuleset, UserRole
+from asyncua.server.internal_session import SessionState
+from asyncua.server.subscription_service import SubscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ServerLimits:
+    """Limity jednoho serveru, 0 = bez omezení (výchozí hodnoty viz protocol_settings)"""
+    min_publishing_interval: float  # ms
+    min_sampling_interval: float    # ms
+    max_sessions: int
+    max_monitored_items: int        # na jednu subscription
+    max_queue_size: int             # notifikací na monitorovanou položku
+    retransmission_queue_size: int  # nepotvrzených notifikací na subscription (Republish)
+    max_chunk_size: int             # B, velikost přijímacího i odesílacího bufferu
+    max_message_size: int           # B
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "ServerLimits":
+        """Vytvoří limity z nastavení doplněných výchozími hodnotami"""
+        return cls(**{field.name: settings[field.name] for field in fields(cls)})
+
+    def transport_limits(self) -> TransportLimits:
+        """Limity transportní vrstvy - počet chunků pokryje celou max. zprávu"""
+        return TransportLimits(
+            max_recv_buffer=self.max_chunk_size,
+            max_send_buffer=self.max_chunk_size,
+            max_chunk_count=math.ceil(self.max_message_size / self.max_chunk_size),
+            max_message_size=self.max_message_size,
+        )
+
+    def queue_size(self, requested: int) -> int:
+        """Revidovaná velikost fronty položky (klient 0 = neomezená fronta)"""
+        if not self.max_queue_size:
+            return requested
+        return min(requested or self.max_queue_size, self.max_queue_size)
+
+
+class RevisingRoleRuleset(SimpleRoleRuleset):
+    """
+    Výchozí práva asyncua doplněná o ModifySubscription - klient asyncua jím
+    reaguje na revidovaný publikační interval a bez něj by subscription selhala.
+    """
+
+    def __init__(self):
+        super().__init__()
+        modify = ua.NodeId(ua.ObjectIds.ModifySubscriptionRequest_Encoding_DefaultBinary)
+        for role in (UserRole.Admin, UserRole.User):
+            self._permission_dict[role].add(modify)
+
+
+class LimitedSubscriptionService(SubscriptionService):
+    """Služba subscriptions, která reviduje požadavky klientů podle limitů serveru"""
+
+    def __init__(self, aspace, limits: ServerLimits):
+        super().__init__(aspace)
+        self.limits = limits
+
+    async def create_subscription(self, params, callback, session_id, request_callback=None):
+        limits = self.limits
+        params.RequestedPublishingInterval = max(params.RequestedPublishingInterval, limits.min_publishing_interval)
+        result = await super().create_subscription(params, callback, session_id, request_callback)
+        self.subscriptions[result.SubscriptionId]._no_acks_limit = limits.retransmission_queue_size
+        return result
+
+    async def create_monitored_items(self, params: ua.CreateMonitoredItemsParameters):
+        limits = self.limits
+        subscription = self.subscriptions.get(params.SubscriptionId)
+        if subscription is None:
+            return await super().create_monitored_items(params)
+
+        for item in params.ItemsToCreate:
+            item.RequestedParameters.QueueSize = limits.queue_size(item.RequestedParameters.QueueSize)
+
+        # Položky nad limit subscription se odmítnou, ostatní vzniknou normálně
+        rejected: List[ua.MonitoredItemCreateRequest] = []
+        if limits.max_monitored_items:
+            free = max(limits.max_monitored_items - len(subscription.monitored_item_srv._monitored_items), 0)
+            rejected = params.ItemsToCreate[free:]
+            params.ItemsToCreate = params.ItemsToCreate[:free]
+
+        results = await super().create_monitored_items(params) if params.ItemsToCreate else []
+        for result in results:
+            result.RevisedSamplingInterval = max(result.RevisedSamplingInterval, limits.min_sampling_interval)
+        for _ in rejected:
+            result = ua.MonitoredItemCreateResult()
+            result.StatusCode = ua.StatusCode(ua.StatusCodes.BadTooManyMonitoredItems)
+            results.append(result)
+        return results
+
+    def modify_monitored_items(self, params):
+        limits = self.limits
+        for item in params.ItemsToModify:
+            item.RequestedParameters.QueueSize = limits.queue_size(item.RequestedParameters.QueueSize)
+            item.RequestedParameters.SamplingInterval = max(
+                item.RequestedParameters.SamplingInterval, limits.min_sampling_interval
+            )
+        return super().modify_monitored_items(params)
+
+
+def install_limits(server: Server, limits: ServerLimits) -> None:
+    """
+    Nastaví limity serveru. Musí se volat před Server.init(), dokud na službu
+    subscriptions neodkazují generátory událostí a relace.
+    """
+    server.limits = limits.transport_limits()
+    server._permission_ruleset = RevisingRoleRuleset()
+
+    iserver = server.iserver
+    service = LimitedSubscriptionService(iserver.aspace, limits)
+    iserver.subscription_service = service
+    iserver.isession.subscription_service = service
+
+    if limits.max_sessions:
+        sessions = weakref.WeakSet()
+        create_session = iserver.create_session
+
+        def create_limited_session(name, *args, external=False, **kwargs):
+            if external:
+                open_sessions = sum(1 for session in sessions if session.state != SessionState.Closed)
+                if open_sessions >= limits.max_sessions:
+                    logger.warning(f"Odmítnuta relace {name}: dosažen limit {limits.max_sessions} relací")
+                    raise ServiceError(ua.StatusCodes.BadTooManySessions)
+            session = create_session(name, *args, external=external, **kwargs)
+            if external:
+                sessions.add(session)
+            return session
+
+        iserver.create_session = create_limited_session
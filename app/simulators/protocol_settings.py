@@ -0,0 +1,198 @@
+"""
+Nastavení protokolů strojů (Machine.protocol_settings)
+
+Každý protokol deklaruje svá nastavení (ProtocolSetting) s výchozí hodnotou.
+V databázi se ukládají jen zadané položky, simulátor si je doplní výchozími
+přes resolve_protocol_settings(). Deklarace slouží i formuláři stroje.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import ProtocolType
+
+_TRUE = {"1", "true", "on", "yes", "ano"}
+_FALSE = {"0", "false", "off", "no", "ne", ""}
+
+# Zástupná hodnota tajného nastavení v odpovědích API - při uložení zachová původní hodnotu
+SECRET_MASK = "********"
+
+
+@dataclass(frozen=True)
+class ProtocolSetting:
+    """Deklarace jednoho nastavení protokolu"""
+    name: str
+    label: str
+    default: Any
+    choices: Tuple[str, ...] = ()
+    min: Optional[float] = None
+    max: Optional[float] = None
+    forbidden: str = ""  # znaky, které řetězec nesmí obsahovat
+    secret: bool = False  # hodnota se nevrací v API ani v exportu
+
+    @property
+    def kind(self) -> str:
+        """Typ hodnoty pro formulář (bool, int, float, str)"""
+        return type(self.default).__name__
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "label": self.label,
+            "default": self.default,
+            "type": self.kind,
+            "choices": list(self.choices),
+            "min": self.min,
+            "max": self.max,
+            "secret": self.secret,
+        }
+
+    def convert(self, value: Any) -> Any:
+        """
+        Převede a zvaliduje hodnotu (hodnoty z formuláře přichází jako řetězce).
+
+        Raises:
+            ValueError: Hodnota neodpovídá typu nebo rozsahu
+        """
+        kind = type(self.default)
+        if kind is bool:
+            if isinstance(value, str):
+                text = value.strip().lower()
+                if text not in _TRUE | _FALSE:
+                    raise ValueError(f"Nastavení '{self.name}' musí být true/false")
+                return text in _TRUE
+            return bool(value)
+        if kind is str:
+            value = str(value)
+            if self.choices and value not in self.choices:
+                raise ValueError(f"Nastavení '{self.name}' musí být jedno z: {', '.join(self.choices)}")
+            if any(char in value for char in self.forbidden):
+                raise ValueError(f"Nastavení '{self.name}' nesmí obsahovat znaky {' '.join(self.forbidden)}")
+            return value
+        if isinstance(value, bool):
+            raise ValueError(f"Nastavení '{self.name}' musí být číslo")
+        try:
+            number = kind(float(value)) if kind is int and not isinstance(value, str) else kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Nastavení '{self.name}' musí být {'celé ' if kind is int else ''}číslo")
+        if self.min is not None and number < self.min:
+            raise ValueError(f"Nastavení '{self.name}' musí být alespoň {self.min:g}")
+        if self.max is not None and number > self.max:
+            raise ValueError(f"Nastavení '{self.name}' může být nejvýše {self.max:g}")
+        return number
+
+
+MQTT_SETTINGS = (
+    ProtocolSetting("encoding", "Kódování zpráv", "json", choices=("json", "sparkplug")),
+    ProtocolSetting("topic_prefix", "Prefix témat (JSON)", "plcsim", forbidden="+#"),
+    ProtocolSetting("group_id", "Sparkplug Group ID", "PlcSim", forbidden="/+#"),
+    ProtocolSetting("client_id", "Client ID (prázdné = plcsim-<ID stroje>)", ""),
+    ProtocolSetting("username", "Uživatel", ""),
+    ProtocolSetting("password", "Heslo", "", secret=True),
+    ProtocolSetting("qos", "QoS", 0, min=0, max=1),
+    ProtocolSetting("keepalive", "Keepalive [s]", 60, min=0, max=65535),
+    ProtocolSetting("report_by_exception", "Publikovat jen změny", False),
+    ProtocolSetting("deadband", "Necitlivost změny (absolutní)", 0.0, min=0.0),
+    ProtocolSetting("refresh_interval", "Úplná publikace při RBE [s] (0 = jen změny)", 60.0, min=0.0),
+)
+
+# Výkonnostní limity OPC UA serveru (viz opc_ua_limits), 0 = bez omezení
+OPC_UA_SETTINGS = (
+    ProtocolSetting("min_publishing_interval", "Min. publikační interval [ms]", 0.0, min=0.0, max=3600000.0),
+    ProtocolSetting("min_sampling_interval", "Min. vzorkovací interval [ms]", 0.0, min=0.0, max=3600000.0),
+    ProtocolSetting("max_sessions", "Max. relací (0 = bez omezení)", 0, min=0),
+    ProtocolSetting("max_monitored_items", "Max. položek na subscription (0 = bez omezení)", 0, min=0),
+    ProtocolSetting("max_queue_size", "Max. fronta notifikací položky (0 = dle klienta)", 0, min=0),
+    ProtocolSetting("retransmission_queue_size", "Fronta nepotvrzených notifikací", 500, min=0),
+    ProtocolSetting("max_chunk_size", "Velikost chunku [B]", 65535, min=8192, max=16777216),
+    ProtocolSetting("max_message_size", "Max. velikost zprávy [B] (0 = bez omezení)", 100 * 1024 * 1024, min=0),
+)
+
+_registry: Dict[ProtocolType, Tuple[ProtocolSetting, ...]] = {
+    ProtocolType.OPC_UA: OPC_UA_SETTINGS,
+    ProtocolType.MQTT: MQTT_SETTINGS,
+}
+
+
+def register_protocol_settings(protocol: ProtocolType, settings: Tuple[ProtocolSetting, ...]) -> None:
+    """Zaregistruje deklaraci nastavení protokolu"""
+    _registry[protocol] = settings
+
+
+def protocol_settings(protocol: ProtocolType) -> Tuple[ProtocolSetting, ...]:
+    """Deklarovaná nastavení protokolu (prázdné = protokol nemá nastavení)"""
+    return _registry.get(protocol, ())
+
+
+def protocol_settings_specs() -> Dict[str, List[dict]]:
+    """Deklarace nastavení všech protokolů pro API a formuláře"""
+    return {protocol.value: [setting.to_dict() for setting in settings] for protocol, settings in _registry.items()}
+
+
+def validate_protocol_settings(protocol: ProtocolType, settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Zvaliduje nastavení protokolu stroje.
+
+    Returns:
+        Nastavení převedená na deklarované typy, None pokud nejsou zadána
+
+    Raises:
+        ValueError: Neznámé nastavení nebo neplatná hodnota
+    """
+    if not settings:
+        return None
+    declared = {setting.name: setting for setting in protocol_settings(protocol)}
+    unknown = set(settings) - set(declared)
+    if unknown:
+        raise ValueError(f"Neznámá nastavení protokolu {protocol.value}: {', '.join(sorted(unknown))}")
+    return {name: declared[name].convert(value) for name, value in settings.items()}
+
+
+def resolve_protocol_settings(protocol: ProtocolType, settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Nastavení protokolu doplněná výchozími hodnotami"""
+    values = {setting.name: setting.default for setting in protocol_settings(protocol)}
+    values.update(settings or {})
+    return values
+
+
+def _secret_names(protocol: ProtocolType) -> set:
+    return {setting.name for setting in protocol_settings(protocol) if setting.secret}
+
+
+def mask_protocol_settings(protocol: ProtocolType, settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Nastavení pro API - zadané tajné hodnoty nahradí SECRET_MASK"""
+    if not settings:
+        return settings
+    secrets = _secret_names(protocol)
+    return {name: SECRET_MASK if name in secrets and value else value for name, value in settings.items()}
+
+
+def strip_secret_settings(protocol: ProtocolType, settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Nastavení pro export - bez tajných hodnot"""
+    if not settings:
+        return settings
+    secrets = _secret_names(protocol)
+    return {name: value for name, value in settings.items() if name not in secrets} or None
+
+
+def keep_secret_settings(
+    protocol: ProtocolType,
+    settings: Optional[Dict[str, Any]],
+    current: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Nahradí SECRET_MASK v nových nastaveních uloženou hodnotou.
+    Bez uložené hodnoty se maska zahodí (platí výchozí hodnota).
+    """
+    if not settings:
+        return settings
+    secrets = _secret_names(protocol)
+    current = current or {}
+    kept = {}
+    for name, value in settings.items():
+        if name in secrets and value == SECRET_MASK:
+            if name in current:
+                kept[name] = current[name]
+        else:
+            kept[name] = value
+    return kept or None
@@ -0,0 +1,56 @@
+"""
+Registr simulátorů podle protokolu
+
+Implementace protokolů (asyncua, pymodbus) se importují až při prvním
+použití daného protokolu - aplikace, která spouští jen Modbus stroje,
+nikdy nenačte asyncua a naopak. Výrazně to zrychluje start aplikace,
+headless runneru i všech nástrojů, které simulátory vůbec nespouští.
+"""
+
+import importlib
+from typing import Dict, Type, Union
+
+from app.models import ProtocolType
+from app.simulators.base import BaseSimulator
+
+# Protokol -> "modul:Třída" (importuje se líně) nebo přímo třída
+_registry: Dict[ProtocolType, Union[str, Type[BaseSimulator]]] = {
+    ProtocolType.OPC_UA: "app.simulators.opc_ua:OpcUaSimulator",
+    ProtocolType.MODBUS: "app.simulators.modbus_tcp:ModbusTcpSimulator",
+    ProtocolType.MQTT: "app.simulators.mqtt:MqttSimulator",
+}
+
+
+def register_simulator(protocol: ProtocolType, simulator: Union[str, Type[BaseSimulator]]) -> None:
+    """
+    Zaregistruje implementaci simulátoru pro protokol.
+
+    Args:
+        protocol: Typ protokolu
+        simulator: Třída simulátoru nebo cesta "modul:Třída" pro líný import
+    """
+    _registry[protocol] = simulator
+
+
+def get_simulator_class(protocol: ProtocolType) -> Type[BaseSimulator]:
+    """
+    Vrátí třídu simulátoru pro protokol, při prvním použití ji naimportuje.
+
+    Raises:
+        ValueError: Pro protokol není registrován simulátor
+    """
+    entry = _registry.get(protocol)
+    if entry is None:
+        raise ValueError(f"Pro protokol {protocol} není registrován simulátor")
+
+    if isinstance(entry, str):
+        module_name, _, class_name = entry.partition(":")
+        entry = getattr(importlib.import_module(module_name), class_name)
+        _registry[protocol] = entry
+
+    return entry
+
+
+def is_loaded(protocol: ProtocolType) -> bool:
+    """Je implementace protokolu již naimportována"""
+    return not isinstance(_registry.get(protocol), str)
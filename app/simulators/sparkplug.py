@@ -0,0 +1,175 @@
+"""
+Kódování Sparkplug B payloadů (protobuf) bez závislosti na knihovně protobuf
+
+Zapisuje jen podmnožinu zprávy Payload, kterou simulátor publikuje:
+
+    Payload { timestamp = 1; repeated Metric metrics = 2; seq = 3; }
+    Metric  { name = 1; alias = 2; timestamp = 3; datatype = 4; <hodnota> }
+
+Metriky v NDATA se posílají jen s aliasem přiděleným v NBIRTH. Hlavička
+metriky (alias, datový typ) se předpočítá jednou do MetricEncoder,
+v ticku se skládá jen zakódovaná hodnota a časová značka.
+"""
+
+import math
+import struct
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.models import DataType
+
+NAMESPACE = "spBv1.0"
+
+# Datové typy Sparkplug B
+SP_INT32 = 3
+SP_UINT64 = 8
+SP_FLOAT = 9
+SP_BOOLEAN = 11
+SP_STRING = 12
+SP_FLOAT_ARRAY = 30
+
+_FLOAT = struct.Struct("<f")
+_FLOAT_MAX = 3.4028234663852886e38  # největší konečný float32
+
+
+def varint(value: int) -> bytes:
+    """Protobuf varint (nezáporné celé číslo)"""
+    if value < 0x80:
+        return bytes((value,))
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _length_delimited(tag: int, data: bytes) -> bytes:
+    return bytes((tag,)) + varint(len(data)) + data
+
+
+def _int32(value) -> bytes:
+    # int_value (pole 10) je uint32 - záporná čísla ve dvojkovém doplňku
+    value = int(value) & 0xFFFFFFFF
+    return b"\x50" + (bytes((value,)) if value < 0x80 else varint(value))
+
+
+def _clamp_float32(value) -> float:
+    """Omezí hodnotu na rozsah float32 (nekonečno a NaN zůstávají)"""
+    value = float(value)
+    if math.isfinite(value) and abs(value) > _FLOAT_MAX:
+        return math.copysign(_FLOAT_MAX, value)
+    return value
+
+
+def _float(value) -> bytes:
+    try:
+        return b"\x65" + _FLOAT.pack(value)
+    except OverflowError:
+        return b"\x65" + _FLOAT.pack(_clamp_float32(value))
+
+
+def _boolean(value) -> bytes:
+    return b"\x70\x01" if value else b"\x70\x00"
+
+
+def _uint64(value) -> bytes:
+    return b"\x58" + varint(int(value))
+
+
+def _string(value) -> bytes:
+    return _length_delimited(0x7A, str(value).encode())
+
+
+def _float_array(values: Sequence[float]) -> bytes:
+    # bytes_value (pole 16): little endian float32 za sebou
+    try:
+        data = struct.pack(f"<{len(values)}f", *values)
+    except OverflowError:
+        data = struct.pack(f"<{len(values)}f", *map(_clamp_float32, values))
+    return b"\x82\x01" + varint(len(data)) + data
+
+
+_VALUE_ENCODERS: Dict[int, Callable] = {
+    SP_INT32: _int32,
+    SP_UINT64: _uint64,
+    SP_FLOAT: _float,
+    SP_BOOLEAN: _boolean,
+    SP_STRING: _string,
+    SP_FLOAT_ARRAY: _float_array,
+}
+
+DATA_TYPES = {
+    DataType.FLOAT: SP_FLOAT,
+    DataType.INT: SP_INT32,
+    DataType.BOOL: SP_BOOLEAN,
+}
+
+
+# Hlavička vnořené metriky (pole 2 + délka) pro krátké metriky - v NDATA jsou všechny kratší než 128 B
+_METRIC_PREFIXES = [b"\x12" + bytes((length,)) for length in range(0x80)]
+
+
+def _metric(body: bytes) -> bytes:
+    length = len(body)
+    if length < 0x80:
+        return _METRIC_PREFIXES[length] + body
+    return b"\x12" + varint(length) + body
+
+
+class MetricEncoder:
+    """Předpočítaná hlavička jedné metriky"""
+
+    __slots__ = ("name", "alias", "datatype", "encode", "_birth_header", "_data_header")
+
+    def __init__(self, name: str, alias: int, datatype: int):
+        self.name = name
+        self.alias = alias
+        self.datatype = datatype
+        self.encode = _VALUE_ENCODERS[datatype]
+        alias_field = b"\x10" + varint(alias)
+        datatype_field = b"\x20" + varint(datatype)
+        self._birth_header = _length_delimited(0x0A, name.encode()) + alias_field + datatype_field
+        self._data_header = alias_field + datatype_field
+
+    def birth(self, value, timestamp_field: bytes) -> bytes:
+        """Metrika pro NBIRTH (název, alias, typ, hodnota)"""
+        return _metric(self._birth_header + timestamp_field + self.encode(value))
+
+    def data(self, value, timestamp_field: bytes) -> bytes:
+        """Metrika pro NDATA (jen alias)"""
+        body = self._data_header + timestamp_field + self.encode(value)
+        length = len(body)
+        if length < 0x80:
+            return _METRIC_PREFIXES[length] + body
+        return b"\x12" + varint(length) + body
+
+
+def timestamp_field(timestamp_ms: int) -> bytes:
+    """Časová značka metriky (pole 3), v ticku se sdílí všemi metrikami"""
+    return b"\x18" + varint(timestamp_ms)
+
+
+def payload(timestamp_ms: int, metrics: List[bytes], seq: Optional[int]) -> bytes:
+    """Složí Payload z již zakódovaných metrik"""
+    parts = [b"\x08" + varint(timestamp_ms), *metrics]
+    if seq is not None:
+        parts.append(b"\x18" + varint(seq))
+    return b"".join(parts)
+
+
+def bdseq_metric(bdseq: int, timestamp_ms: int) -> bytes:
+    """Metrika bdSeq pro NBIRTH a NDEATH"""
+    return _metric(
+        _length_delimited(0x0A, b"bdSeq") + timestamp_field(timestamp_ms) + b"\x20" + varint(SP_UINT64) + _uint64(bdseq)
+    )
+
+
+def topic(group_id: str, message_type: str, edge_node_id: str) -> str:
+    """Téma Sparkplug B zprávy uzlu (NBIRTH, NDATA, NDEATH)"""
+    return f"{NAMESPACE}/{group_id}/{message_type}/{edge_node_id}"
+
+
+def sanitize_id(value: str) -> str:
+    """ID skupiny/uzlu nesmí obsahovat znaky /, +, #"""
+    return "".join("_" if char in "/+#" else char for char in value).strip() or "_"
+
@@ -0,0 +1,94 @@
+"""
+Sdílené prostředí Jinja2 šablon a cache vyrenderovaných karet strojů
+
+Všechny routery renderují přes jedno prostředí - každá šablona se v procesu
+kompiluje jen jednou a zkompilovaný bytecode se ukládá na disk
+(TEMPLATE_CACHE_DIR), takže ani po restartu se šablony znovu neparsují.
+
+Karta stroje (machine_card.html se všemi řádky senzorů) se renderuje přes
+MachineCardCache. Klíčem je Machine.updated_at, verze sady senzorů a stav
+simulace - při shodě se vrátí uložené HTML a senzory stroje se z databáze
+vůbec nenačítají. Změny senzorů mění updated_at jen u senzorů, proto je
+CRUD senzorů i mazání stroje musí ohlásit přes invalidate().
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
+
+from app.config import MACHINE_CARD_CACHE_SIZE, TEMPLATE_BYTECODE_CACHE, TEMPLATE_CACHE_DIR, TEMPLATES_DIR
+from app.models import Machine
+from app.services.metrics import MACHINE_CARD_RENDERS
+
+MACHINE_CARD_TEMPLATE = "partials/machine_card.html"
+
+
+def _create_environment() -> Environment:
+    """Prostředí Jinja2 se stejnými volbami jako výchozí u Jinja2Templates"""
+    bytecode_cache = None
+    if TEMPLATE_BYTECODE_CACHE:
+        TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+    return Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+templates = Jinja2Templates(env=_create_environment())
+
+
+class MachineCardCache:
+    """LRU cache HTML karet strojů s klíčem podle verze stroje, senzorů a stavu"""
+
+    def __init__(self, max_size: int = MACHINE_CARD_CACHE_SIZE):
+        self.max_size = max_size
+        self._cards: "OrderedDict[int, Tuple[Hashable, Markup]]" = OrderedDict()  # machine_id -> (klíč, HTML)
+        self._sensor_versions: Dict[int, int] = {}  # machine_id -> verze sady senzorů
+        self._hits = MACHINE_CARD_RENDERS.labels("hit")
+        self._misses = MACHINE_CARD_RENDERS.labels("miss")
+
+    def render(
+        self,
+        machine: Machine,
+        status: Optional[str] = None,
+        is_running: bool = False,
+        error_message: Optional[str] = None,
+    ) -> Markup:
+        """Vrátí HTML karty stroje, při změně klíče ji vyrenderuje znovu"""
+        key = (machine.updated_at, self._sensor_versions.get(machine.id, 0), status, is_running, error_message)
+        cached = self._cards.get(machine.id)
+        if cached is not None and cached[0] == key:
+            self._cards.move_to_end(machine.id)
+            self._hits.inc()
+            return cached[1]
+
+        self._misses.inc()
+        html = Markup(templates.get_template(MACHINE_CARD_TEMPLATE).render(
+            machine=machine,
+            status=status,
+            is_running=is_running,
+            error_message=error_message,
+        ))
+        self._cards[machine.id] = (key, html)
+        self._cards.move_to_end(machine.id)
+        while len(self._cards) > self.max_size:
+            self._cards.popitem(last=False)
+        return html
+
+    def invalidate(self, *machine_ids: int) -> None:
+        """Zahodí karty strojů po změně jejich senzorů nebo smazání"""
+        for machine_id in machine_ids:
+            self._sensor_versions[machine_id] = self._sensor_versions.get(machine_id, 0) + 1
+            self._cards.pop(machine_id, None)
+
+
+# Globální instance
+machine_cards = MachineCardCache()
+
+# Šablony vkládají kartu přes {{ machine_card(machine, status, is_running) }}
+templates.env.globals["machine_card"] = machine_cards.render
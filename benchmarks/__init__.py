@@ -0,0 +1,3 @@
+"""
+Benchmarky výkonu simulátoru
+"""
@@ -0,0 +1,135 @@
+"""
+Kontrola času importu vstupních modulů (python -X importtime)
+
+Každý modul se importuje v čistém interpretu několikrát, bere se medián
+kumulativního času. Kontroluje se i to, že se při importu nenačtou
+protokolové knihovny (asyncua, pymodbus) - ty se mají importovat až při
+spuštění prvního stroje daného protokolu - a že headless runner nenačte webovou vrstvu.
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --repeat 7 --scale 1.5 --json import-times.json
+
+Návratový kód je 1 při překročení rozpočtu nebo importu zakázaného modulu.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Protokolové knihovny se načítají líně (app.simulators.registry)
+PROTOCOL_PACKAGES = ("asyncua", "pymodbus")
+WEB_PACKAGES = ("fastapi", "starlette", "uvicorn", "jinja2")
+
+
+@dataclass
+class ImportBudget:
+    """Rozpočet importu jednoho modulu"""
+    module: str
+    budget_ms: float
+    forbidden: Tuple[str, ...] = ()
+
+
+BUDGETS = [
+    ImportBudget("app.main", 2000.0, PROTOCOL_PACKAGES),
+    ImportBudget("app.headless", 1200.0, PROTOCOL_PACKAGES + WEB_PACKAGES),
+    ImportBudget("app.simulators.manager", 1200.0, PROTOCOL_PACKAGES + WEB_PACKAGES),
+]
+
+
+def measure(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Naimportuje modul v novém interpretu s -X importtime.
+
+    Returns:
+        Kumulativní čas importu modulu v ms a kumulativní časy všech
+        importovaných balíčků nejvyšší úrovně v ms
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import {module} selhal:\n{result.stderr[-2000:]}")
+
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # hlavička
+        cumulative_ms = int(cumulative) / 1000
+        stripped = name.strip()
+        if stripped == module and name.startswith(" ") and len(name) - len(name.lstrip()) == 1:
+            total = cumulative_ms
+        top = stripped.split(".")[0]
+        packages[top] = max(packages.get(top, 0.0), cumulative_ms)
+
+    return total, packages
+
+
+def check(budget: ImportBudget, repeat: int, scale: float) -> dict:
+    """Změří modul repeat-krát a porovná medián s rozpočtem"""
+    times: List[float] = []
+    packages: Dict[str, float] = {}
+    for _ in range(repeat):
+        total, packages = measure(budget.module)
+        times.append(total)
+
+    median = statistics.median(times)
+    limit = budget.budget_ms * scale
+    forbidden = sorted(name for name in budget.forbidden if name in packages)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:8]
+
+    return {
+        "module": budget.module,
+        "median_ms": round(median, 1),
+        "min_ms": round(min(times), 1),
+        "budget_ms": round(limit, 1),
+        "within_budget": median <= limit,
+        "forbidden_imported": forbidden,
+        "slowest_packages_ms": {name: round(ms, 1) for name, ms in slowest},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Kontrola času importu vstupních modulů")
+    parser.add_argument("--repeat", type=int, default=5, help="Počet měření každého modulu")
+    parser.add_argument(
+        "--scale", type=float, default=1.0,
+        help="Násobek rozpočtů (např. 2.0 pro pomalé CI stroje)",
+    )
+    parser.add_argument("--json", default=None, help="Uložit výsledky do JSON souboru")
+    args = parser.parse_args(argv)
+
+    results = [check(budget, args.repeat, args.scale) for budget in BUDGETS]
+    failed = False
+
+    for result in results:
+        ok = result["within_budget"] and not result["forbidden_imported"]
+        failed |= not ok
+        print(
+            f"{'OK ' if ok else 'CHYBA'} {result['module']:<26} "
+            f"{result['median_ms']:>8.1f} ms (rozpočet {result['budget_ms']:.0f} ms)"
+        )
+        if result["forbidden_imported"]:
+            print(f"      zakázané importy: {', '.join(result['forbidden_imported'])}")
+        if not ok:
+            slowest = ", ".join(f"{name} {ms:.0f} ms" for name, ms in result["slowest_packages_ms"].items())
+            print(f"      nejpomalejší balíčky: {slowest}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
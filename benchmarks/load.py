@@ -0,0 +1,525 @@
+"""
+Zátěžový generátor - roje OPC UA a Modbus TCP klientů proti simulovaným strojům
+
+Zjišťuje, kolik souběžných klientů a čtení za sekundu zvládne jedna instance
+simulátoru. Běží jen na localhostu, cílový stroj lze spustit automaticky
+v samostatném procesu (headless runner), aby klienti nesdíleli event loop se serverem.
+
+    python -m benchmarks.load opc-ua --spawn 1000 --clients 20 --block-size 50 --duration 30
+    python -m benchmarks.load opc-ua --spawn 1000 --mode subscribe --clients 50 --rate 2
+    python -m benchmarks.load modbus --target 127.0.0.1:5020 --clients 100 --rate 10 --block-size 10
+    python -m benchmarks.load modbus --spawn 500 --clients 200 --workers 4 --json load.json
+
+Výstup: propustnost (požadavky/s a hodnoty/s), latence p50/p90/p99/max a chybovost.
+Návratový kód je 1, pokud chybovost překročí --max-error-rate (pro CI).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+PROTOCOLS = ("opc-ua", "modbus")
+OPC_UA_MODES = ("poll", "subscribe")
+MODBUS_MAX_BLOCK = 125  # maximum registrů v jednom požadavku (FC3)
+
+
+@dataclass
+class LoadStats:
+    """Surová data z jednoho pracovního procesu"""
+    requests: int = 0
+    values: int = 0
+    errors: int = 0
+    connect_errors: int = 0
+    clients_connected: int = 0
+    latencies: List[float] = field(default_factory=list)  # sekundy
+    error_samples: List[str] = field(default_factory=list)
+
+    def record_error(self, error: Exception) -> None:
+        """Započítá chybu a uloží několik prvních pro výpis"""
+        self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(f"{type(error).__name__}: {error}")
+
+    def merge(self, other: "LoadStats") -> None:
+        """Přičte výsledky jiného pracovního procesu"""
+        self.requests += other.requests
+        self.values += other.values
+        self.errors += other.errors
+        self.connect_errors += other.connect_errors
+        self.clients_connected += other.clients_connected
+        self.latencies.extend(other.latencies)
+        self.error_samples.extend(other.error_samples[:5 - len(self.error_samples)])
+
+
+@dataclass
+class LoadConfig:
+    """Parametry zátěžového testu"""
+    protocol: str
+    host: str
+    port: int
+    clients: int = 10
+    rate: float = 0.0           # požadavky/s na klienta, 0 = co nejrychleji
+    block_size: int = 10        # uzlů v jednom Read / registrů v jednom čtení
+    duration: float = 10.0
+    warmup: float = 1.0
+    mode: str = "poll"
+    machine: Optional[str] = None
+    registers: int = 0          # velikost prohledávaného rozsahu registrů
+    connect_stagger: float = 0.01
+    timeout: float = 5.0
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Percentil ze seřazeného seznamu (nejbližší hodnota)"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(stats: LoadStats, config: LoadConfig, elapsed: float) -> Dict[str, object]:
+    """Sestaví souhrnný report"""
+    ordered = sorted(stats.latencies)
+    total = stats.requests + stats.errors
+    return {
+        "protocol": config.protocol,
+        "mode": config.mode if config.protocol == "opc-ua" else "poll",
+        "target": f"{config.host}:{config.port}",
+        "clients": config.clients,
+        "clients_connected": stats.clients_connected,
+        "connect_errors": stats.connect_errors,
+        "rate_per_client": config.rate,
+        "block_size": config.block_size,
+        "duration_s": round(elapsed, 2),
+        "requests": stats.requests,
+        "errors": stats.errors,
+        "error_rate": round(stats.errors / total, 6) if total else 0.0,
+        "throughput_rps": round(stats.requests / elapsed, 1) if elapsed else 0.0,
+        "values_per_s": round(stats.values / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p90": round(_percentile(ordered, 0.90) * 1000, 3),
+            "p99": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        },
+        "error_samples": stats.error_samples,
+    }
+
+
+# =============================================================================
+# Klienti
+# =============================================================================
+
+class _Pacer:
+    """Rozvrhuje požadavky klienta na pevnou frekvenci (bez dohánění zpoždění)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next = time.perf_counter()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        self.next += self.interval
+        delay = self.next - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            self.next = time.perf_counter()
+
+
+async def _find_opc_ua_nodes(client, machine: Optional[str]) -> list:
+    """Najde proměnné senzorů stroje (Objects/Machines/<stroj>)"""
+    machines = None
+    for child in await client.nodes.objects.get_children():
+        if (await child.read_browse_name()).Name == "Machines":
+            machines = child
+            break
+    if machines is None:
+        raise RuntimeError("Server neobsahuje složku Machines")
+
+    for node in await machines.get_children():
+        if machine is None or (await node.read_browse_name()).Name == machine:
+            return await node.get_children()
+    raise RuntimeError(f"Stroj {machine or ''} nenalezen")
+
+
+async def _opc_ua_client(index: int, config: LoadConfig, stats: LoadStats, node_ids, start: float, end: float):
+    """Jeden OPC UA klient - cyklické čtení bloků uzlů nebo subscription"""
+    from asyncua import Client
+
+    await asyncio.sleep(index * config.connect_stagger)
+    client = Client(f"opc.tcp://{config.host}:{config.port}", timeout=config.timeout)
+    try:
+        await client.connect()
+    except Exception as e:
+        stats.connect_errors += 1
+        stats.record_error(e)
+        return
+
+    stats.clients_connected += 1
+    nodes = [client.get_node(node_id) for node_id in node_ids]
+    # Každý klient začíná na jiném místě, aby nečetli všichni stejné uzly
+    offset = (index * config.block_size) % max(1, len(nodes))
+
+    try:
+        if config.mode == "subscribe":
+            await _opc_ua_subscribe(client, nodes, offset, config, stats, start, end)
+        else:
+            await _opc_ua_poll(nodes, offset, client, config, stats, start, end)
+    finally:
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+
+
+async def _opc_ua_poll(nodes, offset, client, config, stats, start, end):
+    """Cyklické čtení bloku uzlů jedním Read požadavkem"""
+    block = config.block_size
+    pacer = _Pacer(config.rate)
+    perf_counter = time.perf_counter
+
+    while True:
+        now = perf_counter()
+        if now >= end:
+            break
+        batch = [nodes[(offset + i) % len(nodes)] for i in range(block)]
+        offset = (offset + block) % len(nodes)
+        t = perf_counter()
+        try:
+            await client.read_values(batch)
+        except Exception as e:
+            if t >= start:
+                stats.record_error(e)
+        else:
+            if t >= start:
+                stats.requests += 1
+                stats.values += block
+                stats.latencies.append(perf_counter() - t)
+        await pacer.wait()
+
+
+class _SubscriptionHandler:
+    """Počítá notifikace a jejich zpoždění od zdrojové časové značky"""
+
+    def __init__(self, stats: LoadStats, start: float):
+        self.stats = stats
+        self.start = start
+
+    def datachange_notification(self, node, value, data) -> None:
+        if time.perf_counter() < self.start:
+            return
+        self.stats.requests += 1
+        self.stats.values += 1
+        timestamp = data.monitored_item.Value.SourceTimestamp
+        if timestamp is not None:
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            lag = (datetime.now(timezone.utc) - timestamp).total_seconds()
+            self.stats.latencies.append(max(0.0, lag))
+
+    def status_change_notification(self, status) -> None:
+        self.stats.record_error(RuntimeError(f"Subscription status: {status}"))
+
+
+async def _opc_ua_subscribe(client, nodes, offset, config, stats, start, end):
+    """Subscription na blok uzlů - rate určuje publishing interval"""
+    period_ms = 1000.0 / config.rate if config.rate > 0 else 100.0
+    subscription = await client.create_subscription(period_ms, _SubscriptionHandler(stats, start))
+    batch = [nodes[(offset + i) % len(nodes)] for i in range(min(config.block_size, len(nodes)))]
+    await subscription.subscribe_data_change(batch)
+
+    await asyncio.sleep(max(0.0, end - time.perf_counter()))
+    try:
+        await subscription.delete()
+    except Exception:
+        pass
+
+
+async def _modbus_client(index: int, config: LoadConfig, stats: LoadStats, start: float, end: float):
+    """Jeden Modbus TCP klient - cyklické čtení holding registrů"""
+    from pymodbus.client import AsyncModbusTcpClient
+
+    await asyncio.sleep(index * config.connect_stagger)
+    client = AsyncModbusTcpClient(config.host, port=config.port, timeout=config.timeout, retries=0)
+    try:
+        connected = await client.connect()
+    except Exception as e:
+        connected = False
+        stats.record_error(e)
+    if not connected:
+        stats.connect_errors += 1
+        return
+
+    stats.clients_connected += 1
+    block = config.block_size
+    span = max(block, config.registers)
+    address = (index * block) % (span - block + 1)
+    pacer = _Pacer(config.rate)
+    perf_counter = time.perf_counter
+
+    try:
+        while True:
+            now = perf_counter()
+            if now >= end:
+                break
+            t = perf_counter()
+            try:
+                response = await client.read_holding_registers(address, count=block)
+                if response.isError():
+                    raise RuntimeError(f"Modbus chyba: {response}")
+            except Exception as e:
+                if t >= start:
+                    stats.record_error(e)
+            else:
+                if t >= start:
+                    stats.requests += 1
+                    stats.values += block
+                    stats.latencies.append(perf_counter() - t)
+            address = (address + block) % (span - block + 1)
+            await pacer.wait()
+    finally:
+        client.close()
+
+
+async def run_clients(config: LoadConfig, first_index: int, count: int, node_ids=None) -> LoadStats:
+    """Spustí count klientů v aktuálním procesu a vrátí jejich surová data"""
+    stats = LoadStats()
+    # Rozjezd připojování + zahřátí se do měření nepočítá
+    start = time.perf_counter() + config.warmup + count * config.connect_stagger
+    end = start + config.duration
+
+    if config.protocol == "opc-ua":
+        tasks = [
+            _opc_ua_client(first_index + i, config, stats, node_ids, start, end)
+            for i in range(count)
+        ]
+    else:
+        tasks = [_modbus_client(first_index + i, config, stats, start, end) for i in range(count)]
+
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def _worker(args: Tuple[LoadConfig, int, int, Optional[list]]) -> LoadStats:
+    """Vstupní bod pracovního procesu"""
+    config, first_index, count, node_ids = args
+    logging.getLogger("asyncua").setLevel(logging.ERROR)
+    logging.getLogger("pymodbus").setLevel(logging.CRITICAL)
+    return asyncio.run(run_clients(config, first_index, count, node_ids))
+
+
+async def discover_opc_ua(config: LoadConfig) -> list:
+    """Jednou projde adresní prostor a vrátí NodeId proměnných stroje"""
+    from asyncua import Client
+
+    async with Client(f"opc.tcp://{config.host}:{config.port}", timeout=config.timeout) as client:
+        nodes = await _find_opc_ua_nodes(client, config.machine)
+    if not nodes:
+        raise RuntimeError("Stroj nemá žádné senzory")
+    return [node.nodeid for node in nodes]
+
+
+def run_load(config: LoadConfig, workers: int = 1) -> Dict[str, object]:
+    """
+    Spustí zátěžový test a vrátí report.
+    Klienti se rovnoměrně rozdělí mezi workers procesů.
+    """
+    node_ids = None
+    if config.protocol == "opc-ua":
+        node_ids = asyncio.run(discover_opc_ua(config))
+        config.block_size = min(config.block_size, len(node_ids))
+
+    workers = max(1, min(workers, config.clients))
+    chunks = []
+    first = 0
+    for w in range(workers):
+        count = config.clients // workers + (1 if w < config.clients % workers else 0)
+        chunks.append((config, first, count, node_ids))
+        first += count
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = [_worker(chunks[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            results = pool.map(_worker, chunks)
+    # Doba měření bez rozjezdu a zahřátí
+    elapsed = min(config.duration, time.perf_counter() - started)
+
+    stats = LoadStats()
+    for result in results:
+        stats.merge(result)
+    return summarize(stats, config, elapsed)
+
+
+# =============================================================================
+# Spuštění cílového stroje
+# =============================================================================
+
+def _free_port() -> int:
+    """Najde volný TCP port na 127.0.0.1"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(host: str, port: int, timeout: float, process: subprocess.Popen) -> None:
+    """Počká, až server začne přijímat spojení"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Simulátor skončil s kódem {process.returncode}")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Simulátor na {host}:{port} nenaběhl do {timeout:.0f} s")
+
+
+def spawn_machine(protocol: str, tags: int, port: int) -> Tuple[subprocess.Popen, str]:
+    """
+    Spustí lokální stroj s tags FLOAT senzory v headless runneru.
+
+    Returns:
+        Proces simulátoru a cesta k dočasnému popisu flotily
+    """
+    fleet = {
+        "machines": [{
+            "name": "Load-01",
+            "protocol": "opc_ua" if protocol == "opc-ua" else "modbus",
+            "host": "127.0.0.1",
+            "port": port,
+            "sensors": [
+                {"name": f"tag_{i:05d}", "simulation_type": "sine", "min_value": 0, "max_value": 100}
+                for i in range(1, tags + 1)
+            ],
+        }]
+    }
+    fd, path = tempfile.mkstemp(suffix=".json", prefix="plc-sim-load-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(fleet, f)
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.headless", path, "--log-level", "WARNING"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return process, path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.load",
+        description="Zátěžový test simulátoru roji OPC UA / Modbus TCP klientů",
+    )
+    parser.add_argument("protocol", choices=PROTOCOLS, help="Protokol klientů")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--target", help="Adresa běžícího stroje host:port")
+    target.add_argument("--spawn", type=int, metavar="TAGS", help="Spustit lokální stroj s TAGS senzory")
+    parser.add_argument("--clients", type=int, default=10, help="Počet souběžných klientů")
+    parser.add_argument("--rate", type=float, default=0.0, help="Požadavků/s na klienta (0 = co nejrychleji)")
+    parser.add_argument(
+        "--block-size", type=int, default=10,
+        help="Uzlů v jednom OPC UA Read / registrů v jednom Modbus čtení",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="Doba měření v sekundách")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Zahřátí před měřením v sekundách")
+    parser.add_argument("--mode", choices=OPC_UA_MODES, default="poll", help="Režim OPC UA klientů")
+    parser.add_argument("--machine", default=None, help="Název stroje v OPC UA (výchozí první)")
+    parser.add_argument(
+        "--registers", type=int, default=0,
+        help="Rozsah čtených Modbus registrů (výchozí dle --spawn, jinak blok)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Počet procesů s klienty")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Timeout požadavku v sekundách")
+    parser.add_argument("--json", default=None, help="Uložit report do JSON souboru")
+    parser.add_argument(
+        "--max-error-rate", type=float, default=0.01,
+        help="Maximální chybovost pro úspěšný návratový kód",
+    )
+    args = parser.parse_args(argv)
+
+    if args.protocol == "modbus" and not 1 <= args.block_size <= MODBUS_MAX_BLOCK:
+        parser.error(f"--block-size pro Modbus musí být 1-{MODBUS_MAX_BLOCK}")
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("asyncua").setLevel(logging.ERROR)
+    logging.getLogger("pymodbus").setLevel(logging.CRITICAL)
+
+    process = None
+    fleet_path = None
+    if args.spawn:
+        host, port = "127.0.0.1", _free_port()
+        registers = args.registers or args.spawn * 2  # FLOAT = 2 registry
+        print(f"Spouštím lokální stroj ({args.protocol}, {args.spawn} tagů) na {host}:{port}...", file=sys.stderr)
+        process, fleet_path = spawn_machine(args.protocol, args.spawn, port)
+    else:
+        host, _, port_text = args.target.rpartition(":")
+        port = int(port_text)
+        registers = args.registers
+
+    config = LoadConfig(
+        protocol=args.protocol,
+        host=host,
+        port=port,
+        clients=args.clients,
+        rate=args.rate,
+        block_size=args.block_size,
+        duration=args.duration,
+        warmup=args.warmup,
+        mode=args.mode,
+        machine=args.machine,
+        registers=registers,
+        timeout=args.timeout,
+    )
+
+    try:
+        if process is not None:
+            _wait_for_port(host, port, 300.0, process)
+            time.sleep(1.5)  # první publikace hodnot
+        report = run_load(config, args.workers)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if fleet_path:
+            os.unlink(fleet_path)
+
+    latency = report["latency_ms"]
+    print(
+        f"\n{report['protocol']} ({report['mode']}) {report['target']}: "
+        f"{report['clients_connected']}/{report['clients']} klientů, blok {report['block_size']}\n"
+        f"  požadavky:   {report['requests']} za {report['duration_s']} s "
+        f"({report['throughput_rps']} req/s, {report['values_per_s']} hodnot/s)\n"
+        f"  latence ms:  p50 {latency['p50']}  p90 {latency['p90']}  "
+        f"p99 {latency['p99']}  max {latency['max']}\n"
+        f"  chyby:       {report['errors']} ({report['error_rate']:.2%}), "
+        f"neúspěšná připojení {report['connect_errors']}"
+    )
+    for sample in report["error_samples"]:
+        print(f"    {sample}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({**report, "config": asdict(config)}, f, indent=2)
+
+    return 0 if report["error_rate"] <= args.max_error_rate and not report["connect_errors"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
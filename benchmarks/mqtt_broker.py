@@ -0,0 +1,117 @@
+"""
+Vestavěný MQTT broker pro benchmarky - jen přijímá a počítá zprávy
+
+Odpovídá na CONNECT (CONNACK), PUBLISH s QoS 1 (PUBACK) a PINGREQ (PINGRESP).
+Zprávy nikam nepřeposílá, odběry nepodporuje. Slouží k měření propustnosti
+MQTT simulátorů bez externího brokeru (mosquitto lze použít přes --mqtt-broker).
+
+    python -m benchmarks.mqtt_broker --port 1883     # samostatně, vypisuje zprávy/s
+"""
+
+import argparse
+import asyncio
+import struct
+import time
+from contextlib import suppress
+from typing import Dict, Optional, Set
+
+from app.simulators.mqtt_client import CONNACK, CONNECT, DISCONNECT, PINGREQ, PINGRESP, PUBACK, PUBLISH
+
+
+class SinkBroker:
+    """Broker, který zprávy jen počítá"""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.connections = 0
+        self.topics: Dict[str, int] = {}  # téma -> počet zpráv (jen s count_topics)
+        self.count_topics = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Spustí broker, vrátí port, na kterém naslouchá"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.transport.abort()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def wait_for(self, messages: int, timeout: float = 30.0) -> bool:
+        """Počká, až broker přijme celkem messages zpráv"""
+        deadline = time.monotonic() + timeout
+        while self.messages < messages:
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.001)
+        return True
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        self.connections += 1
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length = 0
+                shift = 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+
+                packet_type = header & 0xF0
+                if packet_type == PUBLISH:
+                    self.messages += 1
+                    self.bytes += length
+                    topic_length = struct.unpack(">H", body[:2])[0]
+                    if self.count_topics:
+                        topic = body[2:2 + topic_length].decode()
+                        self.topics[topic] = self.topics.get(topic, 0) + 1
+                    if header & 0x06:  # QoS 1
+                        writer.write(bytes((PUBACK, 2)) + body[2 + topic_length:4 + topic_length])
+                elif packet_type == CONNECT:
+                    writer.write(bytes((CONNACK, 2, 0, 0)))
+                elif packet_type == PINGREQ:
+                    writer.write(bytes((PINGRESP, 0)))
+                elif packet_type == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+async def _serve(host: str, port: int) -> None:
+    broker = SinkBroker()
+    port = await broker.start(host, port)
+    print(f"MQTT sink broker naslouchá na {host}:{port}")
+    last = 0
+    while True:
+        await asyncio.sleep(1.0)
+        print(f"{broker.messages - last} zpráv/s, celkem {broker.messages}, spojení {len(broker._writers)}")
+        last = broker.messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MQTT broker, který zprávy jen počítá")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+    with suppress(KeyboardInterrupt):
+        asyncio.run(_serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
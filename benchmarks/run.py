@@ -0,0 +1,572 @@
+"""
+Benchmarky hot path simulátoru - generátory, kódování registrů, publikace a start serverů
+
+Běží offline (servery naslouchají jen na 127.0.0.1 na volném portu) a výsledky
+ukládá do JSON souboru, který lze porovnat s výsledky jiného buildu.
+
+    python -m benchmarks.run                          # kompletní sada
+    python -m benchmarks.run --quick                  # jen 10 a 1000 tagů, méně opakování
+    python -m benchmarks.run --only generator,encode  # vybrané skupiny
+    python -m benchmarks.run -o new.json --compare baseline.json --threshold 0.2
+
+Skupiny: generator, bank, formula, alarm, history, waveform, encode, publish, start, mqtt. Všechny časy jsou
+v mikrosekundách na jednu operaci (u publish, start a mqtt.tick na jedno volání pro celý stroj, u mqtt.throughput
+na jednu zprávu doručenou brokeru). Skupina mqtt běží proti vestavěnému brokeru (benchmarks.mqtt_broker),
+případně proti externímu brokeru zadanému přes --mqtt-broker host:port (např. mosquitto).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.models import DataType, Machine, ProtocolType, Sensor, SimulationType
+from app.services.alarms import AlarmEngine
+from app.services.formulas import FormulaGraph
+from app.services.process_models import create_process_model
+from app.services.simulation_types import simulation_types
+from app.services.value_generator import GeneratorBank, ValueGenerator
+from app.services.waveforms import Waveform, block_rms
+from app.simulators.base import SensorState
+from app.simulators.registry import get_simulator_class
+
+GROUPS = ("generator", "bank", "formula", "alarm", "history", "waveform", "encode", "publish", "start", "mqtt")
+BANK_SIZE = 1000
+HISTORY_WINDOW = 10000
+DEFAULT_TAGS = (10, 1000, 10000)
+QUICK_TAGS = (10, 1000)
+MQTT_FLEET = 200        # strojů v měření propustnosti MQTT
+MQTT_FLEET_TAGS = 50    # tagů na stroj v měření propustnosti
+MQTT_FLEET_TICKS = 20   # ticků každého stroje v jednom opakování
+
+# Výsledek jednoho benchmarku: název -> statistiky v µs
+Results = Dict[str, Dict[str, float]]
+
+
+def _stats(samples_us: List[float], ops: int) -> Dict[str, float]:
+    """Souhrnné statistiky z jednotlivých měření (časy na operaci v µs)"""
+    ordered = sorted(samples_us)
+    return {
+        "median_us": round(statistics.median(ordered), 3),
+        "min_us": round(ordered[0], 3),
+        "mean_us": round(statistics.fmean(ordered), 3),
+        "p95_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "rounds": len(ordered),
+        "ops": ops,
+    }
+
+
+def _bench_sync(fn: Callable[[], object], number: int, rounds: int) -> Dict[str, float]:
+    """Změří synchronní funkci - rounds opakování po number voláních"""
+    perf_counter = time.perf_counter
+    for _ in range(min(number, 1000)):  # zahřátí
+        fn()
+
+    samples = []
+    for _ in range(rounds):
+        t = perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((perf_counter() - t) / number * 1e6)
+    return _stats(samples, number * rounds)
+
+
+def _free_port() -> int:
+    """Najde volný TCP port na 127.0.0.1"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _sensors(machine_id: int, count: int) -> List[Sensor]:
+    """Sada senzorů se střídajícími se datovými typy a typy simulace"""
+    data_types = [DataType.FLOAT, DataType.INT, DataType.BOOL]
+    simulation_types = list(SimulationType)
+    return [
+        Sensor(
+            id=i,
+            machine_id=machine_id,
+            name=f"tag_{i:05d}",
+            data_type=data_types[i % len(data_types)],
+            simulation_type=simulation_types[i % len(simulation_types)],
+            min_value=0.0,
+            max_value=100.0,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+# =============================================================================
+# Skupiny benchmarků
+# =============================================================================
+
+def bench_generators(results: Results, rounds: int) -> None:
+    """ValueGenerator.get_value pro každý typ simulace a datový typ"""
+    for simulation_type in SimulationType:
+        for data_type in DataType:
+            generator = ValueGenerator(simulation_type, data_type, 0.0, 100.0, 50.0)
+            name = f"generator.{simulation_type.value}.{data_type.value}"
+            results[name] = _bench_sync(generator.get_value, 20000, rounds)
+
+
+def bench_bank(results: Results, rounds: int) -> None:
+    """GeneratorBank.generate - dávka BANK_SIZE senzorů každého registrovaného typu, čas na senzor"""
+    for spec in simulation_types():
+        for data_type in DataType:
+            bank = GeneratorBank()
+            for i in range(BANK_SIZE):
+                bank.add(i, spec.name, data_type, 0.0, 100.0, 50.0)
+            stats = _bench_sync(lambda bank=bank: list(bank.generate()), 20, rounds)
+            results[f"bank.{spec.name}.{data_type.value}"] = {
+                **{key: round(value / BANK_SIZE, 3) for key, value in stats.items() if key.endswith("_us")},
+                "rounds": stats["rounds"],
+                "ops": stats["ops"] * BANK_SIZE,
+            }
+
+    # Stroj s procesním modelem - model jednou za tick, senzory rovnoměrně přes process_* typy
+    process_types = [spec.name for spec in simulation_types() if spec.name.startswith("process_")]
+    bank = GeneratorBank()
+    bank.set_process(create_process_model("machine"))
+    for i in range(BANK_SIZE):
+        bank.add(i, process_types[i % len(process_types)], DataType.FLOAT, 0.0, 100.0)
+    stats = _bench_sync(lambda: list(bank.generate()), 20, rounds)
+    results["bank.process_model.float"] = {
+        **{key: round(value / BANK_SIZE, 3) for key, value in stats.items() if key.endswith("_us")},
+        "rounds": stats["rounds"],
+        "ops": stats["ops"] * BANK_SIZE,
+    }
+
+
+def bench_formulas(results: Results, rounds: int) -> None:
+    """
+    FormulaGraph.evaluate - BANK_SIZE vzorců nad dvojicemi vstupů, čas na vzorec.
+    "all" = změnily se všechny vstupy, "tenth" = desetina, "none" = žádný (jen kontrola změn).
+    """
+    inputs = [
+        Sensor(id=i, machine_id=1, name=f"in_{i}", min_value=0.0, max_value=100.0)
+        for i in range(BANK_SIZE)
+    ]
+    formulas = [
+        Sensor(
+            id=BANK_SIZE + i,
+            machine_id=1,
+            name=f"out_{i}",
+            simulation_type="formula",
+            formula=f"in_{i} * in_{(i + 1) % BANK_SIZE} + 1",
+        )
+        for i in range(BANK_SIZE)
+    ]
+    graph = FormulaGraph.build(inputs + formulas)
+    states = {sensor.id: SensorState(sensor=sensor, current_value=0.0) for sensor in inputs}
+    graph.evaluate(states)
+
+    counter = [0]
+
+    def changed(step: int) -> None:
+        counter[0] += 1
+        for i in range(0, BANK_SIZE, step):
+            states[i].current_value = float(counter[0])
+        graph.evaluate(states)
+
+    for label, step in (("all", 1), ("tenth", 10), ("none", None)):
+        fn = (lambda: graph.evaluate(states)) if step is None else (lambda step=step: changed(step))
+        stats = _bench_sync(fn, 20, rounds)
+        results[f"formula.{label}"] = {
+            **{key: round(value / BANK_SIZE, 3) for key, value in stats.items() if key.endswith("_us")},
+            "rounds": stats["rounds"],
+            "ops": stats["ops"] * BANK_SIZE,
+        }
+
+
+def bench_alarms(results: Results, rounds: int) -> None:
+    """
+    AlarmEngine.evaluate - BANK_SIZE senzorů s limity HIHI/HI/LO/LOLO, čas na senzor.
+    "quiet" = hodnoty v normálu (bez přechodů), "flapping" = každý tick přechod u všech senzorů.
+    """
+    alarms = {"hihi": 95.0, "hi": 80.0, "lo": 20.0, "lolo": 5.0, "deadband": 1.0}
+    sensors = [
+        Sensor(id=i, machine_id=1, name=f"tag_{i}", alarms=alarms)
+        for i in range(BANK_SIZE)
+    ]
+    engine = AlarmEngine(1)
+    engine.configure(sensors)
+    states = {sensor.id: SensorState(sensor=sensor, current_value=50.0) for sensor in sensors}
+    counter = [0]
+
+    def flapping() -> None:
+        counter[0] += 1
+        value = 90.0 if counter[0] % 2 else 50.0
+        for state in states.values():
+            state.current_value = value
+        engine.evaluate(states)
+
+    for label, fn in (("quiet", lambda: engine.evaluate(states)), ("flapping", flapping)):
+        stats = _bench_sync(fn, 20, rounds)
+        results[f"alarm.{label}"] = {
+            **{key: round(value / BANK_SIZE, 3) for key, value in stats.items() if key.endswith("_us")},
+            "rounds": stats["rounds"],
+            "ops": stats["ops"] * BANK_SIZE,
+        }
+
+
+async def bench_history(results: Results, rounds: int) -> None:
+    """
+    HistoryBuffer (OPC UA HistoryRead) s oknem HISTORY_WINDOW ticků:
+    zápis ticku (čas na tag), raw čtení celého okna a agregace přes celé okno
+    po 100 intervalech (čas na jedno čtení).
+    """
+    from asyncua import ua
+    from app.simulators.opc_ua_history import HistoryBuffer
+
+    history = HistoryBuffer(HISTORY_WINDOW, HISTORY_WINDOW)
+    node_ids = [ua.NodeId(i, 2) for i in range(BANK_SIZE)]
+    series = [history.add(node_id, ua.VariantType.Float) for node_id in node_ids]
+    start = time.time() - HISTORY_WINDOW
+    for tick in range(HISTORY_WINDOW):
+        slot = history.next_slot(start + tick)
+        for item in series:
+            item.values[slot] = float(tick)
+        history.commit()
+
+    def record() -> None:
+        slot = history.next_slot(time.time())
+        for item in series:
+            item.values[slot] = 1.5
+        history.commit()
+
+    stats = _bench_sync(record, 20, rounds)
+    results["history.record"] = {
+        **{key: round(value / BANK_SIZE, 3) for key, value in stats.items() if key.endswith("_us")},
+        "rounds": stats["rounds"],
+        "ops": stats["ops"] * BANK_SIZE,
+    }
+
+    begin = datetime.fromtimestamp(start - 1, timezone.utc)
+    end = datetime.fromtimestamp(time.time() + 1, timezone.utc)
+    samples = []
+    for _ in range(max(3, rounds // 5)):
+        t = time.perf_counter()
+        values, _ = await history.read_node_history(node_ids[0], begin, end, 0)
+        samples.append((time.perf_counter() - t) * 1e6)
+    assert len(values) == HISTORY_WINDOW
+    results["history.read_raw_10k"] = _stats(samples, len(samples))
+    average = ua.NodeId(ua.ObjectIds.AggregateFunction_Average)
+    interval_ms = (end - begin).total_seconds() * 1000 / 100
+    results["history.read_avg_10k"] = _bench_sync(
+        lambda: history.read_processed(node_ids[0], average, begin, end, interval_ms), 5, rounds
+    )
+
+
+def bench_waveforms(results: Results, rounds: int) -> None:
+    """
+    Blok vzorků průběhu (harmonické + porucha + šum) včetně RMS a převod bloku
+    na Modbus registry, čas na blok. Cena nesmí záviset na vzorkovací frekvenci.
+    """
+    machine = Machine(id=1, name="bench", protocol=ProtocolType.MODBUS, port=_free_port())
+    encode = get_simulator_class(ProtocolType.MODBUS)._block_to_registers
+    for samples in (1024, 8192):
+        for sample_rate in (10000.0, 50000.0):
+            params = {
+                "samples": samples, "sample_rate": sample_rate,
+                "fault_frequency": 120.0, "fault_amplitude": 0.5,
+            }
+            waveform = Waveform(0.0, params)
+            results[f"waveform.block.{samples}.{int(sample_rate)}hz"] = _bench_sync(
+                lambda waveform=waveform: block_rms(waveform.block(time.time())), 20, rounds
+            )
+        sensor = Sensor(id=1, machine_id=machine.id, name="wave", min_value=-3.0, max_value=3.0)
+        block = Waveform(0.0, {"samples": samples}).block(time.time())
+        results[f"waveform.modbus.{samples}"] = _bench_sync(lambda: encode(block, sensor), 20, rounds)
+
+
+def bench_encoding(results: Results, rounds: int) -> None:
+    """ModbusTcpSimulator._value_to_registers pro každý datový typ"""
+    machine = Machine(id=1, name="bench", protocol=ProtocolType.MODBUS, port=_free_port())
+    simulator = get_simulator_class(ProtocolType.MODBUS)(machine, [])
+    for data_type, value in ((DataType.FLOAT, 42.125), (DataType.INT, -1234), (DataType.BOOL, True)):
+        encode = simulator._value_to_registers
+        results[f"encode.modbus.{data_type.value}"] = _bench_sync(
+            lambda value=value, data_type=data_type: encode(value, data_type), 20000, rounds
+        )
+
+
+async def bench_protocols(
+    results: Results,
+    tag_counts: List[int],
+    rounds: int,
+    groups: List[str],
+) -> None:
+    """
+    Start serveru a _update_values pro oba protokoly a různé počty tagů.
+    Update loop se nespouští - měří se jen samotná publikace jedné sady hodnot.
+    """
+    for protocol in (ProtocolType.OPC_UA, ProtocolType.MODBUS):
+        simulator_class = get_simulator_class(protocol)
+        label = "opc_ua" if protocol == ProtocolType.OPC_UA else "modbus"
+
+        for count in tag_counts:
+            machine = Machine(id=1, name="bench", protocol=protocol, port=_free_port())
+            simulator = simulator_class(machine, _sensors(1, count))
+
+            t = time.perf_counter()
+            await simulator._start_server()
+            start_us = (time.perf_counter() - t) * 1e6
+            if "start" in groups:
+                results[f"start.{label}.{count}"] = _stats([start_us], 1)
+                print(f"  start.{label}.{count}: {start_us / 1e6:.2f} s", file=sys.stderr)
+
+            try:
+                if "publish" in groups:
+                    for sensor_id, value in simulator._bank.generate():
+                        simulator.sensor_states[sensor_id].current_value = value
+
+                    # Méně opakování u velkých strojů, aby sada doběhla v rozumném čase
+                    publish_rounds = max(5, min(rounds * 10, 200_000 // count))
+                    samples = []
+                    for _ in range(publish_rounds + 2):
+                        t = time.perf_counter()
+                        await simulator._update_values()
+                        samples.append((time.perf_counter() - t) * 1e6)
+                    results[f"publish.{label}.{count}"] = _stats(samples[2:], publish_rounds)
+            finally:
+                await simulator._stop_server()
+
+
+def _mqtt_variants():
+    """Kombinace kódování a report-by-exception: (popisek, nastavení protokolu)"""
+    for encoding in ("json", "sparkplug"):
+        yield f"{encoding}", {"encoding": encoding}
+        yield f"{encoding}.rbe", {"encoding": encoding, "report_by_exception": True, "refresh_interval": 0.0}
+
+
+async def bench_mqtt(results: Results, tag_counts: List[int], rounds: int, broker: Optional[str]) -> None:
+    """
+    MQTT publikace - tick jednoho stroje (_update_values = složení a odeslání jedné zprávy)
+    pro JSON/Sparkplug B s report-by-exception i bez, a propustnost flotily strojů
+    publikujících souběžně na jeden broker (čas na jednu přijatou zprávu).
+
+    Propustnost se dá počítat jen proti vestavěnému brokeru (počítá přijaté zprávy),
+    s externím brokerem se měří jen odeslání.
+    """
+    from benchmarks.mqtt_broker import SinkBroker
+
+    sink = None
+    if broker:
+        host, _, port = broker.rpartition(":")
+        port = int(port)
+    else:
+        sink = SinkBroker()
+        host, port = "127.0.0.1", await sink.start()
+    simulator_class = get_simulator_class(ProtocolType.MQTT)
+
+    try:
+        for label, settings in _mqtt_variants():
+            for count in tag_counts:
+                machine = Machine(
+                    id=1, name="bench", protocol=ProtocolType.MQTT, host=host, port=port,
+                    protocol_settings=settings,
+                )
+                simulator = simulator_class(machine, _sensors(1, count))
+                await simulator._start_server()
+                try:
+                    now = time.time()
+                    tick_rounds = max(5, min(rounds * 10, 200_000 // count))
+                    samples = []
+                    for i in range(tick_rounds + 2):
+                        # Nové hodnoty mimo měření - u RBE se publikují jen skutečně změněné
+                        for sensor_id, value in simulator._bank.generate(now + i):
+                            simulator.sensor_states[sensor_id].current_value = value
+                        t = time.perf_counter()
+                        await simulator._update_values()
+                        samples.append((time.perf_counter() - t) * 1e6)
+                    results[f"mqtt.tick.{label}.{count}"] = _stats(samples[2:], tick_rounds)
+                finally:
+                    await simulator._stop_server()
+
+        if sink is None:
+            return
+        for label, settings in (("json.qos0", {}), ("json.qos1", {"qos": 1}), ("sparkplug.qos0", {"encoding": "sparkplug"})):
+            simulators = []
+            for machine_id in range(1, MQTT_FLEET + 1):
+                machine = Machine(
+                    id=machine_id, name=f"bench-{machine_id}", protocol=ProtocolType.MQTT,
+                    host=host, port=port, protocol_settings=settings,
+                )
+                simulators.append(simulator_class(machine, _sensors(machine_id, MQTT_FLEET_TAGS)))
+            await asyncio.gather(*(simulator._start_server() for simulator in simulators))
+            try:
+                for simulator in simulators:
+                    for sensor_id, value in simulator._bank.generate():
+                        simulator.sensor_states[sensor_id].current_value = value
+                    await simulator._update_values()  # Sparkplug NBIRTH
+                samples = []
+                for _ in range(rounds):
+                    expected = sink.messages + MQTT_FLEET * MQTT_FLEET_TICKS
+                    t = time.perf_counter()
+                    for _ in range(MQTT_FLEET_TICKS):
+                        await asyncio.gather(*(simulator._update_values() for simulator in simulators))
+                    if not await sink.wait_for(expected):
+                        raise RuntimeError(f"Broker nepřijal všechny zprávy ({sink.messages}/{expected})")
+                    samples.append((time.perf_counter() - t) / (MQTT_FLEET * MQTT_FLEET_TICKS) * 1e6)
+                results[f"mqtt.throughput.{label}"] = _stats(samples, rounds * MQTT_FLEET * MQTT_FLEET_TICKS)
+                rate = 1e6 / statistics.median(samples)
+                print(f"  mqtt.throughput.{label}: {rate:,.0f} zpráv/s", file=sys.stderr)
+            finally:
+                await asyncio.gather(*(simulator._stop_server() for simulator in simulators))
+    finally:
+        if sink is not None:
+            await sink.stop()
+
+
+# =============================================================================
+# Porovnání a výstup
+# =============================================================================
+
+def _metadata() -> Dict[str, str]:
+    """Údaje o prostředí pro porovnání buildů"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(current: Results, baseline: Results, threshold: float, metric: str = "median_us") -> List[str]:
+    """
+    Vypíše porovnání zvolené statistiky s baseline.
+
+    Returns:
+        Názvy benchmarků, které se zhoršily o více než threshold (poměrně)
+    """
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline µs':>14} {'current µs':>14} {'ratio':>8}   ({metric})")
+    for name in sorted(current):
+        if name not in baseline:
+            continue
+        old = baseline[name][metric]
+        new = current[name][metric]
+        ratio = new / old if old else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESE"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  zlepšení"
+        print(f"{name:<36} {old:>14.3f} {new:>14.3f} {ratio:>8.2f}{flag}")
+    return regressions
+
+
+def _print_results(results: Results) -> None:
+    """Vypíše tabulku výsledků"""
+    print(f"\n{'benchmark':<36} {'median µs':>14} {'p95 µs':>14} {'min µs':>14}")
+    for name, stats in results.items():
+        print(f"{name:<36} {stats['median_us']:>14.3f} {stats['p95_us']:>14.3f} {stats['min_us']:>14.3f}")
+
+
+async def run_benchmarks(
+    groups: List[str],
+    tag_counts: List[int],
+    rounds: int,
+    mqtt_broker: Optional[str] = None,
+) -> Results:
+    """Spustí vybrané skupiny benchmarků"""
+    results: Results = {}
+    if "generator" in groups:
+        bench_generators(results, rounds)
+    if "bank" in groups:
+        bench_bank(results, rounds)
+    if "formula" in groups:
+        bench_formulas(results, rounds)
+    if "alarm" in groups:
+        bench_alarms(results, rounds)
+    if "history" in groups:
+        await bench_history(results, rounds)
+    if "waveform" in groups:
+        bench_waveforms(results, rounds)
+    if "encode" in groups:
+        bench_encoding(results, rounds)
+    if "publish" in groups or "start" in groups:
+        await bench_protocols(results, tag_counts, rounds, groups)
+    if "mqtt" in groups:
+        await bench_mqtt(results, tag_counts, rounds, mqtt_broker)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarky PLC simulátoru")
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="Výstupní JSON soubor")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"Skupiny oddělené čárkou ({', '.join(GROUPS)})")
+    parser.add_argument(
+        "--tags", default=None,
+        help="Počty tagů pro publish/start oddělené čárkou (výchozí 10,1000,10000)",
+    )
+    parser.add_argument("--rounds", type=int, default=7, help="Počet opakování měření")
+    parser.add_argument("--quick", action="store_true", help="Rychlý běh: 10 a 1000 tagů, 3 opakování")
+    parser.add_argument("--compare", default=None, help="Baseline JSON pro porovnání")
+    parser.add_argument(
+        "--mqtt-broker", default=None,
+        help="Externí MQTT broker host:port pro skupinu mqtt (výchozí vestavěný broker)",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Povolené zhoršení oproti baseline (0.2 = 20 %%)",
+    )
+    parser.add_argument(
+        "--metric", default="median_us", choices=("median_us", "min_us", "mean_us", "p95_us"),
+        help="Statistika pro porovnání (min_us je nejstabilnější na hlučném stroji)",
+    )
+    args = parser.parse_args(argv)
+
+    groups = [group.strip() for group in args.only.split(",") if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"Neznámé skupiny: {', '.join(sorted(unknown))}")
+
+    if args.tags:
+        tag_counts = [int(count) for count in args.tags.split(",")]
+    else:
+        tag_counts = list(QUICK_TAGS if args.quick else DEFAULT_TAGS)
+    rounds = 3 if args.quick else args.rounds
+
+    # Logy serverů by zkreslovaly měření
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("asyncua").setLevel(logging.ERROR)
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmarks(groups, tag_counts, rounds, args.mqtt_broker))
+    _print_results(results)
+
+    report = {"meta": _metadata(), "results": results}
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nVýsledky uloženy do {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold, args.metric)
+        if regressions:
+            print(f"\nZhoršení nad {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
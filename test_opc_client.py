@@ -1,8 +1,15 @@
 """
 Testovací OPC UA klient pro ověření simulátoru
+
+    python test_opc_client.py [opc.tcp://127.0.0.1:4840]   # výpis adresního prostoru
+    python test_opc_client.py load opc-ua --spawn 1000 --clients 20
+    python test_opc_client.py load modbus --target 127.0.0.1:5020 --clients 100 --rate 10
+
+Zátěžový režim (load) je popsán v benchmarks/load.py.
 """
 
 import asyncio
+import sys
 from asyncua import Client
 
 
@@ -77,11 +84,15 @@ async def browse_node(node, indent=0):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        from benchmarks.load import main
+        raise SystemExit(main(sys.argv[2:]))
+    
     print("="*50)
     print("🧪 OPC UA Test Client")
     print("="*50)
     
-    asyncio.run(test_opc_server())
+    asyncio.run(test_opc_server(*sys.argv[1:2]))
     
     print("\n" + "="*50)
     print("✅ Test dokončen")